@@ -0,0 +1,341 @@
+"""
+NPC 聊天回答缓存
+支持精确匹配和相似问题匹配两级缓存，带 TTL 和 LRU 淘汰
+
+相似问题匹配默认关闭：字符 n-gram 相似度无法区分“之前/之后”“可以/不可以”这类只差一两个字、
+意思却相反的问题，启用时除相似度阈值外还要求两个问题中的否定词和时间词完全一致。
+"""
+import copy
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 问题向量：稀疏的 特征 -> 权重 映射
+QuestionVector = Dict[str, float]
+
+# 改变问题含义的否定词和时间词，两个问题中这些词不一致时不作为相似问题命中（长词在前，优先匹配）
+GUARD_TERMS = (
+    '什么时候', '不可以', '不能', '没有', '之前', '之后', '以前', '以后', '前面', '后面',
+    '周末', '工作日', '今天', '明天', '昨天', '早上', '上午', '中午', '下午', '晚上', '现在', '已经',
+    '不', '没', '别', '未', '非', '无', '前', '后', '先', '再',
+    'not', 'no', 'never', 'without', "don't", "can't", 'before', 'after', 'weekend', 'today', 'tomorrow'
+)
+_GUARD_PATTERN = re.compile('|'.join(
+    re.escape(term) if re.match(r'[\u4e00-\u9fff]', term) else rf'\b{re.escape(term)}\b'
+    for term in GUARD_TERMS
+))
+
+
+def normalize_question(question: str) -> str:
+    """
+    规范化问题文本，用于精确匹配
+
+    去除首尾空白和结尾标点，合并连续空白，英文统一为小写。
+
+    Args:
+        question: 原始问题
+
+    Returns:
+        规范化后的问题
+    """
+    text = re.sub(r'\s+', ' ', question.strip().lower())
+    return text.rstrip('?？。.!！~～ ')
+
+
+def char_ngram_vector(text: str) -> QuestionVector:
+    """
+    计算文本的字符 n-gram 向量（默认的轻量嵌入）
+
+    中文按单字和相邻双字，英文和数字按单词，适合短问题的相似度比较。
+
+    Args:
+        text: 规范化后的文本
+
+    Returns:
+        L2 归一化的稀疏向量
+    """
+    features: Counter = Counter()
+    for token in re.findall(r'[\u4e00-\u9fff]+|[a-z0-9]+', text):
+        if re.match(r'[\u4e00-\u9fff]', token):
+            features.update(token)
+            features.update(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            features[token] += 1
+
+    norm = math.sqrt(sum(v * v for v in features.values()))
+    if norm == 0:
+        return {}
+    return {k: v / norm for k, v in features.items()}
+
+
+def guard_terms(text: str) -> Counter:
+    """
+    提取问题中的否定词和时间词
+
+    Args:
+        text: 规范化后的文本
+
+    Returns:
+        词 -> 出现次数
+    """
+    return Counter(_GUARD_PATTERN.findall(text))
+
+
+def cosine_similarity(a: QuestionVector, b: QuestionVector) -> float:
+    """计算两个归一化稀疏向量的余弦相似度"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    value: Any
+    vector: QuestionVector
+    created_at: float
+    guards: Optional[Counter] = None  # 问题中的否定词和时间词
+
+
+class AnswerCache:
+    """
+    回答缓存
+
+    以 (task_id, 规范化问题) 为键。启用相似问题匹配时，精确匹配未命中后在同一任务的缓存条目中
+    查找相似度不低于阈值、且否定词和时间词完全一致的问题。
+    事件循环、线程池中的检索任务和数据文件监视线程都会访问缓存，所有读写都在同一把锁内进行。
+    每次失效都会推进对应任务的代数；调用方在调用 LLM 前记下代数并随写入传入，
+    生成期间任务知识被失效时丢弃这次写入，避免把基于旧知识的回答写回缓存。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 3600.0,
+        semantic_enabled: bool = False,
+        similarity_threshold: float = 0.95,
+        embed_fn: Optional[Callable[[str], QuestionVector]] = None
+    ):
+        """
+        初始化回答缓存
+
+        Args:
+            max_entries: 最大缓存条目数
+            ttl: 缓存有效期（秒）
+            semantic_enabled: 是否启用相似问题匹配
+            similarity_threshold: 相似问题匹配阈值
+            embed_fn: 问题向量化函数，默认使用字符 n-gram 向量
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_enabled = semantic_enabled
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn or char_ngram_vector
+
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._task_keys: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self._lock = threading.RLock()
+        self._generation = 0  # 失效代数，每次失效或清空时递增
+        self._task_generations: Dict[str, int] = {}  # 任务ID -> 最近一次失效时的代数
+        self._cleared_at = 0  # 最近一次清空时的代数
+        self.stats = {
+            'lookups': 0,
+            'exact_hits': 0,
+            'semantic_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'stale_puts': 0
+        }
+
+    def get(self, task_id: str, question: str) -> Optional[Any]:
+        """
+        查找缓存的回答
+
+        Args:
+            task_id: 任务ID
+            question: 用户问题
+
+        Returns:
+            缓存值的副本，未命中时返回 None
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            value = self._lookup(task_id, normalized, time.time())
+        # 缓存中的值写入后不再修改，复制可以在锁外进行
+        return copy.deepcopy(value) if value is not None else None
+
+    def _lookup(self, task_id: str, normalized: str, now: float) -> Optional[Any]:
+        """在锁内查找缓存值并更新统计和 LRU 顺序"""
+        self.stats['lookups'] += 1
+        key = (task_id, normalized)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._is_expired(entry, now):
+                self._remove(key)
+                self.stats['expirations'] += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats['exact_hits'] += 1
+                return entry.value
+
+        if self.semantic_enabled:
+            match_key = self._find_similar(task_id, normalized, now)
+            if match_key is not None:
+                self._entries.move_to_end(match_key)
+                self.stats['semantic_hits'] += 1
+                return self._entries[match_key].value
+
+        self.stats['misses'] += 1
+        return None
+
+    def generation(self, task_id: str) -> int:
+        """
+        获取任务的缓存代数
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            任务最近一次失效（或整个缓存最近一次清空）时的代数
+        """
+        with self._lock:
+            return max(self._task_generations.get(task_id, 0), self._cleared_at)
+
+    def put(self, task_id: str, question: str, value: Any, generation: Optional[int] = None):
+        """
+        写入缓存
+
+        Args:
+            task_id: 任务ID
+            question: 用户问题
+            value: 要缓存的回答
+            generation: 生成回答前通过 generation() 取得的代数，与当前代数不一致时丢弃这次写入
+        """
+        if self.max_entries <= 0:
+            return
+
+        normalized = normalize_question(question)
+        key = (task_id, normalized)
+        entry = CacheEntry(
+            value=copy.deepcopy(value),
+            vector=self.embed_fn(normalized) if self.semantic_enabled else {},
+            created_at=time.time(),
+            guards=guard_terms(normalized) if self.semantic_enabled else None
+        )
+
+        with self._lock:
+            if generation is not None and generation != self.generation(task_id):
+                # 生成回答期间任务知识已失效，回答可能基于旧知识
+                self.stats['stale_puts'] += 1
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._task_keys[task_id].add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats['evictions'] += 1
+
+    def invalidate_task(self, task_id: str) -> int:
+        """
+        使指定任务的全部缓存失效
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            移除的条目数
+        """
+        with self._lock:
+            # 即使没有缓存条目也推进代数，使正在生成的回答不会写回缓存
+            self._generation += 1
+            self._task_generations[task_id] = self._generation
+            keys = list(self._task_keys.get(task_id, ()))
+            for key in keys:
+                self._remove(key)
+            if keys:
+                self.stats['invalidations'] += len(keys)
+        if keys:
+            logger.info(f"任务 {task_id} 的知识已变更，清除 {len(keys)} 条缓存回答")
+        return len(keys)
+
+    def invalidate_tasks(self, task_ids: Iterable[str]) -> int:
+        """批量使任务缓存失效"""
+        return sum(self.invalidate_task(task_id) for task_id in task_ids)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._entries.clear()
+            self._task_keys.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            size = len(self._entries)
+        hits = stats['exact_hits'] + stats['semantic_hits']
+        lookups = stats['lookups']
+        return {
+            **stats,
+            'hits': hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'exact_hit_rate': round(stats['exact_hits'] / lookups, 4) if lookups else 0.0,
+            'semantic_hit_rate': round(stats['semantic_hits'] / lookups, 4) if lookups else 0.0,
+            'size': size,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'similarity_threshold': self.similarity_threshold
+        }
+
+    def _find_similar(self, task_id: str, normalized: str, now: float) -> Optional[Tuple[str, str]]:
+        """在同一任务的缓存条目中查找最相似的问题（调用方持有锁）"""
+        keys = self._task_keys.get(task_id)
+        if not keys:
+            return None
+
+        vector = self.embed_fn(normalized)
+        if not vector:
+            return None
+        guards = guard_terms(normalized)
+
+        best_key = None
+        best_score = self.similarity_threshold
+        for key in list(keys):
+            entry = self._entries[key]
+            if self._is_expired(entry, now):
+                self._remove(key)
+                self.stats['expirations'] += 1
+                continue
+            if entry.guards != guards:
+                # 否定或时间不同的问题即使字面相近含义也可能相反
+                continue
+            score = cosine_similarity(vector, entry.vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+
+        return best_key
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        return self.ttl > 0 and now - entry.created_at > self.ttl
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        task_keys = self._task_keys.get(key[0])
+        if task_keys is not None:
+            task_keys.discard(key)
+            if not task_keys:
+                del self._task_keys[key[0]]
@@ -0,0 +1,202 @@
+"""
+任务变更日志
+每次重新加载任务数据时按行哈希比较新旧数据，记录 (数据代数, 任务ID, 操作) 条目，
+客户端凭上次同步到的代数只拉取之后的新增/修改和删除。日志有长度上限，被截断后需要全量同步。
+数据代数是进程内的计数器，重启后从头开始，因此对外的同步令牌带上日志的纪元（每个进程随机生成），
+其他纪元的令牌一律需要全量同步。
+同一次比较的结果也以 ChangeSet 的形式通知进程内的索引和缓存，只更新变化的行。
+"""
+import logging
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 变更操作
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+@dataclass(frozen=True)
+class ChangeEntry:
+    """一条变更记录"""
+    generation: int
+    task_id: str
+    op: str
+
+
+@dataclass(frozen=True)
+class ChangeSet:
+    """一次成功加载相对上次加载的变更"""
+    kind: str               # 数据类型: tasks / knowledge
+    generation: int         # 本次加载后的数据代数
+    added: List[str]
+    updated: List[str]
+    removed: List[str]
+
+    @classmethod
+    def from_hashes(cls, kind: str, generation: int, old: Dict[str, str], new: Dict[str, str]) -> 'ChangeSet':
+        """
+        比较两次加载的行哈希生成变更集
+
+        Args:
+            kind: 数据类型
+            generation: 本次加载后的数据代数
+            old: 任务ID -> 上次加载的行哈希
+            new: 任务ID -> 本次加载的行哈希
+
+        Returns:
+            变更集，新增和修改按本次加载的顺序排列
+        """
+        upserts, removed = diff_row_hashes(old, new)
+        added = [task_id for task_id in upserts if task_id not in old]
+        updated = [task_id for task_id in upserts if task_id in old]
+        return cls(kind, generation, added, updated, removed)
+
+    @property
+    def upserts(self) -> List[str]:
+        """新增或内容变化的任务ID"""
+        return self.added + self.updated
+
+    @property
+    def touched(self) -> List[str]:
+        """所有受影响的任务ID（新增、修改和删除）"""
+        return self.added + self.updated + self.removed
+
+    def is_empty(self) -> bool:
+        """本次加载是否没有任何变更"""
+        return not (self.added or self.updated or self.removed)
+
+
+def diff_row_hashes(old: Dict[str, str], new: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """
+    比较两次加载的行哈希
+
+    Args:
+        old: 任务ID -> 上次加载的行哈希
+        new: 任务ID -> 本次加载的行哈希
+
+    Returns:
+        (新增或内容变化的任务ID, 被删除的任务ID)
+    """
+    upserts = [task_id for task_id, row_hash in new.items() if old.get(task_id) != row_hash]
+    deletes = [task_id for task_id in old if task_id not in new]
+    return upserts, deletes
+
+
+class ChangeLog:
+    """
+    有长度上限的变更日志
+
+    第一次记录作为同步基线，不产生条目；horizon 之前的变更可能已被截断，
+    since 小于 horizon 的客户端需要全量同步。
+    """
+
+    def __init__(self, max_entries: int = 10000, epoch: Optional[str] = None):
+        """
+        Args:
+            max_entries: 最多保留的条目数
+            epoch: 日志纪元，默认随机生成；不同纪元的代数之间没有可比性
+        """
+        self.max_entries = max_entries
+        self.epoch = epoch or uuid.uuid4().hex[:12]
+        self._entries: Deque[ChangeEntry] = deque()
+        self._lock = threading.Lock()
+        self.horizon: Optional[int] = None  # 可以增量同步的最小 since，尚未建立基线时为 None
+        self._truncated = 0
+
+    @classmethod
+    def from_config(cls, config) -> 'ChangeLog':
+        """从 DataConfig 创建"""
+        return cls(max_entries=config.change_log_size)
+
+    def record(self, generation: int, upserts: List[str], deletes: List[str]):
+        """
+        记录一次加载产生的变更
+
+        Args:
+            generation: 本次加载后的数据代数
+            upserts: 新增或内容变化的任务ID
+            deletes: 被删除的任务ID
+        """
+        with self._lock:
+            if self.horizon is None:
+                self.horizon = generation
+                logger.info(f"变更日志基线: 代数 {generation}")
+                return
+            self._entries.extend(ChangeEntry(generation, task_id, UPSERT) for task_id in upserts)
+            self._entries.extend(ChangeEntry(generation, task_id, DELETE) for task_id in deletes)
+            while len(self._entries) > self.max_entries:
+                # 丢弃了某一代的条目后，早于这一代的客户端无法再增量同步
+                self.horizon = max(self.horizon, self._entries.popleft().generation)
+                self._truncated += 1
+        if upserts or deletes:
+            logger.info(f"变更日志: 代数 {generation}, 新增/修改 {len(upserts)} 个, 删除 {len(deletes)} 个")
+
+    def sync_token(self, generation: int) -> str:
+        """
+        生成同步令牌：纪元加数据代数
+
+        Args:
+            generation: 数据代数
+
+        Returns:
+            形如 "<纪元>.<代数>" 的令牌
+        """
+        return f"{self.epoch}.{generation}"
+
+    def parse_sync_token(self, token: str) -> Optional[int]:
+        """
+        解析同步令牌
+
+        Args:
+            token: 客户端提交的同步令牌
+
+        Returns:
+            令牌中的数据代数；纪元不是当前日志的（如服务重启前取得）或格式错误时返回 None
+        """
+        epoch, _, generation = token.rpartition('.')
+        if epoch != self.epoch or not generation.isdigit():
+            return None
+        return int(generation)
+
+    def changes_since(self, since: int, current: int) -> Optional[Dict[str, str]]:
+        """
+        获取某一代之后的变更（同一任务的多次变更合并为最后一次）
+
+        Args:
+            since: 客户端已同步到的数据代数
+            current: 当前数据代数
+
+        Returns:
+            任务ID -> 最终操作（按最后一次变更的先后排列）；日志已截断、尚无基线或 since 超过当前代数时返回 None
+        """
+        with self._lock:
+            if self.horizon is None or since < self.horizon or since > current:
+                return None
+            recent: List[ChangeEntry] = []
+            # 条目按代数递增排列，从尾部向前读到 since 为止；晚于 current 的条目（请求开始后才发布的数据）不返回
+            for entry in reversed(self._entries):
+                if entry.generation <= since:
+                    break
+                if entry.generation <= current:
+                    recent.append(entry)
+
+        changes: Dict[str, str] = {}
+        for entry in reversed(recent):
+            changes.pop(entry.task_id, None)
+            changes[entry.task_id] = entry.op
+        return changes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取变更日志统计信息"""
+        return {
+            'epoch': self.epoch,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'horizon': self.horizon,
+            'truncated': self._truncated
+        }
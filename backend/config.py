@@ -92,13 +92,254 @@ class PerformanceConfig:
     enable_metrics: bool = True    # 是否启用性能指标
     slow_request_threshold: float = 2.0  # 慢请求阈值（秒）
     p95_target: float = 2.5       # P95响应时间目标（秒）
+    stage_timing_header: bool = False  # 是否始终在 NPC 聊天响应中返回 Server-Timing 头
     
     @classmethod
     def from_env(cls) -> 'PerformanceConfig':
         return cls(
             enable_metrics=os.getenv('ENABLE_METRICS', 'true').lower() == 'true',
             slow_request_threshold=float(os.getenv('SLOW_REQUEST_THRESHOLD', 2.0)),
-            p95_target=float(os.getenv('P95_TARGET', 2.5))
+            p95_target=float(os.getenv('P95_TARGET', 2.5)),
+            stage_timing_header=os.getenv('STAGE_TIMING_HEADER', 'false').lower() == 'true'
+        )
+
+
+@dataclass
+class AnswerCacheConfig:
+    """NPC 聊天回答缓存配置"""
+    enabled: bool = True           # 是否启用回答缓存
+    max_entries: int = 1000        # 最大缓存条目数（LRU淘汰）
+    ttl: float = 3600.0            # 缓存有效期（秒）
+    semantic_enabled: bool = False  # 是否启用相似问题匹配（字面相近但含义相反的问题可能误命中，默认关闭）
+    similarity_threshold: float = 0.95  # 相似问题匹配阈值（余弦相似度）
+    
+    @classmethod
+    def from_env(cls) -> 'AnswerCacheConfig':
+        return cls(
+            enabled=os.getenv('ANSWER_CACHE_ENABLED', 'true').lower() == 'true',
+            max_entries=int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 1000)),
+            ttl=float(os.getenv('ANSWER_CACHE_TTL', 3600.0)),
+            semantic_enabled=os.getenv('ANSWER_CACHE_SEMANTIC', 'false').lower() == 'true',
+            similarity_threshold=float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.95))
+        )
+
+
+@dataclass
+class HedgeConfig:
+    """LLM 对冲请求配置"""
+    enabled: bool = True           # 是否启用对冲请求
+    percentile: float = 0.95       # 对冲延迟取最近成功调用耗时的百分位
+    min_samples: int = 20          # 样本不足时使用默认延迟
+    default_delay: float = 3.0     # 默认对冲延迟（秒）
+    min_delay: float = 0.2         # 对冲延迟下限（秒）
+    
+    @classmethod
+    def from_env(cls) -> 'HedgeConfig':
+        return cls(
+            enabled=os.getenv('LLM_HEDGE_ENABLED', 'true').lower() == 'true',
+            percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', 0.95)),
+            min_samples=int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 20)),
+            default_delay=float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', 3.0)),
+            min_delay=float(os.getenv('LLM_HEDGE_MIN_DELAY', 0.2))
+        )
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """LLM 熔断器配置"""
+    enabled: bool = True           # 是否启用熔断器
+    error_rate_threshold: float = 0.5  # 打开熔断的错误率阈值
+    min_calls: int = 10            # 计算错误率所需的最少调用次数
+    window_size: int = 20          # 错误率统计窗口
+    open_duration: float = 30.0    # 熔断打开持续时间（秒）
+    half_open_timeout: float = 60.0  # 半开试探调用名额的最长占用时间（秒）
+    
+    @classmethod
+    def from_env(cls) -> 'CircuitBreakerConfig':
+        return cls(
+            enabled=os.getenv('LLM_BREAKER_ENABLED', 'true').lower() == 'true',
+            error_rate_threshold=float(os.getenv('LLM_BREAKER_ERROR_RATE', 0.5)),
+            min_calls=int(os.getenv('LLM_BREAKER_MIN_CALLS', 10)),
+            window_size=int(os.getenv('LLM_BREAKER_WINDOW', 20)),
+            open_duration=float(os.getenv('LLM_BREAKER_OPEN_DURATION', 30.0)),
+            half_open_timeout=float(os.getenv('LLM_BREAKER_HALF_OPEN_TIMEOUT', 60.0))
+        )
+
+
+@dataclass
+class LLMGatewayConfig:
+    """LLM 并发网关配置"""
+    enabled: bool = True           # 是否启用并发网关
+    max_concurrency: int = 8       # 最大并发 LLM 调用数
+    max_queue_size: int = 64       # 最大排队数
+    
+    @classmethod
+    def from_env(cls) -> 'LLMGatewayConfig':
+        return cls(
+            enabled=os.getenv('LLM_GATEWAY_ENABLED', 'true').lower() == 'true',
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+            max_queue_size=int(os.getenv('LLM_MAX_QUEUE_SIZE', 64))
+        )
+
+
+@dataclass
+class LLMConfig:
+    """LLM 服务配置"""
+    provider: str = "mock"         # mock 或 openai（OpenAI 兼容接口）
+    base_url: str = "https://api.openai.com/v1"  # OpenAI 兼容接口地址
+    api_key: str = ""              # API 密钥
+    model: str = "gpt-4o-mini"     # 模型名称
+    temperature: float = 0.3       # 采样温度
+    max_tokens: int = 800          # 最大生成 token 数
+    pool_limit: int = 100          # 连接池总连接数上限
+    pool_limit_per_host: int = 32  # 每个主机的连接数上限
+    keepalive_timeout: float = 30.0  # 空闲连接保活时间（秒）
+    
+    @classmethod
+    def from_env(cls) -> 'LLMConfig':
+        return cls(
+            provider=os.getenv('LLM_PROVIDER', 'mock').lower(),
+            base_url=os.getenv('LLM_BASE_URL', 'https://api.openai.com/v1'),
+            api_key=os.getenv('LLM_API_KEY', ''),
+            model=os.getenv('LLM_MODEL', 'gpt-4o-mini'),
+            temperature=float(os.getenv('LLM_TEMPERATURE', 0.3)),
+            max_tokens=int(os.getenv('LLM_MAX_TOKENS', 800)),
+            pool_limit=int(os.getenv('LLM_POOL_LIMIT', 100)),
+            pool_limit_per_host=int(os.getenv('LLM_POOL_LIMIT_PER_HOST', 32)),
+            keepalive_timeout=float(os.getenv('LLM_KEEPALIVE_TIMEOUT', 30.0))
+        )
+
+
+@dataclass
+class MockLLMConfig:
+    """模拟 LLM 服务配置（LLM_PROVIDER=mock 时使用，用于负载和故障测试）"""
+    simulate_delay: bool = True    # 是否模拟延迟
+    latency_model: str = "uniform"  # 首字延迟模型：uniform、lognormal、bimodal 或 trace
+    min_delay: float = 0.5         # uniform 延迟下限（秒）
+    max_delay: float = 2.0         # uniform 延迟上限（秒）
+    median_delay: float = 1.0      # lognormal/bimodal 快速模式的延迟中位数（秒）
+    sigma: float = 0.5             # lognormal/bimodal 的对数标准差
+    slow_rate: float = 0.0         # 慢调用比例
+    slow_delay: float = 8.0        # 慢调用延迟（秒）；bimodal 中为慢速模式的中位数
+    trace_file: str = ""           # trace 模式回放的延迟记录文件
+    tokens_per_second: float = 0.0  # 生成速度，0 表示不模拟逐 token 输出
+    slowdown_per_call: float = 0.0  # 并发超过阈值后，每多一个并发调用增加的延迟比例
+    slowdown_threshold: int = 1    # 不产生减速的并发调用数
+    failure_rate: float = 0.0      # 模拟失败率
+    seed: Optional[int] = None     # 随机种子，便于复现
+    
+    @classmethod
+    def from_env(cls) -> 'MockLLMConfig':
+        seed = os.getenv('MOCK_LLM_SEED')
+        return cls(
+            simulate_delay=os.getenv('MOCK_LLM_SIMULATE_DELAY', 'true').lower() == 'true',
+            latency_model=os.getenv('MOCK_LLM_LATENCY_MODEL', 'uniform').lower(),
+            min_delay=float(os.getenv('MOCK_LLM_MIN_DELAY', 0.5)),
+            max_delay=float(os.getenv('MOCK_LLM_MAX_DELAY', 2.0)),
+            median_delay=float(os.getenv('MOCK_LLM_MEDIAN_DELAY', 1.0)),
+            sigma=float(os.getenv('MOCK_LLM_SIGMA', 0.5)),
+            slow_rate=float(os.getenv('MOCK_LLM_SLOW_RATE', 0.0)),
+            slow_delay=float(os.getenv('MOCK_LLM_SLOW_DELAY', 8.0)),
+            trace_file=os.getenv('MOCK_LLM_TRACE_FILE', ''),
+            tokens_per_second=float(os.getenv('MOCK_LLM_TOKENS_PER_SECOND', 0.0)),
+            slowdown_per_call=float(os.getenv('MOCK_LLM_SLOWDOWN_PER_CALL', 0.0)),
+            slowdown_threshold=int(os.getenv('MOCK_LLM_SLOWDOWN_THRESHOLD', 1)),
+            failure_rate=float(os.getenv('MOCK_LLM_FAILURE_RATE', 0.0)),
+            seed=int(seed) if seed else None
+        )
+
+
+@dataclass
+class PromptConfig:
+    """提示词构建配置"""
+    max_tokens: int = 1200         # 用户提示词的 token 预算（估算值）
+    dedupe_threshold: float = 0.8  # 知识片段去重的相似度阈值
+    sentence_extraction: bool = True  # 是否只保留与问题相关的句子
+    max_description_tokens: int = 200  # 任务描述的 token 上限
+    min_chunk_tokens: int = 40     # 剩余预算低于此值时不再截断放入片段
+    scaffold_cache_size: int = 256  # 任务信息模板缓存条目数
+    
+    @classmethod
+    def from_env(cls) -> 'PromptConfig':
+        return cls(
+            max_tokens=int(os.getenv('PROMPT_MAX_TOKENS', 1200)),
+            dedupe_threshold=float(os.getenv('PROMPT_DEDUPE_THRESHOLD', 0.8)),
+            sentence_extraction=os.getenv('PROMPT_SENTENCE_EXTRACTION', 'true').lower() == 'true',
+            max_description_tokens=int(os.getenv('PROMPT_MAX_DESCRIPTION_TOKENS', 200)),
+            min_chunk_tokens=int(os.getenv('PROMPT_MIN_CHUNK_TOKENS', 40)),
+            scaffold_cache_size=int(os.getenv('PROMPT_SCAFFOLD_CACHE_SIZE', 256))
+        )
+
+
+@dataclass
+class SessionConfig:
+    """多轮对话会话记忆配置"""
+    enabled: bool = True           # 是否启用会话记忆
+    max_sessions: int = 1000       # 内存中保留的会话数（按最近使用淘汰）
+    max_turns: int = 6             # 每个会话保留的原始对话轮数
+    history_tokens: int = 300      # 原始对话轮次的 token 预算，超出时折叠进摘要
+    summary_tokens: int = 150      # 滚动摘要的 token 上限
+    ttl: float = 1800.0            # 会话空闲过期时间（秒）
+    db_path: str = ""              # SQLite 文件路径，为空时只保存在内存
+    
+    @classmethod
+    def from_env(cls) -> 'SessionConfig':
+        return cls(
+            enabled=os.getenv('SESSION_ENABLED', 'true').lower() == 'true',
+            max_sessions=int(os.getenv('SESSION_MAX_SESSIONS', 1000)),
+            max_turns=int(os.getenv('SESSION_MAX_TURNS', 6)),
+            history_tokens=int(os.getenv('SESSION_HISTORY_TOKENS', 300)),
+            summary_tokens=int(os.getenv('SESSION_SUMMARY_TOKENS', 150)),
+            ttl=float(os.getenv('SESSION_TTL', 1800)),
+            db_path=os.getenv('SESSION_DB_PATH', '')
+        )
+
+
+@dataclass
+class SuggestionConfig:
+    """预计算建议索引配置"""
+    max_related: int = 3           # 每个任务的相关任务建议数
+    max_nearby: int = 3            # 每个任务的附近任务建议数
+    nearby_radius: float = 500.0   # 附近任务的距离上限（米）
+    max_questions: int = 3         # 每个任务的追问建议数
+    
+    @classmethod
+    def from_env(cls) -> 'SuggestionConfig':
+        return cls(
+            max_related=int(os.getenv('SUGGESTION_MAX_RELATED', 3)),
+            max_nearby=int(os.getenv('SUGGESTION_MAX_NEARBY', 3)),
+            nearby_radius=float(os.getenv('SUGGESTION_NEARBY_RADIUS', 500)),
+            max_questions=int(os.getenv('SUGGESTION_MAX_QUESTIONS', 3))
+        )
+
+
+@dataclass
+class ExecutorConfig:
+    """CPU 密集型任务执行器配置"""
+    thread_workers: int = 8        # 线程池大小（检索、过滤、模式转换等）
+    
+    @classmethod
+    def from_env(cls) -> 'ExecutorConfig':
+        return cls(
+            thread_workers=int(os.getenv('EXECUTOR_THREAD_WORKERS', 8))
+        )
+
+
+@dataclass
+class DataConfig:
+    """任务数据加载与同步配置"""
+    change_log_size: int = 10000   # 变更日志最多保留的条目数，超出后最早的条目被截断
+    watch_enabled: bool = True     # 是否监视数据文件并在变化后自动重新加载
+    watch_interval: float = 2.0    # 检查数据文件的间隔（秒）
+    snapshot_dir: str = ""         # 解析结果快照目录，为空时每次启动都重新解析数据文件
+    
+    @classmethod
+    def from_env(cls) -> 'DataConfig':
+        return cls(
+            change_log_size=int(os.getenv('DATA_CHANGE_LOG_SIZE', 10000)),
+            watch_enabled=os.getenv('DATA_WATCH_ENABLED', 'true').lower() == 'true',
+            watch_interval=float(os.getenv('DATA_WATCH_INTERVAL', 2.0)),
+            snapshot_dir=os.getenv('DATA_SNAPSHOT_DIR', os.path.join(os.path.dirname(__file__), 'cache', 'snapshots'))
         )
 
 
@@ -110,6 +351,17 @@ class AppConfig:
     rate_limit: RateLimitConfig
     error_handling: ErrorHandlingConfig
     performance: PerformanceConfig
+    answer_cache: AnswerCacheConfig
+    hedge: HedgeConfig
+    circuit_breaker: CircuitBreakerConfig
+    llm_gateway: LLMGatewayConfig
+    llm: LLMConfig
+    mock_llm: MockLLMConfig
+    prompt: PromptConfig
+    session: SessionConfig
+    suggestion: SuggestionConfig
+    executor: ExecutorConfig
+    data: DataConfig
     
     # 环境配置
     environment: str = "development"
@@ -123,6 +375,17 @@ class AppConfig:
             rate_limit=RateLimitConfig.from_env(),
             error_handling=ErrorHandlingConfig.from_env(),
             performance=PerformanceConfig.from_env(),
+            answer_cache=AnswerCacheConfig.from_env(),
+            hedge=HedgeConfig.from_env(),
+            circuit_breaker=CircuitBreakerConfig.from_env(),
+            llm_gateway=LLMGatewayConfig.from_env(),
+            llm=LLMConfig.from_env(),
+            mock_llm=MockLLMConfig.from_env(),
+            prompt=PromptConfig.from_env(),
+            session=SessionConfig.from_env(),
+            suggestion=SuggestionConfig.from_env(),
+            executor=ExecutorConfig.from_env(),
+            data=DataConfig.from_env(),
             environment=os.getenv('ENVIRONMENT', 'development'),
             debug=os.getenv('DEBUG', 'false').lower() == 'true'
         )
@@ -158,7 +421,93 @@ class AppConfig:
             'performance': {
                 'enable_metrics': self.performance.enable_metrics,
                 'slow_request_threshold': self.performance.slow_request_threshold,
-                'p95_target': self.performance.p95_target
+                'p95_target': self.performance.p95_target,
+                'stage_timing_header': self.performance.stage_timing_header
+            },
+            'answer_cache': {
+                'enabled': self.answer_cache.enabled,
+                'max_entries': self.answer_cache.max_entries,
+                'ttl': self.answer_cache.ttl,
+                'semantic_enabled': self.answer_cache.semantic_enabled,
+                'similarity_threshold': self.answer_cache.similarity_threshold
+            },
+            'hedge': {
+                'enabled': self.hedge.enabled,
+                'percentile': self.hedge.percentile,
+                'min_samples': self.hedge.min_samples,
+                'default_delay': self.hedge.default_delay,
+                'min_delay': self.hedge.min_delay
+            },
+            'circuit_breaker': {
+                'enabled': self.circuit_breaker.enabled,
+                'error_rate_threshold': self.circuit_breaker.error_rate_threshold,
+                'min_calls': self.circuit_breaker.min_calls,
+                'window_size': self.circuit_breaker.window_size,
+                'open_duration': self.circuit_breaker.open_duration,
+                'half_open_timeout': self.circuit_breaker.half_open_timeout
+            },
+            'llm_gateway': {
+                'enabled': self.llm_gateway.enabled,
+                'max_concurrency': self.llm_gateway.max_concurrency,
+                'max_queue_size': self.llm_gateway.max_queue_size
+            },
+            'llm': {
+                'provider': self.llm.provider,
+                'base_url': self.llm.base_url,
+                'model': self.llm.model,
+                'temperature': self.llm.temperature,
+                'max_tokens': self.llm.max_tokens,
+                'pool_limit': self.llm.pool_limit,
+                'pool_limit_per_host': self.llm.pool_limit_per_host,
+                'keepalive_timeout': self.llm.keepalive_timeout
+            },
+            'mock_llm': {
+                'simulate_delay': self.mock_llm.simulate_delay,
+                'latency_model': self.mock_llm.latency_model,
+                'min_delay': self.mock_llm.min_delay,
+                'max_delay': self.mock_llm.max_delay,
+                'median_delay': self.mock_llm.median_delay,
+                'sigma': self.mock_llm.sigma,
+                'slow_rate': self.mock_llm.slow_rate,
+                'slow_delay': self.mock_llm.slow_delay,
+                'trace_file': self.mock_llm.trace_file,
+                'tokens_per_second': self.mock_llm.tokens_per_second,
+                'slowdown_per_call': self.mock_llm.slowdown_per_call,
+                'slowdown_threshold': self.mock_llm.slowdown_threshold,
+                'failure_rate': self.mock_llm.failure_rate,
+                'seed': self.mock_llm.seed
+            },
+            'prompt': {
+                'max_tokens': self.prompt.max_tokens,
+                'dedupe_threshold': self.prompt.dedupe_threshold,
+                'sentence_extraction': self.prompt.sentence_extraction,
+                'max_description_tokens': self.prompt.max_description_tokens,
+                'min_chunk_tokens': self.prompt.min_chunk_tokens,
+                'scaffold_cache_size': self.prompt.scaffold_cache_size
+            },
+            'session': {
+                'enabled': self.session.enabled,
+                'max_sessions': self.session.max_sessions,
+                'max_turns': self.session.max_turns,
+                'history_tokens': self.session.history_tokens,
+                'summary_tokens': self.session.summary_tokens,
+                'ttl': self.session.ttl,
+                'db_path': self.session.db_path
+            },
+            'suggestion': {
+                'max_related': self.suggestion.max_related,
+                'max_nearby': self.suggestion.max_nearby,
+                'nearby_radius': self.suggestion.nearby_radius,
+                'max_questions': self.suggestion.max_questions
+            },
+            'executor': {
+                'thread_workers': self.executor.thread_workers
+            },
+            'data': {
+                'change_log_size': self.data.change_log_size,
+                'watch_enabled': self.data.watch_enabled,
+                'watch_interval': self.data.watch_interval,
+                'snapshot_dir': self.data.snapshot_dir
             },
             'environment': self.environment,
             'debug': self.debug
@@ -6,17 +6,24 @@
 """
 
 import csv
+import io
 import json
 import logging
+import re
+import sys
+import threading
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Set, Tuple
+from typing import Callable, Dict, List, Any, Optional, Set, Tuple
 from pathlib import Path
 import hashlib
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field, replace
 from enum import Enum
 
 # 导入地理编码服务
 from geocode import geocode_service, LocationInfo
+from change_log import ChangeLog, ChangeSet
+from config import app_config
+from snapshot_cache import SnapshotCache, schema_signature
 
 # 配置日志
 import os
@@ -49,9 +56,76 @@ class ValidationResult:
     value: Any = None
     record_id: str = ""
 
-@dataclass
+_POINTS_PATTERN = re.compile(r'(\d+)')
+
+
+class CodeTable:
+    """
+    字符串取值与小整数编码的双向映射
+
+    同一取值在所有记录中共享同一个字符串对象，编码按首次出现的顺序分配（从 0 开始），
+    用于类别、难度、状态等取值很少的字段。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, value: str) -> str:
+        """返回取值的共享字符串对象，首次出现时分配编码；非字符串原样返回"""
+        if not isinstance(value, str):
+            return value
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self._values)
+                    self._values.append(sys.intern(value))
+                    self._codes[self._values[code]] = code
+        return self._values[code]
+
+    def lookup(self, value: str) -> Optional[int]:
+        """取值 -> 编码，未出现过的取值返回 None（不分配编码）"""
+        return self._codes.get(value)
+
+    def encode(self, value: str) -> int:
+        """取值 -> 编码"""
+        return self._codes[self.intern(value)]
+
+    def decode(self, code: int) -> str:
+        """编码 -> 取值"""
+        return self._values[code]
+
+    def values(self) -> List[str]:
+        """按编码顺序排列的全部取值"""
+        return list(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+# 全局编码表，所有 DataLoader 实例共享
+CATEGORY_CODES = CodeTable("category")
+DIFFICULTY_CODES = CodeTable("difficulty")
+STATUS_CODES = CodeTable("status")
+
+
+def _intern(value: Any) -> Any:
+    """驻留字符串取值，非字符串原样返回"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True)
 class Task:
-    """任务数据模型"""
+    """
+    任务数据模型
+
+    使用 __slots__ 存储，取值重复的字段（类别、难度、状态、NPC、课程代码、地点）驻留为共享字符串，
+    积分在创建时从奖励字符串中解析一次。
+    """
     task_id: str
     title: str
     description: str
@@ -68,6 +142,7 @@ class Task:
     updated_at: str
     npc_id: str
     course_code: str
+    points: int = field(init=False, default=0)
     
     def __post_init__(self):
         """数据后处理"""
@@ -89,6 +164,22 @@ class Task:
                 self.estimated_duration = int(self.estimated_duration)
             except ValueError:
                 self.estimated_duration = 0
+        
+        # 取值重复的字段共享同一字符串对象
+        self.category = CATEGORY_CODES.intern(self.category)
+        self.difficulty = DIFFICULTY_CODES.intern(self.difficulty)
+        self.status = STATUS_CODES.intern(self.status)
+        self.task_id = _intern(self.task_id)
+        self.location_name = _intern(self.location_name)
+        self.prerequisites = _intern(self.prerequisites)
+        self.npc_id = _intern(self.npc_id)
+        self.course_code = _intern(self.course_code)
+        self.created_at = _intern(self.created_at)
+        self.updated_at = _intern(self.updated_at)
+        
+        # 从奖励字符串中提取积分，如 "学分+2" -> 2
+        match = _POINTS_PATTERN.search(self.rewards) if self.rewards else None
+        self.points = int(match.group(1)) if match else 0
     
     @property
     def location_lat(self) -> float:
@@ -101,18 +192,23 @@ class Task:
         return self.longitude
     
     @property
-    def points(self) -> int:
-        """从奖励字符串中提取积分"""
-        if not self.rewards:
-            return 0
-        # 简单解析积分，如 "学分+2" -> 2
-        import re
-        match = re.search(r'(\d+)', self.rewards)
-        return int(match.group(1)) if match else 0
+    def category_code(self) -> int:
+        """类别编码"""
+        return CATEGORY_CODES.encode(self.category)
+    
+    @property
+    def difficulty_code(self) -> int:
+        """难度编码"""
+        return DIFFICULTY_CODES.encode(self.difficulty)
+    
+    @property
+    def status_code(self) -> int:
+        """状态编码"""
+        return STATUS_CODES.encode(self.status)
 
-@dataclass
+@dataclass(slots=True)
 class TaskKnowledge:
-    """任务知识库数据模型"""
+    """任务知识库数据模型（__slots__ 存储，类型、难度、课程代码和标签驻留为共享字符串）"""
     task_id: str
     knowledge_type: str
     content: str
@@ -137,6 +233,12 @@ class TaskKnowledge:
                 self.estimated_time = int(self.estimated_time)
             except ValueError:
                 self.estimated_time = 0
+        
+        self.task_id = _intern(self.task_id)
+        self.knowledge_type = _intern(self.knowledge_type)
+        self.difficulty = DIFFICULTY_CODES.intern(self.difficulty)
+        self.course_code = _intern(self.course_code)
+        self.tags = [_intern(tag) for tag in self.tags]
     
     @property
     def title(self) -> str:
@@ -197,13 +299,13 @@ class DataValidator:
         
         # 必需字段检查
         required_fields = ['task_id', 'title', 'description', 'category']
-        for field in required_fields:
-            if not task_data.get(field) or str(task_data[field]).strip() == '':
+        for field_name in required_fields:
+            if not task_data.get(field_name) or str(task_data[field_name]).strip() == '':
                 results.append(ValidationResult(
                     level=ValidationLevel.ERROR,
-                    field=field,
-                    message=f"必需字段 '{field}' 为空或缺失",
-                    value=task_data.get(field),
+                    field=field_name,
+                    message=f"必需字段 '{field_name}' 为空或缺失",
+                    value=task_data.get(field_name),
                     record_id=task_data.get('task_id', 'unknown')
                 ))
         
@@ -214,24 +316,24 @@ class DataValidator:
             'estimated_duration': (1, 10080),  # 1分钟到1周
         }
         
-        for field, (min_val, max_val) in numeric_fields.items():
-            value = task_data.get(field)
+        for field_name, (min_val, max_val) in numeric_fields.items():
+            value = task_data.get(field_name)
             if value is not None:
                 try:
                     num_value = float(value)
                     if not (min_val <= num_value <= max_val):
                         results.append(ValidationResult(
                             level=ValidationLevel.WARNING,
-                            field=field,
-                            message=f"字段 '{field}' 值 {num_value} 超出合理范围 [{min_val}, {max_val}]",
+                            field=field_name,
+                            message=f"字段 '{field_name}' 值 {num_value} 超出合理范围 [{min_val}, {max_val}]",
                             value=value,
                             record_id=task_data.get('task_id', 'unknown')
                         ))
                 except (ValueError, TypeError):
                     results.append(ValidationResult(
                         level=ValidationLevel.ERROR,
-                        field=field,
-                        message=f"字段 '{field}' 不是有效的数值",
+                        field=field_name,
+                        message=f"字段 '{field_name}' 不是有效的数值",
                         value=value,
                         record_id=task_data.get('task_id', 'unknown')
                     ))
@@ -242,13 +344,13 @@ class DataValidator:
             'status': ['active', 'inactive', 'draft', 'archived']
         }
         
-        for field, valid_values in enum_fields.items():
-            value = task_data.get(field)
+        for field_name, valid_values in enum_fields.items():
+            value = task_data.get(field_name)
             if value and value not in valid_values:
                 results.append(ValidationResult(
                     level=ValidationLevel.WARNING,
-                    field=field,
-                    message=f"字段 '{field}' 值 '{value}' 不在有效选项中: {valid_values}",
+                    field=field_name,
+                    message=f"字段 '{field_name}' 值 '{value}' 不在有效选项中: {valid_values}",
                     value=value,
                     record_id=task_data.get('task_id', 'unknown')
                 ))
@@ -262,13 +364,13 @@ class DataValidator:
         
         # 必需字段检查
         required_fields = ['task_id', 'knowledge_type', 'content']
-        for field in required_fields:
-            if not kb_data.get(field) or str(kb_data[field]).strip() == '':
+        for field_name in required_fields:
+            if not kb_data.get(field_name) or str(kb_data[field_name]).strip() == '':
                 results.append(ValidationResult(
                     level=ValidationLevel.ERROR,
-                    field=field,
-                    message=f"必需字段 '{field}' 为空或缺失",
-                    value=kb_data.get(field),
+                    field=field_name,
+                    message=f"必需字段 '{field_name}' 为空或缺失",
+                    value=kb_data.get(field_name),
                     record_id=kb_data.get('task_id', 'unknown')
                 ))
         
@@ -304,25 +406,92 @@ class DataValidator:
         
         return results
 
+@dataclass(frozen=True)
+class DataSnapshot:
+    """
+    某一时刻的完整数据
+    
+    加载时在后台构建新的快照，完成后整体替换加载器持有的引用；快照发布后其中的字典和列式任务表不再修改，
+    请求开始时取得快照并只通过它读取数据，重新加载进行中或完成后都不会读到新旧混合的数据。
+    """
+    generation: int = 0  # 数据代数：每次成功加载任务或知识库后加一
+    tasks: Dict[str, Task] = field(default_factory=dict)
+    task_knowledge: Dict[str, TaskKnowledge] = field(default_factory=dict)
+    row_hashes: Dict[str, str] = field(default_factory=dict)  # 任务ID -> 行哈希，用于比较两次加载之间的变更
+    knowledge_hashes: Dict[str, str] = field(default_factory=dict)  # 任务ID -> 知识库行哈希
+    source_hashes: Dict[str, str] = field(default_factory=dict)  # 数据类型 -> 源文件内容哈希
+    source_paths: Dict[str, str] = field(default_factory=dict)  # 数据类型 -> 源文件路径
+    task_store: Any = None  # 列式任务表，任务加载时构建
+    
+    @property
+    def data_version(self) -> str:
+        """
+        数据版本标识：源文件内容哈希
+        
+        只由内容决定，不含进程内的数据代数：同样的文件在不同进程、重启后或重新加载后得到相同的标识，
+        多个工作进程对同一份数据返回相同的 ETag；文件内容变化后标识随之改变。
+        """
+        return "-".join(self.source_hashes.get(kind, "")[:12] for kind in ('tasks', 'knowledge'))
+
 class DataLoader:
     """数据加载器主类"""
     
-    def __init__(self):
-        self.tasks: Dict[str, Task] = {}
-        self.task_knowledge: Dict[str, TaskKnowledge] = {}
+    def __init__(self, snapshot_cache: Optional[SnapshotCache] = None):
+        """
+        Args:
+            snapshot_cache: 解析结果快照缓存，默认按 DataConfig 创建
+        """
+        self._snapshot = DataSnapshot()
+        self._load_lock = threading.RLock()  # 加载互斥：每次加载都基于上一次发布的快照
         self.validation_results: List[ValidationResult] = []
-        self.load_stats = {
+        self.load_stats: Dict[str, Any] = {
             'tasks_loaded': 0,
             'tasks_skipped': 0,
+            'tasks_unchanged': 0,
             'knowledge_loaded': 0,
             'knowledge_skipped': 0,
+            'knowledge_unchanged': 0,
             'duplicates_removed': 0,
             'validation_errors': 0,
             'validation_warnings': 0,
             'last_load_time': None
         }
         self.validator = DataValidator()
+        self.change_log = ChangeLog.from_config(app_config.data)
+        self.snapshot_cache = snapshot_cache or SnapshotCache.from_config(
+            app_config.data, schema_signature(Task, TaskKnowledge))
+        self._preparers: List[Callable[[DataSnapshot, List[ChangeSet]], None]] = []  # 新快照发布前接收快照和变更集
+        self._listeners: List[Callable[[ChangeSet], None]] = []  # 每次成功加载后接收变更集
         
+    @property
+    def snapshot(self) -> DataSnapshot:
+        """当前发布的数据快照"""
+        return self._snapshot
+    
+    @property
+    def tasks(self) -> Dict[str, Task]:
+        return self._snapshot.tasks
+    
+    @property
+    def task_knowledge(self) -> Dict[str, TaskKnowledge]:
+        return self._snapshot.task_knowledge
+    
+    @property
+    def generation(self) -> int:
+        return self._snapshot.generation
+    
+    @property
+    def source_hashes(self) -> Dict[str, str]:
+        return self._snapshot.source_hashes
+    
+    @property
+    def source_paths(self) -> Dict[str, str]:
+        return self._snapshot.source_paths
+    
+    @property
+    def data_version(self) -> str:
+        return self._snapshot.data_version
+    
     def _generate_hash(self, data: Dict[str, Any]) -> str:
         """生成数据哈希用于去重"""
         # 排除时间戳字段，只对核心内容计算哈希
@@ -331,183 +500,420 @@ class DataLoader:
         data_str = json.dumps(core_data, sort_keys=True, ensure_ascii=False)
         return hashlib.md5(data_str.encode('utf-8')).hexdigest()
     
+    @staticmethod
+    def _row_hash(data: Dict[str, Any], data_hash: str) -> str:
+        """行哈希：去重哈希不含时间戳，比较两次加载时把时间戳一并计入"""
+        return f"{data_hash}:{data.get('created_at') or ''}:{data.get('updated_at') or ''}"
+    
+    @staticmethod
+    def _unchanged(current: Dict[str, Any], hashes: Dict[str, str], task_id: Optional[str], row_hash: str):
+        """行哈希与上次加载一致时返回上次的对象，否则返回 None"""
+        if task_id and hashes.get(task_id) == row_hash:
+            return current.get(task_id)
+        return None
+    
+    @staticmethod
+    def _restore(cached: Dict[str, Any], cached_hashes: Dict[str, str],
+                 current: Dict[str, Any], hashes: Dict[str, str]) -> Tuple[Dict[str, Any], int]:
+        """
+        使用快照中的对象：行哈希与当前数据一致的沿用当前对象，其余重新驻留共享字符串
+        
+        Returns:
+            (任务ID -> 对象, 沿用当前对象的数量)
+        """
+        restored = {}
+        unchanged_count = 0
+        for task_id, obj in cached.items():
+            unchanged = DataLoader._unchanged(current, hashes, task_id, cached_hashes[task_id])
+            if unchanged is not None:
+                obj = unchanged
+                unchanged_count += 1
+            else:
+                # 反序列化的字符串不与编码表共享，__post_init__ 对已转换的字段是幂等的
+                obj.__post_init__()
+            restored[task_id] = obj
+        return restored, unchanged_count
+    
+    def _count_issues(self) -> Dict[str, int]:
+        """当前累计的校验与去重计数，用于计算一次解析产生的增量"""
+        return {key: self.load_stats[key] for key in ('validation_errors', 'validation_warnings', 'duplicates_removed')}
+    
+    def add_change_listener(self, listener: Callable[[ChangeSet], None]):
+        """
+        注册变更监听器
+        
+        每次成功加载任务或知识库后，监听器收到本次加载的变更集（新快照已发布），
+        据此只更新变化的行；监听器在加载线程中、下一次加载开始之前执行，抛出的异常记录后忽略。
+        
+        Args:
+            listener: 接收 ChangeSet 的回调
+        """
+        self._listeners.append(listener)
+    
+    def add_prepare_listener(self, listener: Callable[[DataSnapshot, List[ChangeSet]], None]):
+        """
+        注册准备监听器
+        
+        新快照发布之前，监听器收到新快照和本次发布包含的全部变更集（load_all_data 时任务和知识库各一个），
+        用于构建依赖新数据的索引和缓存，快照发布时它们已与之一致；抛出的异常记录后忽略。
+        
+        Args:
+            listener: 接收 (DataSnapshot, List[ChangeSet]) 的回调
+        """
+        self._preparers.append(listener)
+    
+    def _notify(self, changes: ChangeSet):
+        """把变更集依次交给各监听器"""
+        for listener in self._listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                logger.error(f"变更监听器处理失败 ({changes.kind}, 代数 {changes.generation}): {str(e)}")
+    
     def load_tasks_csv(self, file_path: str) -> bool:
-        """加载任务CSV文件"""
+        """加载任务CSV文件（与其他加载互斥，完成后发布新快照）"""
+        with self._load_lock:
+            base = self._snapshot
+            staged = self._stage_tasks(file_path, base)
+            if staged is None:
+                return False
+            self._publish(base, staged, ['tasks'])
+            return True
+    
+    def _stage_tasks(self, file_path: str, base: DataSnapshot) -> Optional[DataSnapshot]:
+        """
+        解析任务文件并构建列式任务表，得到在 base 基础上替换任务数据的快照（不发布）
+        
+        Returns:
+            待发布的快照；文件不存在或读取失败时返回 None
+        """
         logger.info(f"开始加载任务文件: {file_path}")
         
         if not Path(file_path).exists():
             logger.error(f"文件不存在: {file_path}")
-            return False
+            return None
         
         seen_hashes: Set[str] = set()
         loaded_count = 0
         skipped_count = 0
+        unchanged_count = 0
+        # 新数据先写入新的字典，加载完成后随新快照发布，被删除的任务随之移除
+        tasks: Dict[str, Task] = {}
+        row_hashes: Dict[str, str] = {}
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
+            # 只读取一次文件，内容哈希与解析的数据一致
+            raw = Path(file_path).read_bytes()
+            source_hash = hashlib.sha1(raw).hexdigest()
+            # 源文件与快照一致时直接使用快照中已解析、校验的结果
+            cached = self.snapshot_cache.load('tasks', source_hash)
+            if cached is not None:
+                tasks, unchanged_count = self._restore(cached['objects'], cached['row_hashes'], base.tasks, base.row_hashes)
+                row_hashes = dict(cached['row_hashes'])
+                loaded_count = len(tasks)
+                skipped_count = cached['skipped']
+                for key, count in cached['issues'].items():
+                    self.load_stats[key] += count
+            else:
+                issues = self._count_issues()
+                with io.StringIO(raw.decode('utf-8'), newline='') as f:
+                    reader = csv.DictReader(f)
                 
-                for row_num, row in enumerate(reader, 1):
-                    try:
-                        # 数据清理
-                        cleaned_row = {k: v.strip() if isinstance(v, str) else v 
-                                     for k, v in row.items()}
-                        
-                        # 校验数据
-                        validation_results = self.validator.validate_task(cleaned_row)
-                        self.validation_results.extend(validation_results)
+                    for row_num, row in enumerate(reader, 1):
+                        try:
+                            # 数据清理
+                            cleaned_row = {k: v.strip() if isinstance(v, str) else v 
+                                         for k, v in row.items()}
+                            data_hash = self._generate_hash(cleaned_row)
+                            row_hash = self._row_hash(cleaned_row, data_hash)
                         
-                        # 检查是否有错误级别的校验失败
-                        has_errors = any(r.level == ValidationLevel.ERROR for r in validation_results)
-                        if has_errors:
-                            logger.error(f"第 {row_num} 行数据校验失败，跳过")
-                            skipped_count += 1
-                            self.load_stats['validation_errors'] += len([r for r in validation_results if r.level == ValidationLevel.ERROR])
-                            continue
+                            # 与上次加载相同的行直接沿用已校验的任务对象，跳过校验和地理编码
+                            unchanged = self._unchanged(base.tasks, base.row_hashes, cleaned_row.get('task_id'), row_hash)
+                            if unchanged is None:
+                                # 校验数据
+                                validation_results = self.validator.validate_task(cleaned_row)
+                                self.validation_results.extend(validation_results)
+                            
+                                # 检查是否有错误级别的校验失败
+                                has_errors = any(r.level == ValidationLevel.ERROR for r in validation_results)
+                                if has_errors:
+                                    logger.error(f"第 {row_num} 行数据校验失败，跳过")
+                                    skipped_count += 1
+                                    self.load_stats['validation_errors'] += len([r for r in validation_results if r.level == ValidationLevel.ERROR])
+                                    continue
+                            
+                                # 记录警告
+                                warnings = [r for r in validation_results if r.level == ValidationLevel.WARNING]
+                                if warnings:
+                                    for warning in warnings:
+                                        logger.warning(f"第 {row_num} 行: {warning.message}")
+                                    self.load_stats['validation_warnings'] += len(warnings)
                         
-                        # 记录警告
-                        warnings = [r for r in validation_results if r.level == ValidationLevel.WARNING]
-                        if warnings:
-                            for warning in warnings:
-                                logger.warning(f"第 {row_num} 行: {warning.message}")
-                            self.load_stats['validation_warnings'] += len(warnings)
+                            # 去重检查
+                            if data_hash in seen_hashes:
+                                logger.warning(f"第 {row_num} 行: 发现重复数据，跳过")
+                                skipped_count += 1
+                                self.load_stats['duplicates_removed'] += 1
+                                continue
+                            seen_hashes.add(data_hash)
                         
-                        # 去重检查
-                        data_hash = self._generate_hash(cleaned_row)
-                        if data_hash in seen_hashes:
-                            logger.warning(f"第 {row_num} 行: 发现重复数据，跳过")
-                            skipped_count += 1
-                            self.load_stats['duplicates_removed'] += 1
-                            continue
-                        seen_hashes.add(data_hash)
+                            if unchanged is not None:
+                                tasks[unchanged.task_id] = unchanged
+                                row_hashes[unchanged.task_id] = row_hash
+                                loaded_count += 1
+                                unchanged_count += 1
+                                continue
                         
-                        # 地理编码处理
-                        location_name = cleaned_row.get('location_name', '')
-                        if location_name:
-                            location_info = geocode_service.geocode_location(location_name)
-                            # 更新坐标信息 (使用正确的字段名)
-                            cleaned_row['latitude'] = location_info.latitude
-                            cleaned_row['longitude'] = location_info.longitude
+                            # 地理编码处理
+                            location_name = cleaned_row.get('location_name', '')
+                            if location_name:
+                                location_info = geocode_service.geocode_location(location_name)
+                                # 更新坐标信息 (使用正确的字段名)
+                                cleaned_row['latitude'] = location_info.latitude
+                                cleaned_row['longitude'] = location_info.longitude
                             
-                            # 记录地理编码结果
-                            if location_info.source == 'fallback':
-                                logger.warning(f"任务 {cleaned_row.get('task_id', 'unknown')} 使用回退位置: {location_name}")
-                            else:
-                                logger.debug(f"任务 {cleaned_row.get('task_id', 'unknown')} 地理编码成功: {location_name} -> ({location_info.latitude}, {location_info.longitude})")
+                                # 记录地理编码结果
+                                if location_info.source == 'fallback':
+                                    logger.warning(f"任务 {cleaned_row.get('task_id', 'unknown')} 使用回退位置: {location_name}")
+                                else:
+                                    logger.debug(f"任务 {cleaned_row.get('task_id', 'unknown')} 地理编码成功: {location_name} -> ({location_info.latitude}, {location_info.longitude})")
                         
-                        # 创建任务对象
-                        task = Task(**cleaned_row)
-                        self.tasks[task.task_id] = task
-                        loaded_count += 1
+                            # 创建任务对象
+                            task = Task(**cleaned_row)
+                            tasks[task.task_id] = task
+                            row_hashes[task.task_id] = row_hash
+                            loaded_count += 1
                         
-                        logger.debug(f"成功加载任务: {task.task_id}")
+                            logger.debug(f"成功加载任务: {task.task_id}")
                         
-                    except Exception as e:
-                        logger.error(f"第 {row_num} 行处理失败: {str(e)}")
-                        skipped_count += 1
-                        continue
+                        except Exception as e:
+                            logger.error(f"第 {row_num} 行处理失败: {str(e)}")
+                            skipped_count += 1
+                            continue
         
+                # 保存本次解析结果，校验与去重计数随快照保存
+                self.snapshot_cache.save('tasks', source_hash, {
+                    'objects': tasks,
+                    'row_hashes': row_hashes,
+                    'skipped': skipped_count,
+                    'issues': {key: count - issues[key] for key, count in self._count_issues().items()}
+                })
         except Exception as e:
             logger.error(f"读取文件失败: {str(e)}")
-            return False
+            return None
         
         self.load_stats['tasks_loaded'] = loaded_count
         self.load_stats['tasks_skipped'] = skipped_count
-        logger.info(f"任务加载完成: 成功 {loaded_count} 个, 跳过 {skipped_count} 个")
-        return True
+        self.load_stats['tasks_unchanged'] = unchanged_count
+        logger.info(f"任务加载完成: 成功 {loaded_count} 个 (未变化 {unchanged_count} 个), 跳过 {skipped_count} 个")
+        return replace(
+            self._with_source(base, 'tasks', file_path, source_hash),
+            tasks=tasks, row_hashes=row_hashes, task_store=self._build_task_store(tasks)
+        )
+    
+    @staticmethod
+    def _build_task_store(tasks: Dict[str, Task]):
+        """根据任务构建列式任务表"""
+        from task_store import TaskStore
+        store = TaskStore(tasks.values())
+        logger.info(f"列式任务表构建完成: {len(store)} 行")
+        return store
+    
+    @staticmethod
+    def _with_source(base: DataSnapshot, kind: str, file_path: str, source_hash: str) -> DataSnapshot:
+        """在上一个快照的基础上记录源文件内容哈希和路径（数据代数在发布时推进）"""
+        return replace(
+            base,
+            source_hashes={**base.source_hashes, kind: source_hash},
+            source_paths={**base.source_paths, kind: str(file_path)}
+        )
+    
+    def _publish(self, base: DataSnapshot, staged: DataSnapshot, kinds: List[str]):
+        """
+        发布新快照：数据代数加一，一次引用替换
+        
+        发布前先由准备监听器构建依赖新数据的索引和缓存，发布后记录变更并通知变更监听器。
+        
+        Args:
+            base: 本次加载所基于的快照（即当前快照）
+            staged: 已构建完成的新数据
+            kinds: 本次加载的数据类型
+        """
+        snapshot = replace(staged, generation=base.generation + 1)
+        changesets = [
+            ChangeSet.from_hashes('tasks', snapshot.generation, base.row_hashes, snapshot.row_hashes)
+            if kind == 'tasks' else
+            ChangeSet.from_hashes('knowledge', snapshot.generation, base.knowledge_hashes, snapshot.knowledge_hashes)
+            for kind in kinds
+        ]
+        for preparer in self._preparers:
+            try:
+                preparer(snapshot, changesets)
+            except Exception as e:
+                logger.error(f"准备监听器处理失败 (代数 {snapshot.generation}): {str(e)}")
+        
+        self._snapshot = snapshot
+        for changes in changesets:
+            if changes.kind == 'tasks':
+                self.change_log.record(snapshot.generation, changes.upserts, changes.removed)
+            self._notify(changes)
     
     def load_knowledge_jsonl(self, file_path: str) -> bool:
-        """加载知识库JSONL文件"""
+        """加载知识库JSONL文件（与其他加载互斥，完成后发布新快照）"""
+        with self._load_lock:
+            base = self._snapshot
+            staged = self._stage_knowledge(file_path, base)
+            if staged is None:
+                return False
+            self._publish(base, staged, ['knowledge'])
+            return True
+    
+    def _stage_knowledge(self, file_path: str, base: DataSnapshot) -> Optional[DataSnapshot]:
+        """
+        解析知识库文件，得到在 base 基础上替换知识库数据的快照（不发布）
+        
+        Returns:
+            待发布的快照；文件不存在或读取失败时返回 None
+        """
         logger.info(f"开始加载知识库文件: {file_path}")
         
         if not Path(file_path).exists():
             logger.error(f"文件不存在: {file_path}")
-            return False
+            return None
         
         seen_hashes: Set[str] = set()
         loaded_count = 0
         skipped_count = 0
+        unchanged_count = 0
+        # 与任务相同，新数据写入新的字典后随新快照发布
+        task_knowledge: Dict[str, TaskKnowledge] = {}
+        knowledge_hashes: Dict[str, str] = {}
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
+            raw = Path(file_path).read_bytes()
+            source_hash = hashlib.sha1(raw).hexdigest()
+            # 源文件与快照一致时直接使用快照中已解析、校验的结果
+            cached = self.snapshot_cache.load('knowledge', source_hash)
+            if cached is not None:
+                task_knowledge, unchanged_count = self._restore(cached['objects'], cached['row_hashes'], base.task_knowledge, base.knowledge_hashes)
+                knowledge_hashes = dict(cached['row_hashes'])
+                loaded_count = len(task_knowledge)
+                skipped_count = cached['skipped']
+                for key, count in cached['issues'].items():
+                    self.load_stats[key] += count
+            else:
+                issues = self._count_issues()
+                with io.StringIO(raw.decode('utf-8')) as f:
+                    for line_num, line in enumerate(f, 1):
+                        line = line.strip()
+                        if not line:
+                            continue
                     
-                    try:
-                        # 解析JSON
-                        kb_data = json.loads(line)
+                        try:
+                            # 解析JSON
+                            kb_data = json.loads(line)
+                            data_hash = self._generate_hash(kb_data)
+                            row_hash = self._row_hash(kb_data, data_hash)
                         
-                        # 校验数据
-                        validation_results = self.validator.validate_task_knowledge(kb_data)
-                        self.validation_results.extend(validation_results)
+                            unchanged = self._unchanged(base.task_knowledge, base.knowledge_hashes, kb_data.get('task_id'), row_hash)
+                            if unchanged is None:
+                                # 校验数据
+                                validation_results = self.validator.validate_task_knowledge(kb_data)
+                                self.validation_results.extend(validation_results)
+                            
+                                # 检查是否有错误级别的校验失败
+                                has_errors = any(r.level == ValidationLevel.ERROR for r in validation_results)
+                                if has_errors:
+                                    logger.error(f"第 {line_num} 行数据校验失败，跳过")
+                                    skipped_count += 1
+                                    self.load_stats['validation_errors'] += len([r for r in validation_results if r.level == ValidationLevel.ERROR])
+                                    continue
+                            
+                                # 记录警告
+                                warnings = [r for r in validation_results if r.level == ValidationLevel.WARNING]
+                                if warnings:
+                                    for warning in warnings:
+                                        logger.warning(f"第 {line_num} 行: {warning.message}")
+                                    self.load_stats['validation_warnings'] += len(warnings)
                         
-                        # 检查是否有错误级别的校验失败
-                        has_errors = any(r.level == ValidationLevel.ERROR for r in validation_results)
-                        if has_errors:
-                            logger.error(f"第 {line_num} 行数据校验失败，跳过")
-                            skipped_count += 1
-                            self.load_stats['validation_errors'] += len([r for r in validation_results if r.level == ValidationLevel.ERROR])
-                            continue
+                            # 去重检查
+                            if data_hash in seen_hashes:
+                                logger.warning(f"第 {line_num} 行: 发现重复数据，跳过")
+                                skipped_count += 1
+                                self.load_stats['duplicates_removed'] += 1
+                                continue
+                            seen_hashes.add(data_hash)
                         
-                        # 记录警告
-                        warnings = [r for r in validation_results if r.level == ValidationLevel.WARNING]
-                        if warnings:
-                            for warning in warnings:
-                                logger.warning(f"第 {line_num} 行: {warning.message}")
-                            self.load_stats['validation_warnings'] += len(warnings)
+                            if unchanged is not None:
+                                knowledge = unchanged
+                                unchanged_count += 1
+                            else:
+                                # 创建知识库对象
+                                knowledge = TaskKnowledge(**kb_data)
+                            task_knowledge[knowledge.task_id] = knowledge
+                            knowledge_hashes[knowledge.task_id] = row_hash
+                            loaded_count += 1
                         
-                        # 去重检查
-                        data_hash = self._generate_hash(kb_data)
-                        if data_hash in seen_hashes:
-                            logger.warning(f"第 {line_num} 行: 发现重复数据，跳过")
+                            logger.debug(f"成功加载知识库: {knowledge.task_id}")
+                        
+                        except json.JSONDecodeError as e:
+                            logger.error(f"第 {line_num} 行JSON解析失败: {str(e)}")
+                            skipped_count += 1
+                            continue
+                        except Exception as e:
+                            logger.error(f"第 {line_num} 行处理失败: {str(e)}")
                             skipped_count += 1
-                            self.load_stats['duplicates_removed'] += 1
                             continue
-                        seen_hashes.add(data_hash)
-                        
-                        # 创建知识库对象
-                        knowledge = TaskKnowledge(**kb_data)
-                        self.task_knowledge[knowledge.task_id] = knowledge
-                        loaded_count += 1
-                        
-                        logger.debug(f"成功加载知识库: {knowledge.task_id}")
-                        
-                    except json.JSONDecodeError as e:
-                        logger.error(f"第 {line_num} 行JSON解析失败: {str(e)}")
-                        skipped_count += 1
-                        continue
-                    except Exception as e:
-                        logger.error(f"第 {line_num} 行处理失败: {str(e)}")
-                        skipped_count += 1
-                        continue
         
+                # 保存本次解析结果，校验与去重计数随快照保存
+                self.snapshot_cache.save('knowledge', source_hash, {
+                    'objects': task_knowledge,
+                    'row_hashes': knowledge_hashes,
+                    'skipped': skipped_count,
+                    'issues': {key: count - issues[key] for key, count in self._count_issues().items()}
+                })
         except Exception as e:
             logger.error(f"读取文件失败: {str(e)}")
-            return False
+            return None
         
         self.load_stats['knowledge_loaded'] = loaded_count
         self.load_stats['knowledge_skipped'] = skipped_count
-        logger.info(f"知识库加载完成: 成功 {loaded_count} 个, 跳过 {skipped_count} 个")
-        return True
+        self.load_stats['knowledge_unchanged'] = unchanged_count
+        logger.info(f"知识库加载完成: 成功 {loaded_count} 个 (未变化 {unchanged_count} 个), 跳过 {skipped_count} 个")
+        return replace(
+            self._with_source(base, 'knowledge', file_path, source_hash),
+            task_knowledge=task_knowledge, knowledge_hashes=knowledge_hashes
+        )
     
     def load_all_data(self, tasks_file: str = "../data/tasks.csv", 
                      knowledge_file: str = "../data/task_kb.jsonl") -> bool:
-        """加载所有数据"""
-        logger.info("开始加载所有数据")
-        
-        # 重置统计信息
-        self.load_stats['last_load_time'] = datetime.now().isoformat()
-        
-        # 加载任务数据
-        tasks_success = self.load_tasks_csv(tasks_file)
+        """
+        加载所有数据
         
-        # 加载知识库数据
-        knowledge_success = self.load_knowledge_jsonl(knowledge_file)
+        任务和知识库都解析、构建完成后只发布一次快照，请求不会看到只更新了其中一种数据的中间状态；
+        其中一个文件加载失败时，仍发布另一个的新数据。
+        """
+        logger.info("开始加载所有数据")
         
-        # 数据一致性检查
-        self._check_data_consistency()
+        with self._load_lock:
+            # 重置统计信息
+            self.load_stats['last_load_time'] = datetime.now().isoformat()
+            base = self._snapshot
+            
+            # 加载任务数据
+            tasks_staged = self._stage_tasks(tasks_file, base)
+            
+            # 加载知识库数据（在新任务数据的基础上）
+            staged = self._stage_knowledge(knowledge_file, tasks_staged or base)
+            knowledge_success = staged is not None
+            tasks_success = tasks_staged is not None
+            staged = staged or tasks_staged
+            
+            if staged is not None:
+                # 数据一致性检查
+                self._check_data_consistency(staged)
+                kinds = [kind for kind, ok in (('tasks', tasks_success), ('knowledge', knowledge_success)) if ok]
+                self._publish(base, staged, kinds)
         
         success = tasks_success and knowledge_success
         if success:
@@ -517,13 +923,14 @@ class DataLoader:
         
         return success
     
-    def _check_data_consistency(self):
-        """检查数据一致性"""
+    def _check_data_consistency(self, snapshot: Optional[DataSnapshot] = None):
+        """检查数据一致性（默认检查当前快照）"""
         logger.info("开始数据一致性检查")
+        snapshot = snapshot or self._snapshot
         
         # 检查任务和知识库的对应关系
-        task_ids = set(self.tasks.keys())
-        knowledge_task_ids = set(self.task_knowledge.keys())
+        task_ids = set(snapshot.tasks.keys())
+        knowledge_task_ids = set(snapshot.task_knowledge.keys())
         
         # 找出缺少知识库的任务
         missing_knowledge = task_ids - knowledge_task_ids
@@ -576,6 +983,25 @@ class DataLoader:
         """获取指定任务的知识库"""
         return self.task_knowledge.get(task_id)
     
+    def get_task_store(self, snapshot: Optional[DataSnapshot] = None):
+        """
+        获取列式任务表
+        
+        Args:
+            snapshot: 数据快照，默认为当前快照
+            
+        Returns:
+            快照的列式任务表（尚未加载过任务时为空表）
+        """
+        snapshot = snapshot or self._snapshot
+        if snapshot.task_store is None:
+            with self._load_lock:
+                if self._snapshot is snapshot:
+                    snapshot = self._snapshot = replace(snapshot, task_store=self._build_task_store(snapshot.tasks))
+                else:
+                    return self._build_task_store(snapshot.tasks)
+        return snapshot.task_store
+    
     def get_all_tasks(self) -> List[Task]:
         """获取所有任务"""
         return list(self.tasks.values())
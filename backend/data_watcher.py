@@ -0,0 +1,174 @@
+"""
+数据文件监视
+后台线程定期检查最近一次加载的任务 CSV 和知识库 JSONL：修改时间和大小在连续两次检查中保持一致
+（写入已完成）且内容哈希与当前快照不同时，在后台线程中重新加载该文件。加载器构建好新快照后
+整体替换引用，请求继续使用各自取得的快照，不需要手动调用 /debug/reload。
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import app_config
+
+logger = logging.getLogger(__name__)
+
+# 数据类型 -> 加载器方法
+RELOADERS = {
+    'tasks': 'load_tasks_csv',
+    'knowledge': 'load_knowledge_jsonl'
+}
+
+
+class DataWatcher:
+    """
+    轮询数据文件的修改时间、大小和内容哈希
+
+    只有元数据在两次检查之间保持不变才读取文件计算哈希，避免读到写了一半的文件；
+    内容未变（如只更新了修改时间）时不重新加载。
+    """
+
+    def __init__(self, loader, interval: float = 2.0):
+        """
+        Args:
+            loader: 数据加载器，监视其最近一次加载的源文件
+            interval: 检查间隔（秒）
+        """
+        self.loader = loader
+        self.interval = max(0.1, interval)
+        self._observed: Dict[str, Tuple[int, int]] = {}  # 数据类型 -> 上一次检查看到的 (修改时间, 大小)
+        self._confirmed: Dict[str, Tuple[int, int]] = {}  # 数据类型 -> 已确认内容的 (修改时间, 大小)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, Any] = {
+            'checks': 0,
+            'reloads': 0,
+            'failures': 0,
+            'last_reload_at': None,
+            'last_reload_seconds': 0.0
+        }
+
+    @classmethod
+    def from_config(cls, loader, config) -> 'DataWatcher':
+        """根据 DataConfig 创建"""
+        return cls(loader, interval=config.watch_interval)
+
+    def check(self) -> List[str]:
+        """
+        检查一次数据文件，内容发生变化的文件在当前线程中重新加载
+
+        Returns:
+            重新加载的数据类型列表
+        """
+        self.stats['checks'] += 1
+        snapshot = self.loader.snapshot
+        reloaded = []
+        for kind, method in RELOADERS.items():
+            path = snapshot.source_paths.get(kind)
+            if not path:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # 文件正在被替换或已被移走，保留当前快照
+                continue
+
+            signature = (stat.st_mtime_ns, stat.st_size)
+            previous = self._observed.get(kind)
+            self._observed[kind] = signature
+            if signature == self._confirmed.get(kind) or signature != previous:
+                # 与已确认的内容相同，或刚被修改、等下一次检查确认写入已完成
+                continue
+
+            self._confirmed[kind] = signature
+            try:
+                with open(path, 'rb') as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+            except OSError as e:
+                logger.warning(f"读取数据文件失败 {path}: {str(e)}")
+                continue
+            if digest == snapshot.source_hashes.get(kind):
+                continue
+
+            logger.info(f"检测到数据文件变化，重新加载: {path}")
+            start = time.perf_counter()
+            if getattr(self.loader, method)(path):
+                self.stats['reloads'] += 1
+                self.stats['last_reload_at'] = time.time()
+                self.stats['last_reload_seconds'] = round(time.perf_counter() - start, 4)
+                reloaded.append(kind)
+            else:
+                # 加载失败时继续使用当前快照，文件再次变化后重试
+                self.stats['failures'] += 1
+                logger.error(f"数据文件重新加载失败，继续使用当前数据: {path}")
+        return reloaded
+
+    def start(self):
+        """启动后台检查线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"数据文件监视已启动，检查间隔: {self.interval}s")
+
+    def stop(self, timeout: float = 5.0):
+        """停止后台检查线程（等待正在进行的加载完成）"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"数据文件检查失败: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取监视统计信息"""
+        return {
+            **self.stats,
+            'running': bool(self._thread and self._thread.is_alive()),
+            'interval': self.interval,
+            'files': dict(self.loader.snapshot.source_paths)
+        }
+
+
+# 全局数据文件监视器
+data_watcher: Optional[DataWatcher] = None
+
+
+def start_data_watcher(loader) -> DataWatcher:
+    """
+    按配置创建并启动全局数据文件监视器（已存在时先停止）
+
+    Args:
+        loader: 数据加载器
+
+    Returns:
+        全局监视器
+    """
+    global data_watcher
+    if data_watcher is not None:
+        data_watcher.stop()
+    data_watcher = DataWatcher.from_config(loader, app_config.data)
+    data_watcher.start()
+    return data_watcher
+
+
+def stop_data_watcher():
+    """停止全局数据文件监视器"""
+    global data_watcher
+    if data_watcher is not None:
+        data_watcher.stop()
+        data_watcher = None
+        logger.info("数据文件监视已停止")
+
+
+def get_watcher_stats() -> Dict[str, Any]:
+    """获取全局监视器统计信息，未启动时为空"""
+    return data_watcher.get_stats() if data_watcher else {}
@@ -0,0 +1,179 @@
+"""
+CPU 密集型任务执行器
+把同步计算移出事件循环：线程池用于检索、过滤、模式转换、JSON 编码等工作。
+这些工作都依赖进程内数据，交给进程池时序列化输入和输出的开销不低于计算本身，因此不使用进程池；
+在线程中执行的函数访问共享状态时需要自行加锁，或者只在事件循环中访问共享状态。
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import app_config
+from resilience import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+def _call_with_start(fn: Callable, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[float, Any]:
+    """在工作线程中执行函数，同时返回开始执行的时间，用于计算排队时间"""
+    return time.time(), fn(*args, **kwargs)
+
+
+def encode_json(data: Any) -> bytes:
+    """
+    将数据编码为 JSON 字节串
+
+    Args:
+        data: 可 JSON 序列化的数据，无法序列化的值转为字符串
+
+    Returns:
+        UTF-8 编码的 JSON
+    """
+    return json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class PoolStats:
+    """单个执行池的统计信息"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.errors = 0
+        self.queue_wait = LatencyTracker()
+        self.run_time = LatencyTracker()
+
+    def in_flight(self) -> int:
+        """已提交但尚未完成的任务数"""
+        return self.submitted - self.completed - self.errors
+
+    def queue_depth(self) -> int:
+        """排队等待工作者的任务数"""
+        return max(0, self.in_flight() - self.workers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'errors': self.errors,
+            'in_flight': self.in_flight(),
+            'queue_depth': self.queue_depth(),
+            'queue_wait_p50': self.queue_wait.percentile(0.5),
+            'queue_wait_p95': self.queue_wait.percentile(0.95),
+            'run_time_p50': self.run_time.percentile(0.5),
+            'run_time_p95': self.run_time.percentile(0.95)
+        }
+
+
+class CPUExecutors:
+    """线程池执行器"""
+
+    def __init__(self, thread_workers: int = 8):
+        """
+        初始化执行器
+
+        Args:
+            thread_workers: 线程池大小
+        """
+        self.thread_workers = max(1, thread_workers)
+        self._thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="cpu-worker")
+        self.thread_stats = PoolStats(self.thread_workers)
+
+    async def run_in_thread(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        在线程池中执行同步函数
+
+        Args:
+            fn: 同步函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        # 复制当前上下文，使 contextvars（例如请求级耗时记录）在线程中可见
+        context_fn = functools.partial(contextvars.copy_context().run, fn)
+        return await self._submit(self._thread_pool, self.thread_stats, context_fn, args, kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行器统计信息"""
+        return {
+            'thread_pool': self.thread_stats.to_dict()
+        }
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+
+    async def _submit(self, pool: Executor, stats: PoolStats, fn: Callable,
+                      args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        stats.submitted += 1
+        try:
+            started_at, result = await loop.run_in_executor(
+                pool, functools.partial(_call_with_start, fn, args, kwargs)
+            )
+        except BaseException:
+            stats.errors += 1
+            raise
+        finished_at = time.time()
+        stats.completed += 1
+        stats.queue_wait.record(max(0.0, started_at - submitted_at))
+        stats.run_time.record(max(0.0, finished_at - started_at))
+        return result
+
+
+# 全局执行器实例
+executors: Optional[CPUExecutors] = None
+
+
+def initialize_executors(thread_workers: Optional[int] = None) -> CPUExecutors:
+    """
+    初始化全局执行器，未指定的参数使用配置值
+
+    Args:
+        thread_workers: 线程池大小
+
+    Returns:
+        全局执行器
+    """
+    global executors
+    if executors is not None:
+        executors.shutdown(wait=False)
+    config = app_config.executor
+    executors = CPUExecutors(
+        thread_workers=config.thread_workers if thread_workers is None else thread_workers
+    )
+    return executors
+
+
+def get_executors() -> CPUExecutors:
+    """获取全局执行器，未初始化时按配置创建"""
+    if executors is None:
+        return initialize_executors()
+    return executors
+
+
+async def run_in_thread(fn: Callable, *args, **kwargs) -> Any:
+    """在全局线程池中执行同步函数"""
+    return await get_executors().run_in_thread(fn, *args, **kwargs)
+
+
+def get_executor_stats() -> Dict[str, Any]:
+    """获取全局执行器统计信息"""
+    return executors.get_stats() if executors else {}
+
+
+def shutdown_executors():
+    """关闭全局执行器"""
+    global executors
+    if executors is not None:
+        executors.shutdown()
+        executors = None
+        logger.info("执行器已关闭")
@@ -5,13 +5,13 @@
 """
 
 import csv
-import json
 import time
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter
+
+from executors import run_in_thread
 
 # 创建路由器
 router = APIRouter()
@@ -24,13 +24,6 @@ _tasks_cache: List[Dict[str, Any]] = []
 _cache_timestamp: float = 0
 _cache_ttl: float = 300  # 5分钟缓存
 
-class TaskLocationResponse(BaseModel):
-    """前端期望的任务响应格式"""
-    success: bool
-    data: List[Dict[str, Any]]
-    total: int
-    message: str = "数据获取成功"
-
 def load_csv_tasks() -> List[Dict[str, Any]]:
     """
     高性能 CSV 任务加载器
@@ -186,97 +179,11 @@ def format_iso_date(date_str: str) -> Optional[str]:
         return None
 
 # API 端点
-@router.get("/tasks", response_model=TaskLocationResponse)
-async def get_frontend_tasks(
-    category: Optional[str] = Query(None, description="任务类别筛选"),
-    difficulty: Optional[str] = Query(None, description="难度筛选"),
-    status: Optional[str] = Query(None, description="状态筛选"),
-    course: Optional[str] = Query(None, description="课程筛选"),
-    limit: Optional[int] = Query(None, description="限制数量"),
-    offset: Optional[int] = Query(0, description="偏移量")
-):
-    """
-    获取任务列表 - 前端兼容接口
-    完全兼容现有前端 TaskLocation 接口
-    """
-    start_time = time.time()
-    
-    try:
-        # 加载所有任务
-        all_tasks = load_csv_tasks()
-        
-        if not all_tasks:
-            return TaskLocationResponse(
-                success=False,
-                data=[],
-                total=0,
-                message="暂无任务数据"
-            )
-        
-        # 应用筛选
-        filtered_tasks = all_tasks
-        
-        if category:
-            filtered_tasks = [t for t in filtered_tasks if t["category"] == category]
-        
-        if difficulty:
-            filtered_tasks = [t for t in filtered_tasks if t["difficulty"] == difficulty]
-        
-        if status:
-            filtered_tasks = [t for t in filtered_tasks if t["status"] == status]
-        
-        if course:
-            filtered_tasks = [t for t in filtered_tasks if t.get("course") == course]
-        
-        # 应用分页
-        total = len(filtered_tasks)
-        
-        if limit:
-            end_index = offset + limit
-            filtered_tasks = filtered_tasks[offset:end_index]
-        elif offset > 0:
-            filtered_tasks = filtered_tasks[offset:]
-        
-        response_time = time.time() - start_time
-        print(f"📊 前端API响应: {len(filtered_tasks)}/{total} 条任务, 耗时: {response_time:.3f}s")
-        
-        return TaskLocationResponse(
-            success=True,
-            data=filtered_tasks,
-            total=total,
-            message=f"成功获取 {len(filtered_tasks)} 条任务"
-        )
-        
-    except Exception as e:
-        print(f"❌ 前端API错误: {e}")
-        raise HTTPException(status_code=500, detail=f"获取任务失败: {str(e)}")
-
-@router.get("/tasks/{task_id}")
-async def get_frontend_task(task_id: str):
-    """获取单个任务详情 - 前端兼容接口"""
-    try:
-        tasks = load_csv_tasks()
-        
-        for task in tasks:
-            if task["task_id"] == task_id:
-                return {
-                    "success": True,
-                    "data": task,
-                    "message": "任务获取成功"
-                }
-        
-        raise HTTPException(status_code=404, detail=f"任务 {task_id} 不存在")
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"❌ 获取任务详情失败: {e}")
-        raise HTTPException(status_code=500, detail=f"获取任务详情失败: {str(e)}")
-
 @router.get("/health")
 async def frontend_health():
     """健康检查 - 前端兼容接口"""
-    tasks = load_csv_tasks()
+    # 缓存过期时会重新解析 CSV，放到线程池中执行以免阻塞事件循环
+    tasks = await run_in_thread(load_csv_tasks)
     
     return {
         "status": "healthy",
@@ -290,7 +197,7 @@ async def frontend_health():
 @router.get("/stats")
 async def get_stats():
     """获取统计信息"""
-    tasks = load_csv_tasks()
+    tasks = await run_in_thread(load_csv_tasks)
     
     # 统计各类别任务数量
     categories = {}
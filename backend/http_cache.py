@@ -0,0 +1,81 @@
+"""
+HTTP 条件请求支持
+读接口的响应只随数据版本变化，用 (数据版本, 接口, 查询参数) 生成强 ETag；
+请求带 If-None-Match 且与当前 ETag 一致时直接返回 304，跳过过滤和序列化。
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# 要求客户端每次使用缓存前都向服务器验证
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(version: str, scope: str, params: Iterable[Tuple[str, str]] = ()) -> str:
+    """
+    生成强 ETag
+
+    查询参数按名称排序后参与计算，参数顺序不同的同一查询得到相同的 ETag。
+
+    Args:
+        version: 数据版本标识
+        scope: 接口名称，区分不同接口
+        params: 查询参数 (名称, 取值) 列表
+
+    Returns:
+        带双引号的 ETag 字符串
+    """
+    payload = json.dumps([version, scope, sorted(params)], ensure_ascii=False, separators=(',', ':'))
+    return '"' + hashlib.sha1(payload.encode('utf-8')).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断 If-None-Match 请求头是否命中当前 ETag
+
+    按 RFC 7232 使用弱比较：忽略 W/ 前缀，支持逗号分隔的多个 ETag 和 "*"。
+
+    Args:
+        if_none_match: 请求头取值
+        etag: 当前 ETag
+
+    Returns:
+        是否命中
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def etag_headers(etag: str) -> Dict[str, str]:
+    """响应中携带的缓存相关头"""
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def check_not_modified(request: Request, version: str, scope: str) -> Tuple[str, Optional[Response]]:
+    """
+    计算当前请求的 ETag，并检查客户端缓存是否仍然有效
+
+    Args:
+        request: 当前请求
+        version: 数据版本标识
+        scope: 接口名称
+
+    Returns:
+        (ETag, 304 响应)，缓存失效时第二项为 None，调用方照常生成响应并带上 etag_headers
+    """
+    etag = make_etag(version, scope, request.query_params.multi_items())
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return etag, Response(status_code=304, headers=etag_headers(etag))
+    return etag, None
@@ -0,0 +1,367 @@
+"""
+OpenAI 兼容 LLM 客户端
+所有请求共享一个带连接池的 aiohttp.ClientSession，复用 TCP/TLS 连接
+"""
+import codecs
+import json
+import logging
+import re
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class LLMServiceError(Exception):
+    """LLM 服务返回错误响应"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"LLM 服务返回 {status}: {message}")
+        self.status = status
+
+
+def parse_llm_content(content: str) -> Dict[str, Any]:
+    """
+    将模型输出解析为结构化响应
+
+    系统提示词要求模型输出 JSON；兼容 ```json 代码块包裹的输出，
+    无法解析时把整段文本作为回答。
+
+    Args:
+        content: 模型输出的文本
+
+    Returns:
+        包含 answer/confidence 等字段的响应字典
+    """
+    text = content.strip()
+    fenced = re.match(r'^```(?:json)?\s*(.*?)\s*```$', text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        parsed = None
+
+    if not isinstance(parsed, dict) or 'answer' not in parsed:
+        return {
+            "answer": content.strip(),
+            "confidence": "medium",
+            "key_points": [],
+            "actionable_steps": [],
+            "uncertain_aspects": []
+        }
+    return parsed
+
+
+class AnswerStreamExtractor:
+    """
+    从流式 JSON 输出中增量提取 answer 字段的文本
+
+    模型按系统提示词输出 JSON，直接转发原始片段会把 JSON 语法暴露给前端；
+    这里只转发 "answer" 字符串的内容。输出不是 JSON 时原样转发。
+    """
+
+    _ANSWER_KEY = re.compile(r'"answer"\s*:\s*"')
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._state = "detect"  # detect / seek / answer / raw / done
+
+    def feed(self, chunk: str) -> str:
+        """
+        输入一个片段
+
+        Args:
+            chunk: 模型输出的增量文本
+
+        Returns:
+            本次可以转发给用户的回答文本（可能为空）
+        """
+        self.buffer += chunk
+
+        if self._state == "detect":
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return ""
+            if stripped[0] in '{`':
+                self._state = "seek"
+            else:
+                self._state = "raw"
+                self._pos = len(self.buffer)
+                return self.buffer
+
+        if self._state == "raw":
+            self._pos = len(self.buffer)
+            return chunk
+
+        if self._state == "seek":
+            match = self._ANSWER_KEY.search(self.buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+            self._state = "answer"
+
+        if self._state == "answer":
+            return self._read_answer()
+        return ""
+
+    def _read_answer(self) -> str:
+        out: List[str] = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self._state = "done"
+                i += 1
+                break
+            if ch == '\\':
+                # 转义序列不完整时等待下一个片段
+                end = i + 6 if buf[i + 1:i + 2] == 'u' else i + 2
+                if end > len(buf):
+                    break
+                try:
+                    out.append(json.loads(f'"{buf[i:end]}"'))
+                except json.JSONDecodeError:
+                    out.append(buf[i + 1:end])
+                i = end
+                continue
+            out.append(ch)
+            i += 1
+        self._pos = i
+        return "".join(out)
+
+
+class HTTPLLMService:
+    """
+    OpenAI 兼容 Chat Completions 客户端
+
+    接口与 MockLLMService 一致（generate_response / stream_response / get_stats），
+    可直接替换。会话在首次调用时创建，进程内所有请求共享同一个连接池。
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str = "",
+        model: str = "gpt-4o-mini",
+        temperature: float = 0.3,
+        max_tokens: int = 800,
+        pool_limit: int = 100,
+        pool_limit_per_host: int = 32,
+        keepalive_timeout: float = 30.0,
+        request_timeout: Optional[float] = None
+    ):
+        """
+        初始化 LLM 客户端
+
+        Args:
+            base_url: 接口地址，例如 https://api.openai.com/v1
+            api_key: API 密钥，为空时不发送 Authorization 头
+            model: 模型名称
+            temperature: 采样温度
+            max_tokens: 最大生成 token 数
+            pool_limit: 连接池总连接数上限
+            pool_limit_per_host: 每个主机的连接数上限
+            keepalive_timeout: 空闲连接保活时间（秒）
+            request_timeout: 单次请求总超时（秒），None 表示由调用方控制
+        """
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.call_count = 0
+        self.stream_call_count = 0
+        self.stats = {
+            'errors': 0,
+            'connections_created': 0,
+            'connections_reused': 0
+        }
+
+    async def generate_response(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """
+        调用 Chat Completions 接口生成回答
+
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+
+        Returns:
+            结构化的 LLM 响应
+
+        Raises:
+            LLMServiceError: 接口返回非 2xx 状态码
+            aiohttp.ClientError: 网络错误
+        """
+        self.call_count += 1
+        payload = self._build_payload(system_prompt, user_prompt, stream=False)
+        async with self._get_session().post(self._completions_url(), json=payload) as response:
+            await self._raise_for_status(response)
+            body = await response.json(content_type=None)
+
+        content = body["choices"][0]["message"].get("content") or ""
+        return parse_llm_content(content)
+
+    async def stream_response(self, system_prompt: str, user_prompt: str) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        """
+        以流式方式调用 Chat Completions 接口
+
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+
+        Yields:
+            回答文本片段（str），最后一项为完整响应（dict）
+
+        Raises:
+            LLMServiceError: 接口返回非 2xx 状态码
+            aiohttp.ClientError: 网络错误
+        """
+        self.stream_call_count += 1
+        payload = self._build_payload(system_prompt, user_prompt, stream=True)
+        extractor = AnswerStreamExtractor()
+        decoder = codecs.getincrementaldecoder('utf-8')()
+
+        async with self._get_session().post(self._completions_url(), json=payload) as response:
+            await self._raise_for_status(response)
+            pending = ""
+            async for raw in response.content.iter_any():
+                pending += decoder.decode(raw)
+                lines = pending.split('\n')
+                pending = lines.pop()
+                for line in lines:
+                    delta = self._parse_sse_line(line)
+                    if delta is None:
+                        continue
+                    text = extractor.feed(delta)
+                    if text:
+                        yield text
+
+        yield parse_llm_content(extractor.buffer)
+
+    async def close(self):
+        """关闭共享会话及其连接池"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取客户端统计信息"""
+        return {
+            "total_calls": self.call_count,
+            "stream_calls": self.stream_call_count,
+            **self.stats,
+            "pool_limit": self.pool_limit,
+            "pool_limit_per_host": self.pool_limit_per_host,
+            "session_open": bool(self._session and not self._session.closed)
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享会话，首次调用时创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            trace_config = aiohttp.TraceConfig()
+            # aiohttp 3.9 的 Signal 类型参数把回调本身当作参数类型，类型正确的回调也无法通过检查
+            trace_config.on_connection_create_end.append(self._on_connection_created)  # type: ignore[arg-type]
+            trace_config.on_connection_reuseconn.append(self._on_connection_reused)  # type: ignore[arg-type]
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+                trace_configs=[trace_config]
+            )
+        return self._session
+
+    async def _on_connection_created(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                                     params: aiohttp.TraceConnectionCreateEndParams):
+        self.stats['connections_created'] += 1
+
+    async def _on_connection_reused(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                                    params: aiohttp.TraceConnectionReuseconnParams):
+        self.stats['connections_reused'] += 1
+
+    def _completions_url(self) -> str:
+        return f"{self.base_url}/chat/completions"
+
+    def _build_payload(self, system_prompt: str, user_prompt: str, stream: bool) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": stream
+        }
+
+    async def _raise_for_status(self, response: aiohttp.ClientResponse):
+        if response.status >= 400:
+            self.stats['errors'] += 1
+            detail = (await response.text())[:200]
+            raise LLMServiceError(response.status, detail)
+
+    @staticmethod
+    def _parse_sse_line(line: str) -> Optional[str]:
+        """解析一行 SSE 数据，返回增量文本"""
+        line = line.strip()
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            return None
+        try:
+            event = json.loads(data)
+        except json.JSONDecodeError:
+            logger.warning(f"无法解析的流式数据: {data[:100]}")
+            return None
+        choices = event.get("choices") or []
+        if not choices:
+            return None
+        return choices[0].get("delta", {}).get("content") or None
+
+
+def create_llm_service(llm_config, request_timeout: Optional[float] = None):
+    """
+    根据配置创建 LLM 服务
+
+    Args:
+        llm_config: LLMConfig 配置
+        request_timeout: 单次请求总超时（秒）
+
+    Returns:
+        provider 为 openai 时返回 HTTPLLMService，否则返回 None（使用模拟服务）
+    """
+    if llm_config.provider != "openai":
+        return None
+    logger.info(f"使用 OpenAI 兼容 LLM 服务: {llm_config.base_url} ({llm_config.model})")
+    return HTTPLLMService(
+        base_url=llm_config.base_url,
+        api_key=llm_config.api_key,
+        model=llm_config.model,
+        temperature=llm_config.temperature,
+        max_tokens=llm_config.max_tokens,
+        pool_limit=llm_config.pool_limit,
+        pool_limit_per_host=llm_config.pool_limit_per_host,
+        keepalive_timeout=llm_config.keepalive_timeout,
+        request_timeout=request_timeout
+    )
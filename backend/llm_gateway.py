@@ -0,0 +1,198 @@
+"""
+LLM 调用网关
+限制并发 LLM 调用数，超出部分进入有界优先级队列，按截止时间提前拒绝
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from resilience import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayRejectedError(Exception):
+    """网关拒绝调用（队列已满或无法在截止时间前完成）"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class LLMGateway:
+    """
+    有界并发 LLM 网关
+
+    最多 max_concurrency 个调用同时进行，其余按优先级（数值越大越优先）和到达顺序排队。
+    入队前根据平均调用耗时估算等待时间，无法在截止时间前完成的请求直接拒绝。
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue_size: int = 64,
+                 initial_service_time: float = 1.0):
+        """
+        初始化 LLM 网关
+
+        Args:
+            max_concurrency: 最大并发调用数
+            max_queue_size: 最大排队数
+            initial_service_time: 没有样本时假设的单次调用耗时（秒）
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_size = max_queue_size
+        self.initial_service_time = initial_service_time
+
+        self.active = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.queue_wait = LatencyTracker()
+        self.service_time = LatencyTracker()
+        self.stats = {
+            'admitted': 0,
+            'queued': 0,
+            'rejected_queue_full': 0,
+            'rejected_deadline': 0,
+            'expired_in_queue': 0,
+            'hedges_skipped': 0
+        }
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0, deadline: Optional[float] = None) -> AsyncIterator[float]:
+        """
+        获取一个调用槽位，退出时释放
+
+        Args:
+            priority: 优先级，数值越大越优先
+            deadline: 截止时间（time.monotonic() 时间戳），None 表示不限
+
+        Yields:
+            本次排队等待的时间（秒）
+
+        Raises:
+            GatewayRejectedError: 队列已满或无法在截止时间前完成
+        """
+        wait_time = await self.acquire(priority, deadline)
+        granted_at = time.monotonic()
+        try:
+            yield wait_time
+        finally:
+            self.service_time.record(time.monotonic() - granted_at)
+            self.release()
+
+    def try_acquire(self) -> bool:
+        """有空闲槽位且无人排队时立即占用，否则返回 False（不排队）"""
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            self.stats['admitted'] += 1
+            self.queue_wait.record(0.0)
+            return True
+        return False
+
+    async def acquire(self, priority: int = 0, deadline: Optional[float] = None) -> float:
+        """
+        占用一个调用槽位，必要时排队
+
+        Args:
+            priority: 优先级，数值越大越优先
+            deadline: 截止时间（time.monotonic() 时间戳）
+
+        Returns:
+            排队等待的时间（秒）
+
+        Raises:
+            GatewayRejectedError: 队列已满或无法在截止时间前完成
+        """
+        if self.try_acquire():
+            return 0.0
+
+        if len(self._queue) >= self.max_queue_size:
+            self.stats['rejected_queue_full'] += 1
+            raise GatewayRejectedError("queue_full", "LLM 网关队列已满")
+
+        now = time.monotonic()
+        if deadline is not None:
+            ahead = sum(1 for p, _, _ in self._queue if -p >= priority)
+            if now + self.estimate_wait(ahead) + self._avg_service_time() > deadline:
+                self.stats['rejected_deadline'] += 1
+                raise GatewayRejectedError("deadline", "预计无法在截止时间前完成 LLM 调用")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (-priority, next(self._seq), future))
+        self.stats['queued'] += 1
+
+        timeout = None if deadline is None else max(0.0, deadline - now)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(future):
+                # 超时的同时已被分配槽位，正常使用
+                return self._granted(now)
+            self.stats['expired_in_queue'] += 1
+            raise GatewayRejectedError("deadline", "排队超过截止时间")
+        except asyncio.CancelledError:
+            if not self._abandon(future):
+                self.release()
+            raise
+
+        return self._granted(now)
+
+    def release(self):
+        """释放槽位，并唤醒优先级最高的排队请求"""
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                # 槽位直接转交给排队者，active 不变
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def estimate_wait(self, ahead: int) -> float:
+        """估算前面有 ahead 个排队请求时的等待时间"""
+        rounds = ahead // self.max_concurrency + 1
+        return rounds * self._avg_service_time()
+
+    def queue_depth(self) -> int:
+        """当前排队数"""
+        return len(self._queue)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取网关统计信息"""
+        return {
+            **self.stats,
+            'active': self.active,
+            'queue_depth': self.queue_depth(),
+            'max_concurrency': self.max_concurrency,
+            'max_queue_size': self.max_queue_size,
+            'queue_wait_p50': self.queue_wait.percentile(0.5),
+            'queue_wait_p95': self.queue_wait.percentile(0.95),
+            'service_time_p50': self.service_time.percentile(0.5),
+            'service_time_p95': self.service_time.percentile(0.95)
+        }
+
+    def _granted(self, enqueued_at: float) -> float:
+        wait_time = time.monotonic() - enqueued_at
+        self.stats['admitted'] += 1
+        self.queue_wait.record(wait_time)
+        return wait_time
+
+    def _abandon(self, future: asyncio.Future) -> bool:
+        """
+        放弃排队并移出队列；如果槽位已分配给该请求则返回 False
+
+        超时或取消的排队者立即移出，队列中只保留仍在等待的请求，队列已满的判断和 try_acquire 不会被它们占用。
+        """
+        if future.done() and not future.cancelled():
+            return False
+        future.cancel()
+        self._queue = [entry for entry in self._queue if entry[2] is not future]
+        heapq.heapify(self._queue)
+        return True
+
+    def _avg_service_time(self) -> float:
+        if not self.service_time.count():
+            return self.initial_service_time
+        samples = self.service_time.samples
+        return sum(samples) / len(samples)
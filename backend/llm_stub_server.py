@@ -0,0 +1,179 @@
+"""
+本地 OpenAI 兼容 LLM 桩服务
+用于在没有真实模型的情况下联调和压测 HTTPLLMService，支持配置延迟、失败率和流式输出
+
+用法:
+    python llm_stub_server.py --port 8001 --latency 0.5 --jitter 0.2
+    LLM_PROVIDER=openai LLM_BASE_URL=http://127.0.0.1:8001/v1 python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, Optional, Set
+
+from aiohttp import web
+
+STUB_ANSWER = {
+    "answer": "这是本地桩服务返回的回答，请根据任务详情完成相应步骤。",
+    "confidence": "medium",
+    "key_points": ["本地桩服务"],
+    "actionable_steps": ["查看任务详情"],
+    "uncertain_aspects": []
+}
+
+
+class StubState:
+    """桩服务的配置与统计"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, failure_rate: float = 0.0,
+                 chunk_size: int = 8, chunk_delay: float = 0.01, answer: Optional[Dict[str, Any]] = None):
+        """
+        初始化桩服务状态
+
+        Args:
+            latency: 首字节前的基础延迟（秒）
+            jitter: 延迟的随机抖动范围（秒）
+            failure_rate: 返回 500 的比例 (0.0-1.0)
+            chunk_size: 流式模式下每个片段的字符数
+            chunk_delay: 流式模式下片段之间的间隔（秒）
+            answer: 返回的结构化回答
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_delay = chunk_delay
+        self.answer = answer or STUB_ANSWER
+
+        self.requests = 0
+        self.failures = 0
+        self.active = 0
+        self.max_active = 0
+        self.connections: Set[int] = set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取桩服务统计信息"""
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "active": self.active,
+            "max_active": self.max_active,
+            "connections": len(self.connections)
+        }
+
+
+STATE_KEY = web.AppKey("state", StubState)
+
+
+async def handle_chat_completions(request: web.Request) -> web.StreamResponse:
+    """处理 /v1/chat/completions 请求"""
+    state: StubState = request.app[STATE_KEY]
+    payload = await request.json()
+    state.requests += 1
+    state.connections.add(id(request.transport))
+    state.active += 1
+    state.max_active = max(state.max_active, state.active)
+
+    try:
+        await asyncio.sleep(max(0.0, state.latency + random.uniform(-state.jitter, state.jitter)))
+
+        if random.random() < state.failure_rate:
+            state.failures += 1
+            return web.json_response({"error": {"message": "stub failure"}}, status=500)
+
+        content = json.dumps(state.answer, ensure_ascii=False)
+        model = payload.get("model", "stub")
+
+        if not payload.get("stream"):
+            return web.json_response({
+                "id": f"chatcmpl-stub-{state.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop"
+                }]
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i in range(0, len(content), state.chunk_size):
+            if i > 0 and state.chunk_delay > 0:
+                await asyncio.sleep(state.chunk_delay)
+            chunk = {
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[i:i + state.chunk_size]}}]
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+    finally:
+        state.active -= 1
+
+
+async def handle_stats(request: web.Request) -> web.Response:
+    """返回桩服务统计信息"""
+    return web.json_response(request.app[STATE_KEY].get_stats())
+
+
+def create_app(state: Optional[StubState] = None) -> web.Application:
+    """
+    创建桩服务应用
+
+    Args:
+        state: 桩服务状态，None 时使用默认配置
+
+    Returns:
+        aiohttp 应用
+    """
+    app = web.Application()
+    app[STATE_KEY] = state or StubState()
+    app.router.add_post("/v1/chat/completions", handle_chat_completions)
+    app.router.add_get("/stats", handle_stats)
+    return app
+
+
+async def start_stub_server(state: Optional[StubState] = None, host: str = "127.0.0.1",
+                            port: int = 0) -> web.AppRunner:
+    """
+    在当前事件循环中启动桩服务
+
+    Args:
+        state: 桩服务状态
+        host: 监听地址
+        port: 监听端口，0 表示随机端口
+
+    Returns:
+        AppRunner，实际地址见 runner.addresses，用完后调用 runner.cleanup()
+    """
+    runner = web.AppRunner(create_app(state))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容 LLM 桩服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8001, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.5, help="基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2, help="延迟抖动（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="失败率")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="流式片段间隔（秒）")
+    args = parser.parse_args()
+
+    state = StubState(latency=args.latency, jitter=args.jitter,
+                      failure_rate=args.failure_rate, chunk_delay=args.chunk_delay)
+    print(f"LLM 桩服务: http://{args.host}:{args.port}/v1")
+    web.run_app(create_app(state), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
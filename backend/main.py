@@ -1,12 +1,13 @@
-from fastapi import FastAPI, HTTPException, Query, Depends
+from fastapi import FastAPI, HTTPException, Query, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import os
+import json
 import logging
 import time
 import asyncio
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 import math
@@ -19,15 +20,30 @@ from middleware import setup_middleware, get_middleware_stats
 from config import app_config, get_middleware_config
 
 # 导入数据加载器和模式
-from data_loader import data_loader, initialize_data_loader
-from search_engine import initialize_search_engine, search_tasks
-from rag import initialize_rag_service, process_npc_chat
+from data_loader import DataSnapshot, data_loader, initialize_data_loader
+from task_store import decode_cursor, encode_cursor, to_epoch
+from response_cache import assemble, dumps, embed, task_response_cache
+from http_cache import check_not_modified, etag_headers
+from change_log import DELETE, UPSERT, ChangeSet
+from data_watcher import get_watcher_stats, start_data_watcher, stop_data_watcher
+from search_engine import initialize_search_engine, search_tasks_async, update_search_engine
+from rag import (
+    initialize_rag_service, process_npc_chat, process_npc_chat_batch, stream_npc_chat,
+    apply_rag_changes, get_rag_stats, shutdown_rag_service, clear_npc_session
+)
+from singleflight import get_singleflight_stats
+from stage_timing import trace_request
+from executors import (
+    initialize_executors, run_in_thread, encode_json,
+    get_executor_stats, shutdown_executors
+)
 from schemas import (
     HealthStatus, TaskSchema, TaskDetailSchema, TaskListResponse, 
     TaskDetailResponse, ErrorResponse, TaskFilters, PaginationParams,
     PaginationMeta, TaskCategory, TaskDifficulty, TaskStatus,
     LocationSchema, KnowledgeSchema, SearchRequest, SearchResult, SearchResponse,
-    ChatRequest, ChatResponse, Citation, MapAnchor, Suggestion
+    ChatRequest, ChatResponse, Citation, MapAnchor, Suggestion,
+    BatchChatRequest, BatchChatResult, BatchChatResponse
 )
 
 # 加载环境变量
@@ -43,6 +59,9 @@ app_start_time = time.time()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
+    # 启动时初始化 CPU 任务执行器
+    initialize_executors()
+    
     # 启动时初始化数据加载器
     logger.info("正在初始化数据加载器...")
     success = initialize_data_loader()
@@ -61,15 +80,25 @@ async def lifespan(app: FastAPI):
         
         # 初始化 RAG 服务
         logger.info("正在初始化 RAG 服务...")
-        rag_success = initialize_rag_service(data_loader.task_knowledge)
+        rag_success = initialize_rag_service(data_loader.task_knowledge, list(data_loader.tasks.values()))
         if not rag_success:
             logger.error("RAG 服务初始化失败")
         else:
             logger.info("RAG 服务初始化成功")
+        
+        # 预先序列化任务列表项和详情
+        get_response_cache()
+        
+        # 监视数据文件，变化后在后台重新加载
+        if app_config.data.watch_enabled:
+            start_data_watcher(data_loader)
     
     yield
     
     # 关闭时的清理工作
+    stop_data_watcher()
+    await shutdown_rag_service()
+    shutdown_executors()
     logger.info("应用关闭")
 
 app = FastAPI(
@@ -138,7 +167,53 @@ if middleware_instances.get('rate_limiter'):
 if middleware_instances.get('error_handler'):
     app.add_middleware(type(middleware_instances['error_handler']))
 
-# 注册前端兼容性路由
+@app.get("/tasks/changes")
+async def get_task_changes(
+    request: Request,
+    since: str = Query(..., min_length=1, description="上次同步返回的同步令牌 sync_token")
+):
+    """
+    获取某一同步令牌之后的任务变更（增量同步）
+    
+    需要在 /tasks/{task_id} 之前注册，否则会被它匹配。新增或修改的任务以与 /tasks 相同的
+    格式返回当前内容，删除的任务只返回任务ID；令牌来自其他进程（服务重启前）或变更日志已截断时返回 full_resync，
+    客户端应重新拉取完整列表。
+    """
+    snapshot = data_loader.snapshot
+    generation = snapshot.generation
+    change_log = data_loader.change_log
+    sync_token = change_log.sync_token(generation)
+    # 响应中的代数和同步令牌属于本进程，ETag 除内容版本外还要区分它们
+    etag, not_modified = check_not_modified(request, snapshot.data_version,
+                                            f"task_changes:{change_log.epoch}:{generation}")
+    if not_modified:
+        return not_modified
+    
+    since_generation = change_log.parse_sync_token(since)
+    changes = None if since_generation is None else change_log.changes_since(since_generation, generation)
+    if changes is None:
+        return JSONResponse(headers=etag_headers(etag), content={
+            "upserts": [],
+            "deletes": [],
+            "generation": generation,
+            "sync_token": sync_token,
+            "since": since,
+            "full_resync": True,
+            "message": "变更日志不包含该令牌之后的全部变更，需要全量同步"
+        })
+    
+    upserts = [task_id for task_id, op in changes.items() if op == UPSERT]
+    deletes = [task_id for task_id, op in changes.items() if op == DELETE]
+    body = assemble(task_item_fragments(snapshot, upserts), {
+        "deletes": deletes,
+        "generation": generation,
+        "sync_token": sync_token,
+        "since": since,
+        "full_resync": False
+    }, key="upserts")
+    return Response(content=body, media_type="application/json", headers=etag_headers(etag))
+
+# 注册前端兼容性路由（/health、/stats；任务列表和详情由下面的 /tasks、/tasks/{task_id} 提供）
 app.include_router(frontend_router, prefix="", tags=["前端兼容接口"])
 
 # 映射字典
@@ -153,7 +228,13 @@ CATEGORY_MAPPING = {
     "志愿服务": "activity",
     "学术讲座": "academic",
     "实验课程": "course",
-    "数据结构": "course"
+    "数据结构": "course",
+    "实验任务": "academic",
+    "竞赛活动": "academic",
+    "讲座活动": "academic",
+    "文化活动": "activity",
+    "体育锻炼": "activity",
+    "后勤支持": "activity"
 }
 
 DIFFICULTY_MAPPING = {
@@ -224,36 +305,261 @@ def convert_knowledge_to_schema(knowledge) -> Optional[KnowledgeSchema]:
         related_tasks=knowledge.related_tasks
     )
 
-def apply_task_filters(tasks: List, filters: TaskFilters) -> List:
-    """应用任务过滤条件"""
-    filtered_tasks = tasks
+def encode_task_item(task) -> Dict[str, Any]:
+    """任务 -> 列表项字典（与 TaskSchema 的 JSON 输出一致）"""
+    return convert_task_to_schema(task).model_dump(mode='json')
+
+def encode_task_detail(task, snapshot: Optional[DataSnapshot] = None) -> Dict[str, Any]:
+    """任务 -> 详情字典（含快照中的知识库，默认为当前快照；与 TaskDetailSchema 的 JSON 输出一致）"""
+    snapshot = snapshot or data_loader.snapshot
+    task_detail = TaskDetailSchema(
+        **convert_task_to_schema(task).model_dump(),
+        knowledge=convert_knowledge_to_schema(snapshot.task_knowledge.get(task.task_id))
+    )
+    return task_detail.model_dump(mode='json')
+
+def get_response_cache():
+    """
+    获取与当前数据一致的任务响应缓存
+    
+    启动时预先构建，之后随数据变更增量更新（见 prepare_data_changes）；
+    缓存与当前数据代数不一致（如漏掉了某次变更）时全量重建。请求路径上使用 task_item_fragments /
+    task_detail_fragment，不在这里重建。
+    """
+    snapshot = data_loader.snapshot
+    if not task_response_cache.is_current(snapshot.generation):
+        task_response_cache.build(snapshot.generation, snapshot.tasks.values(), encode_task_item,
+                                  lambda task: encode_task_detail(task, snapshot))
+    return task_response_cache
+
+def task_item_fragments(snapshot: DataSnapshot, task_ids: List[str]) -> List[bytes]:
+    """
+    取出快照中若干任务的列表项片段
+    
+    响应缓存与快照版本一致时直接取用；不一致时（后台正在应用新的变更，或请求持有的是上一个快照）
+    只序列化这几条任务，不在请求路径上重建缓存，也不会混入其他版本的数据。
+    """
+    fragments = task_response_cache.view(snapshot.generation)
+    if fragments is not None:
+        return fragments.get_items(task_ids)
+    return [dumps(encode_task_item(snapshot.tasks[task_id])) for task_id in task_ids if task_id in snapshot.tasks]
+
+def task_detail_fragment(snapshot: DataSnapshot, task_id: str) -> Optional[bytes]:
+    """取出快照中任务的详情片段，规则同 task_item_fragments；任务不存在时返回 None"""
+    fragments = task_response_cache.view(snapshot.generation)
+    if fragments is not None:
+        return fragments.details.get(task_id)
+    task = snapshot.tasks.get(task_id)
+    return dumps(encode_task_detail(task, snapshot)) if task is not None else None
+
+def prepare_data_changes(snapshot: DataSnapshot, changesets: List[ChangeSet]):
+    """
+    数据加载器的准备监听器：新快照发布之前，把新增、修改和删除的行增量应用到搜索索引和响应缓存
+    
+    快照发布时索引和缓存已与之一致。响应缓存按数据代数取用，发布前仍持有上一个快照的请求不会用到新片段。
+    
+    Args:
+        snapshot: 即将发布的快照
+        changesets: 本次发布包含的变更集
+    """
+    upserted: Dict[str, Any] = {}
+    removed: List[str] = []
+    for changes in changesets:
+        if changes.kind == 'tasks':
+            tasks = [snapshot.tasks[task_id] for task_id in changes.upserts]
+            update_search_engine(tasks, changes.removed)
+            upserted.update((task.task_id, task) for task in tasks)
+            removed.extend(changes.removed)
+        else:
+            # 知识条目只出现在任务详情中
+            upserted.update((task_id, snapshot.tasks[task_id]) for task_id in changes.touched
+                            if task_id in snapshot.tasks)
+    
+    def encode_detail(task):
+        return encode_task_detail(task, snapshot)
+    
+    if not task_response_cache.update(snapshot.generation - 1, snapshot.generation, list(upserted.values()), removed,
+                                      encode_task_item, encode_detail):
+        task_response_cache.build(snapshot.generation, snapshot.tasks.values(), encode_task_item, encode_detail)
+
+def apply_data_changes(changes: ChangeSet):
+    """
+    数据加载器的变更监听器：新快照发布之后，把变更增量应用到 RAG 服务
+    
+    回答缓存在发布之后才失效，之后重新生成的回答读取的都是新数据。
+    
+    Args:
+        changes: 本次加载的变更集
+    """
+    # 监听器在加载线程中、新快照发布之后执行，当前快照即本次变更对应的快照
+    snapshot = data_loader.snapshot
+    tasks = list(snapshot.tasks.values())
+    if changes.kind == 'tasks':
+        changed = apply_rag_changes(snapshot.task_knowledge, tasks, task_ids=changes.touched)
+    else:
+        changed = apply_rag_changes(snapshot.task_knowledge, tasks, knowledge_ids=changes.touched)
+    if not changes.is_empty():
+        logger.info(f"数据变更已应用 ({changes.kind}): 新增 {len(changes.added)} 个, 修改 {len(changes.updated)} 个, "
+                    f"删除 {len(changes.removed)} 个, 回答缓存及建议变更任务数: {len(changed)}")
+
+data_loader.add_prepare_listener(prepare_data_changes)
+data_loader.add_change_listener(apply_data_changes)
+
+def source_values(mapping: Dict[str, str], values: List[str], target: Optional[str]) -> Optional[List[str]]:
+    """
+    把接口中的枚举取值换算为数据中的原始取值
+    
+    Args:
+        mapping: 原始取值 -> 接口取值的映射
+        values: 数据中出现过的全部原始取值
+        target: 接口取值，None 表示不过滤
+        
+    Returns:
+        映射后等于 target 的原始取值列表，target 为 None 时返回 None
+    """
+    if target is None:
+        return None
+    return [value for value in values if mapping.get(value, value) == target]
+
+def task_filter_conditions(store, filters: TaskFilters) -> Dict[str, Any]:
+    """
+    把接口过滤条件转换为列式任务表的查询条件
+    
+    类别、难度、状态按映射后的接口取值匹配（与响应中的取值一致）。
+    
+    Returns:
+        TaskStore.filter / TaskStore.page 的关键字参数
+    """
+    categorical = store.categorical
+    return dict(
+        category=source_values(CATEGORY_MAPPING, categorical['category'].table.values(), filters.category),
+        difficulty=source_values(DIFFICULTY_MAPPING, categorical['difficulty'].table.values(), filters.difficulty),
+        status=source_values(STATUS_MAPPING, categorical['status'].table.values(), filters.status),
+        course_code=[filters.course] if filters.course else None,
+        created_from=to_epoch(filters.date_from) if filters.date_from else None,
+        created_to=to_epoch(filters.date_to) if filters.date_to else None,
+        updated_from=to_epoch(filters.updated_from) if filters.updated_from else None,
+        updated_to=to_epoch(filters.updated_to) if filters.updated_to else None,
+        search=filters.search
+    )
+
+def apply_task_filters(store, filters: TaskFilters):
+    """
+    应用任务过滤条件，在列式任务表上通过索引完成
     
-    if filters.category:
-        filtered_tasks = [t for t in filtered_tasks if t.category == filters.category]
+    Returns:
+        命中的行号数组（按行号升序）
+    """
+    return store.filter(**task_filter_conditions(store, filters))
+
+def build_task_list(
+    filters: TaskFilters,
+    page: int,
+    size: int,
+    cursor: Optional[str] = None,
+    approximate_total: bool = False,
+    snapshot: Optional[DataSnapshot] = None
+) -> bytes:
+    """
+    过滤、分页并序列化任务列表（同步，供执行器调用）
     
-    if filters.course:
-        filtered_tasks = [t for t in filtered_tasks if t.course_code == filters.course]
+    列表按 (创建时间, 任务ID) 排序。cursor 为 None 时按页码分页；否则从游标之后继续读取一页，
+    耗时与页码深度无关。响应体由预先序列化的任务片段拼接而成，与 TaskListResponse 的 JSON 输出一致。
     
-    if filters.difficulty:
-        filtered_tasks = [t for t in filtered_tasks if t.difficulty == filters.difficulty]
+    Args:
+        filters: 过滤条件
+        page: 页码（游标模式下忽略）
+        size: 每页大小
+        cursor: 分页游标，空字符串表示游标模式的第一页
+        approximate_total: 游标模式下是否只估算总数
+        snapshot: 数据快照，默认为当前快照
+        
+    Returns:
+        JSON 响应体
+        
+    Raises:
+        ValueError: 游标格式无效
+    """
+    snapshot = snapshot or data_loader.snapshot
+    store = data_loader.get_task_store(snapshot)
     
-    if filters.status:
-        filtered_tasks = [t for t in filtered_tasks if t.status == filters.status]
+    if cursor is None:
+        # 页码分页：命中行按列表顺序排列后切片
+        rows = store.keyset.sort_rows(apply_task_filters(store, filters))
+        page_rows, meta = paginate_results(rows, page, size)
+        if meta.has_next:
+            meta.next_cursor = encode_cursor(store.keyset.key_of(int(page_rows[-1])))
+    else:
+        after = decode_cursor(cursor) if cursor else None
+        result = store.page(after, size, approximate_total, **task_filter_conditions(store, filters))
+        page_rows = result.rows
+        pages = math.ceil(result.total / size) if result.total > 0 else 0
+        meta = PaginationMeta(
+            page=result.skipped // size + 1,
+            size=size,
+            total=result.total,
+            pages=pages,
+            has_next=result.next_key is not None,
+            has_prev=result.skipped > 0,
+            next_cursor=encode_cursor(result.next_key) if result.next_key else None,
+            total_approximate=result.total_approximate
+        )
     
-    if filters.date_from:
-        filtered_tasks = [t for t in filtered_tasks if t.created_at and t.created_at >= filters.date_from]
+    # 只取出当前页的任务ID，拼接缓存的 JSON 片段
+    task_ids = [store.get(int(row), 'task_id') for row in page_rows]
+    return assemble(task_item_fragments(snapshot, task_ids), {"meta": meta.model_dump(mode='json')})
+
+def build_task_info(task) -> dict:
+    """构建 RAG 服务所需的任务信息"""
+    return {
+        'task_id': task.task_id,
+        'title': task.title,
+        'description': task.description,
+        'category': task.category,
+        'location_name': task.location_name,
+        'location_lat': task.location_lat,
+        'location_lng': task.location_lng
+    }
+
+def build_chat_response(rag_result) -> ChatResponse:
+    """将 RAG 处理结果转换为聊天响应"""
+    citations = [
+        Citation(
+            source=citation['source'],
+            content=citation['content'],
+            score=citation['score']
+        )
+        for citation in rag_result.citations
+    ]
     
-    if filters.date_to:
-        filtered_tasks = [t for t in filtered_tasks if t.created_at and t.created_at <= filters.date_to]
+    map_anchor = MapAnchor(
+        lat=rag_result.map_anchor['lat'],
+        lng=rag_result.map_anchor['lng']
+    )
     
-    if filters.search:
-        search_term = filters.search.lower()
-        filtered_tasks = [
-            t for t in filtered_tasks 
-            if search_term in t.title.lower() or search_term in t.description.lower()
+    suggestions = None
+    if rag_result.suggestions:
+        suggestions = [
+            Suggestion(
+                type=suggestion['type'],
+                title=suggestion['title'],
+                description=suggestion['description']
+            )
+            for suggestion in rag_result.suggestions
         ]
     
-    return filtered_tasks
+    return ChatResponse(
+        answer=rag_result.answer,
+        citations=citations,
+        map_anchor=map_anchor,
+        suggestions=suggestions,
+        uncertain_reason=rag_result.uncertain_reason
+    )
+
+def format_sse(event: str, data) -> str:
+    """格式化 Server-Sent Events 消息"""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
 
 def paginate_results(items: List, page: int, size: int) -> tuple:
     """分页处理"""
@@ -270,7 +576,9 @@ def paginate_results(items: List, page: int, size: int) -> tuple:
         total=total,
         pages=pages,
         has_next=page < pages,
-        has_prev=page > 1
+        has_prev=page > 1,
+        next_cursor=None,
+        total_approximate=False
     )
     
     return paginated_items, meta
@@ -292,6 +600,7 @@ async def health_check():
 
 @app.get("/tasks", response_model=TaskListResponse)
 async def get_tasks(
+    request: Request,
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(20, ge=1, le=100, description="每页大小"),
     category: Optional[TaskCategory] = Query(None, description="任务类别"),
@@ -300,14 +609,21 @@ async def get_tasks(
     status: Optional[TaskStatus] = Query(None, description="任务状态"),
     date_from: Optional[datetime] = Query(None, description="开始日期"),
     date_to: Optional[datetime] = Query(None, description="结束日期"),
-    search: Optional[str] = Query(None, description="搜索关键词")
+    updated_from: Optional[datetime] = Query(None, description="更新时间起点"),
+    updated_to: Optional[datetime] = Query(None, description="更新时间终点"),
+    search: Optional[str] = Query(None, description="搜索关键词"),
+    cursor: Optional[str] = Query(None, description="分页游标（传空字符串开始游标分页，之后传 meta.next_cursor）"),
+    approximate_total: bool = Query(False, description="游标分页时只估算总数")
 ):
-    """获取任务列表（支持过滤和分页）"""
+    """获取任务列表（支持过滤、页码分页和游标分页）"""
+    # 数据未变化时直接返回 304，不做过滤和序列化
+    # ETag 与响应体来自同一个快照，重新加载进行中也不会把新数据配上旧 ETag
+    snapshot = data_loader.snapshot
+    etag, not_modified = check_not_modified(request, snapshot.data_version, "tasks")
+    if not_modified:
+        return not_modified
+    
     try:
-        # 获取所有任务
-        all_tasks = data_loader.get_all_tasks()
-        
-        # 应用过滤条件
         filters = TaskFilters(
             category=category,
             course=course,
@@ -315,18 +631,17 @@ async def get_tasks(
             status=status,
             date_from=date_from,
             date_to=date_to,
+            updated_from=updated_from,
+            updated_to=updated_to,
             search=search
         )
-        filtered_tasks = apply_task_filters(all_tasks, filters)
         
-        # 分页处理
-        paginated_tasks, meta = paginate_results(filtered_tasks, page, size)
-        
-        # 转换为 Pydantic 模式
-        task_schemas = [convert_task_to_schema(task) for task in paginated_tasks]
-        
-        return TaskListResponse(data=task_schemas, meta=meta)
+        # 过滤、分页和模式转换在线程池中执行，避免阻塞事件循环
+        body = await run_in_thread(build_task_list, filters, page, size, cursor, approximate_total, snapshot)
+        return Response(content=body, media_type="application/json", headers=etag_headers(etag))
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取任务列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail="获取任务列表失败")
@@ -335,22 +650,12 @@ async def get_tasks(
 async def get_task(task_id: str):
     """获取指定任务详情"""
     try:
-        task = data_loader.get_task(task_id)
-        if not task:
+        # 详情（含知识库）在数据加载后已序列化，这里只拼接外层结构
+        detail = task_detail_fragment(data_loader.snapshot, task_id)
+        if detail is None:
             raise HTTPException(status_code=404, detail="任务不存在")
         
-        knowledge = data_loader.get_task_knowledge(task_id)
-        
-        # 转换为详情模式
-        task_schema = convert_task_to_schema(task)
-        knowledge_schema = convert_knowledge_to_schema(knowledge)
-        
-        task_detail = TaskDetailSchema(
-            **task_schema.model_dump(),
-            knowledge=knowledge_schema
-        )
-        
-        return TaskDetailResponse(data=task_detail)
+        return Response(content=embed(detail, {}), media_type="application/json")
         
     except HTTPException:
         raise
@@ -359,11 +664,16 @@ async def get_task(task_id: str):
         raise HTTPException(status_code=500, detail="获取任务详情失败")
 
 @app.get("/api/knowledge")
-async def get_knowledge():
+async def get_knowledge(request: Request):
     """获取知识库列表"""
+    snapshot = data_loader.snapshot
+    etag, not_modified = check_not_modified(request, snapshot.data_version, "knowledge")
+    if not_modified:
+        return not_modified
+    
     try:
-        knowledge_list = data_loader.get_all_knowledge()
-        return {
+        knowledge_list = list(snapshot.task_knowledge.values())
+        return JSONResponse(headers=etag_headers(etag), content={
             "knowledge": [
                 {
                     "task_id": kb.task_id,
@@ -376,18 +686,23 @@ async def get_knowledge():
                 for kb in knowledge_list
             ],
             "total": len(knowledge_list)
-        }
+        })
     except Exception as e:
         logger.error(f"获取知识库列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail="获取知识库列表失败")
 
 @app.get("/api/npcs")
-async def get_npcs():
+async def get_npcs(request: Request):
     """获取NPC列表"""
+    snapshot = data_loader.snapshot
+    etag, not_modified = check_not_modified(request, snapshot.data_version, "npcs")
+    if not_modified:
+        return not_modified
+    
     try:
         # 从任务数据中提取唯一的NPC信息
-        tasks = data_loader.get_all_tasks()
-        npcs = {}
+        tasks = snapshot.tasks.values()
+        npcs: Dict[str, Dict[str, Any]] = {}
         
         for task in tasks:
             if task.npc_id and task.npc_id not in npcs:
@@ -409,10 +724,10 @@ async def get_npcs():
                     "category": task.category
                 })
         
-        return {
+        return JSONResponse(headers=etag_headers(etag), content={
             "npcs": list(npcs.values()),
             "total": len(npcs)
-        }
+        })
     except Exception as e:
         logger.error(f"获取NPC列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail="获取NPC列表失败")
@@ -421,9 +736,9 @@ async def get_npcs():
 async def get_npc(npc_id: str):
     """获取指定NPC详情"""
     try:
-        # 查找与该NPC相关的所有任务
-        tasks = data_loader.get_all_tasks()
-        npc_tasks = [task for task in tasks if task.npc_id == npc_id]
+        # 通过 NPC 索引查找与该NPC相关的所有任务
+        store = data_loader.get_task_store()
+        npc_tasks = store.materialize_rows(store.filter(npc_id=[npc_id]))
         
         if not npc_tasks:
             raise HTTPException(status_code=404, detail="NPC不存在")
@@ -460,13 +775,24 @@ async def get_npc(npc_id: str):
         raise HTTPException(status_code=500, detail="获取NPC详情失败")
 
 @app.get("/api/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """获取数据统计信息"""
+    snapshot = data_loader.snapshot
+    # 响应中含本进程的数据代数和同步令牌，ETag 同样按代数区分
+    etag, not_modified = check_not_modified(request, snapshot.data_version, f"stats:{snapshot.generation}")
+    if not_modified:
+        return not_modified
+    
     try:
         stats = data_loader.get_load_stats()
         validation_results = data_loader.get_validation_results()
+        store = data_loader.get_task_store(snapshot)
         
-        return {
+        return JSONResponse(headers=etag_headers(etag), content={
+            "data_version": snapshot.data_version,
+            "generation": snapshot.generation,
+            "sync_token": data_loader.change_log.sync_token(snapshot.generation),
+            "change_log": data_loader.change_log.get_stats(),
             "load_stats": stats,
             "validation_summary": {
                 "total_issues": len(validation_results),
@@ -475,10 +801,15 @@ async def get_stats():
                 "info": len([r for r in validation_results if r.level.value == "info"])
             },
             "data_counts": {
-                "tasks": len(data_loader.get_all_tasks()),
-                "knowledge": len(data_loader.get_all_knowledge())
-            }
-        }
+                "tasks": len(snapshot.tasks),
+                "knowledge": len(snapshot.task_knowledge)
+            },
+            "task_facets": {
+                column: store.value_counts(column) for column in ('category', 'difficulty', 'status')
+            },
+            "task_store": store.get_stats(),
+            "response_cache": task_response_cache.get_stats()
+        })
     except Exception as e:
         logger.error(f"获取统计信息失败: {str(e)}")
         raise HTTPException(status_code=500, detail="获取统计信息失败")
@@ -488,8 +819,9 @@ async def get_stats():
 async def debug_dump():
     """导出内存数据快照 (调试接口)"""
     try:
-        snapshot = data_loader.get_memory_snapshot()
-        return snapshot
+        # 快照生成和 JSON 编码都在线程池中执行
+        content = await run_in_thread(lambda: encode_json(data_loader.get_memory_snapshot()))
+        return Response(content=content, media_type="application/json")
     except Exception as e:
         logger.error(f"导出内存快照失败: {str(e)}")
         raise HTTPException(status_code=500, detail="导出内存快照失败")
@@ -526,9 +858,12 @@ async def debug_reload():
     """重新加载数据 (调试接口)"""
     try:
         logger.info("手动重新加载数据")
-        success = data_loader.load_all_data()
+        # 只有变化的行被重新校验，变更在新快照发布前增量应用到索引和缓存；
+        # 在线程池中加载，新快照发布前请求继续读取当前快照
+        success = await run_in_thread(data_loader.load_all_data)
         if success:
-            return {"message": "数据重新加载成功", "success": True}
+            get_response_cache()
+            return {"message": "数据重新加载成功", "success": True, "generation": data_loader.generation}
         else:
             return {"message": "数据重新加载失败", "success": False}
     except Exception as e:
@@ -577,6 +912,11 @@ async def get_performance_metrics():
                 "slow_request_threshold": app_config.performance.slow_request_threshold,
                 "enable_metrics": app_config.performance.enable_metrics
             },
+            "rag": get_rag_stats(),
+            "singleflight": get_singleflight_stats(),
+            "executors": get_executor_stats(),
+            "data_watcher": get_watcher_stats(),
+            "snapshot_cache": data_loader.snapshot_cache.get_stats(),
             "uptime": time.time() - app_start_time,
             "timestamp": datetime.now().isoformat()
         }
@@ -632,7 +972,7 @@ async def search_tasks_endpoint(request: SearchRequest):
     try:
         # 执行搜索
         top_n = request.top_n if request.top_n is not None else 10
-        results = search_tasks(request.query, top_n)
+        results = await search_tasks_async(request.query, top_n)
         
         # 转换为响应格式
         search_results = [
@@ -663,7 +1003,8 @@ async def search_tasks_endpoint(request: SearchRequest):
 
 
 @app.post("/npc/{task_id}/chat", response_model=ChatResponse, summary="NPC Chat", description="与任务 NPC 进行对话")
-async def npc_chat(task_id: str, request: ChatRequest):
+async def npc_chat(task_id: str, request: ChatRequest, response: Response,
+                   x_debug_timing: Optional[str] = Header(None, description="非空时返回分阶段耗时 Server-Timing 头")):
     """NPC 聊天端点"""
     try:
         # 检查任务是否存在
@@ -672,52 +1013,18 @@ async def npc_chat(task_id: str, request: ChatRequest):
             raise HTTPException(status_code=404, detail="任务不存在")
         
         # 构建任务信息
-        task_info = {
-            'task_id': task.task_id,
-            'title': task.title,
-            'description': task.description,
-            'category': task.category,
-            'location_name': task.location_name,
-            'location_lat': task.location_lat,
-            'location_lng': task.location_lng
-        }
-        
-        # 异步处理聊天请求
-        rag_result = await process_npc_chat(task_id, request.question, task_info)
-        
-        # 构建响应
-        citations = [
-            Citation(
-                source=citation['source'],
-                content=citation['content'],
-                score=citation['score']
-            )
-            for citation in rag_result.citations
-        ]
+        task_info = build_task_info(task)
         
-        map_anchor = MapAnchor(
-            lat=rag_result.map_anchor['lat'],
-            lng=rag_result.map_anchor['lng']
-        )
+        # 异步处理聊天请求，记录各阶段耗时
+        with trace_request() as trace:
+            rag_result = await process_npc_chat(task_id, request.question, task_info,
+                                              session_id=request.session_id)
         
-        suggestions = None
-        if rag_result.suggestions:
-            suggestions = [
-                Suggestion(
-                    type=suggestion['type'],
-                    title=suggestion['title'],
-                    description=suggestion['description']
-                )
-                for suggestion in rag_result.suggestions
-            ]
+        # 合并到其他请求的调用没有自己的 span，此时不返回该头
+        if (x_debug_timing or app_config.performance.stage_timing_header) and trace.spans:
+            response.headers["Server-Timing"] = trace.server_timing()
         
-        return ChatResponse(
-            answer=rag_result.answer,
-            citations=citations,
-            map_anchor=map_anchor,
-            suggestions=suggestions,
-            uncertain_reason=rag_result.uncertain_reason
-        )
+        return build_chat_response(rag_result)
         
     except HTTPException:
         raise
@@ -726,6 +1033,115 @@ async def npc_chat(task_id: str, request: ChatRequest):
         raise HTTPException(status_code=500, detail="NPC 聊天失败")
 
 
+@app.post("/npc/chat/batch", response_model=BatchChatResponse, summary="NPC Batch Chat",
+          description="一次请求中向多个任务 NPC 提问")
+async def npc_chat_batch(request: BatchChatRequest):
+    """
+    NPC 批量聊天端点
+    
+    所有问题一次性完成检索，LLM 调用在网关并发限制内并行执行。
+    默认按请求顺序返回全部结果；stream=true 时按完成顺序逐行返回 NDJSON。
+    不存在的任务只在对应结果中返回错误，不影响其他问题。
+    """
+    results: List[Optional[BatchChatResult]] = [None] * len(request.items)
+    batch = []
+    positions = []
+    for index, item in enumerate(request.items):
+        task = data_loader.get_task(item.task_id)
+        if not task:
+            results[index] = BatchChatResult(index=index, task_id=item.task_id, response=None, error="任务不存在")
+            continue
+        batch.append((item.task_id, item.question, build_task_info(task)))
+        positions.append(index)
+    
+    async def completed_results():
+        for index, result in enumerate(results):
+            if result is not None:
+                yield result
+        if not batch:
+            return
+        async for batch_index, rag_result in process_npc_chat_batch(batch):
+            index = positions[batch_index]
+            yield BatchChatResult(
+                index=index,
+                task_id=request.items[index].task_id,
+                response=build_chat_response(rag_result)
+            )
+    
+    if request.stream:
+        async def ndjson_stream():
+            try:
+                async for result in completed_results():
+                    yield result.model_dump_json() + "\n"
+            except Exception as e:
+                logger.error(f"NPC 批量聊天失败: {e}")
+                yield json.dumps({"error": "NPC 批量聊天失败"}, ensure_ascii=False) + "\n"
+        
+        return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+    
+    try:
+        start_time = time.time()
+        async for result in completed_results():
+            results[result.index] = result
+        # 每个问题都会得到结果或错误；万一缺少某个结果，也在对应位置返回错误而不是 null
+        ordered = [
+            result or BatchChatResult(index=index, task_id=request.items[index].task_id, response=None,
+                                      error="未返回结果")
+            for index, result in enumerate(results)
+        ]
+        return BatchChatResponse(
+            results=ordered,
+            meta={
+                "total": len(ordered),
+                "failed": sum(1 for r in ordered if r.error is not None),
+                "process_time": round(time.time() - start_time, 3)
+            }
+        )
+    except Exception as e:
+        logger.error(f"NPC 批量聊天失败: {e}")
+        raise HTTPException(status_code=500, detail="NPC 批量聊天失败")
+
+
+@app.post("/npc/{task_id}/chat/stream", summary="NPC Chat (Streaming)", description="以 Server-Sent Events 流式返回 NPC 回答")
+async def npc_chat_stream(task_id: str, request: ChatRequest):
+    """
+    NPC 流式聊天端点
+    
+    依次发送 context（引用和地图锚点）、token（回答片段）和 done（建议和不确定原因）事件。
+    """
+    task = data_loader.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    task_info = build_task_info(task)
+    
+    async def event_stream():
+        try:
+            async for event in stream_npc_chat(task_id, request.question, task_info,
+                                               session_id=request.session_id):
+                yield format_sse(event['event'], event['data'])
+        except Exception as e:
+            logger.error(f"NPC 流式聊天失败: {e}")
+            yield format_sse("error", {"message": "NPC 聊天失败"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@app.delete("/npc/{task_id}/sessions/{session_id}", summary="Clear NPC Chat Session",
+            description="清除多轮对话的会话记忆")
+async def clear_npc_chat_session(task_id: str, session_id: str):
+    """清除指定会话在该任务下的对话历史"""
+    cleared = await run_in_thread(clear_npc_session, session_id, task_id)
+    return {"task_id": task_id, "session_id": session_id, "cleared": cleared}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+模拟 LLM 服务的延迟模型
+为 MockLLMService 提供可替换的首字延迟分布（均匀、对数正态、双峰慢尾、延迟记录回放），
+以及按生成速度逐 token 输出所需的分词
+"""
+import json
+import math
+import random
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import MockLLMConfig
+
+# 与 prompt_builder.estimate_tokens 一致：中文每字 1 个 token，其他字符每 4 个 1 个 token
+_TOKEN_PATTERN = re.compile(
+    r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]|[^\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]{1,4}'
+)
+
+
+class LatencyModel(ABC):
+    """延迟模型基类"""
+
+    @abstractmethod
+    def sample(self, rng: random.Random) -> float:
+        """
+        采样一次延迟
+
+        Args:
+            rng: 随机数生成器
+
+        Returns:
+            延迟（秒）
+        """
+
+    @abstractmethod
+    def describe(self) -> Dict[str, Any]:
+        """模型参数，用于统计信息展示"""
+
+
+class FixedLatency(LatencyModel):
+    """固定延迟"""
+
+    def __init__(self, delay: float):
+        self.delay = max(0.0, delay)
+
+    def sample(self, rng: random.Random) -> float:
+        return self.delay
+
+    def describe(self) -> Dict[str, Any]:
+        return {'model': 'fixed', 'delay': self.delay}
+
+
+class UniformLatency(LatencyModel):
+    """均匀分布延迟"""
+
+    def __init__(self, min_delay: float, max_delay: float):
+        self.min_delay = max(0.0, min_delay)
+        self.max_delay = max(self.min_delay, max_delay)
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.uniform(self.min_delay, self.max_delay)
+
+    def describe(self) -> Dict[str, Any]:
+        return {'model': 'uniform', 'min_delay': self.min_delay, 'max_delay': self.max_delay}
+
+
+class LogNormalLatency(LatencyModel):
+    """对数正态分布延迟，真实 LLM 服务的延迟通常右偏"""
+
+    def __init__(self, median: float, sigma: float, max_delay: Optional[float] = None):
+        """
+        Args:
+            median: 延迟中位数（秒）
+            sigma: 对数标准差，越大尾部越长
+            max_delay: 延迟上限（秒），None 表示不限制
+        """
+        self.median = max(1e-6, median)
+        self.sigma = max(0.0, sigma)
+        self.max_delay = max_delay
+
+    def sample(self, rng: random.Random) -> float:
+        delay = rng.lognormvariate(math.log(self.median), self.sigma)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        return delay
+
+    def describe(self) -> Dict[str, Any]:
+        return {'model': 'lognormal', 'median': self.median, 'sigma': self.sigma, 'max_delay': self.max_delay}
+
+
+class BimodalLatency(LatencyModel):
+    """双峰延迟：大部分调用来自快速模式，slow_rate 比例的调用来自慢速模式"""
+
+    def __init__(self, fast: LatencyModel, slow: LatencyModel, slow_rate: float):
+        self.fast = fast
+        self.slow = slow
+        self.slow_rate = min(max(slow_rate, 0.0), 1.0)
+
+    def sample(self, rng: random.Random) -> float:
+        if rng.random() < self.slow_rate:
+            return self.slow.sample(rng)
+        return self.fast.sample(rng)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'model': 'bimodal',
+            'slow_rate': self.slow_rate,
+            'fast': self.fast.describe(),
+            'slow': self.slow.describe()
+        }
+
+
+class TraceLatency(LatencyModel):
+    """按顺序循环回放记录的延迟"""
+
+    def __init__(self, samples: List[float], source: str = ""):
+        """
+        Args:
+            samples: 延迟记录（秒），不能为空
+            source: 记录来源，仅用于展示
+
+        Raises:
+            ValueError: 记录为空
+        """
+        if not samples:
+            raise ValueError("延迟记录为空")
+        self.samples = [max(0.0, s) for s in samples]
+        self.source = source
+        self._position = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> 'TraceLatency':
+        """
+        从文件加载延迟记录
+
+        每行一个延迟（秒），或一个带 latency 字段的 JSON 对象（例如访问日志导出）；
+        空行和 # 开头的行被忽略。
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            回放模型
+        """
+        samples = []
+        for line in Path(path).read_text(encoding='utf-8').splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                samples.append(float(json.loads(line)['latency']))
+            else:
+                samples.append(float(line))
+        return cls(samples, source=path)
+
+    def sample(self, rng: random.Random) -> float:
+        delay = self.samples[self._position]
+        self._position = (self._position + 1) % len(self.samples)
+        return delay
+
+    def describe(self) -> Dict[str, Any]:
+        return {'model': 'trace', 'source': self.source, 'samples': len(self.samples)}
+
+
+def create_latency_model(config: MockLLMConfig) -> LatencyModel:
+    """
+    根据配置创建延迟模型
+
+    uniform 模型在 slow_rate > 0 时按比例出现固定的 slow_delay 慢调用；
+    bimodal 模型的快慢两种模式都是对数正态分布，中位数分别为 median_delay 和 slow_delay。
+
+    Args:
+        config: 模拟 LLM 服务配置
+
+    Returns:
+        延迟模型
+
+    Raises:
+        ValueError: 未知的模型名称，或 trace 模型未指定记录文件
+    """
+    name = config.latency_model
+    if name == 'uniform':
+        model: LatencyModel = UniformLatency(config.min_delay, config.max_delay)
+        if config.slow_rate > 0:
+            model = BimodalLatency(model, FixedLatency(config.slow_delay), config.slow_rate)
+        return model
+    if name == 'lognormal':
+        return LogNormalLatency(config.median_delay, config.sigma)
+    if name == 'bimodal':
+        return BimodalLatency(
+            LogNormalLatency(config.median_delay, config.sigma),
+            LogNormalLatency(config.slow_delay, config.sigma),
+            config.slow_rate
+        )
+    if name == 'trace':
+        if not config.trace_file:
+            raise ValueError("trace 延迟模型需要指定 MOCK_LLM_TRACE_FILE")
+        return TraceLatency.from_file(config.trace_file)
+    raise ValueError(f"未知的延迟模型: {name}")
+
+
+def split_stream_tokens(text: str) -> List[str]:
+    """
+    把文本切分为用于流式输出的 token（中文每字一个，其他字符每 4 个一个）
+
+    Args:
+        text: 文本
+
+    Returns:
+        token 列表，拼接后等于原文本
+    """
+    return _TOKEN_PATTERN.findall(text)
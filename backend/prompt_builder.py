@@ -0,0 +1,318 @@
+"""
+按 token 预算构建 NPC 聊天提示词
+对检索到的知识片段去重、抽取相关句子，并优先裁掉低分片段；任务信息部分按任务缓存
+"""
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Set, Tuple
+
+from answer_cache import char_ngram_vector, cosine_similarity
+
+logger = logging.getLogger(__name__)
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+_SENTENCE_PATTERN = re.compile(r'[^。！？!?\n]+[。！？!?]?')
+_KNOWLEDGE_PLACEHOLDER = "{knowledge_context}"
+_EMPTY_KNOWLEDGE = "暂无相关知识库信息"
+_HISTORY_HEADER = "\n\n## 对话历史\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 token 数
+
+    中日韩字符和全角标点按每字 1 个 token，其余字符按每 4 个字符 1 个 token，
+    与常见 BPE 分词器的结果量级一致，足以用于预算控制。
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """
+    按句子截断到 token 上限，单句超长时按字符截断
+
+    Args:
+        text: 文本
+        max_tokens: token 上限
+
+    Returns:
+        截断后的文本（原文本的前缀）
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    result = ""
+    for sentence in split_sentences(text):
+        if estimate_tokens(result + sentence) > max_tokens:
+            break
+        result += sentence
+    if result:
+        return result
+
+    end = len(text)
+    while end > 0 and estimate_tokens(text[:end]) > max_tokens:
+        end = int(end * 0.8)
+    return text[:end]
+
+
+def extract_terms(text: str) -> Set[str]:
+    """提取中文单字和英文单词（与关键词检索的分词方式一致）"""
+    lowered = text.lower()
+    return set(re.findall(r'[\u4e00-\u9fff]', lowered)) | set(re.findall(r'[a-zA-Z]+', lowered))
+
+
+def split_sentences(text: str) -> List[str]:
+    """按中英文句末标点和换行切分句子"""
+    return [s.strip() for s in _SENTENCE_PATTERN.findall(text) if s.strip()]
+
+
+def extract_relevant_sentences(content: str, question: str) -> str:
+    """
+    只保留与问题有词项重叠的句子（保持原有顺序）
+
+    Args:
+        content: 知识片段内容
+        question: 用户问题
+
+    Returns:
+        抽取后的内容；没有相关句子时返回原内容
+    """
+    query_terms = extract_terms(question)
+    if not query_terms:
+        return content
+    sentences = split_sentences(content)
+    relevant = [s for s in sentences if query_terms & extract_terms(s)]
+    if not relevant or len(relevant) == len(sentences):
+        return content
+    return "".join(relevant)
+
+
+@dataclass
+class BuiltPrompt:
+    """提示词构建结果"""
+    text: str                           # 用户提示词
+    chunks: List[Dict[str, Any]]        # 实际放入提示词的知识片段（原始片段，用于引用）
+    estimated_tokens: int               # 估算的 token 数
+
+
+class PromptBuilder:
+    """
+    按 token 预算构建用户提示词
+
+    模板中 {knowledge_context} 之前的任务信息部分只与任务有关，按任务缓存；
+    知识片段按分数从高到低放入，超出预算时截断或丢弃低分片段。
+    build() 会在执行器的多个工作线程中同时调用，任务信息缓存和统计信息由锁保护。
+    """
+
+    def __init__(
+        self,
+        template: str,
+        max_tokens: int = 1200,
+        dedupe_threshold: float = 0.8,
+        sentence_extraction: bool = True,
+        max_description_tokens: int = 200,
+        min_chunk_tokens: int = 40,
+        scaffold_cache_size: int = 256
+    ):
+        """
+        初始化提示词构建器
+
+        Args:
+            template: 用户提示词模板，需包含 {knowledge_context} 和 {user_question}
+            max_tokens: 用户提示词的 token 预算
+            dedupe_threshold: 片段去重的相似度阈值
+            sentence_extraction: 是否只保留与问题相关的句子
+            max_description_tokens: 任务描述的 token 上限
+            min_chunk_tokens: 剩余预算低于此值时不再截断放入片段
+            scaffold_cache_size: 任务信息模板缓存条目数
+        """
+        self.head_template, self.tail_template = template.split(_KNOWLEDGE_PLACEHOLDER, 1)
+        self.max_tokens = max_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.sentence_extraction = sentence_extraction
+        self.max_description_tokens = max_description_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.scaffold_cache_size = scaffold_cache_size
+
+        self._scaffolds: "OrderedDict[Tuple, Tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'builds': 0,
+            'chunks_in': 0,
+            'chunks_deduped': 0,
+            'chunks_truncated': 0,
+            'chunks_dropped': 0,
+            'sentences_extracted': 0,
+            'tokens_total': 0,
+            'tokens_saved': 0,
+            'scaffold_hits': 0,
+            'scaffold_misses': 0
+        }
+
+    @classmethod
+    def from_config(cls, template: str, prompt_config) -> 'PromptBuilder':
+        """根据 PromptConfig 创建构建器"""
+        return cls(
+            template=template,
+            max_tokens=prompt_config.max_tokens,
+            dedupe_threshold=prompt_config.dedupe_threshold,
+            sentence_extraction=prompt_config.sentence_extraction,
+            max_description_tokens=prompt_config.max_description_tokens,
+            min_chunk_tokens=prompt_config.min_chunk_tokens,
+            scaffold_cache_size=prompt_config.scaffold_cache_size
+        )
+
+    def build(self, task_info: Dict[str, Any], knowledge_chunks: List[Dict[str, Any]],
+              user_question: str, history: str = "") -> BuiltPrompt:
+        """
+        构建用户提示词
+
+        Args:
+            task_info: 任务信息
+            knowledge_chunks: 检索到的知识片段
+            user_question: 用户问题
+            history: 多轮对话历史（已按会话预算压缩），放在用户问题之前
+
+        Returns:
+            提示词构建结果
+        """
+        # 先在局部计数，构建完成后一次性计入共享的统计信息
+        counts = dict.fromkeys(self.stats, 0)
+        counts['builds'] = 1
+        counts['chunks_in'] = len(knowledge_chunks)
+
+        head, head_tokens = self._scaffold(task_info, counts)
+        tail = self.tail_template.format(user_question=user_question)
+        if history:
+            tail = _HISTORY_HEADER + history + tail
+        budget = self.max_tokens - head_tokens - estimate_tokens(tail)
+
+        raw_tokens = sum(
+            estimate_tokens(self._format_chunk(i, chunk, chunk.get('content', '')))
+            for i, chunk in enumerate(knowledge_chunks, 1)
+        )
+        selected: List[Dict[str, Any]] = []
+        blocks: List[str] = []
+        for chunk in self._dedupe(knowledge_chunks, counts):
+            content = chunk.get('content', '')
+            if self.sentence_extraction:
+                extracted = extract_relevant_sentences(content, user_question)
+                if extracted != content:
+                    counts['sentences_extracted'] += 1
+                    content = extracted
+
+            block = self._format_chunk(len(blocks) + 1, chunk, content)
+            block_tokens = estimate_tokens(block)
+            if block_tokens > budget:
+                if budget < self.min_chunk_tokens:
+                    counts['chunks_dropped'] += 1
+                    continue
+                content = self._truncate(content, budget - (block_tokens - estimate_tokens(content)))
+                if not content:
+                    counts['chunks_dropped'] += 1
+                    continue
+                block = self._format_chunk(len(blocks) + 1, chunk, content)
+                block_tokens = estimate_tokens(block)
+                counts['chunks_truncated'] += 1
+
+            blocks.append(block)
+            selected.append(chunk)
+            budget -= block_tokens
+
+        knowledge_context = "".join(blocks) if blocks else _EMPTY_KNOWLEDGE
+        text = head + knowledge_context + tail
+        tokens = estimate_tokens(text)
+        counts['tokens_total'] = tokens
+        counts['tokens_saved'] = max(0, raw_tokens - sum(estimate_tokens(b) for b in blocks))
+        with self._lock:
+            for name, value in counts.items():
+                self.stats[name] += value
+        return BuiltPrompt(text=text, chunks=selected, estimated_tokens=tokens)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取提示词构建统计信息"""
+        with self._lock:
+            stats = dict(self.stats)
+            cache_size = len(self._scaffolds)
+        builds = stats['builds']
+        return {
+            **stats,
+            'avg_prompt_tokens': round(stats['tokens_total'] / builds, 1) if builds else 0,
+            'max_tokens': self.max_tokens,
+            'scaffold_cache_size': cache_size
+        }
+
+    def _scaffold(self, task_info: Dict[str, Any], counts: Dict[str, int]) -> Tuple[str, int]:
+        """获取任务信息部分（带缓存）及其 token 数"""
+        key = (
+            task_info.get('task_id', ''),
+            task_info.get('title', ''),
+            task_info.get('description', ''),
+            task_info.get('location_name', '')
+        )
+        with self._lock:
+            cached = self._scaffolds.get(key)
+            if cached is not None:
+                self._scaffolds.move_to_end(key)
+        if cached is not None:
+            counts['scaffold_hits'] += 1
+            return cached
+
+        counts['scaffold_misses'] += 1
+        head = self.head_template.format(
+            task_id=key[0],
+            task_title=key[1],
+            task_description=self._truncate(key[2], self.max_description_tokens),
+            task_location=key[3]
+        )
+        scaffold = (head, estimate_tokens(head))
+        with self._lock:
+            self._scaffolds[key] = scaffold
+            while len(self._scaffolds) > self.scaffold_cache_size:
+                self._scaffolds.popitem(last=False)
+        return scaffold
+
+    def _dedupe(self, chunks: List[Dict[str, Any]], counts: Dict[str, int]) -> List[Dict[str, Any]]:
+        """按分数从高到低排序，去掉被包含或高度相似的片段"""
+        ordered = sorted(chunks, key=lambda c: c.get('score', 0), reverse=True)
+        kept: List[Tuple[str, Dict[str, float], Dict[str, Any]]] = []
+        for chunk in ordered:
+            content = chunk.get('content', '').strip()
+            vector = char_ngram_vector(content.lower())
+            duplicate = any(
+                content in other or cosine_similarity(vector, other_vector) >= self.dedupe_threshold
+                for other, other_vector, _ in kept
+            )
+            if duplicate:
+                counts['chunks_deduped'] += 1
+                continue
+            kept.append((content, vector, chunk))
+        return [chunk for _, _, chunk in kept]
+
+    @staticmethod
+    def _truncate(text: str, max_tokens: int) -> str:
+        return truncate_tokens(text, max_tokens)
+
+    @staticmethod
+    def _format_chunk(index: int, chunk: Dict[str, Any], content: str) -> str:
+        return (
+            f"\n### 知识片段 {index}\n"
+            f"来源: {chunk.get('source', '未知')}\n"
+            f"内容: {content}\n"
+            f"相关性分数: {chunk.get('score', 0)}\n"
+        )
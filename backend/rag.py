@@ -4,13 +4,27 @@ RAG (Retrieval-Augmented Generation) 系统实现
 """
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple, AsyncIterator, Union
+from dataclasses import dataclass, replace
 import json
+import random
 import re
 import time
+import hashlib
+from contextlib import nullcontext
 
-from config import app_config
+from config import app_config, MockLLMConfig
+from answer_cache import AnswerCache, normalize_question
+from singleflight import SingleFlight
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker
+from llm_gateway import LLMGateway, GatewayRejectedError
+from llm_client import create_llm_service
+from mock_latency import LatencyModel, create_latency_model, split_stream_tokens
+from prompt_builder import BuiltPrompt, PromptBuilder
+from session_memory import SessionStore
+from suggestion_index import CONTACT_SUGGESTION, SuggestionIndex
+from executors import run_in_thread
+from stage_timing import span, record_span, get_stage_stats
 
 logger = logging.getLogger(__name__)
 
@@ -37,16 +51,68 @@ class KnowledgeRetriever:
         """
         self.embedding_service = embedding_service
         self.knowledge_base = {}  # task_id -> knowledge
+        self._fingerprints: Dict[str, str] = {}  # task_id -> 知识内容指纹
         
-    def load_knowledge_base(self, knowledge_data: Dict[str, Any]):
+    def load_knowledge_base(self, knowledge_data: Dict[str, Any]) -> Set[str]:
         """
         加载知识库数据
         
         Args:
             knowledge_data: 知识库数据字典
+            
+        Returns:
+            与上次加载相比内容发生变化（新增、修改或删除）的任务ID集合
         """
+        fingerprints = {
+            task_id: self._fingerprint(knowledge)
+            for task_id, knowledge in knowledge_data.items()
+        }
+        changed = {
+            task_id for task_id in fingerprints.keys() | self._fingerprints.keys()
+            if fingerprints.get(task_id) != self._fingerprints.get(task_id)
+        }
+        
         self.knowledge_base = knowledge_data
-        logger.info(f"知识库加载完成，任务数量: {len(self.knowledge_base)}")
+        self._fingerprints = fingerprints
+        logger.info(f"知识库加载完成，任务数量: {len(self.knowledge_base)}，变更: {len(changed)}")
+        return changed
+    
+    def update_entries(self, knowledge_data: Dict[str, Any], task_ids: Iterable[str]) -> Set[str]:
+        """
+        按变更的任务ID增量更新知识库，只重新计算这些条目的指纹
+        
+        Args:
+            knowledge_data: 更新后的完整知识库数据字典
+            task_ids: 新增、修改或删除了知识条目的任务ID
+            
+        Returns:
+            内容确实发生变化的任务ID集合
+        """
+        fingerprints = dict(self._fingerprints)
+        changed = set()
+        for task_id in task_ids:
+            knowledge = knowledge_data.get(task_id)
+            fingerprint = self._fingerprint(knowledge) if knowledge is not None else None
+            if fingerprint != fingerprints.get(task_id):
+                changed.add(task_id)
+            if fingerprint is None:
+                fingerprints.pop(task_id, None)
+            else:
+                fingerprints[task_id] = fingerprint
+        
+        self.knowledge_base = knowledge_data
+        self._fingerprints = fingerprints
+        logger.info(f"知识库增量更新完成，任务数量: {len(self.knowledge_base)}，变更: {len(changed)}")
+        return changed
+    
+    @staticmethod
+    def _fingerprint(knowledge: Any) -> str:
+        """计算知识条目的内容指纹"""
+        if not isinstance(knowledge, dict):
+            from dataclasses import asdict, is_dataclass
+            knowledge = asdict(knowledge) if is_dataclass(knowledge) else vars(knowledge)
+        data_str = json.dumps(knowledge, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(data_str.encode('utf-8')).hexdigest()
     
     def retrieve_task_knowledge(self, task_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -301,17 +367,50 @@ class PromptTemplate:
 class MockLLMService:
     """模拟 LLM 服务（用于测试）支持异步和超时"""
     
-    def __init__(self, simulate_delay: bool = True, failure_rate: float = 0.0):
+    def __init__(self, simulate_delay: bool = True, failure_rate: float = 0.0,
+                 stream_chunk_size: int = 4, stream_chunk_delay: float = 0.02,
+                 min_delay: float = 0.5, max_delay: float = 2.0,
+                 slow_rate: float = 0.0, slow_delay: float = 8.0,
+                 latency_model: Optional[LatencyModel] = None, tokens_per_second: float = 0.0,
+                 slowdown_per_call: float = 0.0, slowdown_threshold: int = 1,
+                 seed: Optional[int] = None):
         """
         初始化模拟LLM服务
         
         Args:
             simulate_delay: 是否模拟网络延迟
             failure_rate: 模拟失败率 (0.0-1.0)
+            stream_chunk_size: 流式模式下每个片段的字符数（未设置生成速度时使用）
+            stream_chunk_delay: 流式模式下片段之间的间隔（秒）（未设置生成速度时使用）
+            min_delay: 正常延迟下限（秒）
+            max_delay: 正常延迟上限（秒）
+            slow_rate: 慢调用比例 (0.0-1.0)，用于模拟长尾延迟
+            slow_delay: 慢调用的延迟（秒）
+            latency_model: 首字延迟模型，默认按 min_delay/max_delay/slow_rate/slow_delay 创建
+            tokens_per_second: 生成速度，大于 0 时逐 token 输出，非流式调用也计入生成时间
+            slowdown_per_call: 并发调用数超过阈值后，每多一个并发调用增加的延迟比例
+            slowdown_threshold: 不产生减速的并发调用数
+            seed: 随机种子，None 表示使用全局随机数生成器
         """
         self.simulate_delay = simulate_delay
         self.failure_rate = failure_rate
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.latency_model = latency_model or create_latency_model(MockLLMConfig(
+            min_delay=min_delay, max_delay=max_delay, slow_rate=slow_rate, slow_delay=slow_delay
+        ))
+        self.tokens_per_second = max(0.0, tokens_per_second)
+        self.slowdown_per_call = max(0.0, slowdown_per_call)
+        self.slowdown_threshold = max(0, slowdown_threshold)
+        self.rng = random.Random(seed)  # seed 为 None 时由系统随机源初始化
+        self.stream_chunk_size = max(1, stream_chunk_size)
+        self.stream_chunk_delay = stream_chunk_delay
         self.call_count = 0
+        self.stream_call_count = 0
+        self.active_calls = 0
+        self.max_active_calls = 0
         
         self.responses = {
             "default": {
@@ -344,10 +443,40 @@ class MockLLMService:
             }
         }
     
+    @classmethod
+    def from_config(cls, config: MockLLMConfig) -> 'MockLLMService':
+        """
+        根据配置创建模拟 LLM 服务
+        
+        Args:
+            config: 模拟 LLM 服务配置
+            
+        Returns:
+            模拟 LLM 服务
+            
+        Raises:
+            ValueError: 延迟模型配置无效
+        """
+        return cls(
+            simulate_delay=config.simulate_delay,
+            failure_rate=config.failure_rate,
+            min_delay=config.min_delay,
+            max_delay=config.max_delay,
+            slow_rate=config.slow_rate,
+            slow_delay=config.slow_delay,
+            latency_model=create_latency_model(config),
+            tokens_per_second=config.tokens_per_second,
+            slowdown_per_call=config.slowdown_per_call,
+            slowdown_threshold=config.slowdown_threshold,
+            seed=config.seed
+        )
+    
     async def generate_response(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
         """
         异步生成模拟响应
         
+        设置了生成速度时，延迟为首字延迟加上按 tokens_per_second 计算的生成时间。
+        
         Args:
             system_prompt: 系统提示词
             user_prompt: 用户提示词
@@ -360,27 +489,87 @@ class MockLLMService:
             asyncio.TimeoutError: 模拟的超时异常
         """
         self.call_count += 1
+        self._enter_call()
+        try:
+            await self._simulate_upstream(user_prompt)
+            response = self._match_response(user_prompt)
+            if self.simulate_delay and self.tokens_per_second > 0:
+                tokens = len(split_stream_tokens(response.get('answer', '')))
+                await asyncio.sleep(tokens / self.tokens_per_second * self._slowdown_factor())
+            return response
+        finally:
+            self._exit_call()
+    
+    async def stream_response(self, system_prompt: str, user_prompt: str) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        """
+        以流式方式生成模拟响应
         
+        首个片段之前的延迟与 generate_response 的首字延迟相同。设置了生成速度时逐 token
+        按 tokens_per_second 输出，否则按固定间隔逐段输出；最后输出一次完整的结构化响应（dict），
+        供调用方获取置信度等元数据。
+        
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+            
+        Yields:
+            回答文本片段（str），最后一项为完整响应（dict）
+        """
+        self.stream_call_count += 1
+        self._enter_call()
+        try:
+            await self._simulate_upstream(user_prompt)
+            
+            response = self._match_response(user_prompt)
+            answer = response.get('answer', '')
+            if self.tokens_per_second > 0:
+                for i, token in enumerate(split_stream_tokens(answer)):
+                    if i > 0 and self.simulate_delay:
+                        await asyncio.sleep(self._slowdown_factor() / self.tokens_per_second)
+                    yield token
+            else:
+                for i in range(0, len(answer), self.stream_chunk_size):
+                    if i > 0 and self.simulate_delay and self.stream_chunk_delay > 0:
+                        await asyncio.sleep(self.stream_chunk_delay)
+                    yield answer[i:i + self.stream_chunk_size]
+            
+            yield response
+        finally:
+            self._exit_call()
+    
+    async def _simulate_upstream(self, user_prompt: str):
+        """模拟上游服务的失败和首字延迟"""
         # 模拟失败
-        import random
-        if random.random() < self.failure_rate:
-            if random.random() < 0.5:
+        if self.rng.random() < self.failure_rate:
+            if self.rng.random() < 0.5:
                 raise asyncio.TimeoutError("模拟LLM服务超时")
             else:
                 raise Exception("模拟LLM服务异常")
         
         # 模拟网络延迟
         if self.simulate_delay:
-            # 随机延迟 0.5-2.0 秒
-            delay = random.uniform(0.5, 2.0)
+            delay = self.latency_model.sample(self.rng)
             
             # 特殊情况：如果查询包含"timeout"，模拟长时间延迟
             if "timeout" in user_prompt.lower():
-                delay = random.uniform(5.0, 10.0)
+                delay = self.rng.uniform(5.0, 10.0)
             
-            await asyncio.sleep(delay)
-        
-        # 简单的关键词匹配来选择响应
+            await asyncio.sleep(delay * self._slowdown_factor())
+    
+    def _enter_call(self):
+        self.active_calls += 1
+        self.max_active_calls = max(self.max_active_calls, self.active_calls)
+    
+    def _exit_call(self):
+        self.active_calls -= 1
+    
+    def _slowdown_factor(self) -> float:
+        """并发调用数超过阈值时的延迟倍数，模拟上游过载时变慢"""
+        overload = max(0, self.active_calls - self.slowdown_threshold)
+        return 1.0 + self.slowdown_per_call * overload
+    
+    def _match_response(self, user_prompt: str) -> Dict[str, Any]:
+        """简单的关键词匹配来选择响应"""
         for keyword, response in self.responses.items():
             if keyword != "default" and keyword in user_prompt:
                 return response
@@ -391,25 +580,95 @@ class MockLLMService:
         """获取服务统计信息"""
         return {
             "total_calls": self.call_count,
+            "stream_calls": self.stream_call_count,
             "failure_rate": self.failure_rate,
-            "simulate_delay": self.simulate_delay
+            "simulate_delay": self.simulate_delay,
+            "latency_model": self.latency_model.describe(),
+            "tokens_per_second": self.tokens_per_second,
+            "slowdown_per_call": self.slowdown_per_call,
+            "active_calls": self.active_calls,
+            "max_active_calls": self.max_active_calls
         }
 
 
 class RAGService:
     """RAG 服务主类，支持异步操作和重试机制"""
     
-    def __init__(self, knowledge_retriever: KnowledgeRetriever, llm_service=None):
+    def __init__(self, knowledge_retriever: KnowledgeRetriever, llm_service=None,
+                 answer_cache: Optional[AnswerCache] = None,
+                 gateway: Optional[LLMGateway] = None,
+                 session_store: Optional[SessionStore] = None,
+                 suggestion_index: Optional[SuggestionIndex] = None):
         """
         初始化 RAG 服务
         
         Args:
             knowledge_retriever: 知识检索器
             llm_service: LLM 服务（可选，默认使用模拟服务）
+            answer_cache: 回答缓存（可选，默认按配置创建）
+            gateway: LLM 并发网关（可选，默认按配置创建）
+            session_store: 多轮对话会话存储（可选，默认按配置创建）
+            suggestion_index: 预计算建议索引（可选，默认创建空索引，由 update_suggestions 构建）
         """
         self.retriever = knowledge_retriever
         self.llm_service = llm_service or MockLLMService()
         self.prompt_template = PromptTemplate()
+        self.prompt_builder = PromptBuilder.from_config(PromptTemplate.USER_PROMPT_TEMPLATE, app_config.prompt)
+        
+        # 回答缓存
+        cache_config = app_config.answer_cache
+        if answer_cache is None and cache_config.enabled:
+            answer_cache = AnswerCache(
+                max_entries=cache_config.max_entries,
+                ttl=cache_config.ttl,
+                semantic_enabled=cache_config.semantic_enabled,
+                similarity_threshold=cache_config.similarity_threshold
+            )
+        self.answer_cache = answer_cache
+        
+        # 多轮对话会话记忆
+        if session_store is None and app_config.session.enabled:
+            session_store = SessionStore.from_config(app_config.session)
+        self.session_store = session_store
+        
+        # 预计算建议索引
+        self.suggestion_index = suggestion_index or SuggestionIndex.from_config(app_config.suggestion)
+        
+        # 对冲请求与熔断器
+        self.hedge_config = replace(app_config.hedge)
+        self.latency_tracker = LatencyTracker()
+        breaker_config = app_config.circuit_breaker
+        self.circuit_breaker = None
+        if breaker_config.enabled:
+            self.circuit_breaker = CircuitBreaker(
+                error_rate_threshold=breaker_config.error_rate_threshold,
+                min_calls=breaker_config.min_calls,
+                window_size=breaker_config.window_size,
+                open_duration=breaker_config.open_duration,
+                half_open_timeout=breaker_config.half_open_timeout
+            )
+        
+        # LLM 并发网关
+        gateway_config = app_config.llm_gateway
+        if gateway is None and gateway_config.enabled:
+            gateway = LLMGateway(
+                max_concurrency=gateway_config.max_concurrency,
+                max_queue_size=gateway_config.max_queue_size
+            )
+        self.gateway = gateway
+        self.llm_stats = {
+            'attempts': 0,
+            'retries': 0,
+            'hedges_fired': 0,
+            'hedge_wins': 0,
+            'breaker_rejections': 0
+        }
+        self.batch_stats = {
+            'batches': 0,
+            'items': 0,
+            'deduplicated': 0,
+            'cache_hits': 0
+        }
         
         # 从配置获取重试参数
         self.max_retries = app_config.retry.max_retries
@@ -417,7 +676,9 @@ class RAGService:
         self.max_delay = app_config.retry.max_delay
         self.llm_timeout = app_config.timeout.llm_timeout
     
-    async def process_chat_request(self, task_id: str, user_question: str, task_info: Dict[str, Any]) -> RAGResult:
+    async def process_chat_request(self, task_id: str, user_question: str, task_info: Dict[str, Any],
+                                   priority: int = 0, deadline: Optional[float] = None,
+                                   session_id: Optional[str] = None) -> RAGResult:
         """
         异步处理聊天请求，支持重试机制
         
@@ -425,181 +686,787 @@ class RAGService:
             task_id: 任务ID
             user_question: 用户问题
             task_info: 任务信息
+            priority: LLM 网关排队优先级，数值越大越优先
+            deadline: 截止时间（time.monotonic() 时间戳），默认为请求超时时间
+            session_id: 会话ID，提供时在提示词中带上该会话的对话历史并记录本轮对话
             
         Returns:
             RAG 处理结果
         """
         start_time = time.time()
+        if deadline is None:
+            deadline = time.monotonic() + app_config.timeout.request_timeout
+        
+        history = await self._session_history(session_id, task_id)
+        # 带对话历史的回答依赖上下文，不读写回答缓存
+        if not history:
+            cached = self._get_cached_answer(task_id, user_question)
+            if cached is not None:
+                logger.info(f"命中回答缓存: {task_id}")
+                await self._remember_turn(session_id, task_id, user_question, cached)
+                return cached
+        # 检索前记下缓存代数，生成期间任务知识变更时不写回缓存
+        cache_generation = self._cache_generation(task_id)
         
         try:
-            # 1. 检索相关知识
-            logger.info(f"检索任务 {task_id} 的相关知识")
-            knowledge_chunks = self.retriever.search_relevant_chunks(task_id, user_question, top_k=3)
-            
-            # 2. 构建提示词
-            user_prompt = self.prompt_template.format_user_prompt(
-                task_info, knowledge_chunks, user_question
-            )
+            # 1. 检索相关知识，按 token 预算构建提示词（在线程池中执行，不阻塞事件循环）
+            prompt = await run_in_thread(self._prepare_prompt, task_id, user_question, task_info, history)
+        except Exception as e:
+            logger.error(f"RAG 处理失败: {e}")
+            return self._error_result()
+        
+        # 2. 调用 LLM 并整合结果
+        return await self._complete_chat(task_id, user_question, task_info, prompt,
+                                         priority, deadline, start_time,
+                                         session_id=session_id, cacheable=not history,
+                                         cache_generation=cache_generation)
+    
+    async def process_batch(self, requests: List[Tuple[str, str, Dict[str, Any]]], priority: int = 0,
+                            deadline: Optional[float] = None) -> AsyncIterator[Tuple[int, RAGResult]]:
+        """
+        批量处理聊天请求
+        
+        先在事件循环中查找缓存，未命中的请求在线程池中一次性完成检索和提示词构建，再并发调用 LLM
+        （并发数受网关限制）。同一批次内相同任务的相同问题只调用一次 LLM。
+        
+        Args:
+            requests: (任务ID, 用户问题, 任务信息) 列表
+            priority: LLM 网关排队优先级
+            deadline: 截止时间（time.monotonic() 时间戳），默认为请求超时时间
             
-            # 3. 调用 LLM（带重试机制）
+        Yields:
+            (请求下标, RAG 处理结果)，按完成顺序输出
+        """
+        start_time = time.time()
+        if deadline is None:
+            deadline = time.monotonic() + app_config.timeout.request_timeout
+        self.batch_stats['batches'] += 1
+        self.batch_stats['items'] += len(requests)
+        
+        # 第一阶段：查找缓存（回答缓存和统计只在事件循环中访问），其余请求在线程池中一次性构建提示词
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for index, (task_id, user_question, _) in enumerate(requests):
+            groups.setdefault((task_id, normalize_question(user_question)), []).append(index)
+        self.batch_stats['deduplicated'] += len(requests) - len(groups)
+        
+        cached_results: List[Optional[RAGResult]] = []
+        cache_generations: List[Optional[int]] = []
+        for indices in groups.values():
+            task_id, user_question, _ = requests[indices[0]]
+            cached = self._get_cached_answer(task_id, user_question)
+            if cached is not None:
+                self.batch_stats['cache_hits'] += 1
+            cached_results.append(cached)
+            cache_generations.append(self._cache_generation(task_id))
+        misses = [requests[indices[0]] for indices, cached in zip(groups.values(), cached_results) if cached is None]
+        built = iter(await run_in_thread(self._prepare_batch, misses) if misses else [])
+        prepared: List[Union[RAGResult, BuiltPrompt]] = [
+            cached if cached is not None else next(built) for cached in cached_results
+        ]
+        
+        ready: List[Tuple[List[int], RAGResult]] = []
+        pending: Dict["asyncio.Task[RAGResult]", List[int]] = {}
+        for indices, outcome, cache_generation in zip(groups.values(), prepared, cache_generations):
+            if isinstance(outcome, RAGResult):
+                ready.append((indices, outcome))
+                continue
+            task_id, user_question, task_info = requests[indices[0]]
+            future = asyncio.ensure_future(self._complete_chat(
+                task_id, user_question, task_info, outcome, priority, deadline, start_time,
+                cache_generation=cache_generation
+            ))
+            pending[future] = indices
+        
+        # 第二阶段：按完成顺序输出
+        try:
+            for indices, result in ready:
+                for index in indices:
+                    yield index, result
+            while pending:
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    indices = pending.pop(future)
+                    result = future.result()
+                    for index in indices:
+                        yield index, result
+        finally:
+            # 调用方提前停止迭代（例如客户端断开）时取消剩余的 LLM 调用
+            for future in pending:
+                future.cancel()
+    
+    def _prepare_batch(self, requests: List[Tuple[str, str, Dict[str, Any]]]) -> List[Union[RAGResult, BuiltPrompt]]:
+        """为未命中缓存的批量请求检索知识并构建提示词（在线程池中执行），失败的请求返回回退结果"""
+        prepared: List[Union[RAGResult, BuiltPrompt]] = []
+        for task_id, user_question, task_info in requests:
+            try:
+                prepared.append(self._prepare_prompt(task_id, user_question, task_info))
+            except Exception as e:
+                logger.error(f"RAG 批量检索失败: {e}")
+                prepared.append(self._error_result())
+        return prepared
+    
+    def _prepare_prompt(self, task_id: str, user_question: str, task_info: Dict[str, Any],
+                        history: str = "") -> BuiltPrompt:
+        """检索相关知识并按 token 预算构建提示词，提示词只包含实际放入的片段"""
+        with span("retrieval"):
+            knowledge_chunks = self._retrieve_chunks(task_id, user_question)
+        with span("prompt_build"):
+            return self.prompt_builder.build(task_info, knowledge_chunks, user_question, history)
+    
+    async def _session_history(self, session_id: Optional[str], task_id: str) -> str:
+        """读取会话的对话历史（可能访问 SQLite，在线程池中执行）"""
+        if not session_id or not self.session_store:
+            return ""
+        return await run_in_thread(self.session_store.get_history, session_id, task_id)
+    
+    async def _remember_turn(self, session_id: Optional[str], task_id: str, user_question: str,
+                             result: RAGResult):
+        """把成功回答的一轮对话记入会话"""
+        if not session_id or not self.session_store:
+            return
+        try:
+            await run_in_thread(self.session_store.append, session_id, task_id, user_question, result.answer)
+        except Exception as e:
+            logger.warning(f"记录会话失败: {e}")
+    
+    async def _complete_chat(self, task_id: str, user_question: str, task_info: Dict[str, Any],
+                             prompt: BuiltPrompt, priority: int, deadline: Optional[float],
+                             start_time: float, session_id: Optional[str] = None,
+                             cacheable: bool = True, cache_generation: Optional[int] = None) -> RAGResult:
+        """调用 LLM 生成回答并整合结果，失败时返回回退结果；cache_generation 为检索前记下的缓存代数"""
+        try:
+            # 调用 LLM（带重试机制）
             logger.info(f"调用 LLM 生成回答")
             llm_response = await self._call_llm_with_retry(
                 self.prompt_template.SYSTEM_PROMPT,
-                user_prompt
+                prompt.text,
+                priority=priority,
+                deadline=deadline
             )
             
-            # 4. 构建引用信息
-            citations = []
-            for chunk in knowledge_chunks:
-                citations.append({
-                    "source": chunk.get('source', ''),
-                    "content": chunk.get('content', '')[:100] + "...",
-                    "score": chunk.get('score', 0)
-                })
-            
-            # 5. 构建地图锚点
-            map_anchor = {
-                "lat": task_info.get('location_lat', 0.0),
-                "lng": task_info.get('location_lng', 0.0)
-            }
-            
-            # 6. 处理不确定性
-            uncertain_reason = None
-            if llm_response.get('confidence') == 'low' or llm_response.get('uncertain_aspects'):
-                uncertain_reason = "知识库信息不足，建议咨询相关工作人员或查看更多资料"
-            
-            # 7. 构建建议（如果需要）
-            suggestions = None
-            if not knowledge_chunks or llm_response.get('confidence') == 'low':
-                suggestions = self._generate_suggestions(user_question, task_info)
+            # 整合回答、引用、地图锚点和建议
+            with span("postprocess"):
+                result = self._build_result(llm_response, prompt.chunks, user_question, task_info)
+                if cacheable:
+                    self._cache_answer(task_id, user_question, result, cache_generation)
+            await self._remember_turn(session_id, task_id, user_question, result)
             
             # 记录处理时间
             process_time = time.time() - start_time
+            record_span("total", process_time)
             logger.info(f"RAG 处理完成，耗时: {process_time:.2f}s")
             
-            return RAGResult(
-                answer=llm_response.get('answer', '抱歉，我无法回答这个问题。'),
-                citations=citations,
-                map_anchor=map_anchor,
-                suggestions=suggestions,
-                uncertain_reason=uncertain_reason
-            )
+            return result
+            
+        except CircuitOpenError:
+            logger.warning(f"LLM 熔断中，返回回退回答: {task_id}")
+            return self._unavailable_result()
+            
+        except GatewayRejectedError as e:
+            logger.warning(f"LLM 网关拒绝请求 ({e.reason}): {task_id}")
+            return self._busy_result()
             
         except asyncio.TimeoutError:
             logger.error(f"RAG 处理超时: {task_id}")
-            return RAGResult(
-                answer="抱歉，处理您的问题时超时，请稍后重试。",
-                citations=[],
-                map_anchor={"lat": 0.0, "lng": 0.0},
-                uncertain_reason="请求超时"
-            )
+            return self._timeout_result()
             
         except Exception as e:
             logger.error(f"RAG 处理失败: {e}")
-            return RAGResult(
-                answer="抱歉，处理您的问题时出现了错误，请稍后重试。",
-                citations=[],
-                map_anchor={"lat": 0.0, "lng": 0.0},
-                uncertain_reason="系统处理错误"
-            )
+            return self._error_result()
     
-    async def _call_llm_with_retry(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+    async def stream_chat_request(self, task_id: str, user_question: str, task_info: Dict[str, Any],
+                                  priority: int = 0, deadline: Optional[float] = None,
+                                  session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        以流式方式处理聊天请求
+        
+        检索完成后立即输出引用和地图锚点（context 事件），随后逐段输出 LLM 生成的
+        回答（token 事件），最后输出建议和不确定原因（done 事件）。
+        
+        Args:
+            task_id: 任务ID
+            user_question: 用户问题
+            task_info: 任务信息
+            priority: LLM 网关排队优先级，数值越大越优先
+            deadline: 首个片段的截止时间（time.monotonic() 时间戳），默认为请求超时时间
+            session_id: 会话ID，提供时在提示词中带上该会话的对话历史并记录本轮对话
+            
+        Yields:
+            事件字典，包含 event 和 data 两个字段
+        """
+        start_time = time.time()
+        if deadline is None:
+            deadline = time.monotonic() + app_config.timeout.request_timeout
+        
+        history = await self._session_history(session_id, task_id)
+        cached = None if history else self._get_cached_answer(task_id, user_question)
+        if cached is not None:
+            logger.info(f"命中回答缓存: {task_id}")
+            await self._remember_turn(session_id, task_id, user_question, cached)
+            yield {"event": "context", "data": {"citations": cached.citations, "map_anchor": cached.map_anchor}}
+            yield {"event": "token", "data": {"text": cached.answer}}
+            yield {"event": "done", "data": self._done_payload(cached)}
+            return
+        cache_generation = self._cache_generation(task_id)
+        
+        try:
+            prompt = await run_in_thread(self._prepare_prompt, task_id, user_question, task_info, history)
+            knowledge_chunks = prompt.chunks
+        except Exception as e:
+            logger.error(f"RAG 流式检索失败: {e}")
+            result = self._error_result()
+            yield {"event": "context", "data": {"citations": result.citations, "map_anchor": result.map_anchor}}
+            yield {"event": "token", "data": {"text": result.answer}}
+            yield {"event": "done", "data": self._done_payload(result)}
+            return
+        
+        yield {
+            "event": "context",
+            "data": {
+                "citations": self._build_citations(knowledge_chunks),
+                "map_anchor": self._build_map_anchor(task_info)
+            }
+        }
+        
+        answer_parts: List[str] = []
+        llm_response: Optional[Dict[str, Any]] = None
+        try:
+            async for item in self._stream_llm_with_retry(self.prompt_template.SYSTEM_PROMPT, prompt.text,
+                                                          priority, deadline):
+                if isinstance(item, dict):
+                    llm_response = item
+                    continue
+                if item:
+                    answer_parts.append(item)
+                    yield {"event": "token", "data": {"text": item}}
+        except Exception as e:
+            logger.error(f"RAG 流式生成失败: {e}")
+            if isinstance(e, CircuitOpenError):
+                fallback = self._unavailable_result()
+            elif isinstance(e, GatewayRejectedError):
+                fallback = self._busy_result()
+            elif isinstance(e, asyncio.TimeoutError):
+                fallback = self._timeout_result()
+            else:
+                fallback = self._error_result()
+            if not answer_parts:
+                # 尚未输出任何内容，直接输出回退回答
+                yield {"event": "token", "data": {"text": fallback.answer}}
+                answer_parts.append(fallback.answer)
+            yield {
+                "event": "done",
+                "data": {
+                    "answer": "".join(answer_parts),
+                    "suggestions": None,
+                    "uncertain_reason": fallback.uncertain_reason
+                }
+            }
+            return
+        
+        if llm_response is None:
+            llm_response = {"answer": "".join(answer_parts)}
+        if not answer_parts:
+            # LLM 服务只返回了完整响应，没有文本片段
+            answer = llm_response.get('answer', '抱歉，我无法回答这个问题。')
+            answer_parts.append(answer)
+            yield {"event": "token", "data": {"text": answer}}
+        
+        with span("postprocess"):
+            result = self._build_result(llm_response, knowledge_chunks, user_question, task_info)
+            result.answer = "".join(answer_parts)
+            if not history:
+                self._cache_answer(task_id, user_question, result, cache_generation)
+        await self._remember_turn(session_id, task_id, user_question, result)
+        
+        process_time = time.time() - start_time
+        record_span("stream_total", process_time)
+        logger.info(f"RAG 流式处理完成，耗时: {process_time:.2f}s")
+        
+        yield {"event": "done", "data": self._done_payload(result)}
+    
+    def update_knowledge_base(self, knowledge_data: Dict[str, Any]) -> Set[str]:
+        """
+        更新知识库，并使内容发生变化的任务的缓存回答失效
+        
+        Args:
+            knowledge_data: 知识库数据字典
+            
+        Returns:
+            内容发生变化的任务ID集合
+        """
+        changed = self.retriever.load_knowledge_base(knowledge_data)
+        if self.answer_cache and changed:
+            self.answer_cache.invalidate_tasks(changed)
+        return changed
+    
+    def apply_changes(self, knowledge_data: Dict[str, Any], tasks: List[Any],
+                      knowledge_ids: Iterable[str] = (), task_ids: Iterable[str] = ()) -> Set[str]:
+        """
+        增量应用一次数据加载的变更：更新变化的知识条目，使涉及的任务的缓存回答失效，
+        有变更时增量更新建议索引
+        
+        Args:
+            knowledge_data: 更新后的完整知识库数据字典
+            tasks: 更新后的全部任务对象
+            knowledge_ids: 知识条目新增、修改或删除的任务ID
+            task_ids: 任务本身新增、修改或删除的任务ID
+            
+        Returns:
+            知识内容、任务内容或建议发生变化的任务ID集合
+        """
+        knowledge_ids, task_ids = set(knowledge_ids), set(task_ids)
+        changed = self.retriever.update_entries(knowledge_data, knowledge_ids) if knowledge_ids else set()
+        changed |= task_ids
+        if self.answer_cache and changed:
+            self.answer_cache.invalidate_tasks(changed)
+        if knowledge_ids or task_ids:
+            changed |= self.update_suggestions(tasks, knowledge_data)
+        return changed
+    
+    def update_suggestions(self, tasks: List[Any], knowledge_data: Optional[Dict[str, Any]] = None) -> Set[str]:
+        """
+        重建建议索引，并使建议发生变化的任务的缓存回答失效
+        
+        Args:
+            tasks: 任务对象列表
+            knowledge_data: 知识库数据字典（可选）
+            
+        Returns:
+            建议发生变化的任务ID集合
+        """
+        changed = self.suggestion_index.build(tasks, knowledge_data)
+        if self.answer_cache and changed:
+            self.answer_cache.invalidate_tasks(changed)
+        return changed
+    
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """获取回答缓存统计信息，未启用缓存时返回 None"""
+        return self.answer_cache.get_stats() if self.answer_cache else None
+    
+    def _get_cached_answer(self, task_id: str, user_question: str) -> Optional[RAGResult]:
+        """查找缓存的回答"""
+        if not self.answer_cache:
+            return None
+        with span("cache_lookup"):
+            return self.answer_cache.get(task_id, user_question)
+    
+    def _cache_generation(self, task_id: str) -> Optional[int]:
+        """获取任务当前的回答缓存代数，未启用缓存时返回 None"""
+        return self.answer_cache.generation(task_id) if self.answer_cache else None
+    
+    def _cache_answer(self, task_id: str, user_question: str, result: RAGResult,
+                      generation: Optional[int] = None):
+        """缓存 LLM 成功生成的回答，生成期间任务知识已失效时不写入"""
+        if self.answer_cache:
+            self.answer_cache.put(task_id, user_question, result, generation=generation)
+    
+    def _retrieve_chunks(self, task_id: str, user_question: str) -> List[Dict[str, Any]]:
+        """检索与问题相关的知识片段"""
+        logger.info(f"检索任务 {task_id} 的相关知识")
+        return self.retriever.search_relevant_chunks(task_id, user_question, top_k=3)
+    
+    def _build_citations(self, knowledge_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """根据知识片段构建引用信息"""
+        citations = []
+        for chunk in knowledge_chunks:
+            citations.append({
+                "source": chunk.get('source', ''),
+                "content": chunk.get('content', '')[:100] + "...",
+                "score": chunk.get('score', 0)
+            })
+        return citations
+    
+    def _build_map_anchor(self, task_info: Dict[str, Any]) -> Dict[str, float]:
+        """根据任务信息构建地图锚点"""
+        return {
+            "lat": task_info.get('location_lat', 0.0),
+            "lng": task_info.get('location_lng', 0.0)
+        }
+    
+    def _build_result(self, llm_response: Dict[str, Any], knowledge_chunks: List[Dict[str, Any]],
+                      user_question: str, task_info: Dict[str, Any]) -> RAGResult:
+        """整合 LLM 响应和检索结果"""
+        # 处理不确定性
+        uncertain_reason = None
+        if llm_response.get('confidence') == 'low' or llm_response.get('uncertain_aspects'):
+            uncertain_reason = "知识库信息不足，建议咨询相关工作人员或查看更多资料"
+        
+        # 构建建议（如果需要）
+        suggestions = None
+        if not knowledge_chunks or llm_response.get('confidence') == 'low':
+            suggestions = self._generate_suggestions(user_question, task_info)
+        
+        return RAGResult(
+            answer=llm_response.get('answer', '抱歉，我无法回答这个问题。'),
+            citations=self._build_citations(knowledge_chunks),
+            map_anchor=self._build_map_anchor(task_info),
+            suggestions=suggestions,
+            uncertain_reason=uncertain_reason
+        )
+    
+    def _timeout_result(self) -> RAGResult:
+        """超时时的回退结果"""
+        return RAGResult(
+            answer="抱歉，处理您的问题时超时，请稍后重试。",
+            citations=[],
+            map_anchor={"lat": 0.0, "lng": 0.0},
+            uncertain_reason="请求超时"
+        )
+    
+    def _unavailable_result(self) -> RAGResult:
+        """LLM 服务熔断时的回退结果"""
+        return RAGResult(
+            answer="抱歉，智能助手暂时繁忙，请稍后重试，或先查看任务详情中的说明。",
+            citations=[],
+            map_anchor={"lat": 0.0, "lng": 0.0},
+            uncertain_reason="LLM 服务暂时不可用"
+        )
+    
+    def _busy_result(self) -> RAGResult:
+        """LLM 网关拒绝请求时的回退结果"""
+        return RAGResult(
+            answer="抱歉，当前咨询人数较多，请稍后重试。",
+            citations=[],
+            map_anchor={"lat": 0.0, "lng": 0.0},
+            uncertain_reason="服务繁忙"
+        )
+    
+    def _error_result(self) -> RAGResult:
+        """处理失败时的回退结果"""
+        return RAGResult(
+            answer="抱歉，处理您的问题时出现了错误，请稍后重试。",
+            citations=[],
+            map_anchor={"lat": 0.0, "lng": 0.0},
+            uncertain_reason="系统处理错误"
+        )
+    
+    @staticmethod
+    def _done_payload(result: RAGResult) -> Dict[str, Any]:
+        """构建流式 done 事件的数据"""
+        return {
+            "answer": result.answer,
+            "suggestions": result.suggestions,
+            "uncertain_reason": result.uncertain_reason
+        }
+    
+    async def _call_llm_with_retry(self, system_prompt: str, user_prompt: str,
+                                   priority: int = 0, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         带重试机制的LLM调用
         
+        每次尝试都可能触发对冲请求；熔断器打开或网关拒绝时直接失败，不再重试。
+        
         Args:
             system_prompt: 系统提示词
             user_prompt: 用户提示词
+            priority: LLM 网关排队优先级
+            deadline: 截止时间（time.monotonic() 时间戳）
             
         Returns:
             LLM响应
             
         Raises:
+            CircuitOpenError: 熔断器打开
+            GatewayRejectedError: 网关拒绝调用
             Exception: 所有重试都失败后抛出异常
         """
         last_exception = None
         
         for attempt in range(self.max_retries + 1):
+            self._check_circuit()
+            if attempt > 0:
+                self.llm_stats['retries'] += 1
+            
+            recorded = False
             try:
-                # 设置超时
-                llm_response = await asyncio.wait_for(
-                    self.llm_service.generate_response(system_prompt, user_prompt),
-                    timeout=self.llm_timeout
-                )
+                llm_response = await self._hedged_call(system_prompt, user_prompt, priority, deadline)
+                recorded = self._record_llm_outcome(success=True)
                 
                 logger.info(f"LLM调用成功，尝试次数: {attempt + 1}")
                 return llm_response
                 
+            except GatewayRejectedError:
+                raise
+                
             except asyncio.TimeoutError as e:
                 last_exception = e
+                recorded = self._record_llm_outcome(success=False)
                 logger.warning(f"LLM超时，尝试 {attempt + 1}/{self.max_retries + 1}")
                 
             except Exception as e:
                 last_exception = e
+                recorded = self._record_llm_outcome(success=False)
                 logger.warning(f"LLM错误，尝试 {attempt + 1}/{self.max_retries + 1}: {str(e)}")
             
+            finally:
+                # 网关拒绝或被取消时没有调用结果，归还熔断器的试探名额
+                if not recorded:
+                    self._release_circuit()
+            
             # 如果不是最后一次尝试，则等待后重试
             if attempt < self.max_retries:
-                if app_config.retry.exponential_backoff:
-                    delay = min(self.base_delay * (2 ** attempt), self.max_delay)
-                else:
-                    delay = self.base_delay
-                
+                delay = self._backoff_delay(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    logger.warning("剩余时间不足以重试，放弃重试")
+                    break
                 logger.info(f"等待 {delay}s 后重试...")
-                await asyncio.sleep(delay)
+                with span("llm_backoff"):
+                    await asyncio.sleep(delay)
         
         # 所有重试都失败了
         logger.error(f"LLM调用失败，已重试 {self.max_retries + 1} 次")
         raise last_exception or Exception("LLM调用失败")
     
-    def _generate_suggestions(self, user_question: str, task_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    async def _hedged_call(self, system_prompt: str, user_prompt: str,
+                           priority: int = 0, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
-        生成相关建议
+        发起一次 LLM 调用，必要时发起对冲请求
+        
+        主请求在对冲延迟（最近成功调用耗时的 p95）内未返回时，再发起一个相同的请求，
+        取先成功返回的结果并取消另一个。对冲请求不排队，网关没有空闲槽位时跳过。
         
         Args:
-            user_question: 用户问题
-            task_info: 任务信息
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+            priority: LLM 网关排队优先级
+            deadline: 截止时间（time.monotonic() 时间戳）
             
         Returns:
-            建议列表
+            LLM响应
         """
-        suggestions = []
+        primary = asyncio.ensure_future(self._gated_call(system_prompt, user_prompt, priority, deadline))
+        if not self.hedge_config.enabled:
+            return await primary
         
-        # 基于任务类别的建议
-        category = task_info.get('category', '')
-        if category == 'academic':
-            suggestions.append({
-                "type": "related_task",
-                "title": "学术研究方法指导",
-                "description": "了解更多学术研究相关的任务和资源"
-            })
-        elif category == 'activity':
-            suggestions.append({
-                "type": "related_task", 
-                "title": "校园活动参与指南",
-                "description": "查看更多校园活动和参与方式"
-            })
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self._hedge_delay())
+            if done:
+                return primary.result()
+            
+            if self.gateway and not self.gateway.try_acquire():
+                self.gateway.stats['hedges_skipped'] += 1
+                return await primary
+            
+            self.llm_stats['hedges_fired'] += 1
+            hedge = asyncio.ensure_future(self._reserved_call(system_prompt, user_prompt))
+            pending.add(hedge)
+            logger.info("LLM 主请求未在对冲延迟内返回，发起对冲请求")
+            
+            last_exception: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.llm_stats['hedge_wins'] += 1
+                        return task.result()
+                    last_exception = task.exception()
+            raise last_exception or Exception("LLM对冲调用失败")
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _gated_call(self, system_prompt: str, user_prompt: str,
+                          priority: int = 0, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """经过网关排队的单次 LLM 调用"""
+        async with self._llm_slot(priority, deadline) as queue_wait:
+            if queue_wait is not None:
+                record_span("llm_queue", queue_wait)
+            return await self._timed_call(system_prompt, user_prompt)
+    
+    def _llm_slot(self, priority: int = 0, deadline: Optional[float] = None):
+        """获取网关槽位的异步上下文，未启用网关时不做限制"""
+        if not self.gateway:
+            return nullcontext()
+        return self.gateway.slot(priority, deadline)
+    
+    async def _reserved_call(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """使用已通过 try_acquire 占用的网关槽位进行调用，结束后释放"""
+        try:
+            return await self._timed_call(system_prompt, user_prompt)
+        finally:
+            if self.gateway:
+                self.gateway.release()
+    
+    async def _timed_call(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
+        """带超时的单次 LLM 调用，成功时记录耗时"""
+        self.llm_stats['attempts'] += 1
+        start = time.monotonic()
+        with span("llm_attempt"):
+            llm_response = await asyncio.wait_for(
+                self.llm_service.generate_response(system_prompt, user_prompt),
+                timeout=self.llm_timeout
+            )
+        self.latency_tracker.record(time.monotonic() - start)
+        return llm_response
+    
+    def _hedge_delay(self) -> float:
+        """根据最近成功调用的耗时计算对冲延迟"""
+        config = self.hedge_config
+        delay = None
+        if self.latency_tracker.count() >= config.min_samples:
+            delay = self.latency_tracker.percentile(config.percentile)
+        if delay is None:
+            delay = config.default_delay
+        return min(max(delay, config.min_delay), self.llm_timeout)
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """计算第 attempt 次失败后的重试等待时间"""
+        if app_config.retry.exponential_backoff:
+            return min(self.base_delay * (2 ** attempt), self.max_delay)
+        return self.base_delay
+    
+    def _check_circuit(self):
+        """熔断器打开时直接失败"""
+        if self.circuit_breaker and not self.circuit_breaker.allow_request():
+            self.llm_stats['breaker_rejections'] += 1
+            raise CircuitOpenError("LLM 服务熔断中")
+    
+    def _record_llm_outcome(self, success: bool) -> bool:
+        """向熔断器记录调用结果，返回 True 表示本次放行已有结果"""
+        if not self.circuit_breaker:
+            return True
+        if success:
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+        return True
+    
+    def _release_circuit(self):
+        """放行的调用没有结果时归还熔断器名额"""
+        if self.circuit_breaker:
+            self.circuit_breaker.release()
+    
+    def get_llm_stats(self) -> Dict[str, Any]:
+        """获取 LLM 调用统计信息"""
+        return {
+            **self.llm_stats,
+            'hedge_delay': round(self._hedge_delay(), 4),
+            'latency_p95': self.latency_tracker.percentile(0.95),
+            'circuit_breaker': self.circuit_breaker.get_stats() if self.circuit_breaker else None
+        }
+
+    async def _stream_llm_with_retry(self, system_prompt: str, user_prompt: str,
+                                     priority: int = 0, deadline: Optional[float] = None) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        """
+        带重试机制的流式 LLM 调用
+        
+        只有在尚未输出任何片段时才会重试；首个片段需在 llm_timeout 内到达。
+        整个流式输出期间占用一个网关槽位。
+        LLM 服务不支持流式输出时，回退为一次性调用并输出完整响应。
+        
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+            priority: LLM 网关排队优先级
+            deadline: 截止时间（time.monotonic() 时间戳）
+            
+        Yields:
+            回答文本片段（str）或完整响应（dict）
+            
+        Raises:
+            Exception: 所有重试都失败或输出中途失败时抛出异常
+        """
+        stream_fn = getattr(self.llm_service, 'stream_response', None)
+        if stream_fn is None:
+            yield await self._call_llm_with_retry(system_prompt, user_prompt, priority, deadline)
+            return
         
-        # 通用建议
-        suggestions.append({
-            "type": "contact",
-            "title": "联系相关工作人员",
-            "description": "如需更详细信息，建议直接联系任务负责人"
-        })
+        last_exception: Optional[Exception] = None
         
+        for attempt in range(self.max_retries + 1):
+            self._check_circuit()
+            if attempt > 0:
+                self.llm_stats['retries'] += 1
+            self.llm_stats['attempts'] += 1
+            
+            emitted = False
+            recorded = False
+            try:
+                # 槽位获取也在 try 中：网关拒绝、排队时被取消都会归还熔断器名额
+                async with self._llm_slot(priority, deadline) as queue_wait:
+                    if queue_wait is not None:
+                        record_span("llm_queue", queue_wait)
+                    stream = stream_fn(system_prompt, user_prompt)
+                    try:
+                        with span("llm_first_token"):
+                            first_item = await asyncio.wait_for(stream.__anext__(), timeout=self.llm_timeout)
+                        emitted = True
+                        logger.info(f"LLM流式调用首个片段到达，尝试次数: {attempt + 1}")
+                        yield first_item
+                        async for item in stream:
+                            yield item
+                        recorded = self._record_llm_outcome(success=True)
+                        return
+                        
+                    except StopAsyncIteration:
+                        recorded = self._record_llm_outcome(success=True)
+                        return
+                        
+                    except asyncio.TimeoutError as e:
+                        last_exception = e
+                        recorded = self._record_llm_outcome(success=False)
+                        logger.warning(f"LLM流式调用超时，尝试 {attempt + 1}/{self.max_retries + 1}")
+                        
+                    except Exception as e:
+                        last_exception = e
+                        recorded = self._record_llm_outcome(success=False)
+                        logger.warning(f"LLM流式调用错误，尝试 {attempt + 1}/{self.max_retries + 1}: {str(e)}")
+                    
+                    finally:
+                        await stream.aclose()
+            finally:
+                if not recorded:
+                    self._release_circuit()
+            
+            # 已经向客户端输出过内容，无法透明重试
+            if emitted:
+                break
+            
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    logger.warning("剩余时间不足以重试，放弃重试")
+                    break
+                logger.info(f"等待 {delay}s 后重试...")
+                with span("llm_backoff"):
+                    await asyncio.sleep(delay)
+        
+        logger.error("LLM流式调用失败")
+        raise last_exception or Exception("LLM流式调用失败")
+    
+    def _generate_suggestions(self, user_question: str, task_info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        获取相关建议（相关任务、附近任务、追问），从预计算的建议索引中查找
+        
+        Args:
+            user_question: 用户问题
+            task_info: 任务信息
+            
+        Returns:
+            建议列表，任务不在索引中时只返回联系工作人员的建议
+        """
+        suggestions = self.suggestion_index.get(task_info.get('task_id', ''))
+        if suggestions is None:
+            return [dict(CONTACT_SUGGESTION)]
         return suggestions
 
 
 # 全局 RAG 服务实例
 rag_service = None
 
+# 相同任务、相同问题的并发聊天请求合并为一次处理
+chat_flight = SingleFlight("npc_chat")
 
-def initialize_rag_service(knowledge_data: Dict[str, Any]) -> bool:
+
+def initialize_rag_service(knowledge_data: Dict[str, Any], tasks: Optional[List[Any]] = None) -> bool:
     """
     初始化 RAG 服务
     
     Args:
         knowledge_data: 知识库数据
+        tasks: 任务对象列表（可选，用于预计算建议索引）
         
     Returns:
         初始化是否成功
@@ -608,7 +1475,11 @@ def initialize_rag_service(knowledge_data: Dict[str, Any]) -> bool:
     try:
         retriever = KnowledgeRetriever()
         retriever.load_knowledge_base(knowledge_data)
-        rag_service = RAGService(retriever)
+        llm_service = (create_llm_service(app_config.llm, request_timeout=app_config.timeout.llm_timeout)
+                       or MockLLMService.from_config(app_config.mock_llm))
+        rag_service = RAGService(retriever, llm_service)
+        if tasks is not None:
+            rag_service.update_suggestions(tasks, knowledge_data)
         logger.info("RAG 服务初始化成功")
         return True
     except Exception as e:
@@ -616,7 +1487,74 @@ def initialize_rag_service(knowledge_data: Dict[str, Any]) -> bool:
         return False
 
 
-async def process_npc_chat(task_id: str, user_question: str, task_info: Dict[str, Any]) -> RAGResult:
+async def shutdown_rag_service():
+    """关闭 RAG 服务持有的 LLM 连接池和会话数据库"""
+    if rag_service and hasattr(rag_service.llm_service, 'close'):
+        await rag_service.llm_service.close()
+        logger.info("LLM 连接池已关闭")
+    if rag_service and rag_service.session_store:
+        rag_service.session_store.close()
+
+
+def refresh_rag_knowledge(knowledge_data: Dict[str, Any], tasks: Optional[List[Any]] = None) -> Set[str]:
+    """
+    数据重新加载后刷新 RAG 知识库和建议索引
+    
+    Args:
+        knowledge_data: 知识库数据
+        tasks: 任务对象列表（可选，提供时重建建议索引）
+        
+    Returns:
+        知识内容或建议发生变化的任务ID集合
+    """
+    if not rag_service:
+        return set()
+    changed = rag_service.update_knowledge_base(knowledge_data)
+    if tasks is not None:
+        changed |= rag_service.update_suggestions(tasks, knowledge_data)
+    return changed
+
+
+def apply_rag_changes(knowledge_data: Dict[str, Any], tasks: List[Any],
+                      knowledge_ids: Iterable[str] = (), task_ids: Iterable[str] = ()) -> Set[str]:
+    """
+    把一次数据加载的变更增量应用到 RAG 服务
+    
+    Args:
+        knowledge_data: 更新后的完整知识库数据
+        tasks: 更新后的全部任务对象
+        knowledge_ids: 知识条目发生变化的任务ID
+        task_ids: 任务本身发生变化的任务ID
+        
+    Returns:
+        知识内容、任务内容或建议发生变化的任务ID集合（服务尚未初始化时为空）
+    """
+    if not rag_service:
+        return set()
+    return rag_service.apply_changes(knowledge_data, tasks, knowledge_ids, task_ids)
+
+
+def get_rag_stats() -> Dict[str, Any]:
+    """获取 RAG 服务统计信息"""
+    if not rag_service:
+        return {}
+    stats = {
+        "answer_cache": rag_service.get_cache_stats(),
+        "llm": rag_service.get_llm_stats(),
+        "prompt": rag_service.prompt_builder.get_stats(),
+        "batch": dict(rag_service.batch_stats),
+        "sessions": rag_service.session_store.get_stats() if rag_service.session_store else None,
+        "suggestions": rag_service.suggestion_index.get_stats(),
+        "stages": get_stage_stats(),
+        "llm_gateway": rag_service.gateway.get_stats() if rag_service.gateway else None
+    }
+    if hasattr(rag_service.llm_service, 'get_stats'):
+        stats["llm_service"] = rag_service.llm_service.get_stats()
+    return stats
+
+
+async def process_npc_chat(task_id: str, user_question: str, task_info: Dict[str, Any],
+                           priority: int = 0, session_id: Optional[str] = None) -> RAGResult:
     """
     异步处理 NPC 聊天请求
     
@@ -624,6 +1562,8 @@ async def process_npc_chat(task_id: str, user_question: str, task_info: Dict[str
         task_id: 任务ID
         user_question: 用户问题
         task_info: 任务信息
+        priority: LLM 网关排队优先级，数值越大越优先
+        session_id: 多轮对话的会话ID（可选）
         
     Returns:
         RAG 处理结果
@@ -632,4 +1572,69 @@ async def process_npc_chat(task_id: str, user_question: str, task_info: Dict[str
     if not rag_service:
         raise RuntimeError("RAG 服务未初始化")
     
-    return await rag_service.process_chat_request(task_id, user_question, task_info)
\ No newline at end of file
+    service = rag_service
+    # 带会话的请求依赖各自的对话历史，只与同一会话的相同问题合并
+    key = (task_id, normalize_question(user_question), session_id)
+    return await chat_flight.do(
+        key, lambda: service.process_chat_request(task_id, user_question, task_info, priority=priority,
+                                                  session_id=session_id)
+    )
+
+
+async def process_npc_chat_batch(requests: List[Tuple[str, str, Dict[str, Any]]],
+                                 priority: int = 0) -> AsyncIterator[Tuple[int, RAGResult]]:
+    """
+    批量处理 NPC 聊天请求
+    
+    Args:
+        requests: (任务ID, 用户问题, 任务信息) 列表
+        priority: LLM 网关排队优先级
+        
+    Yields:
+        (请求下标, RAG 处理结果)，按完成顺序输出
+    """
+    global rag_service
+    if not rag_service:
+        raise RuntimeError("RAG 服务未初始化")
+    
+    async for index, result in rag_service.process_batch(requests, priority=priority):
+        yield index, result
+
+
+async def stream_npc_chat(task_id: str, user_question: str, task_info: Dict[str, Any],
+                          session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    以流式方式处理 NPC 聊天请求
+    
+    Args:
+        task_id: 任务ID
+        user_question: 用户问题
+        task_info: 任务信息
+        session_id: 多轮对话的会话ID（可选）
+        
+    Yields:
+        流式事件字典
+    """
+    global rag_service
+    if not rag_service:
+        raise RuntimeError("RAG 服务未初始化")
+    
+    async for event in rag_service.stream_chat_request(task_id, user_question, task_info,
+                                                       session_id=session_id):
+        yield event
+
+
+def clear_npc_session(session_id: str, task_id: str) -> bool:
+    """
+    清除多轮对话的会话记忆
+    
+    Args:
+        session_id: 会话ID
+        task_id: 任务ID
+        
+    Returns:
+        会话是否存在
+    """
+    if not rag_service or not rag_service.session_store:
+        return False
+    return rag_service.session_store.clear(session_id, task_id)
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+LLM 调用弹性组件
+包含延迟统计（用于对冲请求）和熔断器
+"""
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时拒绝调用"""
+    pass
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计"""
+
+    def __init__(self, window_size: int = 200):
+        """
+        初始化延迟统计
+
+        Args:
+            window_size: 保留的最近样本数
+        """
+        self.samples: Deque[float] = deque(maxlen=window_size)
+
+    def record(self, latency: float):
+        """记录一次成功调用的耗时（秒）"""
+        self.samples.append(latency)
+
+    def count(self) -> int:
+        """当前样本数"""
+        return len(self.samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        计算百分位延迟
+
+        Args:
+            p: 百分位 (0.0-1.0)
+
+        Returns:
+            百分位延迟，无样本时返回 None
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    基于错误率的熔断器
+
+    closed: 正常放行，统计最近 window_size 次调用结果；
+    open: 错误率超过阈值后打开，open_duration 内直接拒绝调用；
+    half_open: 打开时间结束后放行少量试探调用，成功则关闭，失败则重新打开；
+               试探调用没有结果（被网关拒绝、被取消）时通过 release 归还名额，
+               超过 half_open_timeout 仍未归还的名额视为丢失，重新放行试探调用。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        error_rate_threshold: float = 0.5,
+        min_calls: int = 10,
+        window_size: int = 20,
+        open_duration: float = 30.0,
+        half_open_max_calls: int = 1,
+        half_open_timeout: float = 60.0
+    ):
+        """
+        初始化熔断器
+
+        Args:
+            error_rate_threshold: 打开熔断的错误率阈值 (0.0-1.0)
+            min_calls: 计算错误率所需的最少调用次数
+            window_size: 统计错误率的滑动窗口大小
+            open_duration: 熔断打开持续时间（秒）
+            half_open_max_calls: 半开状态允许的试探调用数
+            half_open_timeout: 试探调用名额的最长占用时间（秒），超时后重新放行试探调用
+        """
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.half_open_timeout = half_open_timeout
+
+        self.state = self.CLOSED
+        self.outcomes: Deque[bool] = deque(maxlen=window_size)  # True 表示失败
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.probe_started_at = 0.0  # 最近一次放行试探调用的时间
+        self.stats = {
+            'rejected': 0,
+            'opened': 0,
+            'successes': 0,
+            'failures': 0
+        }
+
+    def allow_request(self) -> bool:
+        """检查是否允许发起调用"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at >= self.open_duration:
+                self.state = self.HALF_OPEN
+                self.half_open_calls = 0
+                logger.info("熔断器进入半开状态")
+            else:
+                self.stats['rejected'] += 1
+                return False
+
+        if self.state == self.HALF_OPEN:
+            if (self.half_open_calls >= self.half_open_max_calls
+                    and time.monotonic() - self.probe_started_at >= self.half_open_timeout):
+                logger.warning("熔断器试探调用超时未返回结果，重新放行试探调用")
+                self.half_open_calls = 0
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.stats['rejected'] += 1
+                return False
+            self.half_open_calls += 1
+            self.probe_started_at = time.monotonic()
+
+        return True
+
+    def release(self):
+        """放行的调用没有产生成功或失败结果（被网关拒绝、被取消），归还半开状态的试探名额"""
+        if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_success(self):
+        """记录一次成功调用"""
+        self.stats['successes'] += 1
+        if self.state == self.HALF_OPEN:
+            self.state = self.CLOSED
+            self.outcomes.clear()
+            logger.info("熔断器已关闭")
+        self.outcomes.append(False)
+
+    def record_failure(self):
+        """记录一次失败调用"""
+        self.stats['failures'] += 1
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+
+        self.outcomes.append(True)
+        if self.state == self.CLOSED and len(self.outcomes) >= self.min_calls:
+            if self.error_rate() >= self.error_rate_threshold:
+                self._open()
+
+    def error_rate(self) -> float:
+        """当前窗口内的错误率"""
+        if not self.outcomes:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器统计信息"""
+        return {
+            **self.stats,
+            'state': self.state,
+            'error_rate': round(self.error_rate(), 4),
+            'window_calls': len(self.outcomes)
+        }
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.stats['opened'] += 1
+        logger.warning(f"LLM 错误率 {self.error_rate():.0%} 超过阈值，熔断器打开 {self.open_duration}s")
@@ -0,0 +1,217 @@
+"""
+任务响应序列化缓存
+数据加载后把每个任务（以及任务 + 知识库详情）预先序列化为 JSON 字节片段，
+列表页直接拼接片段得到响应体，请求路径上不再逐条构造和校验 Pydantic 模型。
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# 任务 -> 可 JSON 序列化的字典
+TaskEncoder = Callable[[Any], Dict[str, Any]]
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    快速 JSON 编码（orjson，输出 UTF-8 字节，中文不转义）
+
+    Args:
+        obj: 字典、列表等可序列化对象
+
+    Returns:
+        JSON 字节串
+    """
+    return orjson.dumps(obj)
+
+
+def embed(fragment: bytes, envelope: Dict[str, Any], key: str = "data") -> bytes:
+    """
+    把预先序列化的片段放入 {key: 片段, **envelope} 形式的响应体
+
+    Args:
+        fragment: 已序列化的 JSON 字节片段
+        envelope: 响应中的其他字段（如 meta、total）
+        key: 片段所在的字段名
+
+    Returns:
+        完整的 JSON 响应体
+    """
+    body = b'{' + dumps(key) + b':' + fragment
+    rest = dumps(envelope)
+    if len(rest) > 2:
+        return body + b',' + rest[1:]
+    return body + b'}'
+
+
+def assemble(fragments: Iterable[bytes], envelope: Dict[str, Any], key: str = "data") -> bytes:
+    """
+    把多个预先序列化的片段拼接为 {key: [...], **envelope} 形式的响应体
+
+    Args:
+        fragments: 每个元素的 JSON 字节片段
+        envelope: 响应中的其他字段
+        key: 列表字段名
+
+    Returns:
+        完整的 JSON 响应体
+    """
+    return embed(b'[' + b','.join(fragments) + b']', envelope, key)
+
+
+@dataclass(frozen=True)
+class ResponseFragments:
+    """某一数据版本下全部任务的列表片段和详情片段（发布后不再修改）"""
+    source: Any = None
+    items: Dict[str, bytes] = field(default_factory=dict)
+    details: Dict[str, bytes] = field(default_factory=dict)
+
+    def get_items(self, task_ids: Iterable[str]) -> List[bytes]:
+        """按顺序取出多个任务的列表项片段（不存在的任务被忽略）"""
+        items = self.items
+        return [items[task_id] for task_id in task_ids if task_id in items]
+
+
+class TaskResponseCache:
+    """
+    每个任务的列表片段和详情片段
+
+    构建和增量更新都生成新的 ResponseFragments 再整体替换引用，读取方不会看到更新到一半的缓存；
+    source 记录缓存对应的数据版本（数据代数），数据重新加载后据此判断缓存是否过期。
+    """
+
+    def __init__(self):
+        self._fragments = ResponseFragments()
+        self._lock = threading.Lock()
+        self._builds = 0
+        self._updates = 0
+        self._build_time = 0.0
+
+    @property
+    def source(self) -> Any:
+        """缓存对应的数据版本"""
+        return self._fragments.source
+
+    def build(self, source: Any, tasks: Iterable[Any], encode_item: TaskEncoder,
+              encode_detail: TaskEncoder) -> int:
+        """
+        序列化全部任务并替换缓存
+
+        Args:
+            source: 数据版本标识，与 is_current 比较
+            tasks: 任务对象列表
+            encode_item: 任务 -> 列表项字典
+            encode_detail: 任务 -> 详情字典（含知识库）
+
+        Returns:
+            缓存的任务数量（序列化失败的任务记录错误后跳过）
+        """
+        start = time.perf_counter()
+        items: Dict[str, bytes] = {}
+        details: Dict[str, bytes] = {}
+        for task in tasks:
+            try:
+                items[task.task_id] = dumps(encode_item(task))
+                details[task.task_id] = dumps(encode_detail(task))
+            except Exception as e:
+                logger.error(f"任务 {task.task_id} 序列化失败，跳过: {str(e)}")
+                items.pop(task.task_id, None)
+
+        with self._lock:
+            self._fragments = ResponseFragments(source, items, details)
+            self._builds += 1
+            self._build_time = time.perf_counter() - start
+
+        logger.info(f"任务响应缓存构建完成: {len(items)} 个任务, 耗时: {self._build_time:.3f}s")
+        return len(items)
+
+    def update(self, previous: Any, source: Any, tasks: Iterable[Any], removed_ids: Iterable[str],
+               encode_item: TaskEncoder, encode_detail: TaskEncoder) -> bool:
+        """
+        增量更新缓存：只重新序列化变化的任务，删除被移除的任务
+
+        Args:
+            previous: 变更之前的数据版本，与缓存当前版本不一致时不做处理
+            source: 变更之后的数据版本
+            tasks: 新增或内容变化的任务对象
+            removed_ids: 被删除的任务ID
+            encode_item: 任务 -> 列表项字典
+            encode_detail: 任务 -> 详情字典（含知识库）
+
+        Returns:
+            是否已更新；未更新时缓存保持过期，由调用方全量构建
+        """
+        with self._lock:
+            current = self._fragments
+            if current.source != previous:
+                return False
+            items, details = dict(current.items), dict(current.details)
+            for task_id in removed_ids:
+                items.pop(task_id, None)
+                details.pop(task_id, None)
+            count = 0
+            for task in tasks:
+                try:
+                    item, detail = dumps(encode_item(task)), dumps(encode_detail(task))
+                except Exception as e:
+                    logger.error(f"任务 {task.task_id} 序列化失败，跳过: {str(e)}")
+                    items.pop(task.task_id, None)
+                    details.pop(task.task_id, None)
+                    continue
+                items[task.task_id], details[task.task_id] = item, detail
+                count += 1
+            self._fragments = ResponseFragments(source, items, details)
+            self._updates += 1
+        if count:
+            logger.info(f"任务响应缓存增量更新: {count} 个任务")
+        return True
+
+    def is_current(self, source: Any) -> bool:
+        """缓存是否由给定版本的数据构建"""
+        return self._fragments.source == source
+
+    def view(self, source: Any) -> Optional[ResponseFragments]:
+        """
+        取得与给定数据版本一致的片段
+
+        Args:
+            source: 数据版本
+
+        Returns:
+            片段集合；缓存对应其他版本（如后台更新尚未完成）时返回 None
+        """
+        fragments = self._fragments
+        return fragments if fragments.source == source else None
+
+    def get_item(self, task_id: str) -> Optional[bytes]:
+        """任务的列表项片段"""
+        return self._fragments.items.get(task_id)
+
+    def get_items(self, task_ids: Iterable[str]) -> List[bytes]:
+        """按顺序取出多个任务的列表项片段（不存在的任务被忽略）"""
+        return self._fragments.get_items(task_ids)
+
+    def get_detail(self, task_id: str) -> Optional[bytes]:
+        """任务的详情片段（含知识库）"""
+        return self._fragments.details.get(task_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        fragments = self._fragments
+        return {
+            'tasks': len(fragments.items),
+            'item_bytes': sum(len(fragment) for fragment in fragments.items.values()),
+            'detail_bytes': sum(len(fragment) for fragment in fragments.details.values()),
+            'builds': self._builds,
+            'updates': self._updates,
+            'last_build_seconds': round(self._build_time, 4)
+        }
+
+
+# 全局任务响应缓存实例
+task_response_cache = TaskResponseCache()
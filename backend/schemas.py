@@ -89,6 +89,8 @@ class PaginationMeta(BaseModel):
     pages: int = Field(..., description="总页数", ge=0)
     has_next: bool = Field(..., description="是否有下一页")
     has_prev: bool = Field(..., description="是否有上一页")
+    next_cursor: Optional[str] = Field(None, description="下一页的分页游标")
+    total_approximate: bool = Field(False, description="总数是否为估计值")
 
 
 class TaskListResponse(BaseModel):
@@ -126,6 +128,8 @@ class SearchResponse(BaseModel):
 class ChatRequest(BaseModel):
     """NPC 聊天请求模式"""
     question: str = Field(..., description="用户问题", min_length=1, max_length=500)
+    session_id: Optional[str] = Field(None, description="多轮对话的会话ID，提供时服务端保存对话历史",
+                                      min_length=1, max_length=64)
 
 
 class Citation(BaseModel):
@@ -157,6 +161,32 @@ class ChatResponse(BaseModel):
     uncertain_reason: Optional[str] = Field(None, description="不确定原因")
 
 
+class BatchChatItem(BaseModel):
+    """批量聊天中的单个问题"""
+    task_id: str = Field(..., description="任务ID")
+    question: str = Field(..., description="用户问题", min_length=1, max_length=500)
+
+
+class BatchChatRequest(BaseModel):
+    """NPC 批量聊天请求模式"""
+    items: List[BatchChatItem] = Field(..., description="问题列表", min_length=1, max_length=20)
+    stream: bool = Field(False, description="是否按完成顺序以 NDJSON 流式返回")
+
+
+class BatchChatResult(BaseModel):
+    """批量聊天中的单个结果"""
+    index: int = Field(..., description="对应请求中的下标", ge=0)
+    task_id: str = Field(..., description="任务ID")
+    response: Optional[ChatResponse] = Field(None, description="聊天结果")
+    error: Optional[str] = Field(None, description="错误信息")
+
+
+class BatchChatResponse(BaseModel):
+    """NPC 批量聊天响应模式"""
+    results: List[BatchChatResult] = Field(..., description="按请求顺序排列的结果")
+    meta: Dict[str, Any] = Field(..., description="批量处理元数据")
+
+
 class ErrorResponse(BaseModel):
     """错误响应模式"""
     error: str = Field(..., description="错误类型")
@@ -172,6 +202,8 @@ class TaskFilters(BaseModel):
     status: Optional[TaskStatus] = Field(None, description="任务状态")
     date_from: Optional[datetime] = Field(None, description="开始日期")
     date_to: Optional[datetime] = Field(None, description="结束日期")
+    updated_from: Optional[datetime] = Field(None, description="更新时间起点")
+    updated_to: Optional[datetime] = Field(None, description="更新时间终点")
     search: Optional[str] = Field(None, description="搜索关键词")
 
 
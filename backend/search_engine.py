@@ -3,10 +3,14 @@
 """
 import math
 import re
-from typing import List, Dict, Any, Tuple
+import threading
+from typing import List, Dict, Any, Iterable, Tuple
 from collections import defaultdict, Counter
 import logging
 
+from singleflight import SingleFlight
+from executors import run_in_thread
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,6 +34,10 @@ class BM25SearchEngine:
         self.avgdl = 0  # 平均文档长度
         self.corpus_size = 0  # 语料库大小
         self.indexed = False
+        self._positions: Dict[str, int] = {}  # task_id -> 文档位置
+        self._total_len = 0  # 现有文档的总长度
+        self._removed = 0  # 已删除、尚未压缩的文档位置数（documents 中对应位置为 None）
+        self._lock = threading.RLock()  # 增量更新与搜索互斥
         
     def tokenize(self, text: str) -> List[str]:
         """
@@ -72,35 +80,99 @@ class BM25SearchEngine:
         """
         logger.info(f"开始构建搜索索引，文档数量: {len(documents)}")
         
-        self.documents = documents
-        self.corpus_size = len(documents)
-        self.doc_freqs = defaultdict(int)
-        self.doc_len = []
-        
-        # 统计词频和文档长度
-        for doc in documents:
-            # 合并标题和描述作为搜索内容
-            content = f"{doc.get('title', '')} {doc.get('description', '')}"
-            tokens = self.tokenize(content)
-            self.doc_len.append(len(tokens))
+        with self._lock:
+            self.documents = []
+            self.doc_freqs = defaultdict(int)
+            self.doc_len = []
+            self._positions = {}
+            self._total_len = 0
+            self._removed = 0
             
-            # 统计词汇在文档中的出现
-            unique_tokens = set(tokens)
-            for token in unique_tokens:
-                self.doc_freqs[token] += 1
-        
-        # 计算平均文档长度
-        self.avgdl = sum(self.doc_len) / len(self.doc_len) if self.doc_len else 0
-        
-        # 计算 IDF
-        for token, freq in self.doc_freqs.items():
-            # 使用标准的IDF公式: log(N / df)，为常见词汇添加最小值
-            idf_value = math.log(self.corpus_size / freq)
-            self.idf[token] = max(0.1, idf_value)  # 最小IDF值为0.1
-        
-        self.indexed = True
+            # 统计词频和文档长度
+            for doc in documents:
+                self._add(doc)
+            self._refresh_stats()
+            self.indexed = True
         logger.info(f"搜索索引构建完成，词汇数量: {len(self.idf)}")
     
+    def update_documents(self, documents: List[Dict[str, Any]], removed_ids: Iterable[str] = ()):
+        """
+        增量更新搜索索引，只对新增和修改的文档分词
+        
+        Args:
+            documents: 新增或内容变化的文档（按 task_id 替换已有文档，否则追加）
+            removed_ids: 被删除文档的 task_id
+        """
+        removed_ids = list(removed_ids)
+        with self._lock:
+            for task_id in removed_ids:
+                position = self._positions.pop(task_id, None)
+                if position is not None:
+                    self._unindex(position)
+                    self.documents[position] = None
+                    self._removed += 1
+            for doc in documents:
+                position = self._positions.get(doc.get('task_id', ''))
+                if position is None:
+                    self._add(doc)
+                else:
+                    self._unindex(position)
+                    self._index(position, doc)
+            # 删除过半时压缩，保持文档原有顺序
+            if self._removed > len(self.documents) // 2:
+                self._compact()
+            self._refresh_stats()
+        logger.info(f"搜索索引增量更新完成: 更新 {len(documents)} 个, 删除 {len(removed_ids)} 个, 文档数量: {self.corpus_size}")
+    
+    def _content_tokens(self, doc: Dict[str, Any]) -> List[str]:
+        """合并标题和描述作为搜索内容并分词"""
+        return self.tokenize(f"{doc.get('title', '')} {doc.get('description', '')}")
+    
+    def _add(self, doc: Dict[str, Any]):
+        """在末尾追加文档"""
+        position = len(self.documents)
+        self.documents.append(None)
+        self.doc_len.append(0)
+        self._positions[doc.get('task_id', '')] = position
+        self._index(position, doc)
+    
+    def _index(self, position: int, doc: Dict[str, Any]):
+        """把文档放入指定位置并计入词频统计"""
+        tokens = self._content_tokens(doc)
+        self.documents[position] = doc
+        self.doc_len[position] = len(tokens)
+        self._total_len += len(tokens)
+        # 统计词汇在文档中的出现
+        for token in set(tokens):
+            self.doc_freqs[token] += 1
+    
+    def _unindex(self, position: int):
+        """从词频统计中扣除指定位置的文档"""
+        self._total_len -= self.doc_len[position]
+        self.doc_len[position] = 0
+        for token in set(self._content_tokens(self.documents[position])):
+            self.doc_freqs[token] -= 1
+            if self.doc_freqs[token] <= 0:
+                del self.doc_freqs[token]
+    
+    def _compact(self):
+        """移除已删除文档留下的空位"""
+        kept = [i for i, doc in enumerate(self.documents) if doc is not None]
+        self.documents = [self.documents[i] for i in kept]
+        self.doc_len = [self.doc_len[i] for i in kept]
+        self._positions = {doc.get('task_id', ''): i for i, doc in enumerate(self.documents)}
+        self._removed = 0
+    
+    def _refresh_stats(self):
+        """根据当前文档重新计算语料库大小、平均文档长度和 IDF"""
+        self.corpus_size = len(self.documents) - self._removed
+        self.avgdl = self._total_len / self.corpus_size if self.corpus_size else 0
+        # 使用标准的IDF公式: log(N / df)，为常见词汇添加最小值 0.1
+        self.idf = {
+            token: max(0.1, math.log(self.corpus_size / freq))
+            for token, freq in self.doc_freqs.items()
+        }
+    
     def get_bm25_score(self, query_tokens: List[str], doc_index: int) -> float:
         """
         计算 BM25 分数
@@ -116,6 +188,8 @@ class BM25SearchEngine:
             return 0.0
             
         doc = self.documents[doc_index]
+        if doc is None:
+            return 0.0
         content = f"{doc.get('title', '')} {doc.get('description', '')}"
         doc_tokens = self.tokenize(content)
         doc_token_counts = Counter(doc_tokens)
@@ -170,32 +244,35 @@ class BM25SearchEngine:
             
         logger.info(f"执行搜索，查询: '{query}', 分词结果: {query_tokens}")
         
-        # 计算每个文档的 BM25 分数
+        # 计算每个文档的 BM25 分数（持锁读取，避免与增量更新交错）
         scores = []
-        for i, doc in enumerate(self.documents):
-            score = self.get_bm25_score(query_tokens, i)
+        with self._lock:
+            for i, doc in enumerate(self.documents):
+                if doc is None:
+                    continue
+                score = self.get_bm25_score(query_tokens, i)
             
-            # 计算匹配度：匹配的查询词数量 / 总查询词数量
-            content = f"{doc.get('title', '')} {doc.get('description', '')}"
-            doc_tokens = set(self.tokenize(content))
-            matched_query_tokens = set(query_tokens) & doc_tokens
-            match_ratio = len(matched_query_tokens) / len(set(query_tokens)) if query_tokens else 0
+                # 计算匹配度：匹配的查询词数量 / 总查询词数量
+                content = f"{doc.get('title', '')} {doc.get('description', '')}"
+                doc_tokens = set(self.tokenize(content))
+                matched_query_tokens = set(query_tokens) & doc_tokens
+                match_ratio = len(matched_query_tokens) / len(set(query_tokens)) if query_tokens else 0
             
-            # 严格的匹配要求：
-            # 1. 分数必须大于0
-            # 2. 必须有匹配的词汇
-            # 3. 对于包含英文的查询，匹配度要求更高
-            has_english = any(token.isalpha() and token.isascii() for token in query_tokens)
-            min_match_ratio = 0.8 if has_english else 0.3
+                # 严格的匹配要求：
+                # 1. 分数必须大于0
+                # 2. 必须有匹配的词汇
+                # 3. 对于包含英文的查询，匹配度要求更高
+                has_english = any(token.isalpha() and token.isascii() for token in query_tokens)
+                min_match_ratio = 0.8 if has_english else 0.3
             
-            if score > 0 and len(matched_query_tokens) > 0 and match_ratio >= min_match_ratio:
-                scores.append({
-                    'task_id': doc.get('task_id', ''),
-                    'title': doc.get('title', ''),
-                    'score': round(score, 4),
-                    'lat': doc.get('location_lat', 0.0),
-                    'lng': doc.get('location_lng', 0.0)
-                })
+                if score > 0 and len(matched_query_tokens) > 0 and match_ratio >= min_match_ratio:
+                    scores.append({
+                        'task_id': doc.get('task_id', ''),
+                        'title': doc.get('title', ''),
+                        'score': round(score, 4),
+                        'lat': doc.get('location_lat', 0.0),
+                        'lng': doc.get('location_lng', 0.0)
+                    })
         
         # 按分数降序排序
         scores.sort(key=lambda x: x['score'], reverse=True)
@@ -210,6 +287,9 @@ class BM25SearchEngine:
 # 全局搜索引擎实例
 search_engine = BM25SearchEngine()
 
+# 相同查询的并发搜索请求合并为一次处理
+search_flight = SingleFlight("task_search")
+
 
 def initialize_search_engine(tasks: List[Dict[str, Any]]):
     """
@@ -221,16 +301,7 @@ def initialize_search_engine(tasks: List[Dict[str, Any]]):
     global search_engine
     try:
         # 转换任务数据格式
-        documents = []
-        for task in tasks:
-            doc = {
-                'task_id': getattr(task, 'task_id', ''),
-                'title': getattr(task, 'title', ''),
-                'description': getattr(task, 'description', ''),
-                'location_lat': getattr(task, 'location_lat', 0.0),
-                'location_lng': getattr(task, 'location_lng', 0.0)
-            }
-            documents.append(doc)
+        documents = [task_document(task) for task in tasks]
         
         search_engine.build_index(documents)
         logger.info("搜索引擎初始化成功")
@@ -240,6 +311,34 @@ def initialize_search_engine(tasks: List[Dict[str, Any]]):
         return False
 
 
+def task_document(task: Any) -> Dict[str, Any]:
+    """把任务对象转换为搜索文档"""
+    return {
+        'task_id': getattr(task, 'task_id', ''),
+        'title': getattr(task, 'title', ''),
+        'description': getattr(task, 'description', ''),
+        'location_lat': getattr(task, 'location_lat', 0.0),
+        'location_lng': getattr(task, 'location_lng', 0.0)
+    }
+
+
+def update_search_engine(tasks: List[Any], removed_ids: Iterable[str] = ()) -> bool:
+    """
+    把任务的新增、修改和删除增量应用到搜索索引
+    
+    Args:
+        tasks: 新增或内容变化的任务对象
+        removed_ids: 被删除的任务ID
+        
+    Returns:
+        是否已更新（索引尚未构建时不做处理，由 initialize_search_engine 全量构建）
+    """
+    if not search_engine.indexed:
+        return False
+    search_engine.update_documents([task_document(task) for task in tasks], removed_ids)
+    return True
+
+
 def search_tasks(query: str, top_n: int = 10) -> List[Dict[str, Any]]:
     """
     搜索任务
@@ -252,4 +351,21 @@ def search_tasks(query: str, top_n: int = 10) -> List[Dict[str, Any]]:
         搜索结果列表
     """
     global search_engine
-    return search_engine.search(query, top_n)
\ No newline at end of file
+    return search_engine.search(query, top_n)
+
+
+async def search_tasks_async(query: str, top_n: int = 10) -> List[Dict[str, Any]]:
+    """
+    异步搜索任务
+    
+    在执行器线程池中执行搜索，避免阻塞事件循环（索引在进程内存中，不适合进程池）；相同 (规范化查询, top_n) 的并发请求只执行一次。
+    
+    Args:
+        query: 搜索查询
+        top_n: 返回结果数量
+        
+    Returns:
+        搜索结果列表（合并的请求共享同一个列表，调用方不应修改）
+    """
+    key = (' '.join(query.lower().split()), top_n)
+    return await search_flight.do(key, lambda: run_in_thread(search_tasks, query, top_n))
\ No newline at end of file
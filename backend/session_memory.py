@@ -0,0 +1,305 @@
+"""
+多轮对话会话记忆
+按 (会话ID, 任务ID) 保存有限的对话历史，超出轮数或 token 预算时把最早的轮次折叠进滚动摘要，
+会话数量按最近使用淘汰；可选写入 SQLite，被淘汰或服务重启后仍可恢复
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prompt_builder import estimate_tokens, split_sentences, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 会话键：(会话ID, 任务ID)
+SessionKey = Tuple[str, str]
+
+
+@dataclass
+class ConversationTurn:
+    """一轮对话"""
+    question: str
+    answer: str
+    tokens: int
+
+
+@dataclass
+class SessionState:
+    """单个会话的记忆：最近几轮原始对话 + 更早轮次的滚动摘要"""
+    turns: List[ConversationTurn] = field(default_factory=list)
+    summary: List[str] = field(default_factory=list)  # 摘要条目，从旧到新
+    updated_at: float = 0.0
+
+    def history_tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns)
+
+    def summary_tokens(self) -> int:
+        return sum(estimate_tokens(entry) for entry in self.summary)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'turns': [[t.question, t.answer, t.tokens] for t in self.turns],
+            'summary': self.summary,
+            'updated_at': self.updated_at
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> 'SessionState':
+        raw = json.loads(data)
+        return cls(
+            turns=[ConversationTurn(q, a, tokens) for q, a, tokens in raw['turns']],
+            summary=list(raw['summary']),
+            updated_at=raw['updated_at']
+        )
+
+
+def summarize_turn(turn: ConversationTurn, max_tokens: int = 40) -> str:
+    """
+    抽取式摘要：保留问题和回答的首句
+
+    Args:
+        turn: 对话轮次
+        max_tokens: 问题和回答各自的 token 上限
+
+    Returns:
+        摘要条目
+    """
+    sentences = split_sentences(turn.answer)
+    gist = truncate_tokens(sentences[0] if sentences else turn.answer, max_tokens)
+    return f"用户问“{truncate_tokens(turn.question, max_tokens)}”，回答：{gist}"
+
+
+class SessionStore:
+    """
+    会话记忆存储
+
+    每个会话的原始对话不超过 max_turns 轮、history_tokens 个 token，摘要不超过 summary_tokens，
+    因此无论对话多长，内存占用和提示词中的历史部分都有固定上限。
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        max_turns: int = 6,
+        history_tokens: int = 300,
+        summary_tokens: int = 150,
+        ttl: float = 1800.0,
+        db_path: str = "",
+        summarizer: Callable[[ConversationTurn], str] = summarize_turn,
+        time_fn: Callable[[], float] = time.time
+    ):
+        """
+        初始化会话存储
+
+        Args:
+            max_sessions: 内存中保留的会话数
+            max_turns: 每个会话保留的原始对话轮数
+            history_tokens: 原始对话轮次的 token 预算
+            summary_tokens: 滚动摘要的 token 上限
+            ttl: 会话空闲过期时间（秒）
+            db_path: SQLite 文件路径，为空时只保存在内存
+            summarizer: 把折叠的对话轮次转为摘要条目的函数
+            time_fn: 时间函数（便于测试）
+        """
+        self.max_sessions = max(1, max_sessions)
+        self.max_turns = max(1, max_turns)
+        self.history_tokens = max(0, history_tokens)
+        self.summary_tokens = max(0, summary_tokens)
+        self.ttl = ttl
+        self.db_path = db_path
+        self.summarizer = summarizer
+        self.time_fn = time_fn
+
+        self._sessions: "OrderedDict[SessionKey, SessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'appends': 0,
+            'summarized_turns': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'db_loads': 0,
+            'db_writes': 0
+        }
+        if db_path:
+            self._open_db()
+
+    @classmethod
+    def from_config(cls, session_config) -> 'SessionStore':
+        """根据 SessionConfig 创建会话存储"""
+        return cls(
+            max_sessions=session_config.max_sessions,
+            max_turns=session_config.max_turns,
+            history_tokens=session_config.history_tokens,
+            summary_tokens=session_config.summary_tokens,
+            ttl=session_config.ttl,
+            db_path=session_config.db_path
+        )
+
+    def get_history(self, session_id: str, task_id: str) -> str:
+        """
+        获取用于提示词的对话历史
+
+        Args:
+            session_id: 会话ID
+            task_id: 任务ID
+
+        Returns:
+            格式化的对话历史，没有历史时返回空字符串
+        """
+        with self._lock:
+            self.stats['lookups'] += 1
+            state = self._get((session_id, task_id))
+            if state is None:
+                return ""
+            self.stats['hits'] += 1
+            return self._format(state)
+
+    def append(self, session_id: str, task_id: str, question: str, answer: str):
+        """
+        记录一轮对话，超出预算时把最早的轮次折叠进摘要
+
+        Args:
+            session_id: 会话ID
+            task_id: 任务ID
+            question: 用户问题
+            answer: 回答
+        """
+        key = (session_id, task_id)
+        with self._lock:
+            self.stats['appends'] += 1
+            state = self._get(key) or SessionState()
+            state.turns.append(ConversationTurn(
+                question=question,
+                answer=answer,
+                tokens=estimate_tokens(question) + estimate_tokens(answer)
+            ))
+            self._compact(state)
+            state.updated_at = self.time_fn()
+
+            self._sessions[key] = state
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats['evictions'] += 1
+            self._save(key, state)
+
+    def clear(self, session_id: str, task_id: str) -> bool:
+        """
+        清除会话记忆
+
+        Returns:
+            会话是否存在
+        """
+        key = (session_id, task_id)
+        with self._lock:
+            existed = self._get(key) is not None
+            self._delete(key)
+            return existed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话存储统计信息"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            lookups = self.stats['lookups']
+            return {
+                **self.stats,
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+                'sessions': len(sessions),
+                'max_sessions': self.max_sessions,
+                'turns': sum(len(s.turns) for s in sessions),
+                'history_tokens': sum(s.history_tokens() for s in sessions),
+                'summary_tokens': sum(s.summary_tokens() for s in sessions),
+                'persistent': self._db is not None
+            }
+
+    def close(self):
+        """关闭 SQLite 连接"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _get(self, key: SessionKey) -> Optional[SessionState]:
+        """查找会话（内存未命中时从 SQLite 加载），过期的会话被删除"""
+        state = self._sessions.get(key)
+        if state is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE session_id = ? AND task_id = ?", key
+            ).fetchone()
+            if row is not None:
+                state = SessionState.from_json(row[0])
+                self.stats['db_loads'] += 1
+                self._sessions[key] = state
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.stats['evictions'] += 1
+        if state is None:
+            return None
+        if self.time_fn() - state.updated_at > self.ttl:
+            self._delete(key)
+            self.stats['expirations'] += 1
+            return None
+        self._sessions.move_to_end(key)
+        return state
+
+    def _compact(self, state: SessionState):
+        """把超出轮数或 token 预算的最早轮次折叠进摘要，并把摘要控制在上限内"""
+        while state.turns and (len(state.turns) > self.max_turns
+                               or state.history_tokens() > self.history_tokens):
+            state.summary.append(self.summarizer(state.turns.pop(0)))
+            self.stats['summarized_turns'] += 1
+        # 摘要超出上限时丢弃最早的条目，只剩一条时截断
+        while state.summary and state.summary_tokens() > self.summary_tokens:
+            if len(state.summary) == 1:
+                state.summary[0] = truncate_tokens(state.summary[0], self.summary_tokens)
+                if not state.summary[0]:
+                    state.summary.clear()
+                break
+            state.summary.pop(0)
+
+    @staticmethod
+    def _format(state: SessionState) -> str:
+        lines = []
+        if state.summary:
+            lines.append(f"更早的对话摘要: {'；'.join(state.summary)}")
+        for turn in state.turns:
+            lines.append(f"用户: {turn.question}")
+            lines.append(f"助手: {turn.answer}")
+        return "\n".join(lines)
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT NOT NULL, task_id TEXT NOT NULL, data TEXT NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (session_id, task_id))"
+        )
+        expired = self._db.execute(
+            "DELETE FROM sessions WHERE updated_at < ?", (self.time_fn() - self.ttl,)
+        ).rowcount
+        self._db.commit()
+        logger.info(f"会话数据库已打开: {self.db_path}，清理过期会话 {expired} 个")
+
+    def _save(self, key: SessionKey, state: SessionState):
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, task_id, data, updated_at) VALUES (?, ?, ?, ?)",
+            (key[0], key[1], state.to_json(), state.updated_at)
+        )
+        self._db.commit()
+        self.stats['db_writes'] += 1
+
+    def _delete(self, key: SessionKey):
+        self._sessions.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM sessions WHERE session_id = ? AND task_id = ?", key)
+            self._db.commit()
@@ -0,0 +1,93 @@
+"""
+请求合并（single-flight）
+相同键的并发请求只执行一次，其余请求等待第一个请求的结果
+"""
+import asyncio
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 已创建的合并组，用于统一输出指标
+_groups: List['SingleFlight'] = []
+
+
+class SingleFlight:
+    """
+    请求合并组
+
+    相同键的工作在独立的任务中执行，所有调用方通过 asyncio.shield 等待该任务，
+    因此某个调用方被取消（如客户端断开）不会影响其他等待者。
+    """
+
+    def __init__(self, name: str):
+        """
+        初始化请求合并组
+
+        Args:
+            name: 合并组名称，用于指标输出
+        """
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {
+            'calls': 0,
+            'executions': 0,
+            'coalesced': 0,
+            'errors': 0
+        }
+        _groups.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行或合并请求
+
+        Args:
+            key: 请求键，相同键的并发请求会被合并
+            fn: 无参协程函数，只在没有同键请求进行中时调用
+
+        Returns:
+            工作结果（合并的请求共享同一个结果对象）
+
+        Raises:
+            Exception: 工作抛出的异常会传递给所有等待者
+        """
+        self.stats['calls'] += 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats['coalesced'] += 1
+            logger.debug(f"[{self.name}] 合并进行中的请求: {key}")
+        else:
+            self.stats['executions'] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._on_done, key))
+
+        return await asyncio.shield(task)
+
+    def inflight_count(self) -> int:
+        """当前进行中的请求数"""
+        return len(self._inflight)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计信息"""
+        calls = self.stats['calls']
+        return {
+            **self.stats,
+            'inflight': len(self._inflight),
+            'coalesce_rate': round(self.stats['coalesced'] / calls, 4) if calls else 0.0
+        }
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats['errors'] += 1
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有请求合并组的统计信息"""
+    return {group.name: group.get_stats() for group in _groups}
@@ -0,0 +1,146 @@
+"""
+解析结果快照缓存
+加载器解析并校验完数据文件后，把结果（任务或知识库对象、行哈希）以 pickle 协议 5 写入缓存目录；
+下次启动时源文件内容哈希、快照格式版本和数据模型字段都一致，就直接读取快照，跳过 CSV/JSON 解析、
+字段校验和地理编码。缓存目录只应由服务自己写入（读取快照等同于执行其中的 pickle 数据）。
+"""
+import logging
+import os
+import pickle
+import tempfile
+import time
+from dataclasses import fields, is_dataclass
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 解析、校验或地理编码规则变化时递增，使旧快照失效
+SNAPSHOT_FORMAT = 1
+
+
+def schema_signature(*models: type) -> Tuple:
+    """
+    数据模型的结构签名（类名和字段名），模型字段变化后旧快照不再匹配
+
+    Args:
+        models: dataclass 类型
+
+    Returns:
+        可比较的签名元组
+    """
+    return tuple(
+        (model.__name__, tuple(f.name for f in fields(model)) if is_dataclass(model) else ())
+        for model in models
+    )
+
+
+class SnapshotCache:
+    """
+    按数据类型保存最近一次解析结果的快照文件
+
+    每种数据只保留一个文件（<目录>/<数据类型>.pickle），文件头记录格式版本、模型签名和源文件内容哈希，
+    三者都与当前一致才算命中；写入先写临时文件再原子替换，多个进程同时启动也不会读到写了一半的快照。
+    """
+
+    def __init__(self, directory: Optional[str], schema: Tuple = ()):
+        """
+        Args:
+            directory: 快照目录，为空时不使用快照
+            schema: 数据模型签名，见 schema_signature
+        """
+        self.directory: str = directory or ""  # 空字符串表示不使用快照
+        self.schema = schema
+        self.stats: Dict[str, Any] = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'errors': 0,
+            'last_load_seconds': 0.0
+        }
+
+    @classmethod
+    def from_config(cls, config, schema: Tuple = ()) -> 'SnapshotCache':
+        """根据 DataConfig 创建"""
+        return cls(config.snapshot_dir, schema)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def path_for(self, kind: str) -> str:
+        """数据类型对应的快照文件路径"""
+        return os.path.join(self.directory, f"{kind}.pickle")
+
+    def _header(self, kind: str, source_hash: str) -> Dict[str, Any]:
+        return {'format': SNAPSHOT_FORMAT, 'schema': self.schema, 'kind': kind, 'source_hash': source_hash}
+
+    def load(self, kind: str, source_hash: str) -> Optional[Any]:
+        """
+        读取与源文件内容哈希匹配的快照
+
+        Args:
+            kind: 数据类型
+            source_hash: 源文件内容哈希
+
+        Returns:
+            保存时的数据；没有快照、快照过期或读取失败时返回 None
+        """
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        try:
+            with open(self.path_for(kind), 'rb') as f:
+                header = pickle.load(f)
+                if header != self._header(kind, source_hash):
+                    self.stats['misses'] += 1
+                    return None
+                payload = pickle.load(f)
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        except Exception as e:
+            # 快照损坏或由不兼容的版本写入时回退到解析源文件
+            self.stats['errors'] += 1
+            logger.warning(f"读取数据快照失败，改为解析源文件 ({kind}): {str(e)}")
+            return None
+
+        self.stats['hits'] += 1
+        self.stats['last_load_seconds'] = round(time.perf_counter() - start, 4)
+        logger.info(f"使用数据快照 ({kind}), 耗时: {self.stats['last_load_seconds']}s")
+        return payload
+
+    def save(self, kind: str, source_hash: str, payload: Any) -> bool:
+        """
+        写入快照（先写临时文件再原子替换）
+
+        Args:
+            kind: 数据类型
+            source_hash: 解析的源文件内容哈希
+            payload: 解析结果，需要可以 pickle
+
+        Returns:
+            是否写入成功；失败只记录日志，不影响加载
+        """
+        if not self.enabled:
+            return False
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{kind}-", dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                # 文件头单独序列化，不匹配时不必读取数据部分
+                pickle.dump(self._header(kind, source_hash), f, protocol=5)
+                pickle.dump(payload, f, protocol=5)
+            os.replace(tmp_path, self.path_for(kind))
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f"写入数据快照失败 ({kind}): {str(e)}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return False
+        self.stats['writes'] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取快照缓存统计信息"""
+        return {**self.stats, 'enabled': self.enabled, 'directory': self.directory}
@@ -0,0 +1,148 @@
+"""
+RAG 流水线分阶段耗时统计
+每个阶段的耗时作为一个 span 记录到全局直方图；请求内的 span 通过 contextvars 汇总，
+可以在调试响应头中返回
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from resilience import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# 直方图桶上界（毫秒），最后一个桶为 +Inf
+BUCKET_BOUNDS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StageHistogram:
+    """单个阶段的耗时直方图（不加锁，由模块级的 _lock 保护）"""
+
+    def __init__(self, bounds_ms: Tuple[float, ...] = BUCKET_BOUNDS_MS):
+        self.bounds_ms = bounds_ms
+        self.buckets = [0] * (len(bounds_ms) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = LatencyTracker()
+
+    def record(self, seconds: float):
+        """记录一次耗时（秒）"""
+        self.buckets[bisect.bisect_left(self.bounds_ms, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.record(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}ms" for bound in self.bounds_ms] + ["le_inf"]
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 3) if self.count else None,
+            'max_ms': round(self.max * 1000, 3),
+            'p50_ms': self._ms(self.recent.percentile(0.5)),
+            'p95_ms': self._ms(self.recent.percentile(0.95)),
+            'p99_ms': self._ms(self.recent.percentile(0.99)),
+            'buckets': dict(zip(labels, self.buckets))
+        }
+
+    @staticmethod
+    def _ms(seconds: Optional[float]) -> Optional[float]:
+        return None if seconds is None else round(seconds * 1000, 3)
+
+
+class RequestTrace:
+    """单个请求内记录的 span 列表"""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float):
+        self.spans.append((stage, seconds))
+
+    def totals(self) -> Dict[str, Tuple[int, float]]:
+        """按阶段汇总：阶段 -> (次数, 总耗时秒)"""
+        result: Dict[str, Tuple[int, float]] = {}
+        for stage, seconds in self.spans:
+            count, total = result.get(stage, (0, 0.0))
+            result[stage] = (count + 1, total + seconds)
+        return result
+
+    def server_timing(self) -> str:
+        """格式化为 Server-Timing 响应头"""
+        parts = []
+        for stage, (count, total) in self.totals().items():
+            part = f"{stage};dur={total * 1000:.1f}"
+            if count > 1:
+                part += f';desc="x{count}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+
+# span 也会在执行器线程中记录，直方图的创建、记录和读取都在 _lock 下进行
+_lock = threading.Lock()
+_histograms: Dict[str, StageHistogram] = {}
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("rag_request_trace", default=None)
+
+
+def record_span(stage: str, seconds: float):
+    """
+    记录一个阶段的耗时
+
+    Args:
+        stage: 阶段名称
+        seconds: 耗时（秒）
+    """
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = StageHistogram()
+        histogram.record(seconds)
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """计时上下文，退出时（包括异常和取消）记录阶段耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def trace_request() -> Iterator[RequestTrace]:
+    """
+    开始记录当前请求的 span
+
+    在此上下文中创建的协程、任务和执行器线程都会把 span 记录到同一个 RequestTrace。
+
+    Yields:
+        当前请求的 RequestTrace
+    """
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def get_stage_stats() -> Dict[str, Any]:
+    """获取各阶段耗时直方图"""
+    with _lock:
+        return {stage: histogram.to_dict() for stage, histogram in sorted(_histograms.items())}
+
+
+def reset_stage_stats():
+    """清空各阶段耗时统计"""
+    with _lock:
+        _histograms.clear()
@@ -0,0 +1,659 @@
+"""
+预计算建议索引
+数据加载时根据任务图（前置任务）、类别、课程和地理位置为每个任务生成相关任务、附近任务和追问建议，
+回答置信度低或没有检索到知识时直接查表。候选任务通过按网格分桶的位置索引和按课程、类别分组的索引查找，
+不再两两比较所有任务；数据重新加载后只重新计算受变更影响的任务。
+"""
+import heapq
+import logging
+import math
+import re
+import threading
+import time
+from typing import AbstractSet, Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+_TASK_ID_PATTERN = re.compile(r'[A-Za-z]+\d+')
+
+# 各任务类别的典型追问
+_CATEGORY_QUESTIONS = {
+    '学术研究': '需要提前准备哪些资料？',
+    '实验任务': '操作时需要注意哪些安全事项？',
+    '志愿服务': '志愿服务时长如何认定？',
+    '社团活动': '活动需要提前报名吗？',
+    '体育锻炼': '需要自备哪些装备？',
+    '竞赛活动': '可以组队参加吗？',
+    '文化活动': '活动对校外人员开放吗？',
+    '讲座活动': '讲座需要预约座位吗？',
+    '后勤支持': '完成任务需要哪些技能？'
+}
+
+# 没有预计算建议时使用的通用建议
+CONTACT_SUGGESTION = {
+    "type": "contact",
+    "title": "联系相关工作人员",
+    "description": "如需更详细信息，建议直接联系任务负责人"
+}
+
+
+def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    计算两个经纬度坐标之间的球面距离
+
+    Returns:
+        距离（米）
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_prerequisites(prerequisites: str, task_ids: AbstractSet[str]) -> List[str]:
+    """
+    从前置任务字段中解析出存在的任务ID（"无" 或空值表示没有前置任务）
+
+    Args:
+        prerequisites: 前置任务字段，如 "NT001;NT002"
+        task_ids: 已加载的任务ID集合
+
+    Returns:
+        前置任务ID列表
+    """
+    if not prerequisites:
+        return []
+    return [tid for tid in _TASK_ID_PATTERN.findall(prerequisites) if tid in task_ids]
+
+
+def _has_location(task) -> bool:
+    return bool(task.latitude or task.longitude)
+
+
+def _distance(task, other) -> float:
+    """两个任务之间的距离，任一任务没有位置时为无穷大"""
+    if _has_location(task) and _has_location(other):
+        return haversine_distance(task.latitude, task.longitude, other.latitude, other.longitude)
+    return math.inf
+
+
+def _diff(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    """两次构建之间新增、删除或内容变化的键"""
+    changed = {key for key in old if key not in new}
+    for key, value in new.items():
+        previous = old.get(key)
+        if previous is not value and (previous is None or previous != value):
+            changed.add(key)
+    return changed
+
+
+def _mentioned_ids(prerequisites: str) -> Set[str]:
+    """前置任务字段中出现的全部任务ID（不论是否存在）"""
+    return set(_TASK_ID_PATTERN.findall(prerequisites)) if prerequisites else set()
+
+
+def _discard(groups: Dict[str, Set[str]], key: str, value: str):
+    """从分组集合中移除元素，集合为空时删除分组"""
+    members = groups.get(key)
+    if members is not None:
+        members.discard(value)
+        if not members:
+            del groups[key]
+
+
+def _never(_task_id: str) -> bool:
+    return False
+
+class GridIndex:
+    """
+    按经纬度网格分桶的任务位置索引
+
+    查询时从所在网格向外逐圈扫描，已找到的结果比未扫描网格的最小可能距离更近时停止；
+    扫描的网格数超过任务数时（任务稀疏地分布在很大的范围内）改为直接计算全部距离。
+    没有位置的任务单独记录，距离视为无穷大。
+    """
+
+    def __init__(self, cell_size: float):
+        """
+        Args:
+            cell_size: 网格边长（米，按纬度方向换算为度）
+        """
+        self.cell_deg = max(cell_size, 1.0) / METERS_PER_DEGREE
+        self._cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self._cell_of: Dict[str, Tuple[int, int]] = {}
+        self._unlocated: Dict[str, Any] = {}
+        self._bounds: Optional[List[int]] = None  # [最小行, 最大行, 最小列, 最大列]，只扩大不缩小
+
+    @classmethod
+    def for_tasks(cls, tasks: Iterable[Any], max_cell_size: float) -> 'GridIndex':
+        """
+        按任务分布的密度选择网格大小（平均每格约 2 个任务）并加入任务
+
+        Args:
+            tasks: 任务对象列表
+            max_cell_size: 网格边长上限（米）
+
+        Returns:
+            网格索引
+        """
+        tasks = list(tasks)
+        located = [task for task in tasks if _has_location(task)]
+        cell_size = max_cell_size
+        if len(located) > 1:
+            lats = [task.latitude for task in located]
+            lngs = [task.longitude for task in located]
+            height = (max(lats) - min(lats)) * METERS_PER_DEGREE
+            width = (max(lngs) - min(lngs)) * METERS_PER_DEGREE * math.cos(math.radians(sum(lats) / len(lats)))
+            cell_size = min(max_cell_size, math.sqrt(2 * max(height, 1.0) * max(width, 1.0) / len(located)))
+        index = cls(cell_size)
+        for task in tasks:
+            index.add(task)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._cell_of) + len(self._unlocated)
+
+    def _cell(self, task) -> Tuple[int, int]:
+        return math.floor(task.latitude / self.cell_deg), math.floor(task.longitude / self.cell_deg)
+
+    def add(self, task):
+        """加入任务（同一任务ID已存在时先调用 remove）"""
+        if not _has_location(task):
+            self._unlocated[task.task_id] = task
+            return
+        cell = self._cell(task)
+        self._cells.setdefault(cell, {})[task.task_id] = task
+        self._cell_of[task.task_id] = cell
+        if self._bounds is None:
+            self._bounds = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            bounds = self._bounds
+            bounds[0], bounds[1] = min(bounds[0], cell[0]), max(bounds[1], cell[0])
+            bounds[2], bounds[3] = min(bounds[2], cell[1]), max(bounds[3], cell[1])
+
+    def remove(self, task_id: str):
+        """移除任务"""
+        if self._unlocated.pop(task_id, None) is not None:
+            return
+        cell = self._cell_of.pop(task_id, None)
+        if cell is not None:
+            members = self._cells[cell]
+            del members[task_id]
+            if not members:
+                del self._cells[cell]
+
+    def nearest(self, task, k: int, excluded: Callable[[str], bool],
+                max_distance: float = math.inf) -> List[Tuple[float, str]]:
+        """
+        按 (距离, 任务ID) 升序取最近的 k 个任务
+
+        Args:
+            task: 查询的任务
+            k: 最多返回的数量
+            excluded: 返回 True 的任务ID不参与排序
+            max_distance: 距离上限（米），有限时不返回没有位置的任务
+
+        Returns:
+            (距离, 任务ID) 列表
+        """
+        if k <= 0:
+            return []
+        if not _has_location(task):
+            # 没有位置时所有距离都是无穷大，只按任务ID排序
+            if max_distance < math.inf:
+                return []
+            ids = (tid for tid in (*self._cell_of, *self._unlocated) if not excluded(tid))
+            return [(math.inf, tid) for tid in heapq.nsmallest(k, ids)]
+
+        found = sorted(self._scan(task, k, excluded, max_distance))[:k]
+        if len(found) < k and max_distance == math.inf and self._unlocated:
+            ids = (tid for tid in self._unlocated if not excluded(tid))
+            found += [(math.inf, tid) for tid in heapq.nsmallest(k - len(found), ids)]
+        return found
+
+    def _scan(self, task, k: int, excluded: Callable[[str], bool], max_distance: float) -> List[Tuple[float, str]]:
+        """从查询任务所在网格向外逐圈扫描，返回的结果包含距离最近的 k 个（未排序）"""
+        if self._bounds is None:
+            return []
+        row, col = self._cell(task)
+        min_row, max_row, min_col, max_col = self._bounds
+        found: List[Tuple[float, str]] = []
+        visited = 0
+        radius = 0
+        while True:
+            for cell in self._ring(row, col, radius):
+                for other_id, other in self._cells.get(cell, {}).items():
+                    if excluded(other_id):
+                        continue
+                    distance = _distance(task, other)
+                    if distance <= max_distance:
+                        found.append((distance, other_id))
+            visited += 8 * radius or 1
+
+            if (row - radius <= min_row and row + radius >= max_row
+                    and col - radius <= min_col and col + radius >= max_col):
+                return found
+            bound = self._ring_bound(task, radius)
+            if bound > max_distance:
+                return found
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] < bound:
+                    return found
+            if visited > len(self._cell_of):
+                # 任务稀疏，直接计算全部距离
+                return [
+                    (distance, other_id)
+                    for other_id, cell in self._cell_of.items()
+                    if not excluded(other_id)
+                    for distance in (_distance(task, self._cells[cell][other_id]),)
+                    if distance <= max_distance
+                ]
+            radius += 1
+
+    def _ring_bound(self, task, radius: int) -> float:
+        """第 radius 圈之外的任务与查询任务的最小可能距离（米）"""
+        # 更外圈的任务与查询位置在纬度或经度方向上至少相差 radius 个网格
+        span = radius * self.cell_deg
+        if abs(task.longitude) + span >= 180:
+            return 0.0  # 网格不跨越 180 度经线，无法据此排除
+        cos_lat = math.cos(math.radians(min(90.0, abs(task.latitude) + span)))
+        lng_bound = 2 * EARTH_RADIUS_M * math.asin(min(1.0, cos_lat * math.sin(math.radians(span) / 2)))
+        return 0.999 * min(span * METERS_PER_DEGREE, lng_bound)
+
+    @staticmethod
+    def _ring(row: int, col: int, radius: int) -> Iterable[Tuple[int, int]]:
+        """与中心网格切比雪夫距离恰为 radius 的网格"""
+        if radius == 0:
+            yield row, col
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, col - radius
+            yield r, col + radius
+
+
+# 相关任务排序键：(-分数, 距离, 任务ID)，越小越靠前
+RankKey = Tuple[int, float, str]
+
+
+class SuggestionIndex:
+    """
+    任务建议索引
+
+    建议在 build() 时生成，查询只是一次字典查找。相关任务从任务图以及按课程、类别分组的位置网格中
+    取最近的若干个，附近任务从全部任务的位置网格中按半径查找。再次 build() 时与上一次的任务和知识库比较，
+    只重新计算受影响的任务：变更的任务本身、建议中引用了变更任务的任务，以及变更任务可能进入其建议的任务。
+    结果先写入副本再整体替换，并发查询不会读到一半的结果。任务和知识库对象视为不可变，修改数据应传入新对象。
+    """
+
+    def __init__(self, max_related: int = 3, max_nearby: int = 3,
+                 nearby_radius: float = 500.0, max_questions: int = 3):
+        """
+        初始化建议索引
+
+        Args:
+            max_related: 每个任务的相关任务建议数
+            max_nearby: 每个任务的附近任务建议数
+            nearby_radius: 附近任务的距离上限（米）
+            max_questions: 每个任务的追问建议数
+        """
+        self.max_related = max(0, max_related)
+        self.max_nearby = max(0, max_nearby)
+        self.nearby_radius = nearby_radius
+        self.max_questions = max(0, max_questions)
+
+        self._suggestions: Dict[str, Tuple[Dict[str, str], ...]] = {}
+        self._lock = threading.Lock()
+        # 以下状态只在 build() 中读写，由 _build_lock 串行化
+        self._build_lock = threading.Lock()
+        self._tasks: Dict[str, Any] = {}
+        self._knowledge: Dict[str, Any] = {}
+        self._prerequisites: Dict[str, List[str]] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        self._mentions: Dict[str, Set[str]] = {}  # 前置任务字段中出现的任务ID -> 提到它的任务
+        self._located = GridIndex(nearby_radius)
+        self._courses: Dict[str, GridIndex] = {}
+        self._categories: Dict[str, GridIndex] = {}
+        self._refs: Dict[str, Set[str]] = {}  # 任务ID -> 建议中引用了它的任务
+        self._uses: Dict[str, Set[str]] = {}  # 任务ID -> 它的建议引用的任务
+        self._thresholds: Dict[str, Optional[RankKey]] = {}  # 第 max_related 个相关任务的排序键，不足时为 None
+        self._nearby_thresholds: Dict[str, Optional[Tuple[float, str]]] = {}  # 最后一个附近任务候选，不足时为 None
+        self._course_open: Dict[str, Set[str]] = {}  # 课程 -> 同课程任务仍可能进入其相关任务的任务
+        self._category_open: Dict[str, Set[str]] = {}  # 类别 -> 同类任务仍可能进入其相关任务的任务
+        self.stats = {
+            'builds': 0,
+            'last_build_time': 0.0,
+            'last_recomputed': 0,
+            'lookups': 0,
+            'hits': 0
+        }
+
+    @classmethod
+    def from_config(cls, suggestion_config) -> 'SuggestionIndex':
+        """根据 SuggestionConfig 创建建议索引"""
+        return cls(
+            max_related=suggestion_config.max_related,
+            max_nearby=suggestion_config.max_nearby,
+            nearby_radius=suggestion_config.nearby_radius,
+            max_questions=suggestion_config.max_questions
+        )
+
+    def build(self, tasks: Iterable[Any], knowledge: Optional[Dict[str, Any]] = None) -> Set[str]:
+        """
+        根据当前全部任务更新建议索引，只重新计算受变更影响的任务
+
+        Args:
+            tasks: 任务对象列表
+            knowledge: 任务ID -> 知识库对象（可选，用于生成追问）
+
+        Returns:
+            建议发生变化的任务ID集合（包括新增和删除的任务）
+        """
+        start = time.perf_counter()
+        by_id = {task.task_id: task for task in tasks}
+        knowledge = dict(knowledge or {})
+
+        with self._build_lock:
+            touched = _diff(self._tasks, by_id)
+            affected = _diff(self._knowledge, knowledge)
+            self._knowledge = knowledge
+            affected |= self._apply(by_id, touched)
+            affected = {tid for tid in affected if tid in by_id}
+
+            with self._lock:
+                old = self._suggestions
+            index = dict(old)
+            for tid in touched:
+                if tid not in by_id:
+                    index.pop(tid, None)
+            for tid in affected:
+                index[tid] = self._compute(by_id[tid])
+
+            with self._lock:
+                self._suggestions = index
+                self.stats['builds'] += 1
+                self.stats['last_build_time'] = round(time.perf_counter() - start, 6)
+                self.stats['last_recomputed'] = len(affected)
+
+        changed = {tid for tid in touched | affected if old.get(tid) != index.get(tid)}
+        logger.info(f"建议索引构建完成，任务数量: {len(index)}，重新计算: {len(affected)}，变更: {len(changed)}")
+        return changed
+
+    def get(self, task_id: str) -> Optional[List[Dict[str, str]]]:
+        """
+        查询任务的预计算建议
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            建议列表的副本，任务不在索引中时返回 None
+        """
+        with self._lock:
+            self.stats['lookups'] += 1
+            suggestions = self._suggestions.get(task_id)
+            if suggestions is None:
+                return None
+            self.stats['hits'] += 1
+        return [dict(s) for s in suggestions]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取建议索引统计信息"""
+        with self._lock:
+            lookups = self.stats['lookups']
+            return {
+                **self.stats,
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0,
+                'tasks': len(self._suggestions),
+                'suggestions': sum(len(s) for s in self._suggestions.values())
+            }
+
+    def _apply(self, by_id: Dict[str, Any], touched: Set[str]) -> Set[str]:
+        """
+        把变更的任务写入任务图和位置索引
+
+        Args:
+            by_id: 更新后的全部任务
+            touched: 新增、修改或删除的任务ID
+
+        Returns:
+            需要重新计算建议的任务ID集合（可能包含已删除的任务）
+        """
+        # 变更任务超过一半时全部重新计算，不再逐个查找受影响的任务
+        full = len(touched) > len(by_id) // 2
+        affected = set(by_id) if full else set(touched)
+        for tid in touched:
+            affected |= self._refs.get(tid, set())
+
+        old_tasks = self._tasks
+        self._tasks = by_id
+        for tid in touched:
+            old, new = old_tasks.get(tid), by_id.get(tid)
+            if old is not None and not full:
+                self._unindex(old)
+            if new is not None and not full:
+                self._index(new)
+            old_mentions = _mentioned_ids(old.prerequisites) if old is not None else set()
+            new_mentions = _mentioned_ids(new.prerequisites) if new is not None else set()
+            for mentioned in old_mentions - new_mentions:
+                _discard(self._mentions, mentioned, tid)
+            for mentioned in new_mentions - old_mentions:
+                self._mentions.setdefault(mentioned, set()).add(tid)
+            if new is None:
+                self._forget(tid)
+        if full:
+            self._reindex()
+
+        # 任务新增或删除会改变提到它的任务解析出的前置任务
+        relink = set(touched)
+        for tid in touched:
+            relink |= self._mentions.get(tid, set())
+        for tid in relink:
+            affected |= self._relink(tid)
+
+        if not full:
+            for tid in touched:
+                if tid in by_id:
+                    affected |= self._candidates(by_id[tid])
+        return affected
+
+    def _reindex(self):
+        """按当前全部任务重建位置和分组索引（全部任务都会重新计算，候选门槛一并清空）"""
+        courses: Dict[str, List[Any]] = {}
+        categories: Dict[str, List[Any]] = {}
+        for task in self._tasks.values():
+            if task.course_code:
+                courses.setdefault(task.course_code, []).append(task)
+            if task.category:
+                categories.setdefault(task.category, []).append(task)
+        self._located = GridIndex.for_tasks(self._tasks.values(), self.nearby_radius)
+        self._courses = {key: GridIndex.for_tasks(members, self.nearby_radius) for key, members in courses.items()}
+        self._categories = {key: GridIndex.for_tasks(members, self.nearby_radius) for key, members in categories.items()}
+        self._thresholds.clear()
+        self._nearby_thresholds.clear()
+        self._course_open.clear()
+        self._category_open.clear()
+
+    def _index(self, task):
+        """把任务加入位置和分组索引"""
+        self._located.add(task)
+        if task.course_code:
+            self._courses.setdefault(task.course_code, GridIndex(self.nearby_radius)).add(task)
+        if task.category:
+            self._categories.setdefault(task.category, GridIndex(self.nearby_radius)).add(task)
+
+    def _unindex(self, task):
+        """把任务的旧版本移出位置和分组索引"""
+        self._located.remove(task.task_id)
+        for groups, key in ((self._courses, task.course_code), (self._categories, task.category)):
+            group = groups.get(key)
+            if group is not None:
+                group.remove(task.task_id)
+                if not len(group):
+                    del groups[key]
+        _discard(self._course_open, task.course_code, task.task_id)
+        _discard(self._category_open, task.category, task.task_id)
+        self._thresholds.pop(task.task_id, None)
+        self._nearby_thresholds.pop(task.task_id, None)
+
+    def _forget(self, task_id: str):
+        """删除已移除任务的引用关系"""
+        self._set_uses(task_id, set())
+        self._uses.pop(task_id, None)
+
+    def _relink(self, task_id: str) -> Set[str]:
+        """重新解析任务的前置任务，返回前置关系发生变化时涉及的任务"""
+        task = self._tasks.get(task_id)
+        old = self._prerequisites.pop(task_id, [])
+        new = parse_prerequisites(task.prerequisites, self._tasks.keys()) if task is not None else []
+        if new:
+            self._prerequisites[task_id] = new
+        if old == new:
+            return set()
+        for prereq in old:
+            _discard(self._dependents, prereq, task_id)
+        for prereq in new:
+            self._dependents.setdefault(prereq, set()).add(task_id)
+        return {task_id, *old, *new}
+
+    def _candidates(self, task) -> Set[str]:
+        """变更后的任务可能进入其相关任务或附近任务的其他任务"""
+        found = set(self._prerequisites.get(task.task_id, ()))
+        found.update(self._dependents.get(task.task_id, ()))
+        if task.course_code:
+            found.update(tid for tid in self._course_open.get(task.course_code, ())
+                         if self._may_rank(tid, task, 2))
+        if task.category:
+            found.update(tid for tid in self._category_open.get(task.category, ())
+                         if self._may_rank(tid, task, 1))
+        if self.max_nearby:
+            for distance, tid in self._located.nearest(task, len(self._located), _never, self.nearby_radius):
+                threshold = self._nearby_thresholds.get(tid)
+                if threshold is None or (distance, task.task_id) < threshold:
+                    found.add(tid)
+        return found
+
+    def _may_rank(self, task_id: str, candidate, score: int) -> bool:
+        """候选任务的排序键是否小于该任务当前第 max_related 个相关任务"""
+        threshold = self._thresholds.get(task_id)
+        key = (-score, _distance(self._tasks[task_id], candidate), candidate.task_id)
+        return threshold is None or key < threshold
+
+    def _set_uses(self, task_id: str, uses: Set[str]):
+        """更新任务的建议所引用的任务"""
+        old = self._uses.get(task_id, set())
+        for other_id in old - uses:
+            _discard(self._refs, other_id, task_id)
+        for other_id in uses - old:
+            self._refs.setdefault(other_id, set()).add(task_id)
+        self._uses[task_id] = uses
+
+    def _set_threshold(self, task, threshold: Optional[RankKey]):
+        """记录相关任务的门槛，并据此维护同课程、同类别的候选集合"""
+        self._thresholds[task.task_id] = threshold
+        open_course = self.max_related > 0 and (threshold is None or threshold[0] >= -2)
+        open_category = self.max_related > 0 and (threshold is None or threshold[0] >= -1)
+        for groups, key, is_open in ((self._course_open, task.course_code, open_course),
+                                     (self._category_open, task.category, open_category)):
+            if not key:
+                continue
+            if is_open:
+                groups.setdefault(key, set()).add(task.task_id)
+            else:
+                _discard(groups, key, task.task_id)
+
+    def _compute(self, task) -> Tuple[Dict[str, str], ...]:
+        """生成单个任务的建议，并记录其引用的任务"""
+        related = self._related(task)
+        self._set_threshold(task, related[self.max_related - 1][0] if len(related) == self.max_related > 0 else None)
+        # 已作为相关任务推荐的不再重复出现在附近任务中
+        shown = {self._tasks[other_id].title for _, other_id, _ in related}
+        nearby = self._nearby(task, len(shown)) if self.max_nearby else []
+        self._nearby_thresholds[task.task_id] = nearby[-1] if nearby and len(nearby) == self.max_nearby + len(shown) else None
+        prerequisites = self._prerequisites.get(task.task_id, [])[:1]
+        self._set_uses(task.task_id, {other_id for _, other_id, _ in related}
+                       | {other_id for _, other_id in nearby} | set(prerequisites))
+
+        suggestions = [
+            {
+                "type": "related_task",
+                "title": self._tasks[other_id].title,
+                "description": f"{reason} · {self._tasks[other_id].difficulty} · {self._tasks[other_id].location_name}"
+            }
+            for _, other_id, reason in related
+        ]
+        suggestions += [
+            {
+                "type": "nearby_task",
+                "title": self._tasks[other_id].title,
+                "description": f"距此约 {round(distance)} 米 · {self._tasks[other_id].location_name}"
+            }
+            for distance, other_id in nearby
+            if self._tasks[other_id].title not in shown
+        ][:self.max_nearby]
+        suggestions += self._questions(task, prerequisites, self._knowledge.get(task.task_id))
+        suggestions.append(dict(CONTACT_SUGGESTION))
+        return tuple(suggestions)
+
+    def _related(self, task) -> List[Tuple[RankKey, str, str]]:
+        """相关任务：前置/后续任务优先，其次是同一课程、同一类别，同分时距离近的优先"""
+        task_id, limit = task.task_id, self.max_related
+        prerequisites = self._prerequisites.get(task_id, [])
+        graph = (set(prerequisites) | self._dependents.get(task_id, set())) - {task_id}
+        ranked = sorted(
+            ((-3, _distance(task, self._tasks[other_id]), other_id),
+             other_id, "前置任务" if other_id in prerequisites else "后续任务")
+            for other_id in graph
+        )[:limit]
+
+        course = self._courses.get(task.course_code) if task.course_code else None
+        if course is not None and len(ranked) < limit:
+            excluded = lambda other_id: other_id == task_id or other_id in graph
+            ranked += [
+                ((-2, distance, other_id), other_id, f"同属课程 {task.course_code}")
+                for distance, other_id in course.nearest(task, limit - len(ranked), excluded)
+            ]
+
+        category = self._categories.get(task.category) if task.category else None
+        if category is not None and len(ranked) < limit:
+            excluded = lambda other_id: other_id == task_id or other_id in graph or bool(
+                task.course_code and self._tasks[other_id].course_code == task.course_code)
+            ranked += [
+                ((-1, distance, other_id), other_id, f"同类{task.category}任务")
+                for distance, other_id in category.nearest(task, limit - len(ranked), excluded)
+            ]
+        return ranked
+
+    def _nearby(self, task, extra: int = 0) -> List[Tuple[float, str]]:
+        """附近任务：距离上限内按距离排序，多取 extra 个以便去重"""
+        task_id = task.task_id
+        return self._located.nearest(task, self.max_nearby + extra, lambda other_id: other_id == task_id,
+                                     self.nearby_radius)
+
+    def _questions(self, task, prerequisites: List[str], knowledge) -> List[Dict[str, str]]:
+        """追问建议：前置任务、类别、知识库标签、地点、时长、奖励，按顺序取前几个"""
+        questions = []
+        for prereq in prerequisites[:1]:
+            questions.append(f"开始前需要先完成“{self._tasks[prereq].title}”吗？")
+        if task.category in _CATEGORY_QUESTIONS:
+            questions.append(_CATEGORY_QUESTIONS[task.category])
+        if knowledge is not None and knowledge.tags:
+            questions.append(f"能详细介绍一下{knowledge.tags[-1]}吗？")
+        if task.location_name:
+            questions.append(f"{task.location_name}怎么走？")
+        if task.estimated_duration:
+            questions.append("完成这个任务大概需要多久？")
+        if task.rewards:
+            questions.append("完成任务可以获得什么奖励？")
+
+        return [
+            {"type": "follow_up", "title": question, "description": f"继续询问关于“{task.title}”的问题"}
+            for question in questions[:self.max_questions]
+        ]
@@ -0,0 +1,709 @@
+"""
+列式任务存储
+把任务目录按列保存在 NumPy 数组中：数值列（坐标、时长、积分、时间戳）、分类编码列（类别、难度、状态、
+课程、NPC）和带偏移量表的字符串列。过滤和聚合以向量化布尔掩码完成，
+只有最终返回的那一页才重新构造 Task 对象。
+列表按 (创建时间, 任务ID) 排序，分页游标记录上一页最后一条的排序键，从有序位置继续读取。
+"""
+import base64
+import binascii
+import bisect
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from data_loader import CATEGORY_CODES, DIFFICULTY_CODES, STATUS_CODES, CodeTable, Task
+
+logger = logging.getLogger(__name__)
+
+# 缺失或无法解析的时间戳
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+# 搜索列中分隔标题和描述的字符
+_SEPARATOR = "\x00"
+
+
+def parse_timestamp(value: Optional[str]) -> int:
+    """
+    把 ISO 8601 时间字符串解析为 UTC 秒级时间戳（不带时区的按 UTC 处理）
+
+    Args:
+        value: 时间字符串，如 "2025-09-01T09:00:00Z"
+
+    Returns:
+        时间戳，为空或无法解析时返回 MISSING_TIMESTAMP
+    """
+    if not value:
+        return MISSING_TIMESTAMP
+    try:
+        return to_epoch(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        return MISSING_TIMESTAMP
+
+
+def to_epoch(dt: datetime) -> int:
+    """datetime -> UTC 秒级时间戳（不带时区的按 UTC 处理）"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+class StringColumn:
+    """
+    字符串列：所有取值拼接为一个字符串，按偏移量表切片取出
+
+    相比每行一个 str 对象，省去了每个对象约 50 字节的头部开销。
+    """
+
+    def __init__(self, values: Sequence[str]):
+        values = [value or "" for value in values]
+        self._data = "".join(values)
+        self.offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in values], out=self.offsets[1:])
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return self._data[self.offsets[row]:self.offsets[row + 1]]
+
+    def contains(self, term: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        查找包含子串的行
+
+        在拼接后的整个字符串上用 str.find 定位全部匹配，再用偏移量表一次性把位置映射回行号，
+        总耗时与数据总长度成正比；指定 rows 时只逐行检查这些候选行。
+
+        Args:
+            term: 子串
+            rows: 候选行（可选）
+
+        Returns:
+            布尔掩码
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        if rows is not None:
+            data = self._data
+            starts, ends = self.offsets[rows].tolist(), self.offsets[rows + 1].tolist()
+            hits = [row for row, start, end in zip(rows.tolist(), starts, ends)
+                    if data.find(term, start, end) != -1]
+            mask[hits] = True
+            return mask
+        if not term:
+            mask[:] = True
+            return mask
+
+        data, positions = self._data, []
+        position = data.find(term)
+        while position != -1:
+            positions.append(position)
+            position = data.find(term, position + 1)
+        if positions:
+            starts = np.array(positions, dtype=np.int64)
+            matched = np.searchsorted(self.offsets, starts, side='right') - 1
+            # 跨过行尾的匹配不算命中
+            within = starts + len(term) <= self.offsets[matched + 1]
+            mask[matched[within]] = True
+        return mask
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data.encode('utf-8')) + self.offsets.nbytes
+
+
+class HashIndex:
+    """
+    二级哈希索引：取值 -> 升序行号数组
+
+    查询耗时只与命中行数有关，与总行数无关。
+    """
+
+    def __init__(self, keys: Iterable[Hashable]):
+        """
+        Args:
+            keys: 每行的取值，按行号顺序
+        """
+        positions: Dict[Hashable, List[int]] = {}
+        for row, key in enumerate(keys):
+            positions.setdefault(key, []).append(row)
+        self._rows = {key: np.array(rows, dtype=np.int64) for key, rows in positions.items()}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def lookup(self, keys: Iterable[Hashable]) -> np.ndarray:
+        """
+        取值属于给定集合的行
+
+        Args:
+            keys: 可接受的取值，不存在的取值被忽略
+
+        Returns:
+            升序行号数组
+        """
+        arrays = [self._rows[key] for key in keys if key in self._rows]
+        if not arrays:
+            return np.empty(0, dtype=np.int64)
+        if len(arrays) == 1:
+            return arrays[0]
+        # 不同取值的行互不重叠，合并后排序即可
+        return np.sort(np.concatenate(arrays))
+
+    def sizes(self) -> Dict[Hashable, int]:
+        """取值 -> 行数"""
+        return {key: len(rows) for key, rows in self._rows.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(rows.nbytes for rows in self._rows.values())
+
+
+def intersect_rows(row_sets: List[np.ndarray]) -> np.ndarray:
+    """
+    求多个升序行号数组的交集，从最小的集合开始
+
+    每一步用二分查找在较大的集合中检查当前结果，耗时为 O(结果大小 × log(集合大小))，
+    中间结果为空时提前结束。
+
+    Args:
+        row_sets: 升序、无重复的行号数组列表（不能为空）
+
+    Returns:
+        升序行号数组
+    """
+    ordered = sorted(row_sets, key=len)
+    result = ordered[0]
+    for rows in ordered[1:]:
+        if not len(result):
+            break
+        positions = np.searchsorted(rows, result)
+        found = positions < len(rows)
+        found[found] = rows[positions[found]] == result[found]
+        result = result[found]
+    return result
+
+
+def encode_cursor(key: Tuple[int, str]) -> str:
+    """
+    把排序键编码为不透明的分页游标
+
+    Args:
+        key: (创建时间戳, 任务ID)
+
+    Returns:
+        URL 安全的 base64 字符串
+    """
+    payload = json.dumps([int(key[0]), key[1]], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    解析分页游标
+
+    Args:
+        cursor: encode_cursor 生成的字符串
+
+    Returns:
+        (创建时间戳, 任务ID)
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_key, task_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+    if type(sort_key) is not int or not isinstance(task_id, str):
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return sort_key, task_id
+
+
+@dataclass
+class KeysetPage:
+    """按游标读取的一页"""
+    rows: np.ndarray                          # 本页的行号，按排序键排列
+    total: int                                # 命中总数（近似模式下为估计值）
+    skipped: int                              # 游标之前的命中数（近似模式下为估计值）
+    next_key: Optional[Tuple[int, str]]       # 下一页的起点，没有下一页时为 None
+    total_approximate: bool = False
+
+
+class KeysetIndex:
+    """
+    列表顺序索引：按 (排序键, 任务ID) 排列的行号
+
+    游标只记录上一页最后一条的排序键，续读时二分查找定位，与页码深度无关；
+    排序键由取值而不是行号决定，数据重新加载后游标仍然有效。
+    """
+
+    def __init__(self, sort_keys: Union[Sequence[int], np.ndarray], task_ids: Sequence[str]):
+        """
+        Args:
+            sort_keys: 每行的排序键（缺失的创建时间为 MISSING_TIMESTAMP，排在最前）
+            task_ids: 每行的任务ID
+        """
+        keys = [int(key) for key in sort_keys]
+        ids = list(task_ids)
+        order = sorted(range(len(ids)), key=lambda row: (keys[row], ids[row]))
+        self.order = np.array(order, dtype=np.int64)
+        self.rank = np.empty(len(order), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(order), dtype=np.int64)
+        self.sorted_keys = np.array([keys[row] for row in order], dtype=np.int64)
+        self._sorted_ids = [ids[row] for row in order]
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def key_of(self, row: int) -> Tuple[int, str]:
+        """行号 -> 排序键"""
+        position = int(self.rank[row])
+        return int(self.sorted_keys[position]), self._sorted_ids[position]
+
+    def position_after(self, key: Optional[Tuple[int, str]]) -> int:
+        """
+        第一个排在 key 之后的位置
+
+        Args:
+            key: 上一页最后一条的排序键，None 表示从头开始
+
+        Returns:
+            在列表顺序中的下标
+        """
+        if key is None:
+            return 0
+        sort_key, task_id = key
+        low = int(np.searchsorted(self.sorted_keys, sort_key, side='left'))
+        high = int(np.searchsorted(self.sorted_keys, sort_key, side='right'))
+        return bisect.bisect_right(self._sorted_ids, task_id, low, high)
+
+    def sort_rows(self, rows: np.ndarray) -> np.ndarray:
+        """把行号按列表顺序排列"""
+        return self.order[np.sort(self.rank[rows])]
+
+    def page(self, start: int, size: int, rows: Optional[np.ndarray] = None) -> KeysetPage:
+        """
+        精确模式：从命中集合中取出位置不小于 start 的前 size 条
+
+        只对命中行做一次选择（np.partition），不对整个结果排序。
+
+        Args:
+            start: position_after 返回的起始位置
+            size: 每页大小
+            rows: 命中行，None 表示全部行
+
+        Returns:
+            KeysetPage
+        """
+        if rows is None:
+            total, skipped = len(self), min(start, len(self))
+            positions = np.arange(skipped, min(len(self), start + size + 1), dtype=np.int64)
+        else:
+            ranks = self.rank[rows]
+            later = ranks[ranks >= start]
+            total, skipped = len(ranks), len(ranks) - len(later)
+            if len(later) > size + 1:
+                later = np.partition(later, size)[:size + 1]
+            positions = np.sort(later)
+        return self._make_page(self.order[positions], size, total, skipped)
+
+    def scan(self, start: int, size: int, predicate: Callable[[np.ndarray], np.ndarray],
+             chunk: int = 256) -> KeysetPage:
+        """
+        近似模式：从 start 开始按列表顺序逐块检查，凑够一页即停止
+
+        耗时只与本页跨过的行数有关；总数按已检查部分的命中率估算。
+
+        Args:
+            start: position_after 返回的起始位置
+            size: 每页大小
+            predicate: 行号数组 -> 布尔掩码
+            chunk: 第一块的行数，之后逐块翻倍
+
+        Returns:
+            KeysetPage
+        """
+        hits: List[int] = []
+        position = start = min(start, len(self))
+        chunk = max(chunk, size + 1)
+        while position < len(self) and len(hits) <= size:
+            window = self.order[position:position + chunk]
+            hits.extend(window[predicate(window)].tolist())
+            position += len(window)
+            chunk *= 2
+
+        if start == 0 and position >= len(self):
+            return self._make_page(np.array(hits, dtype=np.int64), size, len(hits), 0)
+        ratio = len(hits) / (position - start) if position > start else 0.0
+        skipped = round(ratio * start)
+        total = skipped + len(hits) + round(ratio * (len(self) - position))
+        page = self._make_page(np.array(hits, dtype=np.int64), size, total, skipped)
+        page.total_approximate = True
+        return page
+
+    def _make_page(self, rows: np.ndarray, size: int, total: int, skipped: int) -> KeysetPage:
+        has_more = len(rows) > size
+        rows = rows[:size]
+        next_key = self.key_of(int(rows[-1])) if has_more else None
+        return KeysetPage(rows=rows, total=total, skipped=skipped, next_key=next_key)
+
+
+class SortedIndex:
+    """
+    有序索引：时间戳升序排列的数组及其对应的行号排列
+
+    范围查询用二分查找（np.searchsorted）定位上下界，缺失的时间戳不进入索引。
+    """
+
+    def __init__(self, values: np.ndarray):
+        """
+        Args:
+            values: 每行的时间戳，MISSING_TIMESTAMP 表示缺失
+        """
+        self.values = values
+        present = np.flatnonzero(values != MISSING_TIMESTAMP)
+        self.order = present[np.argsort(values[present], kind='stable')]
+        self.sorted_values = values[self.order]
+
+    def bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        """
+        范围 [start, end] 在有序数组中的下标区间
+
+        Args:
+            start: 下限（含），None 表示不限
+            end: 上限（含），None 表示不限
+
+        Returns:
+            (left, right)，命中行为 order[left:right]
+        """
+        left = 0 if start is None else int(np.searchsorted(self.sorted_values, start, side='left'))
+        right = len(self.order) if end is None else int(np.searchsorted(self.sorted_values, end, side='right'))
+        return left, max(left, right)
+
+    def range_rows(self, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        """时间在 [start, end] 内的行，按行号升序"""
+        left, right = self.bounds(start, end)
+        return np.sort(self.order[left:right])
+
+    def check(self, rows: np.ndarray, start: Optional[int], end: Optional[int]) -> np.ndarray:
+        """
+        逐行检查候选行是否在范围内（候选行比范围小时比取出整个范围更快）
+
+        Returns:
+            布尔掩码，与 rows 对齐
+        """
+        values = self.values[rows]
+        keep = values != MISSING_TIMESTAMP
+        if start is not None:
+            keep &= values >= start
+        if end is not None:
+            keep &= values <= end
+        return keep
+
+    def span(self) -> Tuple[Optional[int], Optional[int]]:
+        """最早和最晚的时间戳，没有数据时为 (None, None)"""
+        if not len(self.sorted_values):
+            return None, None
+        return int(self.sorted_values[0]), int(self.sorted_values[-1])
+
+
+class CategoricalColumn:
+    """分类列：取值编码为小整数，过滤时比较编码"""
+
+    def __init__(self, values: Sequence[str], table: CodeTable):
+        self.table = table
+        self.codes = np.fromiter((table.encode(value or "") for value in values),
+                                 dtype=np.int32, count=len(values))
+        self.index = HashIndex(self.codes.tolist())
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.table.decode(int(self.codes[row]))
+
+    def lookup(self, values: Iterable[str]) -> np.ndarray:
+        """
+        通过哈希索引查找取值属于给定集合的行
+
+        Args:
+            values: 可接受的取值
+
+        Returns:
+            升序行号数组
+        """
+        # 查询条件中出现的未知取值不写入编码表
+        return self.index.lookup(self.table.lookup(value) for value in values)
+
+    def value_counts(self, rows: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """
+        按取值计数
+
+        Args:
+            rows: 只统计这些行（可选）
+
+        Returns:
+            取值 -> 行数（不含计数为 0 的取值）
+        """
+        codes = self.codes if rows is None else self.codes[rows]
+        counts = np.bincount(codes, minlength=len(self.table))
+        return {self.table.decode(code): int(count) for code, count in enumerate(counts) if count}
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.index.nbytes
+
+
+class TaskStore:
+    """
+    列式任务表
+
+    行号即加载顺序。类别、难度、状态使用 data_loader 中的全局编码表，课程和 NPC 使用本表自己的编码表。
+    列表顺序为 (创建时间, 任务ID)，由 keyset 索引维护。
+    """
+
+    CATEGORICAL_COLUMNS = ('category', 'difficulty', 'status', 'course_code', 'npc_id')
+    STRING_COLUMNS = ('task_id', 'title', 'description', 'location_name', 'prerequisites',
+                      'rewards', 'created_at', 'updated_at')
+
+    def __init__(self, tasks: Iterable[Task]):
+        """
+        从任务对象构建列式表
+
+        Args:
+            tasks: 任务对象列表
+        """
+        tasks = list(tasks)
+        n = len(tasks)
+
+        self.latitude = np.fromiter((t.latitude for t in tasks), dtype=np.float64, count=n)
+        self.longitude = np.fromiter((t.longitude for t in tasks), dtype=np.float64, count=n)
+        self.estimated_duration = np.fromiter((t.estimated_duration for t in tasks), dtype=np.int32, count=n)
+        self.points = np.fromiter((t.points for t in tasks), dtype=np.int32, count=n)
+        self.created_ts = np.fromiter((parse_timestamp(t.created_at) for t in tasks), dtype=np.int64, count=n)
+        self.updated_ts = np.fromiter((parse_timestamp(t.updated_at) for t in tasks), dtype=np.int64, count=n)
+        self.date_indexes: Dict[str, SortedIndex] = {
+            'created_at': SortedIndex(self.created_ts),
+            'updated_at': SortedIndex(self.updated_ts)
+        }
+
+        tables = {
+            'category': CATEGORY_CODES,
+            'difficulty': DIFFICULTY_CODES,
+            'status': STATUS_CODES,
+            'course_code': CodeTable('course_code'),
+            'npc_id': CodeTable('npc_id')
+        }
+        self.categorical: Dict[str, CategoricalColumn] = {
+            name: CategoricalColumn([getattr(t, name) for t in tasks], tables[name])
+            for name in self.CATEGORICAL_COLUMNS
+        }
+        self.strings: Dict[str, StringColumn] = {
+            name: StringColumn([getattr(t, name) for t in tasks])
+            for name in self.STRING_COLUMNS
+        }
+        # 搜索列：小写的 "标题\x00描述"，与原来的 title.lower()/description.lower() 子串匹配一致
+        self._search = StringColumn([
+            f"{t.title}{_SEPARATOR}{t.description}".lower() for t in tasks
+        ])
+        self._row_of = {task_id: row for row, task_id in enumerate(t.task_id for t in tasks)}
+        self.keyset = KeysetIndex(self.created_ts, [t.task_id for t in tasks])
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def row_of(self, task_id: str) -> Optional[int]:
+        """任务ID -> 行号"""
+        return self._row_of.get(task_id)
+
+    def filter(
+        self,
+        category: Optional[Iterable[str]] = None,
+        difficulty: Optional[Iterable[str]] = None,
+        status: Optional[Iterable[str]] = None,
+        course_code: Optional[Iterable[str]] = None,
+        npc_id: Optional[Iterable[str]] = None,
+        created_from: Optional[int] = None,
+        created_to: Optional[int] = None,
+        updated_from: Optional[int] = None,
+        updated_to: Optional[int] = None,
+        search: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        按条件过滤，所有条件取交集
+
+        分类条件通过哈希索引、时间范围通过有序索引得到候选行，从最小的集合开始求交集；
+        比最小集合还大的时间范围不取出，只逐行检查剩下的候选行，关键词条件也只检查候选行，
+        因此耗时取决于结果大小而不是任务总数。
+
+        Args:
+            category/difficulty/status/course_code/npc_id: 可接受的原始取值，None 表示不过滤
+            created_from: 创建时间下限（时间戳，含）
+            created_to: 创建时间上限（时间戳，含）
+            updated_from: 更新时间下限（时间戳，含）
+            updated_to: 更新时间上限（时间戳，含）
+            search: 标题或描述中包含的关键词（不区分大小写）
+
+        Returns:
+            按行号升序排列的命中行
+        """
+        # 分类条件走哈希索引，按集合大小从小到大求交集
+        row_sets = [
+            self.categorical[name].lookup(values)
+            for name, values in (('category', category), ('difficulty', difficulty), ('status', status),
+                                 ('course_code', course_code), ('npc_id', npc_id))
+            if values is not None
+        ]
+
+        # 时间范围：先用二分查找得到各范围的大小，比所有分类集合都小的那个范围直接取出参与求交集
+        date_ranges = [
+            (self.date_indexes[name], start, end)
+            for name, start, end in (('created_at', created_from, created_to),
+                                     ('updated_at', updated_from, updated_to))
+            if start is not None or end is not None
+        ]
+        checked = date_ranges
+        if date_ranges:
+            sizes = [index.bounds(start, end) for index, start, end in date_ranges]
+            smallest = min(range(len(date_ranges)), key=lambda i: sizes[i][1] - sizes[i][0])
+            left, right = sizes[smallest]
+            if not row_sets or right - left < min(len(rows) for rows in row_sets):
+                index, start, end = date_ranges[smallest]
+                row_sets.append(index.range_rows(start, end))
+                checked = date_ranges[:smallest] + date_ranges[smallest + 1:]
+
+        rows = intersect_rows(row_sets) if row_sets else np.arange(len(self), dtype=np.int64)
+        for index, start, end in checked:
+            rows = rows[index.check(rows, start, end)]
+
+        if search and len(rows):
+            # 其他条件已经很有选择性时，只检查剩下的候选行
+            candidates = rows if len(rows) * 8 < len(self) else None
+            rows = rows[self._search.contains(search.lower(), candidates)[rows]]
+
+        return rows
+
+    def matches(
+        self,
+        rows: np.ndarray,
+        category: Optional[Iterable[str]] = None,
+        difficulty: Optional[Iterable[str]] = None,
+        status: Optional[Iterable[str]] = None,
+        course_code: Optional[Iterable[str]] = None,
+        npc_id: Optional[Iterable[str]] = None,
+        created_from: Optional[int] = None,
+        created_to: Optional[int] = None,
+        updated_from: Optional[int] = None,
+        updated_to: Optional[int] = None,
+        search: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        逐行检查给定的行是否满足条件（条件含义与 filter 相同，不使用索引）
+
+        Returns:
+            布尔掩码，与 rows 对齐
+        """
+        keep = np.ones(len(rows), dtype=bool)
+        for name, values in (('category', category), ('difficulty', difficulty), ('status', status),
+                             ('course_code', course_code), ('npc_id', npc_id)):
+            if values is not None:
+                column = self.categorical[name]
+                codes = [code for code in (column.table.lookup(value) for value in values) if code is not None]
+                keep &= np.isin(column.codes[rows], codes)
+        for name, start, end in (('created_at', created_from, created_to),
+                                 ('updated_at', updated_from, updated_to)):
+            if start is not None or end is not None:
+                keep &= self.date_indexes[name].check(rows, start, end)
+        if search:
+            keep &= self._search.contains(search.lower(), rows)[rows]
+        return keep
+
+    def page(self, after: Optional[Tuple[int, str]], size: int, approximate: bool = False,
+             **conditions) -> KeysetPage:
+        """
+        按游标读取一页
+
+        精确模式先通过索引得到全部命中行，再选出游标之后的 size 条；近似模式从游标位置按列表顺序逐块
+        检查，凑够一页即停止，总数为估计值。没有过滤条件时两种模式都直接按位置切片。
+
+        Args:
+            after: 上一页最后一条的排序键（decode_cursor 的结果），None 表示第一页
+            size: 每页大小
+            approximate: 是否使用近似总数模式
+            **conditions: 与 filter 相同的过滤条件
+
+        Returns:
+            KeysetPage
+        """
+        start = self.keyset.position_after(after)
+        if all(value is None for value in conditions.values()):
+            return self.keyset.page(start, size)
+        if approximate:
+            return self.keyset.scan(start, size, lambda rows: self.matches(rows, **conditions))
+        return self.keyset.page(start, size, self.filter(**conditions))
+
+    def value_counts(self, column: str, rows: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """
+        分类列按取值计数
+
+        Args:
+            column: 分类列名
+            rows: 只统计这些行（可选）
+
+        Returns:
+            取值 -> 行数
+        """
+        return self.categorical[column].value_counts(rows)
+
+    def get(self, row: int, column: str) -> Any:
+        """读取单个单元格"""
+        if column in self.categorical:
+            return self.categorical[column][row]
+        if column in self.strings:
+            return self.strings[column][row]
+        return getattr(self, column)[row].item()
+
+    def materialize(self, row: int) -> Task:
+        """
+        从列数据重新构造 Task 对象
+
+        Args:
+            row: 行号
+
+        Returns:
+            任务对象
+        """
+        values = {name: column[row] for name, column in self.strings.items()}
+        values.update({name: column[row] for name, column in self.categorical.items()})
+        return Task(
+            latitude=float(self.latitude[row]),
+            longitude=float(self.longitude[row]),
+            estimated_duration=int(self.estimated_duration[row]),
+            **values
+        )
+
+    def materialize_rows(self, rows: Iterable[int]) -> List[Task]:
+        """批量构造 Task 对象（只用于需要返回的那一页）"""
+        return [self.materialize(int(row)) for row in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储统计信息"""
+        numeric_columns: Tuple[np.ndarray, ...] = (
+            self.latitude, self.longitude, self.estimated_duration, self.points,
+            self.created_ts, self.updated_ts
+        )
+        numeric = sum(array.nbytes for array in numeric_columns)
+        return {
+            'rows': len(self),
+            'numeric_bytes': numeric,
+            'categorical_bytes': sum(c.nbytes for c in self.categorical.values()),
+            'string_bytes': sum(c.nbytes for c in self.strings.values()) + self._search.nbytes,
+            'date_index_bytes': sum(i.order.nbytes + i.sorted_values.nbytes for i in self.date_indexes.values()),
+            'keyset_index_bytes': self.keyset.order.nbytes + self.keyset.rank.nbytes + self.keyset.sorted_keys.nbytes,
+            'created_at_span': self.date_indexes['created_at'].span()
+        }
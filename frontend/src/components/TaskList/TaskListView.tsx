@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useEffect, useRef } from 'react';
 import { List, Tag, Button, Empty, Spin, Avatar } from 'antd';
 import { 
   EnvironmentOutlined, 
@@ -15,6 +15,10 @@ interface TaskListViewProps {
   onTaskSelect?: (task: TaskLocation) => void;
   onTaskAction?: (task: TaskLocation, action: 'view' | 'start') => void;
   selectedTaskId?: string;
+  // 无限滚动：提供 onLoadMore 时不再前端分页，滚动到底部按游标加载下一页
+  hasMore?: boolean;
+  loadingMore?: boolean;
+  onLoadMore?: () => void;
 }
 
 const TaskListView: React.FC<TaskListViewProps> = ({
@@ -22,8 +26,27 @@ const TaskListView: React.FC<TaskListViewProps> = ({
   loading = false,
   onTaskSelect,
   onTaskAction,
-  selectedTaskId
+  selectedTaskId,
+  hasMore = false,
+  loadingMore = false,
+  onLoadMore
 }) => {
+  const sentinelRef = useRef<HTMLDivElement>(null);
+
+  // 底部哨兵进入视口时加载下一页，每页只请求游标之后的固定条数
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !onLoadMore || !hasMore || loadingMore) return;
+
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) {
+        onLoadMore();
+      }
+    });
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [onLoadMore, hasMore, loadingMore, tasks.length]);
+
   const getDifficultyTag = (difficulty: string) => {
     switch (difficulty) {
       case 'easy': return <Tag color="green">⭐ 简单</Tag>;
@@ -82,7 +105,7 @@ const TaskListView: React.FC<TaskListViewProps> = ({
         size="small"
         dataSource={tasks}
         header={<div className="text-text-primary px-4 pt-2 font-semibold">{`任务列表 (${tasks.length})`}</div>}
-        pagination={{
+        pagination={onLoadMore ? false : {
           pageSize: 5,
           size: 'small',
           showSizeChanger: false,
@@ -90,6 +113,17 @@ const TaskListView: React.FC<TaskListViewProps> = ({
           showTotal: (total, range) => 
             <span className="text-text-muted">{`第 ${range[0]}-${range[1]} 项，共 ${total} 个任务`}</span>
         }}
+        loadMore={onLoadMore && hasMore ? (
+          <div ref={sentinelRef} className="text-center py-3">
+            {loadingMore ? (
+              <Spin size="small" />
+            ) : (
+              <Button type="link" size="small" onClick={onLoadMore}>
+                加载更多
+              </Button>
+            )}
+          </div>
+        ) : undefined}
         renderItem={(task) => {
           const isSelected = selectedTaskId === task.task_id;
 
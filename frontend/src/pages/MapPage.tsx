@@ -13,16 +13,25 @@ import MapLegend from '../components/Map/MapLegend';
 import TaskFilters, { FilterState } from '../components/Filters/TaskFilters';
 import TaskListView from '../components/TaskList/TaskListView';
 import { seedTasks, TaskLocation, CITYU_CENTER } from '../data/seedTasks';
-import { filterTasks, getUniqueValues, getAvailableCourses, debounceFilter } from '../utils/filterUtils';
+import { filterTasks, hasActiveFilters, getUniqueValues, getAvailableCourses, debounceFilter } from '../utils/filterUtils';
 import TaskDrawer from '../components/Task/TaskDrawer';
 
+// /tasks 的任务类别 -> 地图使用的类别
+const CATEGORY_MAP: Record<string, 'academic' | 'social' | 'campus'> = {
+  course: 'academic',
+  academic: 'academic',
+  activity: 'social',
+  social: 'social',
+  orientation: 'campus'
+};
+
 // Data adapter: Transform API response to TaskLocation format
 const transformApiDataToTaskLocation = (apiTasks: any[]): TaskLocation[] => {
   return apiTasks.map((task, index) => ({
     task_id: task.task_id || `api-${index}`,
     title: task.title || '未命名任务',
     description: task.description || '暂无描述',
-    category: task.category as 'academic' | 'social' | 'campus' || 'campus',
+    category: CATEGORY_MAP[task.category] || 'campus',
     difficulty: task.difficulty as 'easy' | 'medium' | 'hard' || 'medium',
     status: task.status as 'available' | 'in_progress' | 'completed' || 'available',
     location: task.location || {
@@ -30,16 +39,26 @@ const transformApiDataToTaskLocation = (apiTasks: any[]): TaskLocation[] => {
       lng: CITYU_CENTER.lng + (Math.random() - 0.5) * 0.01,
       name: task.location?.name || '校园位置'
     },
-    rewards: task.rewards,
-    estimatedTime: task.estimatedTime || task.estimated_time,
-    course: task.course,
-    dueDate: task.dueDate || task.due_date,
-    createdAt: task.createdAt || task.created_at,
-    created_at: task.created_at || task.createdAt,
-    due_date: task.due_date || task.dueDate
+    rewards: task.points ? [`${task.points}积分`] : undefined,
+    estimatedTime: task.estimated_duration,
+    course: task.course_code || undefined,
+    dueDate: task.updated_at,
+    createdAt: task.created_at,
+    created_at: task.created_at,
+    due_date: task.updated_at
   }));
 };
 
+// 任务列表每次按游标请求的条数
+const PAGE_SIZE = 50;
+// 地图沿游标分批拉取全部任务时每批的条数（/tasks 每页最多 100 条）
+const MAP_BATCH_SIZE = 100;
+
+interface TaskPage {
+  tasks: TaskLocation[];
+  nextCursor: string | null;
+}
+
 const MapPage: React.FC = () => {
   const [filters, setFilters] = useState<FilterState>({
     categories: [],
@@ -58,10 +77,67 @@ const MapPage: React.FC = () => {
   const [drawerOpen, setDrawerOpen] = useState(false);
   const [drawerVisible, setDrawerVisible] = useState(false);
 
-  // Data source management
+  // Data source management: the map, statistics and filter options use every task;
+  // the list pages through the same endpoint with a cursor
   const [tasks, setTasks] = useState<TaskLocation[]>(seedTasks);
+  const [listTasks, setListTasks] = useState<TaskLocation[]>(seedTasks);
   const [dataSource, setDataSource] = useState<'api' | 'local' | 'loading'>('loading');
   const [dataError, setDataError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // How many filtered tasks the list shows while filters are active
+  const [filteredLimit, setFilteredLimit] = useState(PAGE_SIZE);
+
+  // Fetch one page after the given cursor (empty string starts from the beginning)
+  const fetchTaskPage = useCallback(async (cursor: string, size: number = PAGE_SIZE): Promise<TaskPage> => {
+    const params = new URLSearchParams({ size: String(size), cursor });
+    const response = await fetch(`/api/tasks?${params.toString()}`, {
+      method: 'GET',
+      headers: { 'Content-Type': 'application/json' },
+    });
+    
+    if (!response.ok) {
+      throw new Error(`API响应错误: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    if (!Array.isArray(data.data) || !data.meta) {
+      throw new Error('API数据格式错误');
+    }
+    
+    return {
+      tasks: transformApiDataToTaskLocation(data.data),
+      nextCursor: (data.meta.next_cursor as string | null) ?? null
+    };
+  }, []);
+
+  // Markers, clustering and statistics need the full task set: follow the cursor until the last batch
+  const fetchAllTasks = useCallback(async () => {
+    const all: TaskLocation[] = [];
+    let cursor: string | null = '';
+    while (cursor !== null) {
+      const page = await fetchTaskPage(cursor, MAP_BATCH_SIZE);
+      all.push(...page.tasks);
+      cursor = page.nextCursor;
+    }
+    return all;
+  }, [fetchTaskPage]);
+
+  // List infinite scroll: append the next page, each request costs one page regardless of depth
+  const loadMoreTasks = useCallback(async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchTaskPage(nextCursor);
+      setListTasks((current) => [...current, ...page.tasks]);
+      setNextCursor(page.nextCursor);
+    } catch (error) {
+      console.warn('⚠️ 加载更多任务失败:', error);
+      message.error('加载更多任务失败');
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextCursor, loadingMore, fetchTaskPage]);
 
   // Data fetching with graceful fallback
   useEffect(() => {
@@ -70,28 +146,18 @@ const MapPage: React.FC = () => {
         setDataSource('loading');
         setDataError(null);
         
-        const response = await fetch('/api/tasks', {
-          method: 'GET',
-          headers: { 'Content-Type': 'application/json' },
-        });
-        
-        if (!response.ok) {
-          throw new Error(`API响应错误: ${response.status}`);
-        }
-        
-        const data = await response.json();
-        if (!data.success || !Array.isArray(data.data)) {
-          throw new Error('API数据格式错误');
-        }
-        
-        const transformedTasks = transformApiDataToTaskLocation(data.data);
-        setTasks(transformedTasks);
+        const [allTasks, page] = await Promise.all([fetchAllTasks(), fetchTaskPage('')]);
+        setTasks(allTasks);
+        setListTasks(page.tasks);
+        setNextCursor(page.nextCursor);
         setDataSource('api');
         console.log('✅ 地图数据来源: 后端CSV API');
         
       } catch (error) {
         console.warn('⚠️ API获取失败，降级到本地数据:', error);
         setTasks(seedTasks);
+        setListTasks(seedTasks);
+        setNextCursor(null);
         setDataSource('local');
         setDataError(error instanceof Error ? error.message : '未知错误');
       }
@@ -100,7 +166,7 @@ const MapPage: React.FC = () => {
     // Delay to avoid immediate error flash
     const timer = setTimeout(fetchTasks, 500);
     return () => clearTimeout(timer);
-  }, []);
+  }, [fetchAllTasks, fetchTaskPage]);
 
   // Get unique values for filters (now based on dynamic tasks)
   const categories = useMemo(() => getUniqueValues(tasks, 'category'), [tasks]);
@@ -137,6 +203,31 @@ const MapPage: React.FC = () => {
     return result;
   }, [tasks, filters]);
 
+  // Without filters the list pages through /tasks with the cursor. With filters, filtering only the pages
+  // loaded so far would hide matches further down, so the list shows the filtered full task set
+  // (already loaded for the map) and grows it locally one page at a time
+  const filtersActive = useMemo(() => hasActiveFilters(filters), [filters]);
+
+  useEffect(() => {
+    setFilteredLimit(PAGE_SIZE);
+  }, [filters]);
+
+  const visibleListTasks = useMemo(
+    () => (filtersActive ? filteredTasks.slice(0, filteredLimit) : listTasks),
+    [filtersActive, filteredTasks, filteredLimit, listTasks]
+  );
+  const listHasMore = filtersActive
+    ? filteredLimit < filteredTasks.length
+    : dataSource === 'api' && nextCursor !== null;
+
+  const handleListLoadMore = useCallback(() => {
+    if (filtersActive) {
+      setFilteredLimit((limit) => limit + PAGE_SIZE);
+    } else {
+      loadMoreTasks();
+    }
+  }, [filtersActive, loadMoreTasks]);
+
   // Statistics
   const stats = useMemo(() => {
     const total = filteredTasks.length;
@@ -351,11 +442,14 @@ const MapPage: React.FC = () => {
           <Col xs={24} lg={viewMode === 'split' ? 12 : 24}>
             <NeonCard className="p-2">
               <TaskListView
-                tasks={filteredTasks}
+                tasks={visibleListTasks}
                 loading={isFiltering}
                 onTaskSelect={handleTaskSelect}
                 onTaskAction={handleTaskAction}
                 selectedTaskId={selectedTask?.task_id}
+                hasMore={listHasMore}
+                loadingMore={!filtersActive && loadingMore}
+                onLoadMore={handleListLoadMore}
               />
             </NeonCard>
           </Col>
@@ -112,6 +112,16 @@ export const filterTasks = (tasks: TaskLocation[], filters: FilterState): TaskLo
   });
 };
 
+// Whether any filter narrows the task set (the default FilterState matches every task)
+export const hasActiveFilters = (filters: FilterState): boolean => {
+  return filters.categories.length > 0 ||
+    filters.difficulties.length > 0 ||
+    filters.statuses.length > 0 ||
+    filters.courses.length > 0 ||
+    filters.timeRange !== 'all' ||
+    filters.searchText.length > 0;
+};
+
 export const getUniqueValues = (
   tasks: TaskLocation[], 
   field: 'category' | 'difficulty' | 'status'
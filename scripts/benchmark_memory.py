@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+任务数据内存基准测试脚本
+把 data/tasks.csv 和 data/task_kb.jsonl 复制扩充到指定条数，分别用原来的普通 dataclass 布局
+和当前的 __slots__ + 字符串驻留布局构建记录，用 tracemalloc 统计每条记录占用的字节数。
+每个 worker 进程都持有完整的任务目录，因此这里的差值会按 worker 数成倍放大。
+"""
+import sys
+import os
+import io
+import csv
+import gc
+import json
+import re
+import logging
+import argparse
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from data_loader import Task, TaskKnowledge
+
+# 测试配置
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+DEFAULT_TASKS = os.path.join(DATA_DIR, 'tasks.csv')
+DEFAULT_KNOWLEDGE = os.path.join(DATA_DIR, 'task_kb.jsonl')
+DEFAULT_COUNT = 10000
+
+
+@dataclass
+class LegacyTask:
+    """改造前的任务布局：普通 dataclass，字符串不驻留，积分每次访问时解析"""
+    task_id: str
+    title: str
+    description: str
+    category: str
+    location_name: str
+    latitude: float
+    longitude: float
+    difficulty: str
+    estimated_duration: int
+    prerequisites: str
+    rewards: str
+    status: str
+    created_at: str
+    updated_at: str
+    npc_id: str
+    course_code: str
+
+    def __post_init__(self):
+        self.latitude = float(self.latitude)
+        self.longitude = float(self.longitude)
+        self.estimated_duration = int(self.estimated_duration)
+
+    @property
+    def points(self) -> int:
+        match = re.search(r'(\d+)', self.rewards or '')
+        return int(match.group(1)) if match else 0
+
+
+@dataclass
+class LegacyTaskKnowledge:
+    """改造前的知识库布局"""
+    task_id: str
+    knowledge_type: str
+    content: str
+    tags: List[str]
+    difficulty: str
+    estimated_time: int
+    course_code: str
+
+
+def expand_tasks_csv(path: str, count: int) -> str:
+    """
+    把任务 CSV 循环复制到 count 行，任务ID和标题加序号保证唯一
+
+    Returns:
+        CSV 文本（每次解析都会生成新的字符串对象，与真实加载一致）
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=list(rows[0].keys()))
+    writer.writeheader()
+    for i in range(count):
+        row = dict(rows[i % len(rows)])
+        row['task_id'] = f"NT{i + 1:06d}"
+        row['title'] = f"{row['title']} #{i + 1}"
+        writer.writerow(row)
+    return out.getvalue()
+
+
+def expand_knowledge_jsonl(path: str, count: int) -> str:
+    """把知识库 JSONL 循环复制到 count 行，任务ID加序号保证唯一"""
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    lines = []
+    for i in range(count):
+        entry = dict(entries[i % len(entries)])
+        entry['task_id'] = f"T{i + 1:06d}"
+        lines.append(json.dumps(entry, ensure_ascii=False))
+    return "\n".join(lines)
+
+
+def measure(build: Callable[[], List[Any]]) -> Dict[str, Any]:
+    """
+    统计构建的记录保留下来的内存（解析过程中的临时对象在统计前释放）
+
+    Returns:
+        {'records', 'bytes', 'bytes_per_record'}
+    """
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    records = build()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return {
+        'records': len(records),
+        'bytes': retained,
+        'bytes_per_record': round(retained / len(records), 1) if records else 0.0
+    }
+
+
+def build_tasks(csv_text: str, cls) -> Callable[[], List[Any]]:
+    def build():
+        return [cls(**row) for row in csv.DictReader(io.StringIO(csv_text))]
+    return build
+
+
+def build_knowledge(jsonl_text: str, cls) -> Callable[[], List[Any]]:
+    def build():
+        return [cls(**json.loads(line)) for line in jsonl_text.splitlines()]
+    return build
+
+
+def compare(name: str, legacy: Dict[str, Any], compact: Dict[str, Any]) -> Dict[str, Any]:
+    before, after = legacy['bytes_per_record'], compact['bytes_per_record']
+    return {
+        'name': name,
+        'records': compact['records'],
+        'before_bytes_per_record': before,
+        'after_bytes_per_record': after,
+        'reduction': round(1 - after / before, 4) if before else 0.0,
+        'before_total_mb': round(legacy['bytes'] / 1024 / 1024, 2),
+        'after_total_mb': round(compact['bytes'] / 1024 / 1024, 2)
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print(f"{'记录类型':<16}{'条数':>8}{'改造前 B/条':>14}{'改造后 B/条':>14}{'减少':>10}")
+    for r in results:
+        print(f"{r['name']:<16}{r['records']:>8}{r['before_bytes_per_record']:>14.1f}"
+              f"{r['after_bytes_per_record']:>14.1f}{r['reduction']:>10.1%}")
+
+
+def main() -> int:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="任务数据内存基准测试")
+    parser.add_argument("--tasks", default=DEFAULT_TASKS, help="任务 CSV 文件")
+    parser.add_argument("--knowledge", default=DEFAULT_KNOWLEDGE, help="知识库 JSONL 文件")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT, help="扩充后的记录条数")
+    parser.add_argument("--output", help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    csv_text = expand_tasks_csv(args.tasks, args.count)
+    jsonl_text = expand_knowledge_jsonl(args.knowledge, args.count)
+
+    results = [
+        compare('Task',
+                measure(build_tasks(csv_text, LegacyTask)),
+                measure(build_tasks(csv_text, Task))),
+        compare('TaskKnowledge',
+                measure(build_knowledge(jsonl_text, LegacyTaskKnowledge)),
+                measure(build_knowledge(jsonl_text, TaskKnowledge)))
+    ]
+    print_report(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+RAG 离线基准测试脚本
+在进程内直接驱动 RAGService（使用 MockLLMService），不依赖 HTTP 服务和真实 LLM，
+报告吞吐量、延迟百分位、重试次数、缓存命中率和检索召回率。
+相同的种子和参数生成相同的请求序列，便于比较检索、缓存或 LLM 网关改动前后的结果。
+"""
+import sys
+import os
+import asyncio
+import time
+import json
+import random
+import logging
+import argparse
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from config import app_config, MockLLMConfig
+from data_loader import DataLoader
+from llm_gateway import LLMGateway
+from rag import KnowledgeRetriever, MockLLMService, RAGService
+from stage_timing import get_stage_stats, reset_stage_stats
+
+# 测试配置
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+DEFAULT_CORPUS = os.path.join(DATA_DIR, 'rag_benchmark_questions.jsonl')
+DEFAULT_KNOWLEDGE = os.path.join(DATA_DIR, 'task_kb.jsonl')
+DEFAULT_TOTAL_REQUESTS = 2000
+DEFAULT_CONCURRENCY = 50
+DEFAULT_SEED = 42
+
+# 与基线对比时关注的指标：(报告中的路径, 是否越大越好)
+COMPARE_METRICS = [
+    ('throughput_rps', True),
+    ('latency.p50', False),
+    ('latency.p95', False),
+    ('latency.p99', False),
+    ('success_rate', True),
+    ('llm.calls', False),
+    ('llm.retries', False),
+    ('answer_cache.hit_rate', True),
+    ('retrieval.recall', True),
+]
+
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    """
+    加载带标注的问题集
+
+    每行一个 JSON 对象：task_id、question、variants（同义改写，可选）、
+    relevant（应出现在检索片段中的短语，为空表示知识库中没有答案）。
+
+    Args:
+        path: JSONL 文件路径
+
+    Returns:
+        问题条目列表
+    """
+    corpus = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                corpus.append(json.loads(line))
+    return corpus
+
+
+def load_knowledge(path: str) -> Dict[str, Any]:
+    """使用数据加载器加载知识库（包含与服务相同的校验和去重）"""
+    loader = DataLoader()
+    if not loader.load_knowledge_jsonl(path):
+        raise RuntimeError(f"知识库加载失败: {path}")
+    return loader.task_knowledge
+
+
+def build_task_info(task_id: str, knowledge: Any) -> Dict[str, Any]:
+    """根据知识条目构造提示词所需的任务信息"""
+    return {
+        'task_id': task_id,
+        'title': getattr(knowledge, 'title', ''),
+        'description': getattr(knowledge, 'title', ''),
+        'location_name': ''
+    }
+
+
+def generate_workload(corpus: List[Dict[str, Any]], total: int, seed: int,
+                      popularity: str = 'zipf', variant_rate: float = 0.3) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    按种子生成请求序列
+
+    Args:
+        corpus: 问题条目列表
+        total: 请求总数
+        seed: 随机种子
+        popularity: 'zipf'（少数问题被频繁提问）或 'uniform'
+        variant_rate: 使用同义改写代替原问题的比例
+
+    Returns:
+        (问题条目, 实际提问文本) 列表
+    """
+    rng = random.Random(seed)
+    order = list(range(len(corpus)))
+    rng.shuffle(order)
+    if popularity == 'zipf':
+        weights = [1.0 / (rank + 1) for rank in range(len(order))]
+    else:
+        weights = [1.0] * len(order)
+
+    workload = []
+    for index in rng.choices(order, weights=weights, k=total):
+        entry = corpus[index]
+        question = entry['question']
+        variants = entry.get('variants') or []
+        if variants and rng.random() < variant_rate:
+            question = rng.choice(variants)
+        workload.append((entry, question))
+    return workload
+
+
+def evaluate_retrieval(retriever: KnowledgeRetriever, corpus: List[Dict[str, Any]], top_k: int = 3) -> Dict[str, Any]:
+    """
+    按标注短语评估检索召回率
+
+    对每个问题及其改写检索 top_k 个片段，召回率为标注短语出现在片段中的比例；
+    未标注短语的问题用于统计误检（知识库没有答案却检索到片段）。
+
+    Args:
+        retriever: 知识检索器
+        corpus: 问题条目列表
+        top_k: 检索片段数量
+
+    Returns:
+        检索质量统计
+    """
+    recalls = []
+    hits = 0
+    negatives = 0
+    false_positives = 0
+    for entry in corpus:
+        relevant = entry.get('relevant') or []
+        for question in [entry['question']] + list(entry.get('variants') or []):
+            chunks = retriever.search_relevant_chunks(entry['task_id'], question, top_k=top_k)
+            text = "\n".join(chunk.get('content', '') for chunk in chunks)
+            if not relevant:
+                negatives += 1
+                false_positives += 1 if chunks else 0
+                continue
+            found = sum(1 for phrase in relevant if phrase in text)
+            recalls.append(found / len(relevant))
+            hits += 1 if found else 0
+
+    return {
+        'labelled_questions': len(recalls),
+        'recall': round(sum(recalls) / len(recalls), 4) if recalls else None,
+        'hit_rate': round(hits / len(recalls), 4) if recalls else None,
+        'unanswerable_questions': negatives,
+        'false_positive_rate': round(false_positives / negatives, 4) if negatives else None
+    }
+
+
+def percentile(data: List[float], p: float) -> Optional[float]:
+    """计算百分位数（线性插值），p 为 0-100"""
+    if not data:
+        return None
+    ordered = sorted(data)
+    index = (p / 100) * (len(ordered) - 1)
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def get_path(report: Dict[str, Any], path: str) -> Any:
+    """按点分隔路径读取报告中的值"""
+    value: Any = report
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+class RAGBenchmark:
+    """进程内 RAG 基准测试"""
+
+    def __init__(self, knowledge: Dict[str, Any], llm_service: MockLLMService,
+                 gateway: Optional[LLMGateway] = None, hedge: bool = True):
+        """
+        初始化基准测试
+
+        Args:
+            knowledge: 知识库数据
+            llm_service: 模拟 LLM 服务
+            gateway: LLM 并发网关（可选，默认按配置创建）
+            hedge: 是否启用对冲请求
+        """
+        self.retriever = KnowledgeRetriever()
+        self.retriever.load_knowledge_base(knowledge)
+        self.task_infos = {task_id: build_task_info(task_id, item) for task_id, item in knowledge.items()}
+        self.llm_service = llm_service
+        self.service = RAGService(self.retriever, llm_service, gateway=gateway)
+        self.service.hedge_config.enabled = hedge
+        # 回退结果的 uncertain_reason -> 结果类型
+        self.fallback_outcomes = {
+            self.service._timeout_result().uncertain_reason: 'timeout',
+            self.service._unavailable_result().uncertain_reason: 'unavailable',
+            self.service._busy_result().uncertain_reason: 'busy',
+            self.service._error_result().uncertain_reason: 'error'
+        }
+        self.samples: List[Dict[str, Any]] = []
+        self.wall_time = 0.0
+
+    async def run(self, workload: List[Tuple[Dict[str, Any], str]], concurrency: int,
+                  progress: bool = True):
+        """
+        以固定并发数（闭环客户端）执行请求序列
+
+        Args:
+            workload: 请求序列
+            concurrency: 并发客户端数
+            progress: 是否打印进度
+        """
+        reset_stage_stats()
+        next_index = 0
+        step = max(1, len(workload) // 10)
+
+        async def client():
+            nonlocal next_index
+            while next_index < len(workload):
+                entry, question = workload[next_index]
+                next_index += 1
+                task_id = entry['task_id']
+                start = time.perf_counter()
+                result = await self.service.process_chat_request(
+                    task_id, question, self.task_infos.get(task_id, {'task_id': task_id})
+                )
+                self.samples.append({
+                    'latency': time.perf_counter() - start,
+                    'outcome': self.fallback_outcomes.get(result.uncertain_reason, 'ok')
+                })
+                if progress and len(self.samples) % step == 0:
+                    print(f"已完成: {len(self.samples)}/{len(workload)} ({len(self.samples) / len(workload) * 100:.0f}%)")
+
+        start_time = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(max(1, concurrency))))
+        self.wall_time = time.perf_counter() - start_time
+
+    def generate_report(self, corpus: List[Dict[str, Any]], settings: Dict[str, Any]) -> Dict[str, Any]:
+        """生成测试报告"""
+        latencies = [s['latency'] for s in self.samples]
+        ok_latencies = [s['latency'] for s in self.samples if s['outcome'] == 'ok']
+        outcomes: Dict[str, int] = {}
+        for sample in self.samples:
+            outcomes[sample['outcome']] = outcomes.get(sample['outcome'], 0) + 1
+
+        llm_stats = self.service.get_llm_stats()
+        cache_stats = self.service.get_cache_stats() or {}
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'settings': settings,
+            'requests': len(self.samples),
+            'wall_time': round(self.wall_time, 3),
+            'throughput_rps': round(len(self.samples) / self.wall_time, 2) if self.wall_time else 0.0,
+            'success_rate': round(outcomes.get('ok', 0) / len(self.samples), 4) if self.samples else 0.0,
+            'outcomes': outcomes,
+            'latency': self._latency_summary(latencies),
+            'latency_ok': self._latency_summary(ok_latencies),
+            'llm': {
+                'calls': self.llm_service.call_count,
+                'attempts': llm_stats['attempts'],
+                'retries': llm_stats['retries'],
+                'hedges_fired': llm_stats['hedges_fired'],
+                'hedge_wins': llm_stats['hedge_wins'],
+                'breaker_rejections': llm_stats['breaker_rejections'],
+                'max_active_calls': self.llm_service.max_active_calls
+            },
+            'answer_cache': {
+                key: cache_stats.get(key)
+                for key in ('lookups', 'hits', 'hit_rate', 'exact_hit_rate', 'semantic_hit_rate', 'size')
+            },
+            'retrieval': evaluate_retrieval(self.retriever, corpus),
+            'stages': {
+                stage: {key: stats[key] for key in ('count', 'p50_ms', 'p95_ms', 'p99_ms')}
+                for stage, stats in get_stage_stats().items()
+            },
+            'gateway': self.service.gateway.get_stats() if self.service.gateway else None
+        }
+
+    @staticmethod
+    def _latency_summary(latencies: List[float]) -> Dict[str, Optional[float]]:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 4)
+        return {
+            'avg': rounded(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': rounded(percentile(latencies, 50)),
+            'p95': rounded(percentile(latencies, 95)),
+            'p99': rounded(percentile(latencies, 99)),
+            'max': rounded(max(latencies)) if latencies else None
+        }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    """打印测试报告，提供基线报告时同时打印关键指标的变化"""
+    print("\n" + "=" * 60)
+    print("RAG 离线基准测试报告")
+    print("=" * 60)
+
+    latency = report['latency']
+    print("\n📊 负载:")
+    print(f"  请求数: {report['requests']}  耗时: {report['wall_time']:.2f}s  吞吐量: {report['throughput_rps']:.1f} req/s")
+    print(f"  成功率: {report['success_rate'] * 100:.1f}%  结果分布: {report['outcomes']}")
+    if latency['p50'] is not None:
+        print(f"  延迟 P50/P95/P99: {latency['p50']:.3f}s / {latency['p95']:.3f}s / {latency['p99']:.3f}s")
+
+    llm = report['llm']
+    print("\n🤖 LLM:")
+    print(f"  调用次数: {llm['calls']}  尝试次数: {llm['attempts']}  重试次数: {llm['retries']}")
+    print(f"  对冲: {llm['hedges_fired']} (胜出 {llm['hedge_wins']})  熔断拒绝: {llm['breaker_rejections']}")
+
+    cache = report['answer_cache']
+    if cache.get('lookups') is not None:
+        print("\n💾 回答缓存:")
+        print(f"  命中率: {cache['hit_rate'] * 100:.1f}% (精确 {cache['exact_hit_rate'] * 100:.1f}%, 相似 {cache['semantic_hit_rate'] * 100:.1f}%)")
+
+    retrieval = report['retrieval']
+    print("\n🔍 检索质量:")
+    print(f"  标注问题数: {retrieval['labelled_questions']}  召回率: {retrieval['recall']}  命中率: {retrieval['hit_rate']}")
+    print(f"  无答案问题误检率: {retrieval['false_positive_rate']}")
+
+    print("\n⏱️  分阶段耗时 (P50/P95 ms):")
+    for stage, stats in report['stages'].items():
+        print(f"  {stage:<14} {stats['count']:>6}  {stats['p50_ms']} / {stats['p95_ms']}")
+
+    if baseline:
+        print("\n📈 与基线对比:")
+        for path, higher_is_better in COMPARE_METRICS:
+            old, new = get_path(baseline, path), get_path(report, path)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            better = (new > old) == higher_is_better if new != old else None
+            mark = "" if better is None else ("✅" if better else "❌")
+            print(f"  {path:<24} {old:>10} → {new:<10} ({change:+.1f}%) {mark}")
+
+    print("\n" + "=" * 60)
+
+
+async def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="RAG 离线基准测试（MockLLMService）")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="带标注的问题集（JSONL）")
+    parser.add_argument("--knowledge", default=DEFAULT_KNOWLEDGE, help="知识库文件（JSONL）")
+    parser.add_argument("--total", type=int, default=DEFAULT_TOTAL_REQUESTS, help="总请求数")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="并发客户端数")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="随机种子")
+    parser.add_argument("--popularity", choices=["zipf", "uniform"], default="zipf", help="问题热度分布")
+    parser.add_argument("--variant-rate", type=float, default=0.3, help="使用同义改写提问的比例")
+    parser.add_argument("--latency-model", choices=["uniform", "lognormal", "bimodal", "trace"],
+                        default="uniform", help="模拟 LLM 首字延迟模型")
+    parser.add_argument("--min-delay", type=float, default=0.5, help="uniform 延迟下限（秒）")
+    parser.add_argument("--max-delay", type=float, default=2.0, help="uniform 延迟上限（秒）")
+    parser.add_argument("--median-delay", type=float, default=1.0, help="lognormal/bimodal 延迟中位数（秒）")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal/bimodal 对数标准差")
+    parser.add_argument("--slow-rate", type=float, default=0.02, help="慢调用比例")
+    parser.add_argument("--slow-delay", type=float, default=8.0, help="慢调用延迟（秒）")
+    parser.add_argument("--trace-file", default="", help="trace 模型回放的延迟记录文件")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="模拟生成速度，0 表示不计生成时间")
+    parser.add_argument("--slowdown-per-call", type=float, default=0.0, help="并发超过阈值后每个调用增加的延迟比例")
+    parser.add_argument("--slowdown-threshold", type=int, default=1, help="不产生减速的并发调用数")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="模拟失败率")
+    parser.add_argument("--gateway-concurrency", type=int, help="LLM 网关最大并发（默认使用配置）")
+    parser.add_argument("--no-cache", action="store_true", help="禁用回答缓存")
+    parser.add_argument("--no-hedge", action="store_true", help="禁用对冲请求")
+    parser.add_argument("--baseline", help="基线报告文件，用于对比关键指标")
+    parser.add_argument("--output", help="输出报告文件路径")
+    parser.add_argument("--verbose", action="store_true", help="输出服务日志")
+
+    args = parser.parse_args()
+    # 后端模块导入时已配置日志；默认关闭服务日志，避免大量输出影响测试结果
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    if args.no_cache:
+        app_config.answer_cache.enabled = False
+
+    corpus = load_corpus(args.corpus)
+    workload = generate_workload(corpus, args.total, args.seed, args.popularity, args.variant_rate)
+    # 固定种子使模拟 LLM 的延迟和失败序列可复现
+    llm_service = MockLLMService.from_config(MockLLMConfig(
+        latency_model=args.latency_model,
+        min_delay=args.min_delay,
+        max_delay=args.max_delay,
+        median_delay=args.median_delay,
+        sigma=args.sigma,
+        slow_rate=args.slow_rate,
+        slow_delay=args.slow_delay,
+        trace_file=args.trace_file,
+        tokens_per_second=args.tokens_per_second,
+        slowdown_per_call=args.slowdown_per_call,
+        slowdown_threshold=args.slowdown_threshold,
+        failure_rate=args.failure_rate,
+        seed=args.seed
+    ))
+    gateway = None
+    if args.gateway_concurrency:
+        gateway = LLMGateway(
+            max_concurrency=args.gateway_concurrency,
+            max_queue_size=app_config.llm_gateway.max_queue_size
+        )
+
+    benchmark = RAGBenchmark(load_knowledge(args.knowledge), llm_service, gateway=gateway,
+                             hedge=not args.no_hedge)
+    settings = {
+        **{key: value for key, value in vars(args).items() if key not in ('baseline', 'output', 'verbose')},
+        'corpus_size': len(corpus),
+        'app_config': {
+            key: app_config.to_dict()[key]
+            for key in ('timeout', 'retry', 'answer_cache', 'hedge', 'circuit_breaker', 'llm_gateway', 'prompt')
+        }
+    }
+
+    print("开始 RAG 离线基准测试...")
+    print(f"问题集: {len(corpus)} 条  请求数: {args.total}  并发: {args.concurrency}  种子: {args.seed}")
+    print("-" * 50)
+
+    try:
+        await benchmark.run(workload, args.concurrency)
+    except KeyboardInterrupt:
+        print("\n测试被用户中断")
+        return 1
+
+    report = benchmark.generate_report(corpus, settings)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 报告已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,294 @@
+"""
+NPC 聊天回答缓存测试
+"""
+import sys
+import os
+import threading
+import time
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from answer_cache import AnswerCache, normalize_question, char_ngram_vector, cosine_similarity
+from rag import KnowledgeRetriever, MockLLMService, RAGService
+
+
+TEST_KNOWLEDGE = {
+    'T001': {
+        'knowledge_type': 'guide',
+        'title': '图书馆文献检索指南',
+        'content': '文献检索步骤：1. 确定检索主题和关键词 2. 选择合适的数据库 3. 构建检索策略',
+        'tags': ['research', 'library']
+    },
+    'T002': {
+        'knowledge_type': 'safety_guide',
+        'title': '实验室安全指南',
+        'content': '进入实验室前必须完成安全培训，穿戴防护装备。',
+        'tags': ['safety']
+    }
+}
+
+TASK_INFO = {
+    'task_id': 'T001',
+    'title': '图书馆文献检索',
+    'description': '在图书馆完成指定主题的文献检索任务',
+    'category': 'academic',
+    'location_name': '邵逸夫图书馆',
+    'location_lat': 22.3364,
+    'location_lng': 114.2654
+}
+
+
+class TestAnswerCache:
+    """回答缓存测试"""
+
+    def test_normalize_question(self):
+        """测试问题规范化"""
+        assert normalize_question("  如何进行文献检索？ ") == "如何进行文献检索"
+        assert normalize_question("How   to Search?") == "how to search"
+
+    def test_similarity(self):
+        """测试相似度计算"""
+        a = char_ngram_vector(normalize_question("如何进行文献检索"))
+        b = char_ngram_vector(normalize_question("怎样进行文献检索"))
+        c = char_ngram_vector(normalize_question("实验室在哪里"))
+        assert cosine_similarity(a, a) == pytest.approx(1.0)
+        assert cosine_similarity(a, b) > cosine_similarity(a, c)
+
+    def test_exact_hit(self):
+        """测试精确匹配命中"""
+        cache = AnswerCache(semantic_enabled=False)
+        cache.put('T001', '如何进行文献检索？', {'answer': 'A'})
+
+        assert cache.get('T001', '如何进行文献检索') == {'answer': 'A'}
+        assert cache.get('T002', '如何进行文献检索') is None
+
+        stats = cache.get_stats()
+        assert stats['exact_hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_semantic_hit(self):
+        """测试相似问题命中"""
+        cache = AnswerCache(semantic_enabled=True, similarity_threshold=0.7)
+        cache.put('T001', '如何进行文献检索的步骤', {'answer': 'A'})
+
+        assert cache.get('T001', '文献检索的步骤如何进行') == {'answer': 'A'}
+        assert cache.get('T001', '实验室在哪里') is None
+        assert cache.get_stats()['semantic_hits'] == 1
+
+    def test_semantic_disabled_by_default(self):
+        """测试默认只做精确匹配"""
+        cache = AnswerCache()
+        cache.put('T001', '如何进行文献检索的步骤', {'answer': 'A'})
+        assert cache.get('T001', '如何进行文献检索的步骤?') == {'answer': 'A'}
+        assert cache.get('T001', '文献检索的步骤如何进行') is None
+
+    @pytest.mark.parametrize("cached, asked", [
+        ("完成这个任务之后我可以去哪里吃饭", "完成这个任务之前我可以去哪里吃饭"),
+        ("这个任务周末可以做吗", "这个任务周末不可以做吗"),
+        ("任务地点在哪里", "任务地点不在哪里"),
+    ])
+    def test_opposite_questions_do_not_hit(self, cached, asked):
+        """测试字面相近但否定或时间不同的问题不会命中，即使放宽阈值"""
+        a = char_ngram_vector(normalize_question(cached))
+        b = char_ngram_vector(normalize_question(asked))
+        assert cosine_similarity(a, b) > 0.85
+
+        cache = AnswerCache(semantic_enabled=True, similarity_threshold=0.8)
+        cache.put('T001', cached, {'answer': 'A'})
+        assert cache.get('T001', asked) is None
+        assert cache.get_stats()['semantic_hits'] == 0
+
+    def test_guard_terms_allow_rephrasing(self):
+        """测试否定词和时间词一致时仍可相似命中"""
+        cache = AnswerCache(semantic_enabled=True, similarity_threshold=0.7)
+        cache.put('T001', '这个任务周末不可以做吗', {'answer': 'A'})
+        assert cache.get('T001', '周末这个任务不可以做吗') == {'answer': 'A'}
+
+    def test_returned_value_is_a_copy(self):
+        """测试返回值修改不影响缓存"""
+        cache = AnswerCache()
+        cache.put('T001', 'q', {'answer': 'A'})
+        cache.get('T001', 'q')['answer'] = 'B'
+        assert cache.get('T001', 'q') == {'answer': 'A'}
+
+    def test_ttl_expiry(self):
+        """测试 TTL 过期"""
+        cache = AnswerCache(ttl=0.05)
+        cache.put('T001', 'q', {'answer': 'A'})
+        time.sleep(0.1)
+
+        assert cache.get('T001', 'q') is None
+        assert cache.get_stats()['expirations'] == 1
+        assert cache.get_stats()['size'] == 0
+
+    def test_lru_eviction(self):
+        """测试 LRU 淘汰"""
+        cache = AnswerCache(max_entries=2, semantic_enabled=False)
+        cache.put('T001', 'q1', 1)
+        cache.put('T001', 'q2', 2)
+        cache.get('T001', 'q1')  # q1 变为最近使用
+        cache.put('T001', 'q3', 3)
+
+        assert cache.get('T001', 'q2') is None
+        assert cache.get('T001', 'q1') == 1
+        assert cache.get('T001', 'q3') == 3
+        assert cache.get_stats()['evictions'] == 1
+
+    def test_invalidate_task(self):
+        """测试按任务失效"""
+        cache = AnswerCache()
+        cache.put('T001', 'q1', 1)
+        cache.put('T001', 'q2', 2)
+        cache.put('T002', 'q1', 3)
+
+        assert cache.invalidate_task('T001') == 2
+        assert cache.get('T001', 'q1') is None
+        assert cache.get('T002', 'q1') == 3
+
+    def test_put_after_invalidation_is_dropped(self):
+        """测试生成期间任务失效时丢弃写入，其他任务不受影响"""
+        cache = AnswerCache()
+        generation = cache.generation('T001')
+        other = cache.generation('T002')
+
+        cache.invalidate_task('T001')  # 没有缓存条目也推进代数
+        cache.put('T001', 'q1', 1, generation=generation)
+        cache.put('T002', 'q1', 2, generation=other)
+        assert cache.get('T001', 'q1') is None
+        assert cache.get('T002', 'q1') == 2
+
+        generation = cache.generation('T002')
+        cache.clear()
+        cache.put('T002', 'q2', 3, generation=generation)
+        assert cache.get('T002', 'q2') is None
+        assert cache.get_stats()['stale_puts'] == 2
+
+        cache.put('T001', 'q1', 4, generation=cache.generation('T001'))
+        assert cache.get('T001', 'q1') == 4
+
+    def test_concurrent_invalidation(self):
+        """测试监视线程失效缓存与其他线程读写同时进行"""
+        cache = AnswerCache(max_entries=50, semantic_enabled=True, similarity_threshold=0.5)
+        errors = []
+        stop = threading.Event()
+
+        def readers():
+            try:
+                for i in range(3000):
+                    task_id = f'T{i % 5}'
+                    cache.put(task_id, f'第{i % 40}个问题怎么做', i)
+                    cache.get(task_id, f'第{(i + 1) % 40}个问题如何做')
+            except Exception as e:  # pragma: no cover - 仅在出现竞争时触发
+                errors.append(e)
+            finally:
+                stop.set()
+
+        def invalidator():
+            try:
+                while not stop.is_set():
+                    cache.invalidate_tasks([f'T{i}' for i in range(5)])
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        threads = [threading.Thread(target=readers), threading.Thread(target=invalidator)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        stats = cache.get_stats()
+        assert stats['lookups'] == 3000
+        assert stats['size'] <= 50
+
+
+class TestRAGServiceCache:
+    """RAG 服务回答缓存集成测试"""
+
+    def _make_service(self):
+        retriever = KnowledgeRetriever()
+        retriever.load_knowledge_base(dict(TEST_KNOWLEDGE))
+        llm = MockLLMService(simulate_delay=False)
+        return RAGService(retriever, llm, answer_cache=AnswerCache()), llm
+
+    @pytest.mark.asyncio
+    async def test_repeated_question_skips_llm(self):
+        """测试重复问题不再调用 LLM"""
+        service, llm = self._make_service()
+
+        first = await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        second = await service.process_chat_request('T001', '如何进行文献检索', TASK_INFO)
+
+        assert llm.call_count == 1
+        assert second.answer == first.answer
+        assert second.citations == first.citations
+        assert service.get_cache_stats()['exact_hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidation_during_generation_skips_put(self):
+        """测试调用 LLM 期间任务知识变更时，旧回答不写回缓存"""
+        service, llm = self._make_service()
+        call_llm = service._call_llm_with_retry
+
+        async def call_and_invalidate(*args, **kwargs):
+            response = await call_llm(*args, **kwargs)
+            service.answer_cache.invalidate_task('T001')
+            return response
+
+        service._call_llm_with_retry = call_and_invalidate
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        assert service.get_cache_stats()['size'] == 0
+        assert service.get_cache_stats()['stale_puts'] == 1
+
+        service._call_llm_with_retry = call_llm
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        assert llm.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_answers_are_not_cached(self):
+        """测试失败的回答不会被缓存"""
+        service, llm = self._make_service()
+        llm.failure_rate = 1.0
+        service.max_retries = 0
+
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        assert service.get_cache_stats()['size'] == 0
+
+    @pytest.mark.asyncio
+    async def test_knowledge_change_invalidates_task(self):
+        """测试知识变更只使对应任务的缓存失效"""
+        service, llm = self._make_service()
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        await service.process_chat_request('T002', '安全培训', TASK_INFO)
+
+        updated = dict(TEST_KNOWLEDGE)
+        updated['T001'] = dict(TEST_KNOWLEDGE['T001'], content='新的文献检索步骤说明。')
+        changed = service.update_knowledge_base(updated)
+
+        assert changed == {'T001'}
+        assert service.get_cache_stats()['invalidations'] == 1
+        await service.process_chat_request('T002', '安全培训', TASK_INFO)
+        assert llm.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_apply_changes_only_touches_changed_entries(self):
+        """测试增量变更只重新比较给定任务的知识条目，并使任务本身变化的缓存回答失效"""
+        service, llm = self._make_service()
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        await service.process_chat_request('T002', '安全培训', TASK_INFO)
+
+        updated = dict(TEST_KNOWLEDGE)
+        del updated['T002']
+        # T001 只是被列为可能变化，内容未变；T002 的知识条目被删除
+        assert service.apply_changes(updated, [], knowledge_ids=['T001', 'T002']) >= {'T002'}
+        assert service.retriever.retrieve_task_knowledge('T002') is None
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        assert llm.call_count == 2
+
+        # 任务本身的变化同样使其缓存回答失效
+        service.apply_changes(updated, [], task_ids=['T001'])
+        await service.process_chat_request('T001', '如何进行文献检索？', TASK_INFO)
+        assert llm.call_count == 3
@@ -0,0 +1,224 @@
+"""
+任务变更日志与增量同步测试
+"""
+import sys
+import os
+import json
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from change_log import DELETE, UPSERT, ChangeLog, ChangeSet, diff_row_hashes
+from data_loader import DataLoader
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def test_diff_row_hashes():
+    old = {'NT001': 'a', 'NT002': 'b', 'NT003': 'c'}
+    new = {'NT001': 'a', 'NT002': 'x', 'NT004': 'd'}
+    assert diff_row_hashes(old, new) == (['NT002', 'NT004'], ['NT003'])
+    assert diff_row_hashes({}, {'NT001': 'a'}) == (['NT001'], [])
+
+
+def test_change_log_since():
+    log = ChangeLog(max_entries=10)
+    assert log.changes_since(0, 0) is None
+
+    # 第一次记录只建立基线
+    log.record(1, ['NT001', 'NT002'], [])
+    assert log.changes_since(1, 1) == {}
+    assert log.changes_since(0, 1) is None
+
+    log.record(2, ['NT001'], ['NT002'])
+    log.record(3, ['NT002', 'NT003'], [])
+    log.record(4, [], ['NT003'])
+    assert log.changes_since(1, 4) == {'NT001': UPSERT, 'NT002': UPSERT, 'NT003': DELETE}
+    assert log.changes_since(3, 4) == {'NT003': DELETE}
+    assert log.changes_since(4, 4) == {}
+    # 比当前代数还新的 since（如服务重启后）需要全量同步
+    assert log.changes_since(5, 4) is None
+
+
+def test_change_log_truncation():
+    log = ChangeLog(max_entries=3)
+    log.record(1, [], [])
+    log.record(2, ['NT001', 'NT002'], [])
+    log.record(3, ['NT003', 'NT004'], [])
+    # 第 2 代的一条被截断，since=1 无法再增量同步
+    assert log.changes_since(1, 3) is None
+    assert log.changes_since(2, 3) == {'NT003': UPSERT, 'NT004': UPSERT}
+    assert log.get_stats() == {'epoch': log.epoch, 'entries': 3, 'max_entries': 3, 'horizon': 2, 'truncated': 1}
+
+
+def test_sync_token_epoch():
+    log = ChangeLog(epoch='boot1')
+    assert log.sync_token(7) == 'boot1.7'
+    assert log.parse_sync_token('boot1.7') == 7
+    # 其他进程（如重启前）的令牌、旧的纯数字代数和格式错误的令牌都无法增量同步
+    assert ChangeLog(epoch='boot2').parse_sync_token('boot1.7') is None
+    assert log.parse_sync_token('7') is None
+    assert log.parse_sync_token('boot1.x') is None
+    assert ChangeLog().epoch != ChangeLog().epoch
+
+
+def write_tasks(path, edit=None):
+    with open(os.path.join(DATA_DIR, 'tasks.csv'), encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    if edit:
+        lines = edit(lines)
+    path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+
+def reload_changes(loader, path):
+    """重新加载并返回本次加载产生的变更"""
+    since = loader.generation
+    assert loader.load_tasks_csv(str(path))
+    return loader.change_log.changes_since(since, loader.generation)
+
+
+def test_loader_records_row_changes(tmp_path):
+    path = tmp_path / 'tasks.csv'
+    write_tasks(path)
+    loader = DataLoader()
+    assert loader.load_tasks_csv(str(path))
+    assert reload_changes(loader, path) == {}
+
+    def edit(lines):
+        header, rows = lines[0], lines[1:]
+        rows[0] = rows[0].replace('整理图书资源', '整理图书与期刊')               # NT001 内容修改
+        rows[1] = rows[1].replace('2025-09-02T10:00:00Z,NPC102', '2025-09-09T10:00:00Z,NPC102')  # NT002 只改更新时间
+        del rows[2]                                                             # 删除 NT003
+        rows.append(rows[-1].replace('NT020', 'NT021', 1))                      # 新增 NT021
+        return [header] + rows
+
+    write_tasks(path, edit)
+    assert reload_changes(loader, path) == {'NT001': UPSERT, 'NT002': UPSERT, 'NT021': UPSERT, 'NT003': DELETE}
+    # 被删除的任务不再保留在内存中
+    assert loader.get_task('NT003') is None
+    assert loader.get_task_store().row_of('NT003') is None
+    assert loader.get_task('NT001').title == '整理图书与期刊'
+
+
+def test_changes_endpoint(tmp_path):
+    import main
+
+    path = tmp_path / 'tasks.csv'
+    write_tasks(path)
+    main.data_loader.load_tasks_csv(str(path))
+    client = TestClient(main.app)
+    since = client.get('/api/stats').json()['sync_token']
+    write_tasks(path, lambda lines: [line.replace('整理图书资源', '图书上架') for line in lines if 'NT005' not in line])
+    main.data_loader.load_tasks_csv(str(path))
+
+    body = client.get(f'/tasks/changes?since={since}').json()
+    assert body['full_resync'] is False
+    assert body['generation'] == main.data_loader.generation
+    assert body['sync_token'] == main.data_loader.change_log.sync_token(main.data_loader.generation)
+    assert [task['task_id'] for task in body['upserts']] == ['NT001']
+    assert body['upserts'][0]['title'] == '图书上架'
+    assert body['deletes'] == ['NT005']
+
+    assert client.get(f"/tasks/changes?since={body['sync_token']}").json()['upserts'] == []
+    assert client.get('/tasks/changes?since=0').json()['full_resync'] is True
+    assert client.get(f'/tasks/changes?since={main.data_loader.generation}').json()['full_resync'] is True
+
+    # 恢复默认数据，避免影响其他测试
+    main.data_loader.load_all_data(os.path.join(DATA_DIR, 'tasks.csv'), os.path.join(DATA_DIR, 'task_kb.jsonl'))
+
+
+def test_token_from_previous_process_requires_resync(tmp_path):
+    """测试服务重启后，即使代数相同，旧进程的令牌也不会被当作已同步"""
+    path = tmp_path / 'tasks.csv'
+    write_tasks(path)
+    before = DataLoader()
+    assert before.load_tasks_csv(str(path))
+    assert before.load_tasks_csv(str(path))
+    token = before.change_log.sync_token(before.generation)
+
+    # 删除一行后新进程启动，加载两次后代数与旧进程相同
+    write_tasks(path, lambda lines: [line for line in lines if not line.startswith('NT003,')])
+    after = DataLoader()
+    assert after.load_tasks_csv(str(path))
+    assert after.load_tasks_csv(str(path))
+    assert after.generation == before.generation
+    assert after.change_log.parse_sync_token(token) is None
+
+
+def test_reload_reuses_unchanged_rows(tmp_path, monkeypatch):
+    path = tmp_path / 'tasks.csv'
+    write_tasks(path)
+    loader = DataLoader()
+    received = []
+    loader.add_change_listener(received.append)
+    assert loader.load_tasks_csv(str(path))
+    previous = dict(loader.tasks)
+
+    validated = []
+    validate_task = loader.validator.validate_task
+    monkeypatch.setattr(loader.validator, 'validate_task',
+                        lambda row: validated.append(row['task_id']) or validate_task(row))
+
+    def edit(lines):
+        rows = [line for line in lines if not line.startswith('NT003,')]
+        rows[1] = rows[1].replace('整理图书资源', '整理图书与期刊')
+        return rows + [rows[-1].replace('NT020', 'NT021', 1)]
+
+    write_tasks(path, edit)
+    assert loader.load_tasks_csv(str(path))
+    # 只有变化的行被重新校验，其余沿用上次的任务对象
+    assert validated == ['NT001', 'NT021']
+    assert loader.tasks['NT002'] is previous['NT002']
+    assert loader.load_stats['tasks_unchanged'] == len(previous) - 2
+    assert received[-1] == ChangeSet('tasks', loader.generation, ['NT021'], ['NT001'], ['NT003'])
+    assert received[-1].touched == ['NT021', 'NT001', 'NT003']
+
+
+def test_reload_knowledge_changes(tmp_path):
+    with open(os.path.join(DATA_DIR, 'task_kb.jsonl'), encoding='utf-8') as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    path = tmp_path / 'task_kb.jsonl'
+    path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    loader = DataLoader()
+    received = []
+    loader.add_change_listener(received.append)
+    assert loader.load_knowledge_jsonl(str(path))
+    assert received[-1].added and not received[-1].updated
+
+    first = json.loads(lines[0])
+    second = json.loads(lines[1])
+    unchanged = loader.task_knowledge[json.loads(lines[2])['task_id']]
+    lines[0] = json.dumps(dict(first, content='更新后的知识内容'), ensure_ascii=False)
+    path.write_text("\n".join(lines[:1] + lines[2:]) + "\n", encoding='utf-8')
+    assert loader.load_knowledge_jsonl(str(path))
+    assert received[-1] == ChangeSet('knowledge', loader.generation, [], [first['task_id']], [second['task_id']])
+    assert loader.task_knowledge[first['task_id']].content == '更新后的知识内容'
+    assert second['task_id'] not in loader.task_knowledge
+    assert loader.task_knowledge[unchanged.task_id] is unchanged
+
+
+def test_changes_propagate_to_indexes_and_caches(tmp_path):
+    import main
+    from search_engine import search_tasks
+
+    path = tmp_path / 'tasks.csv'
+    write_tasks(path)
+    main.data_loader.load_tasks_csv(str(path))
+    main.initialize_search_engine(main.data_loader.get_all_tasks())
+    cache = main.get_response_cache()
+    builds = cache.get_stats()['builds']
+
+    write_tasks(path, lambda lines: [line.replace('整理图书资源', '天文观测记录') for line in lines if 'NT005' not in line])
+    main.data_loader.load_tasks_csv(str(path))
+
+    # 响应缓存增量更新，不再全量重建
+    assert cache.is_current(main.data_loader.generation)
+    assert main.get_response_cache().get_stats()['builds'] == builds
+    assert json.loads(cache.get_item('NT001'))['title'] == '天文观测记录'
+    assert cache.get_item('NT005') is None
+    assert [r['task_id'] for r in search_tasks('天文观测')] == ['NT001']
+    assert 'NT005' not in {r['task_id'] for r in search_tasks('任务', top_n=100)}
+
+    # 恢复默认数据，避免影响其他测试
+    main.data_loader.load_all_data(os.path.join(DATA_DIR, 'tasks.csv'), os.path.join(DATA_DIR, 'task_kb.jsonl'))
+    main.initialize_search_engine(main.data_loader.get_all_tasks())
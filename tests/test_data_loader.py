@@ -0,0 +1,66 @@
+"""
+数据加载器与任务数据模型测试
+"""
+import sys
+import os
+import pickle
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from data_loader import CATEGORY_CODES, CodeTable, Task, TaskKnowledge
+
+
+def make_task(task_id='NT001', category='学术研究', rewards='学分+2'):
+    # 通过拼接生成新的字符串对象，模拟从 CSV 逐行解析
+    return Task(
+        task_id=task_id, title='图书整理', description='', category=''.join(list(category)),
+        location_name='Library', latitude='22.336', longitude='114.17', difficulty='初级',
+        estimated_duration='30', prerequisites='无', rewards=rewards, status='active',
+        created_at='', updated_at='', npc_id=''.join(['NPC', '101']), course_code='LIB1001'
+    )
+
+
+def test_code_table():
+    table = CodeTable("test")
+    assert table.encode('a') == 0
+    assert table.encode('b') == 1
+    assert table.encode('a') == 0
+    assert table.decode(1) == 'b'
+    assert table.values() == ['a', 'b']
+    assert table.intern(None) is None
+
+
+def test_task_is_slotted_and_compact():
+    task = make_task()
+    assert not hasattr(task, '__dict__')
+    with pytest.raises(AttributeError):
+        task.extra = 1
+
+    other = make_task('NT002')
+    assert task.category is other.category
+    assert task.npc_id is other.npc_id
+    assert task.category_code == CATEGORY_CODES.encode('学术研究')
+    assert CATEGORY_CODES.decode(task.category_code) == '学术研究'
+
+
+def test_task_conversions_and_points():
+    task = make_task()
+    assert task.latitude == pytest.approx(22.336)
+    assert task.estimated_duration == 30
+    assert task.points == 2
+    assert make_task(rewards='').points == 0
+    assert make_task(rewards='志愿时长').points == 0
+
+
+def test_task_pickles():
+    task = make_task()
+    assert pickle.loads(pickle.dumps(task)) == task
+
+
+def test_knowledge_is_slotted_and_interned():
+    kb = TaskKnowledge('T001', 'procedure', '内容', '["图书馆", "学术研究"]', '初级', '60', 'CS2402')
+    assert not hasattr(kb, '__dict__')
+    assert kb.tags == ['图书馆', '学术研究']
+    assert kb.estimated_time == 60
+    assert kb.title == '操作流程'
@@ -0,0 +1,166 @@
+"""
+数据快照与数据文件监视测试
+"""
+import sys
+import os
+import json
+import time
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from data_loader import DataLoader
+from data_watcher import DataWatcher
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def copy_data(tmp_path):
+    paths = {}
+    for name in ('tasks.csv', 'task_kb.jsonl'):
+        with open(os.path.join(DATA_DIR, name), encoding='utf-8') as f:
+            content = f.read()
+        paths[name] = tmp_path / name
+        paths[name].write_text(content, encoding='utf-8')
+    return paths['tasks.csv'], paths['task_kb.jsonl']
+
+
+def rewrite(path, old, new):
+    """修改文件内容，并把修改时间推后以免与上次写入落在同一时间粒度内"""
+    path.write_text(path.read_text(encoding='utf-8').replace(old, new), encoding='utf-8')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def loaded(tmp_path):
+    tasks_path, kb_path = copy_data(tmp_path)
+    loader = DataLoader()
+    assert loader.load_all_data(str(tasks_path), str(kb_path))
+    return loader, tasks_path, kb_path
+
+
+def test_snapshot_unaffected_by_reload(loaded):
+    loader, tasks_path, _ = loaded
+    snapshot = loader.snapshot
+    store = loader.get_task_store()
+
+    rewrite(tasks_path, '整理图书资源', '图书上架')
+    assert loader.load_tasks_csv(str(tasks_path))
+
+    # 已取得的快照保持原样，新数据只出现在新快照中
+    assert loader.snapshot is not snapshot
+    assert snapshot.tasks['NT001'].title == '整理图书资源'
+    assert snapshot.task_store is store
+    assert loader.get_task('NT001').title == '图书上架'
+    assert loader.snapshot.generation == snapshot.generation + 1
+    assert loader.snapshot.task_knowledge is snapshot.task_knowledge
+
+
+def test_watcher_reloads_changed_file_once_stable(loaded):
+    loader, tasks_path, kb_path = loaded
+    watcher = DataWatcher(loader, interval=0.1)
+    generation = loader.generation
+    # 第一次检查记录文件状态，第二次确认内容与已加载的一致
+    assert watcher.check() == []
+    assert watcher.check() == []
+
+    rewrite(tasks_path, '整理图书资源', '图书上架')
+    # 刚修改的文件等下一次检查确认写入完成后才加载
+    assert watcher.check() == []
+    assert watcher.check() == ['tasks']
+    assert loader.get_task('NT001').title == '图书上架'
+    assert loader.generation == generation + 1
+    assert watcher.check() == []
+
+    lines = kb_path.read_text(encoding='utf-8').splitlines()
+    first = json.loads(lines[0])
+    rewrite(kb_path, lines[0], json.dumps(dict(first, content='更新后的知识内容'), ensure_ascii=False))
+    watcher.check()
+    assert watcher.check() == ['knowledge']
+    assert loader.get_task_knowledge(first['task_id']).content == '更新后的知识内容'
+    assert watcher.get_stats()['reloads'] == 2
+
+
+def test_watcher_ignores_touch_without_change(loaded):
+    loader, tasks_path, _ = loaded
+    watcher = DataWatcher(loader, interval=0.1)
+    watcher.check()
+    watcher.check()
+    generation = loader.generation
+
+    rewrite(tasks_path, '', '')
+    watcher.check()
+    assert watcher.check() == []
+    assert loader.generation == generation
+
+
+def test_watcher_thread(loaded):
+    loader, tasks_path, _ = loaded
+    watcher = DataWatcher(loader, interval=0.05)
+    watcher.start()
+    try:
+        time.sleep(0.2)
+        rewrite(tasks_path, '整理图书资源', '图书上架')
+        deadline = time.time() + 5
+        while loader.get_task('NT001').title != '图书上架' and time.time() < deadline:
+            time.sleep(0.05)
+        assert loader.get_task('NT001').title == '图书上架'
+        assert watcher.get_stats()['running']
+    finally:
+        watcher.stop()
+    assert not watcher.get_stats()['running']
+
+
+def test_load_all_data_publishes_one_snapshot(loaded):
+    """测试任务和知识库一起加载时只发布一次快照，准备监听器在发布前拿到完整的新快照"""
+    loader, tasks_path, kb_path = loaded
+    before = loader.snapshot
+    prepared, published = [], []
+
+    def prepare(snapshot, changesets):
+        # 发布前：当前快照仍是旧的，新快照中任务、知识库和列式任务表都已就绪
+        assert loader.snapshot is before
+        prepared.append((snapshot, [changes.kind for changes in changesets]))
+
+    loader.add_prepare_listener(prepare)
+    loader.add_change_listener(lambda changes: published.append((loader.snapshot, changes)))
+
+    rewrite(tasks_path, '整理图书资源', '图书上架')
+    assert loader.load_all_data(str(tasks_path), str(kb_path))
+
+    snapshot = loader.snapshot
+    assert snapshot.generation == before.generation + 1
+    assert prepared == [(snapshot, ['tasks', 'knowledge'])]
+    assert snapshot.tasks['NT001'].title == '图书上架'
+    assert snapshot.task_store.materialize(snapshot.task_store.row_of('NT001')).title == '图书上架'
+    assert [(s, changes.kind, changes.generation) for s, changes in published] == [
+        (snapshot, 'tasks', snapshot.generation), (snapshot, 'knowledge', snapshot.generation)
+    ]
+    assert published[0][1].updated == ['NT001']
+
+
+def test_request_reads_its_own_snapshot(tmp_path):
+    """测试请求持有的旧快照在重新加载后仍返回旧数据，不混入新版本的缓存片段"""
+    import main
+    from schemas import TaskFilters
+
+    tasks_path, kb_path = copy_data(tmp_path)
+    main.data_loader.load_all_data(str(tasks_path), str(kb_path))
+    main.get_response_cache()
+    snapshot = main.data_loader.snapshot
+
+    rewrite(tasks_path, '整理图书资源', '图书上架')
+    main.data_loader.load_tasks_csv(str(tasks_path))
+    # 响应缓存在新快照发布前已更新到新的数据代数
+    assert main.task_response_cache.is_current(main.data_loader.generation)
+
+    old = json.loads(main.build_task_list(TaskFilters(), 1, 1, snapshot=snapshot))
+    new = TestClient(main.app).get('/tasks', params={'size': 1}).json()
+    assert old['data'][0]['title'] == '整理图书资源'
+    assert new['data'][0]['title'] == '图书上架'
+    assert json.loads(main.task_detail_fragment(snapshot, 'NT001'))['title'] == '整理图书资源'
+
+    # 恢复默认数据，避免影响其他测试
+    main.data_loader.load_all_data(os.path.join(DATA_DIR, 'tasks.csv'), os.path.join(DATA_DIR, 'task_kb.jsonl'))
@@ -0,0 +1,83 @@
+"""
+CPU 任务执行器测试
+"""
+import sys
+import os
+import asyncio
+import json
+import time
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from executors import CPUExecutors, encode_json
+
+
+def busy_wait(seconds: float) -> float:
+    """占用 CPU 的同步函数"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return seconds
+
+
+def fail():
+    raise ValueError("boom")
+
+
+class TestCPUExecutors:
+    """执行器测试"""
+
+    @pytest.mark.asyncio
+    async def test_run_in_thread_keeps_event_loop_responsive(self):
+        """测试同步计算在线程池中执行时事件循环仍可调度其他协程"""
+        pool = CPUExecutors(thread_workers=2)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.ensure_future(ticker())
+        try:
+            assert await pool.run_in_thread(busy_wait, 0.2) == 0.2
+        finally:
+            ticker_task.cancel()
+            pool.shutdown()
+        assert ticks >= 5
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate(self):
+        pool = CPUExecutors(thread_workers=1)
+        with pytest.raises(ValueError):
+            await pool.run_in_thread(fail)
+        stats = pool.get_stats()['thread_pool']
+        assert stats['errors'] == 1
+        assert stats['in_flight'] == 0
+        pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_queue_depth(self):
+        """测试任务数超过工作者时统计排队深度和排队时间"""
+        pool = CPUExecutors(thread_workers=1)
+        futures = [asyncio.ensure_future(pool.run_in_thread(time.sleep, 0.05)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert pool.get_stats()['thread_pool']['queue_depth'] == 2
+
+        await asyncio.gather(*futures)
+        stats = pool.get_stats()['thread_pool']
+        assert stats['queue_depth'] == 0
+        assert stats['completed'] == 3
+        assert stats['queue_wait_p95'] >= 0.05
+        pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_encode_json_in_thread(self):
+        pool = CPUExecutors(thread_workers=1)
+        data = {"任务": ["T001", "T002"], "count": 2}
+        content = await pool.run_in_thread(encode_json, data)
+        assert json.loads(content) == data
+        assert pool.get_stats()['thread_pool']['completed'] == 1
+        pool.shutdown()
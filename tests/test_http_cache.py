@@ -0,0 +1,94 @@
+"""
+ETag 与条件请求测试
+"""
+import sys
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from http_cache import etag_matches, make_etag
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def test_make_etag():
+    etag = make_etag('2-abc', 'tasks', [('size', '10'), ('page', '2')])
+    assert etag.startswith('"') and etag.endswith('"')
+    # 参数顺序不影响 ETag，版本、接口或参数不同则 ETag 不同
+    assert etag == make_etag('2-abc', 'tasks', [('page', '2'), ('size', '10')])
+    assert etag != make_etag('3-abc', 'tasks', [('page', '2'), ('size', '10')])
+    assert etag != make_etag('2-abc', 'npcs', [('page', '2'), ('size', '10')])
+    assert etag != make_etag('2-abc', 'tasks', [('page', '3'), ('size', '10')])
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches(None, etag)
+
+
+@pytest.fixture
+def client():
+    import main
+    main.data_loader.load_all_data(os.path.join(DATA_DIR, 'tasks.csv'), os.path.join(DATA_DIR, 'task_kb.jsonl'))
+    return TestClient(main.app), main
+
+
+@pytest.mark.parametrize('path', ['/api/npcs', '/api/knowledge', '/api/stats', '/tasks?limit=3&category=academic'])
+def test_conditional_get(client, path):
+    client, _ = client
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers['etag']
+    assert first.headers['cache-control'] == 'no-cache'
+
+    cached = client.get(path, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.content == b''
+    assert cached.headers['etag'] == etag
+
+    # 查询参数不同则 ETag 不同
+    assert client.get(path + ('&' if '?' in path else '?') + 'x=1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_follows_content_not_generation(client, tmp_path):
+    """测试 ETag 只由数据内容决定：内容不变的重新加载仍返回 304，内容变化后 ETag 改变"""
+    import shutil
+    from data_loader import DataLoader
+
+    client, main = client
+    path = '/tasks?size=5'
+    etag = client.get(path).headers['etag']
+    assert etag == make_etag(main.data_loader.data_version, 'tasks', [('size', '5')])
+
+    # 同样的文件重新加载（或由另一个进程加载）得到相同的 ETag
+    generation = main.data_loader.generation
+    main.data_loader.load_tasks_csv(os.path.join(DATA_DIR, 'tasks.csv'))
+    assert main.data_loader.generation == generation + 1
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+    other = DataLoader()
+    other.load_all_data(os.path.join(DATA_DIR, 'tasks.csv'), os.path.join(DATA_DIR, 'task_kb.jsonl'))
+    assert other.data_version == main.data_loader.data_version
+
+    # 统计信息含本进程的数据代数，代数变化后 ETag 随之改变
+    stats_etag = client.get('/api/stats').headers['etag']
+    main.data_loader.load_tasks_csv(os.path.join(DATA_DIR, 'tasks.csv'))
+    assert client.get('/api/stats', headers={'If-None-Match': stats_etag}).status_code == 200
+
+    tasks_path = tmp_path / 'tasks.csv'
+    shutil.copy(os.path.join(DATA_DIR, 'tasks.csv'), tasks_path)
+    tasks_path.write_text(tasks_path.read_text(encoding='utf-8').replace('整理图书资源', '图书上架', 1),
+                          encoding='utf-8')
+    try:
+        main.data_loader.load_tasks_csv(str(tasks_path))
+        response = client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != etag
+        assert response.json()['data'][0]['title'] == '图书上架'
+    finally:
+        main.data_loader.load_tasks_csv(os.path.join(DATA_DIR, 'tasks.csv'))
@@ -0,0 +1,146 @@
+"""
+OpenAI 兼容 LLM 客户端测试（使用本地桩服务）
+"""
+import sys
+import os
+import asyncio
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from llm_client import HTTPLLMService, LLMServiceError, AnswerStreamExtractor, parse_llm_content
+from llm_stub_server import StubState, start_stub_server, STUB_ANSWER
+from rag import KnowledgeRetriever, RAGService
+
+
+async def start_stub(**kwargs):
+    """启动桩服务，返回 (runner, state, base_url)"""
+    state = StubState(**kwargs)
+    runner = await start_stub_server(state)
+    host, port = runner.addresses[0][:2]
+    return runner, state, f"http://{host}:{port}/v1"
+
+
+class TestParsing:
+    """输出解析测试"""
+
+    def test_parse_json_content(self):
+        result = parse_llm_content('```json\n{"answer": "你好", "confidence": "high"}\n```')
+        assert result == {"answer": "你好", "confidence": "high"}
+
+    def test_parse_plain_text(self):
+        result = parse_llm_content("直接回答")
+        assert result['answer'] == "直接回答"
+        assert result['confidence'] == "medium"
+
+    def test_extractor_handles_split_escapes(self):
+        extractor = AnswerStreamExtractor()
+        pieces = ['{"confidence": "high", "ans', 'wer": "第一行\\', 'n第二\\u', '884c\\"', '", "key_points": []}']
+        text = "".join(extractor.feed(p) for p in pieces)
+        assert text == '第一行\n第二行"'
+
+    def test_extractor_passes_through_plain_text(self):
+        extractor = AnswerStreamExtractor()
+        assert extractor.feed("你好") == "你好"
+        assert extractor.feed("，同学") == "，同学"
+
+
+class TestHTTPLLMService:
+    """连接池客户端测试"""
+
+    @pytest.mark.asyncio
+    async def test_generate_response_reuses_connection(self):
+        """测试顺序请求复用同一条连接"""
+        runner, state, base_url = await start_stub(latency=0.0)
+        client = HTTPLLMService(base_url=base_url, api_key="test")
+        try:
+            for _ in range(5):
+                result = await client.generate_response("system", "user")
+                assert result['answer'] == STUB_ANSWER['answer']
+
+            assert state.requests == 5
+            assert state.get_stats()['connections'] == 1
+            stats = client.get_stats()
+            assert stats['connections_created'] == 1
+            assert stats['connections_reused'] == 4
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_pool_limit_per_host(self):
+        """测试并发请求受每主机连接数限制"""
+        runner, state, base_url = await start_stub(latency=0.05)
+        client = HTTPLLMService(base_url=base_url, pool_limit_per_host=3)
+        try:
+            await asyncio.gather(*[client.generate_response("s", "u") for _ in range(9)])
+            assert state.max_active == 3
+            assert client.get_stats()['connections_created'] == 3
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_stream_response(self):
+        """测试流式输出只转发 answer 文本，最后输出完整响应"""
+        runner, _, base_url = await start_stub(latency=0.0, chunk_size=5, chunk_delay=0.0)
+        client = HTTPLLMService(base_url=base_url)
+        try:
+            items = [item async for item in client.stream_response("s", "u")]
+            chunks = [item for item in items if isinstance(item, str)]
+            assert len(chunks) > 1
+            assert "".join(chunks) == STUB_ANSWER['answer']
+            assert items[-1] == STUB_ANSWER
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_error_status_raises(self):
+        """测试接口错误抛出 LLMServiceError"""
+        runner, _, base_url = await start_stub(latency=0.0, failure_rate=1.0)
+        client = HTTPLLMService(base_url=base_url)
+        try:
+            with pytest.raises(LLMServiceError) as exc_info:
+                await client.generate_response("s", "u")
+            assert exc_info.value.status == 500
+            assert client.get_stats()['errors'] == 1
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_close_releases_session(self):
+        """测试关闭后可重新创建会话"""
+        runner, _, base_url = await start_stub(latency=0.0)
+        client = HTTPLLMService(base_url=base_url)
+        try:
+            await client.generate_response("s", "u")
+            await client.close()
+            assert client.get_stats()['session_open'] is False
+
+            await client.generate_response("s", "u")
+            assert client.get_stats()['session_open'] is True
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_rag_service_with_http_client():
+    """测试 RAG 服务通过 HTTP 客户端完成问答"""
+    runner, state, base_url = await start_stub(latency=0.01)
+    client = HTTPLLMService(base_url=base_url)
+    retriever = KnowledgeRetriever()
+    retriever.load_knowledge_base({})
+    service = RAGService(retriever, client)
+    service.answer_cache = None
+    try:
+        results = await asyncio.gather(*[
+            service.process_chat_request('T001', f'问题{i}', {'task_id': 'T001'}) for i in range(4)
+        ])
+        assert all(r.answer == STUB_ANSWER['answer'] for r in results)
+        assert state.requests >= 4
+    finally:
+        await client.close()
+        await runner.cleanup()
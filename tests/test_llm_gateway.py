@@ -0,0 +1,216 @@
+"""
+LLM 并发网关测试
+"""
+import sys
+import os
+import asyncio
+import time
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from llm_gateway import LLMGateway, GatewayRejectedError
+from rag import KnowledgeRetriever, RAGService
+
+
+class CountingLLM:
+    """记录最大并发数的 LLM 服务"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.call_count = 0
+
+    async def generate_response(self, system_prompt, user_prompt):
+        self.call_count += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return {"answer": "ok", "confidence": "high", "uncertain_aspects": []}
+        finally:
+            self.active -= 1
+
+
+class TestLLMGateway:
+    """网关基本行为测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_cap(self):
+        """测试并发数不超过上限"""
+        gateway = LLMGateway(max_concurrency=2, max_queue_size=10)
+        active = 0
+        max_active = 0
+
+        async def work():
+            nonlocal active, max_active
+            async with gateway.slot():
+                active += 1
+                max_active = max(max_active, active)
+                await asyncio.sleep(0.02)
+                active -= 1
+
+        await asyncio.gather(*[work() for _ in range(6)])
+
+        assert max_active == 2
+        stats = gateway.get_stats()
+        assert stats['admitted'] == 6
+        assert stats['queued'] == 4
+        assert stats['active'] == 0
+        assert stats['queue_depth'] == 0
+        assert stats['queue_wait_p95'] > 0
+
+    @pytest.mark.asyncio
+    async def test_queue_full_rejection(self):
+        """测试队列已满时拒绝"""
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=1)
+        await gateway.acquire()
+        waiter = asyncio.ensure_future(gateway.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(GatewayRejectedError) as exc_info:
+            await gateway.acquire()
+        assert exc_info.value.reason == "queue_full"
+
+        gateway.release()
+        await waiter
+        gateway.release()
+        assert gateway.active == 0
+
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        """测试高优先级请求先获得槽位"""
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=10)
+        await gateway.acquire()
+        order = []
+
+        async def wait(name, priority):
+            await gateway.acquire(priority=priority)
+            order.append(name)
+            gateway.release()
+
+        low = asyncio.ensure_future(wait("low", 0))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(wait("high", 5))
+        await asyncio.sleep(0)
+
+        gateway.release()
+        await asyncio.gather(low, high)
+        assert order == ["high", "low"]
+
+    @pytest.mark.asyncio
+    async def test_deadline_rejected_before_queueing(self):
+        """测试预计无法在截止时间前完成的请求直接拒绝"""
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=10, initial_service_time=1.0)
+        await gateway.acquire()
+
+        with pytest.raises(GatewayRejectedError) as exc_info:
+            await gateway.acquire(deadline=time.monotonic() + 0.5)
+        assert exc_info.value.reason == "deadline"
+        assert gateway.get_stats()['rejected_deadline'] == 1
+        assert gateway.queue_depth() == 0
+
+    @pytest.mark.asyncio
+    async def test_expires_in_queue(self):
+        """测试排队超过截止时间后放弃"""
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=10, initial_service_time=0.001)
+        await gateway.acquire()
+
+        with pytest.raises(GatewayRejectedError):
+            await gateway.acquire(deadline=time.monotonic() + 0.05)
+        assert gateway.get_stats()['expired_in_queue'] == 1
+
+        # 过期的排队者不会占用槽位
+        gateway.release()
+        assert gateway.active == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        """测试排队中被取消的请求不会泄漏槽位"""
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=10)
+        await gateway.acquire()
+        waiter = asyncio.ensure_future(gateway.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+
+        gateway.release()
+        assert gateway.active == 0
+        assert gateway.try_acquire() is True
+
+    @pytest.mark.asyncio
+    async def test_abandoned_waiters_leave_queue(self):
+        """测试超时和取消的排队者移出队列，不占用排队名额"""
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=2, initial_service_time=0.001)
+        await gateway.acquire()
+
+        with pytest.raises(GatewayRejectedError):
+            await gateway.acquire(deadline=time.monotonic() + 0.02)
+        cancelled = asyncio.ensure_future(gateway.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert gateway.queue_depth() == 0
+
+        # 两个放弃的排队者不计入队列长度，仍可排满两个
+        waiters = [asyncio.ensure_future(gateway.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert gateway.queue_depth() == 2
+        with pytest.raises(GatewayRejectedError) as exc_info:
+            await gateway.acquire()
+        assert exc_info.value.reason == "queue_full"
+
+        for waiter in waiters:
+            gateway.release()
+            await waiter
+        gateway.release()
+        assert gateway.active == 0
+        assert gateway.try_acquire() is True
+
+
+class TestRAGServiceGateway:
+    """RAG 服务网关集成测试"""
+
+    def _make_service(self, llm, gateway):
+        retriever = KnowledgeRetriever()
+        retriever.load_knowledge_base({})
+        service = RAGService(retriever, llm, gateway=gateway)
+        service.answer_cache = None
+        service.hedge_config.enabled = False
+        return service
+
+    @pytest.mark.asyncio
+    async def test_burst_is_limited(self):
+        """测试突发请求下 LLM 并发受限，排队时间单独统计"""
+        llm = CountingLLM(delay=0.02)
+        gateway = LLMGateway(max_concurrency=2, max_queue_size=20)
+        service = self._make_service(llm, gateway)
+        task_info = {'task_id': 'T001'}
+
+        results = await asyncio.gather(*[
+            service.process_chat_request('T001', f'问题{i}', task_info) for i in range(8)
+        ])
+
+        assert all(r.answer == "ok" for r in results)
+        assert llm.max_active == 2
+        stats = gateway.get_stats()
+        assert stats['queue_wait_p95'] > 0
+        assert stats['service_time_p50'] >= 0.02
+
+    @pytest.mark.asyncio
+    async def test_rejected_request_returns_busy_fallback(self):
+        """测试网关拒绝时返回繁忙回退回答且不重试"""
+        llm = CountingLLM(delay=0.2)
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=0)
+        service = self._make_service(llm, gateway)
+        task_info = {'task_id': 'T001'}
+
+        first, second = await asyncio.gather(
+            service.process_chat_request('T001', '问题一', task_info),
+            service.process_chat_request('T001', '问题二', task_info)
+        )
+
+        assert first.answer == "ok"
+        assert second.uncertain_reason == "服务繁忙"
+        assert llm.call_count == 1
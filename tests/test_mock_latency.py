@@ -0,0 +1,126 @@
+"""
+模拟 LLM 延迟模型测试
+"""
+import sys
+import os
+import asyncio
+import random
+import statistics
+import time
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from config import MockLLMConfig
+from mock_latency import (
+    BimodalLatency, FixedLatency, LogNormalLatency, TraceLatency, UniformLatency,
+    create_latency_model, split_stream_tokens
+)
+from rag import MockLLMService
+
+
+def test_lognormal_median():
+    rng = random.Random(1)
+    model = LogNormalLatency(median=0.8, sigma=0.4)
+    samples = [model.sample(rng) for _ in range(5000)]
+    assert statistics.median(samples) == pytest.approx(0.8, rel=0.05)
+    assert max(samples) > 1.6  # 右偏的长尾
+
+
+def test_bimodal_slow_rate():
+    rng = random.Random(2)
+    model = BimodalLatency(FixedLatency(0.1), FixedLatency(5.0), slow_rate=0.1)
+    samples = [model.sample(rng) for _ in range(5000)]
+    assert samples.count(5.0) / len(samples) == pytest.approx(0.1, abs=0.02)
+
+
+def test_trace_replay_cycles(tmp_path):
+    trace = tmp_path / "trace.txt"
+    trace.write_text('# 秒\n0.1\n{"latency": 0.5, "path": "/npc/T001/chat"}\n\n2\n', encoding='utf-8')
+    model = TraceLatency.from_file(str(trace))
+    assert [model.sample(None) for _ in range(4)] == [0.1, 0.5, 2.0, 0.1]
+    assert model.describe()['samples'] == 3
+
+
+def test_create_latency_model():
+    assert isinstance(create_latency_model(MockLLMConfig()), UniformLatency)
+    assert isinstance(create_latency_model(MockLLMConfig(slow_rate=0.1)), BimodalLatency)
+    assert isinstance(create_latency_model(MockLLMConfig(latency_model='lognormal')), LogNormalLatency)
+    with pytest.raises(ValueError):
+        create_latency_model(MockLLMConfig(latency_model='trace'))
+    with pytest.raises(ValueError):
+        create_latency_model(MockLLMConfig(latency_model='gamma'))
+
+
+def test_split_stream_tokens():
+    text = "图书馆开放，library opens at 8。"
+    tokens = split_stream_tokens(text)
+    assert "".join(tokens) == text
+    assert tokens[:5] == ["图", "书", "馆", "开", "放"]
+
+
+@pytest.mark.asyncio
+async def test_stream_at_tokens_per_second():
+    """测试按生成速度逐 token 输出"""
+    llm = MockLLMService(latency_model=FixedLatency(0.0), tokens_per_second=500)
+    start = time.perf_counter()
+    items = [item async for item in llm.stream_response("system", "图书馆")]
+    elapsed = time.perf_counter() - start
+
+    tokens, response = items[:-1], items[-1]
+    assert "".join(tokens) == response['answer']
+    assert tokens == split_stream_tokens(response['answer'])
+    assert elapsed >= (len(tokens) - 1) / 500
+
+
+@pytest.mark.asyncio
+async def test_generate_includes_generation_time():
+    llm = MockLLMService(latency_model=FixedLatency(0.01), tokens_per_second=1000)
+    start = time.perf_counter()
+    response = await llm.generate_response("system", "图书馆")
+    tokens = len(split_stream_tokens(response['answer']))
+    assert time.perf_counter() - start >= 0.01 + tokens / 1000
+
+
+@pytest.mark.asyncio
+async def test_concurrency_slowdown():
+    """测试并发调用超过阈值后变慢"""
+    llm = MockLLMService(latency_model=FixedLatency(0.05), slowdown_per_call=1.0, slowdown_threshold=1)
+
+    start = time.perf_counter()
+    await llm.generate_response("system", "问题")
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(llm.generate_response("system", "问题") for _ in range(3)))
+    concurrent = time.perf_counter() - start
+
+    assert single < 0.09
+    assert concurrent >= 0.14  # 3 个并发调用，延迟倍数为 1 + 1.0 * 2
+    stats = llm.get_stats()
+    assert stats['max_active_calls'] == 3
+    assert stats['active_calls'] == 0
+
+
+@pytest.mark.asyncio
+async def test_seeded_failures_are_reproducible():
+    async def outcomes(seed):
+        llm = MockLLMService(simulate_delay=False, failure_rate=0.5, seed=seed)
+        result = []
+        for _ in range(20):
+            try:
+                await llm.generate_response("system", "问题")
+                result.append(True)
+            except Exception:
+                result.append(False)
+        return result
+
+    assert await outcomes(7) == await outcomes(7)
+
+
+def test_from_config():
+    config = MockLLMConfig(latency_model='bimodal', slow_rate=0.05, tokens_per_second=40, seed=3)
+    llm = MockLLMService.from_config(config)
+    stats = llm.get_stats()
+    assert stats['latency_model']['model'] == 'bimodal'
+    assert stats['tokens_per_second'] == 40
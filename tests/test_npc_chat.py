@@ -14,6 +14,35 @@ from rag import (
 )
 
 
+def _make_test_retriever():
+    """构建只包含 T001 知识的检索器"""
+    retriever = KnowledgeRetriever()
+    retriever.load_knowledge_base({
+        'T001': {
+            'knowledge_type': 'guide',
+            'title': '图书馆文献检索指南',
+            'content': '文献检索步骤：1. 确定检索主题和关键词 2. 选择合适的数据库 3. 构建检索策略',
+            'tags': ['research', 'library'],
+            'difficulty_level': 'beginner',
+            'estimated_read_time': 10,
+            'prerequisites': None,
+            'related_tasks': []
+        }
+    })
+    return retriever
+
+
+TEST_TASK_INFO = {
+    'task_id': 'T001',
+    'title': '图书馆文献检索',
+    'description': '在图书馆完成指定主题的文献检索任务',
+    'category': 'academic',
+    'location_name': '邵逸夫图书馆',
+    'location_lat': 22.3364,
+    'location_lng': 114.2654
+}
+
+
 def test_knowledge_retriever():
     """测试知识检索器"""
     retriever = KnowledgeRetriever()
@@ -206,6 +235,129 @@ def test_rag_integration():
     assert cross_task_result.answer
 
 
+@pytest.mark.asyncio
+async def test_mock_llm_stream_response():
+    """测试模拟 LLM 服务的流式模式"""
+    llm = MockLLMService(simulate_delay=False, stream_chunk_size=5)
+    
+    items = [item async for item in llm.stream_response("系统提示", "图书馆相关问题")]
+    
+    text_parts = [item for item in items if isinstance(item, str)]
+    assert len(text_parts) > 1
+    assert all(len(part) <= 5 for part in text_parts)
+    assert isinstance(items[-1], dict)
+    assert "".join(text_parts) == items[-1]['answer']
+    assert llm.get_stats()['stream_calls'] == 1
+
+
+@pytest.mark.asyncio
+async def test_rag_stream_chat_request():
+    """测试 RAG 流式处理：先输出引用和锚点，再输出回答片段"""
+    llm = MockLLMService(simulate_delay=False)
+    rag_service = RAGService(_make_test_retriever(), llm)
+    
+    events = [
+        event async for event in
+        rag_service.stream_chat_request('T001', '如何进行文献检索？', TEST_TASK_INFO)
+    ]
+    
+    assert events[0]['event'] == 'context'
+    assert events[0]['data']['map_anchor'] == {'lat': 22.3364, 'lng': 114.2654}
+    assert len(events[0]['data']['citations']) > 0
+    
+    tokens = [e['data']['text'] for e in events if e['event'] == 'token']
+    assert len(tokens) > 1
+    
+    assert events[-1]['event'] == 'done'
+    assert events[-1]['data']['answer'] == "".join(tokens)
+    
+    # 流式结果应与非流式结果一致
+    result = await rag_service.process_chat_request('T001', '如何进行文献检索？', TEST_TASK_INFO)
+    assert result.answer == events[-1]['data']['answer']
+
+
+@pytest.mark.asyncio
+async def test_rag_stream_falls_back_on_llm_failure():
+    """测试流式处理在 LLM 全部失败时输出回退回答"""
+    llm = MockLLMService(simulate_delay=False, failure_rate=1.0)
+    rag_service = RAGService(_make_test_retriever(), llm)
+    rag_service.max_retries = 1
+    rag_service.base_delay = 0.01
+    
+    events = [
+        event async for event in
+        rag_service.stream_chat_request('T001', '如何进行文献检索？', TEST_TASK_INFO)
+    ]
+    
+    assert events[0]['event'] == 'context'
+    assert events[-1]['event'] == 'done'
+    assert events[-1]['data']['uncertain_reason'] in ("请求超时", "系统处理错误")
+    assert llm.get_stats()['stream_calls'] == 2
+
+
+@pytest.mark.asyncio
+async def test_rag_process_batch():
+    """测试批量处理：一次检索、相同问题只调用一次 LLM、按完成顺序输出全部下标"""
+    llm = MockLLMService(simulate_delay=False)
+    rag_service = RAGService(_make_test_retriever(), llm)
+    rag_service.answer_cache = None
+    
+    requests = [
+        ('T001', '如何进行文献检索？', TEST_TASK_INFO),
+        ('T001', '图书馆在哪里', TEST_TASK_INFO),
+        ('T001', '如何进行文献检索', TEST_TASK_INFO),
+    ]
+    results = [item async for item in rag_service.process_batch(requests)]
+    
+    assert sorted(index for index, _ in results) == [0, 1, 2]
+    by_index = dict(results)
+    assert '图书馆' in by_index[1].answer
+    assert by_index[0].answer == by_index[2].answer
+    assert len(by_index[0].citations) > 0
+    assert llm.get_stats()['total_calls'] == 2
+    assert rag_service.batch_stats['deduplicated'] == 1
+
+
+@pytest.mark.asyncio
+async def test_rag_process_batch_looks_up_cache_on_event_loop():
+    """测试批量请求在事件循环中查找回答缓存，只把未命中的请求交给线程池构建提示词"""
+    import threading
+    from answer_cache import AnswerCache
+    rag_service = RAGService(_make_test_retriever(), MockLLMService(simulate_delay=False), answer_cache=AnswerCache())
+    rag_service.hedge_config.enabled = False
+    await rag_service.process_chat_request('T001', '如何进行文献检索？', TEST_TASK_INFO)
+    
+    lookup_threads, offloaded = [], []
+    cache_get, prepare_batch = rag_service.answer_cache.get, rag_service._prepare_batch
+    rag_service.answer_cache.get = lambda *args: lookup_threads.append(threading.current_thread()) or cache_get(*args)
+    rag_service._prepare_batch = lambda requests: offloaded.extend(requests) or prepare_batch(requests)
+    
+    requests = [('T001', '如何进行文献检索？', TEST_TASK_INFO), ('T001', '图书馆在哪里', TEST_TASK_INFO)]
+    results = dict([item async for item in rag_service.process_batch(requests)])
+    
+    assert set(results) == {0, 1}
+    assert lookup_threads == [threading.main_thread()] * 2
+    assert [question for _, question, _ in offloaded] == ['图书馆在哪里']
+    assert rag_service.batch_stats['cache_hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_rag_process_batch_runs_llm_calls_concurrently():
+    """测试批量请求的 LLM 调用并发执行"""
+    import time
+    llm = MockLLMService(simulate_delay=True, min_delay=0.1, max_delay=0.1)
+    rag_service = RAGService(_make_test_retriever(), llm)
+    rag_service.answer_cache = None
+    rag_service.hedge_config.enabled = False
+    
+    requests = [('T001', f'问题{i}', TEST_TASK_INFO) for i in range(5)]
+    start = time.monotonic()
+    results = [item async for item in rag_service.process_batch(requests)]
+    
+    assert len(results) == 5
+    assert time.monotonic() - start < 0.4
+
+
 @pytest.mark.integration
 def test_api_integration():
     """测试 API 集成（服务器未运行时跳过）"""
@@ -0,0 +1,130 @@
+"""
+按 token 预算构建提示词测试
+"""
+import sys
+import os
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from prompt_builder import PromptBuilder, estimate_tokens, extract_relevant_sentences
+from rag import PromptTemplate
+
+
+TASK_INFO = {
+    'task_id': 'T001',
+    'title': '图书馆文献检索',
+    'description': '学习使用图书馆数据库检索学术文献',
+    'location_name': '邵逸夫图书馆'
+}
+
+
+def make_builder(**kwargs):
+    return PromptBuilder(PromptTemplate.USER_PROMPT_TEMPLATE, **kwargs)
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("图书馆") == 3
+    assert estimate_tokens("library") == 2
+    assert estimate_tokens("图书馆 library。") == 4 + 2
+
+
+def test_extract_relevant_sentences():
+    content = "开放时间为早上八点。数据库需要校园网访问。借书需要学生证。"
+    assert extract_relevant_sentences(content, "数据库怎么访问") == "数据库需要校园网访问。"
+    # 没有相关句子时保留原内容
+    assert extract_relevant_sentences(content, "xyz") == content
+
+
+def test_matches_template_when_within_budget():
+    """测试预算充足且无需压缩时，与原模板输出一致"""
+    chunks = [{'content': '图书馆提供数据库检索服务。', 'score': 3, 'source': '指南'}]
+    builder = make_builder(max_tokens=2000, sentence_extraction=False)
+
+    built = builder.build(TASK_INFO, chunks, '图书馆在哪里？')
+
+    assert built.text == PromptTemplate.format_user_prompt(TASK_INFO, chunks, '图书馆在哪里？')
+    assert built.chunks == chunks
+
+
+def test_dedupes_overlapping_chunks():
+    """测试去掉被包含或高度相似的片段"""
+    chunks = [
+        {'content': '图书馆提供数据库检索服务，开放时间为早八点到晚十点。', 'score': 5, 'source': 'A'},
+        {'content': '图书馆提供数据库检索服务', 'score': 2, 'source': 'B'},
+        {'content': '实验室需要预约。', 'score': 1, 'source': 'C'}
+    ]
+    builder = make_builder(sentence_extraction=False)
+
+    built = builder.build(TASK_INFO, chunks, '图书馆')
+
+    assert [c['source'] for c in built.chunks] == ['A', 'C']
+    assert builder.get_stats()['chunks_deduped'] == 1
+
+
+def test_respects_budget_and_trims_low_score_first():
+    """测试超出预算时优先保留高分片段"""
+    high = {'content': '检索步骤一。' * 20, 'score': 9, 'source': 'high'}
+    low = {'content': '其他说明内容。' * 40, 'score': 1, 'source': 'low'}
+    builder = make_builder(max_tokens=300, sentence_extraction=False, min_chunk_tokens=30)
+
+    built = builder.build(TASK_INFO, [low, high], '检索')
+
+    assert built.chunks[0]['source'] == 'high'
+    assert built.estimated_tokens <= 300
+    assert '知识片段 1' in built.text
+    stats = builder.get_stats()
+    assert stats['chunks_truncated'] + stats['chunks_dropped'] >= 1
+    assert stats['tokens_saved'] > 0
+
+
+def test_truncates_long_description():
+    """测试任务描述按上限截断"""
+    info = dict(TASK_INFO, description='很长的描述。' * 200)
+    builder = make_builder(max_description_tokens=20)
+
+    built = builder.build(info, [], '问题')
+
+    assert '很长的描述。' * 3 in built.text
+    assert '很长的描述。' * 4 not in built.text
+    assert '暂无相关知识库信息' in built.text
+
+
+def test_scaffold_cache():
+    """测试任务信息部分按任务缓存，任务信息变化后重新生成"""
+    builder = make_builder(scaffold_cache_size=1)
+    builder.build(TASK_INFO, [], '问题一')
+    builder.build(TASK_INFO, [], '问题二')
+    stats = builder.get_stats()
+    assert stats['scaffold_hits'] == 1
+    assert stats['scaffold_misses'] == 1
+
+    builder.build(dict(TASK_INFO, title='新标题'), [], '问题')
+    assert builder.get_stats()['scaffold_misses'] == 2
+    assert builder.get_stats()['scaffold_cache_size'] == 1
+
+
+def test_concurrent_builds():
+    """测试多个工作线程同时构建时任务信息缓存和统计信息保持一致"""
+    builder = make_builder(scaffold_cache_size=2)
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(200):
+                builder.build(dict(TASK_INFO, task_id=f'T{(offset + i) % 5}'), [], '问题')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = builder.get_stats()
+    assert errors == []
+    assert stats['builds'] == 1600
+    assert stats['scaffold_hits'] + stats['scaffold_misses'] == 1600
+    assert stats['scaffold_cache_size'] <= 2
@@ -0,0 +1,286 @@
+"""
+LLM 对冲请求与熔断器测试
+"""
+import sys
+import os
+import asyncio
+import time
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from llm_gateway import LLMGateway
+from resilience import CircuitBreaker, LatencyTracker
+from rag import KnowledgeRetriever, MockLLMService, RAGService
+
+
+TASK_INFO = {
+    'task_id': 'T001',
+    'title': '图书馆文献检索',
+    'category': 'academic',
+    'location_lat': 22.3364,
+    'location_lng': 114.2654
+}
+
+
+def make_service(llm):
+    """构建不带缓存的 RAG 服务"""
+    retriever = KnowledgeRetriever()
+    retriever.load_knowledge_base({})
+    service = RAGService(retriever, llm)
+    service.answer_cache = None
+    service.base_delay = 0.01
+    return service
+
+
+class FirstCallSlowLLM(MockLLMService):
+    """第一次调用很慢，之后的调用很快"""
+
+    def __init__(self, slow_delay: float = 2.0):
+        super().__init__(simulate_delay=False)
+        self.slow_delay = slow_delay
+        self.cancelled = 0
+
+    async def generate_response(self, system_prompt, user_prompt):
+        self.call_count += 1
+        try:
+            if self.call_count == 1:
+                await asyncio.sleep(self.slow_delay)
+            return self._match_response(user_prompt)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+class TestLatencyTracker:
+    """延迟统计测试"""
+
+    def test_percentile(self):
+        tracker = LatencyTracker(window_size=100)
+        assert tracker.percentile(0.95) is None
+        for i in range(1, 101):
+            tracker.record(i / 100)
+        assert tracker.percentile(0.95) == pytest.approx(0.95)
+        assert tracker.percentile(0.5) == pytest.approx(0.5)
+
+    def test_window(self):
+        tracker = LatencyTracker(window_size=3)
+        for value in (10.0, 1.0, 1.0, 1.0):
+            tracker.record(value)
+        assert tracker.count() == 3
+        assert tracker.percentile(1.0) == 1.0
+
+
+class TestCircuitBreaker:
+    """熔断器状态转换测试"""
+
+    def test_opens_when_error_rate_exceeds_threshold(self):
+        breaker = CircuitBreaker(error_rate_threshold=0.5, min_calls=4, window_size=10)
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED  # 样本不足
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request() is False
+        assert breaker.get_stats()['rejected'] == 1
+
+    def test_half_open_recovery(self):
+        breaker = CircuitBreaker(min_calls=1, open_duration=0.05)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        time.sleep(0.06)
+        assert breaker.allow_request() is True
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request() is False  # 只允许一个试探调用
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_failure_reopens(self):
+        breaker = CircuitBreaker(min_calls=1, open_duration=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow_request() is True
+
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.get_stats()['opened'] == 2
+
+    def test_release_returns_probe(self):
+        breaker = CircuitBreaker(min_calls=1, open_duration=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow_request() is True
+
+        # 试探调用没有结果时归还名额，下一次调用可以继续试探
+        breaker.release()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request() is True
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.release()  # 非半开状态下没有影响
+        assert breaker.allow_request() is True
+
+    def test_half_open_probe_timeout(self):
+        breaker = CircuitBreaker(min_calls=1, open_duration=0.05, half_open_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+
+        # 名额一直未归还时，超时后重新放行试探调用
+        time.sleep(0.06)
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+
+
+class TestHedgedRequests:
+    """对冲请求测试"""
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_over_slow_primary(self):
+        """测试主请求过慢时对冲请求胜出，并取消主请求"""
+        llm = FirstCallSlowLLM(slow_delay=2.0)
+        service = make_service(llm)
+        service.hedge_config.default_delay = 0.05
+        service.hedge_config.min_delay = 0.01
+
+        start = time.monotonic()
+        result = await service.process_chat_request('T001', '图书馆怎么走', TASK_INFO)
+        elapsed = time.monotonic() - start
+
+        assert elapsed < 1.0
+        assert '图书馆' in result.answer
+        assert llm.call_count == 2
+        await asyncio.sleep(0.01)  # 等待被取消的主请求结束
+        assert llm.cancelled == 1
+        stats = service.get_llm_stats()
+        assert stats['hedges_fired'] == 1
+        assert stats['hedge_wins'] == 1
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_does_not_hedge(self):
+        """测试主请求在对冲延迟内返回时不发起对冲"""
+        llm = MockLLMService(simulate_delay=True, min_delay=0.01, max_delay=0.02)
+        service = make_service(llm)
+        service.hedge_config.default_delay = 0.5
+
+        await service.process_chat_request('T001', '问题', TASK_INFO)
+
+        assert llm.call_count == 1
+        assert service.get_llm_stats()['hedges_fired'] == 0
+
+    @pytest.mark.asyncio
+    async def test_hedge_delay_follows_p95(self):
+        """测试样本充足时对冲延迟取 p95"""
+        service = make_service(MockLLMService(simulate_delay=False))
+        service.hedge_config.min_samples = 10
+        service.hedge_config.min_delay = 0.0
+        for i in range(1, 21):
+            service.latency_tracker.record(i * 0.1)
+
+        assert service._hedge_delay() == pytest.approx(1.9)
+
+
+class TestCircuitBreakerIntegration:
+    """熔断器与 RAG 服务集成测试"""
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_fails_fast_to_fallback(self):
+        """测试熔断打开后不再调用 LLM，直接返回回退回答"""
+        llm = MockLLMService(simulate_delay=False, failure_rate=1.0)
+        service = make_service(llm)
+        service.max_retries = 1
+        service.circuit_breaker = CircuitBreaker(min_calls=2, open_duration=60)
+
+        first = await service.process_chat_request('T001', '问题一', TASK_INFO)
+        assert first.uncertain_reason in ("请求超时", "系统处理错误")
+        calls_before = llm.call_count
+
+        start = time.monotonic()
+        second = await service.process_chat_request('T001', '问题二', TASK_INFO)
+
+        assert time.monotonic() - start < 0.1
+        assert llm.call_count == calls_before
+        assert second.uncertain_reason == "LLM 服务暂时不可用"
+        assert service.get_llm_stats()['breaker_rejections'] == 1
+
+
+class TestHalfOpenProbe:
+    """半开状态试探调用没有结果时的名额归还测试"""
+
+    def _half_open_service(self, llm, gateway=None):
+        retriever = KnowledgeRetriever()
+        retriever.load_knowledge_base({})
+        service = RAGService(retriever, llm, gateway=gateway)
+        service.answer_cache = None
+        service.hedge_config.enabled = False
+        service.circuit_breaker = CircuitBreaker(min_calls=1, open_duration=0.01)
+        service.circuit_breaker.record_failure()
+        time.sleep(0.02)
+        return service
+
+    @staticmethod
+    async def _stream_events(service, question):
+        return [event async for event in service.stream_chat_request('T001', question, TASK_INFO)]
+
+    @pytest.mark.asyncio
+    async def test_rejected_probe_does_not_stick_half_open(self):
+        """测试试探调用被网关拒绝后，后续调用仍可试探并关闭熔断器"""
+        gateway = LLMGateway(max_concurrency=1, max_queue_size=0)
+        await gateway.acquire()
+        service = self._half_open_service(MockLLMService(simulate_delay=False), gateway)
+
+        result = await service.process_chat_request('T001', '问题一', TASK_INFO)
+        assert result.uncertain_reason == "服务繁忙"
+        events = await self._stream_events(service, '问题二')
+        assert events[-1]['data']['uncertain_reason'] == "服务繁忙"
+        assert service.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+        gateway.release()
+        events = await self._stream_events(service, '问题三')
+        assert events[-1]['data']['uncertain_reason'] != "LLM 服务暂时不可用"
+        assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_does_not_stick_half_open(self):
+        """测试试探调用被取消（客户端断开）后，后续调用仍可试探"""
+        llm = FirstCallSlowLLM(slow_delay=2.0)
+        service = self._half_open_service(llm)
+
+        pending = asyncio.ensure_future(service.process_chat_request('T001', '问题一', TASK_INFO))
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        assert llm.cancelled == 1
+        assert service.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+        result = await service.process_chat_request('T001', '问题二', TASK_INFO)
+        assert result.uncertain_reason != "LLM 服务暂时不可用"
+        assert service.circuit_breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_cancelled_stream_probe_does_not_stick_half_open(self):
+        """测试流式试探调用在等待首个片段时被取消后，后续调用仍可试探"""
+        service = self._half_open_service(MockLLMService(simulate_delay=False))
+
+        async def slow_stream(system_prompt, user_prompt):
+            await asyncio.sleep(2.0)
+            yield "太慢了"
+
+        service.llm_service.stream_response = slow_stream
+        pending = asyncio.ensure_future(self._stream_events(service, '问题一'))
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        assert service.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+        del service.llm_service.stream_response
+        events = await self._stream_events(service, '问题二')
+        assert events[-1]['data']['uncertain_reason'] != "LLM 服务暂时不可用"
+        assert service.circuit_breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,138 @@
+"""
+任务响应序列化缓存测试
+"""
+import sys
+import os
+import json
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from response_cache import TaskResponseCache, assemble, dumps, embed
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+class Item:
+    def __init__(self, task_id, title):
+        self.task_id = task_id
+        self.title = title
+
+
+def test_assemble_and_embed():
+    fragments = [dumps({'id': 1, 'name': '图书馆'}), dumps({'id': 2, 'name': 'Lab'})]
+    assert json.loads(assemble(fragments, {'meta': {'total': 2}})) == {
+        'data': [{'id': 1, 'name': '图书馆'}, {'id': 2, 'name': 'Lab'}], 'meta': {'total': 2}
+    }
+    assert json.loads(assemble([], {})) == {'data': []}
+    assert json.loads(embed(fragments[0], {'success': True})) == {'data': {'id': 1, 'name': '图书馆'}, 'success': True}
+    assert '图书馆'.encode('utf-8') in fragments[0]
+
+
+def test_cache_build_and_lookup():
+    def encode_item(item):
+        if item.task_id == 'BAD':
+            raise ValueError('invalid')
+        return {'task_id': item.task_id, 'title': item.title}
+
+    cache = TaskResponseCache()
+    source = object()
+    assert not cache.is_current(source)
+    count = cache.build(source, [Item('NT001', '图书整理'), Item('BAD', ''), Item('NT002', '迎新')],
+                        encode_item, lambda item: {'detail': item.title})
+    # 序列化失败的任务被跳过，不影响其他任务
+    assert count == 2
+    assert cache.is_current(source)
+    assert json.loads(cache.get_item('NT001')) == {'task_id': 'NT001', 'title': '图书整理'}
+    assert cache.get_items(['NT002', 'BAD', 'NT001']) == [cache.get_item('NT002'), cache.get_item('NT001')]
+    assert cache.get_detail('BAD') is None
+    assert cache.get_stats()['builds'] == 1
+
+
+@pytest.fixture
+def loaded_main():
+    import main
+    main.data_loader.load_all_data(os.path.join(DATA_DIR, 'tasks.csv'), os.path.join(DATA_DIR, 'task_kb.jsonl'))
+    return main
+
+
+def test_task_list_matches_schema_serialization(loaded_main):
+    """测试 /tasks、/tasks/{task_id} 实际返回的响应体与逐条转换 Pydantic 模型的结果一致"""
+    from fastapi.testclient import TestClient
+    from schemas import TaskDetailResponse, TaskDetailSchema, TaskListResponse
+
+    main = loaded_main
+    client = TestClient(main.app)
+    response = client.get('/tasks', params={'category': 'academic', 'size': 3})
+    assert response.status_code == 200
+    body = response.json()
+    tasks = [t for t in main.data_loader.get_all_tasks()
+             if main.CATEGORY_MAPPING.get(t.category, t.category) == 'academic']
+    expected = TaskListResponse(
+        data=[main.convert_task_to_schema(t) for t in tasks[:3]],
+        meta=body['meta']
+    ).model_dump(mode='json')
+    assert body == expected
+    assert body['meta']['total'] == len(tasks)
+
+    task = tasks[0]
+    detail = TaskDetailResponse(data=TaskDetailSchema(
+        **main.convert_task_to_schema(task).model_dump(),
+        knowledge=main.convert_knowledge_to_schema(main.data_loader.get_task_knowledge(task.task_id))
+    )).model_dump(mode='json')
+    assert json.loads(embed(main.get_response_cache().get_detail(task.task_id), {})) == detail
+    assert client.get(f'/tasks/{task.task_id}').json() == detail
+    assert client.get('/tasks/NOPE').status_code == 404
+
+
+def test_cache_follows_reload(loaded_main):
+    main = loaded_main
+    cache = main.get_response_cache()
+    builds, updates = cache.get_stats()['builds'], cache.get_stats()['updates']
+    assert main.get_response_cache() is cache and cache.get_stats()['builds'] == builds
+
+    # 重新加载后按变更增量更新，不再全量重建
+    main.data_loader.load_tasks_csv(os.path.join(DATA_DIR, 'tasks.csv'))
+    assert cache.is_current(main.data_loader.generation)
+    assert cache.get_stats()['updates'] == updates + 1
+
+    # 缓存对应的不是当前版本时（如漏掉了变更），不能按变更增量更新，取用前全量重建
+    cache.build('stale', [], main.encode_task_item, main.encode_task_detail)
+    assert cache.view(main.data_loader.generation) is None
+    assert not cache.update(main.data_loader.generation, main.data_loader.generation + 1, [], [],
+                            main.encode_task_item, main.encode_task_detail)
+    main.get_response_cache()
+    assert cache.view(main.data_loader.generation) is not None
+    assert cache.get_stats()['tasks'] == len(main.data_loader.tasks)
+    assert cache.get_stats()['builds'] == builds + 2
+
+
+
+def test_task_list_cursor_paging_over_http(loaded_main):
+    """测试沿 meta.next_cursor 通过 /tasks 逐页读取的结果与页码分页一致"""
+    from fastapi.testclient import TestClient
+
+    client = TestClient(loaded_main.app)
+    expected = [t['task_id'] for t in client.get('/tasks', params={'size': 100}).json()['data']]
+    first = client.get('/tasks', params={'size': 7, 'cursor': ''}).json()
+    assert first['meta']['total'] == len(expected) > 7
+    # 页码分页同样返回游标，可以接着用游标分页
+    assert client.get('/tasks', params={'size': 7}).json()['meta']['next_cursor'] == first['meta']['next_cursor']
+
+    for extra in ({}, {'approximate_total': 'true'}):
+        collected, cursor = [], ''
+        while cursor is not None:
+            body = client.get('/tasks', params={'size': 7, 'cursor': cursor, **extra}).json()
+            collected.extend(t['task_id'] for t in body['data'])
+            cursor = body['meta']['next_cursor']
+        assert collected == expected
+
+    academic = [t['task_id'] for t in client.get('/tasks', params={'size': 100, 'category': 'academic'}).json()['data']]
+    collected, cursor = [], ''
+    while cursor is not None:
+        body = client.get('/tasks', params={'size': 3, 'cursor': cursor, 'category': 'academic'}).json()
+        collected.extend(t['task_id'] for t in body['data'])
+        cursor = body['meta']['next_cursor']
+    assert collected == academic
+
+    assert client.get('/tasks', params={'cursor': 'broken'}).status_code == 400
@@ -143,6 +143,27 @@ class TestBM25SearchEngine:
             for i in range(len(results) - 1):
                 assert results[i]['score'] >= results[i + 1]['score']
     
+    def test_incremental_update_matches_rebuild(self):
+        """测试增量更新后的索引与按同样文档全量构建的结果一致"""
+        updated = dict(self.test_documents[1], title='实验室消防演练')
+        added = dict(self.test_documents[4], task_id='T006', title='图书馆学术讲座')
+        self.engine.update_documents([updated, added], removed_ids=['T003', 'T404'])
+
+        expected = BM25SearchEngine()
+        expected.build_index([self.test_documents[0], updated, self.test_documents[3],
+                              self.test_documents[4], added])
+        assert self.engine.corpus_size == expected.corpus_size == 5
+        assert self.engine.avgdl == pytest.approx(expected.avgdl)
+        assert self.engine.idf == pytest.approx(expected.idf)
+        for query in ['实验室', '图书馆', '学生会', '讲座', '消防']:
+            assert self.engine.search(query) == expected.search(query)
+
+        # 删除过半后压缩空位，结果不变
+        self.engine.update_documents([], removed_ids=['T001', 'T002', 'T004'])
+        assert len(self.engine.documents) == 2
+        expected.build_index([self.test_documents[4], added])
+        assert self.engine.search('讲座') == expected.search('讲座')
+    
     def test_search_empty_query(self):
         """测试空查询"""
         results = self.engine.search("", top_n=5)
@@ -0,0 +1,157 @@
+"""
+多轮对话会话记忆测试
+"""
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from answer_cache import AnswerCache
+from prompt_builder import estimate_tokens
+from session_memory import SessionStore
+from rag import KnowledgeRetriever, MockLLMService, RAGService
+
+
+TASK_INFO = {'task_id': 'T001', 'title': '图书馆文献检索', 'location_lat': 22.3, 'location_lng': 114.2}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingLLM(MockLLMService):
+    """记录收到的用户提示词"""
+
+    def __init__(self):
+        super().__init__(simulate_delay=False)
+        self.prompts = []
+
+    async def generate_response(self, system_prompt, user_prompt):
+        self.prompts.append(user_prompt)
+        return await super().generate_response(system_prompt, user_prompt)
+
+
+def make_service(llm, store):
+    retriever = KnowledgeRetriever()
+    retriever.load_knowledge_base({
+        'T001': {'title': '图书馆指南', 'content': '图书馆提供文献检索服务。开放时间为早八点。'}
+    })
+    service = RAGService(retriever, llm, answer_cache=AnswerCache(), session_store=store)
+    service.hedge_config.enabled = False
+    return service
+
+
+class TestSessionStore:
+    """会话存储测试"""
+
+    def test_history_is_kept_per_session_and_task(self):
+        store = SessionStore()
+        store.append('s1', 'T001', '在哪里？', '在图书馆。')
+        assert store.get_history('s1', 'T001') == "用户: 在哪里？\n助手: 在图书馆。"
+        assert store.get_history('s1', 'T002') == ""
+        assert store.get_history('s2', 'T001') == ""
+
+    def test_old_turns_are_folded_into_summary(self):
+        """测试超出轮数后最早的轮次折叠进摘要"""
+        store = SessionStore(max_turns=2, history_tokens=1000)
+        for i in range(3):
+            store.append('s1', 'T001', f'问题{i}', f'回答{i}。补充说明。')
+
+        history = store.get_history('s1', 'T001')
+        assert history.startswith('更早的对话摘要: 用户问“问题0”，回答：回答0。')
+        assert '补充说明' not in history.split('\n')[0]
+        assert '用户: 问题1' in history and '用户: 问题2' in history
+        assert store.get_stats()['summarized_turns'] == 1
+
+    def test_history_stays_bounded(self):
+        """测试对话再长，历史部分的 token 数也不超过预算"""
+        store = SessionStore(max_turns=4, history_tokens=60, summary_tokens=40)
+        sizes = []
+        for i in range(50):
+            store.append('s1', 'T001', f'第{i}个问题是什么', '这是一个比较长的回答，' * 3 + '。')
+            sizes.append(estimate_tokens(store.get_history('s1', 'T001')))
+        assert max(sizes) <= 60 + 40 + 20
+        assert sizes[-1] == sizes[-10]
+
+    def test_lru_eviction(self):
+        store = SessionStore(max_sessions=2)
+        store.append('s1', 'T001', '问', '答')
+        store.append('s2', 'T001', '问', '答')
+        store.get_history('s1', 'T001')
+        store.append('s3', 'T001', '问', '答')
+
+        assert store.get_history('s2', 'T001') == ""
+        assert store.get_history('s1', 'T001') != ""
+        assert store.get_stats()['evictions'] == 1
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        store = SessionStore(ttl=60, time_fn=clock)
+        store.append('s1', 'T001', '问', '答')
+        clock.now += 61
+        assert store.get_history('s1', 'T001') == ""
+        assert store.get_stats()['expirations'] == 1
+
+    def test_sqlite_backing(self, tmp_path):
+        """测试被淘汰或重启后从 SQLite 恢复会话"""
+        db_path = str(tmp_path / "sessions.db")
+        store = SessionStore(max_sessions=1, db_path=db_path)
+        store.append('s1', 'T001', '在哪里？', '在图书馆。')
+        store.append('s2', 'T001', '几点开门？', '早八点。')
+        assert store.get_history('s1', 'T001') == "用户: 在哪里？\n助手: 在图书馆。"
+        assert store.get_stats()['db_loads'] == 1
+        store.close()
+
+        reopened = SessionStore(db_path=db_path)
+        assert reopened.get_history('s2', 'T001') == "用户: 几点开门？\n助手: 早八点。"
+        assert reopened.clear('s2', 'T001') is True
+        reopened.close()
+        assert SessionStore(db_path=db_path).get_history('s2', 'T001') == ""
+
+
+@pytest.mark.asyncio
+async def test_rag_includes_history_in_prompt():
+    """测试带会话的请求在提示词中带上对话历史，且不使用回答缓存"""
+    llm = RecordingLLM()
+    service = make_service(llm, SessionStore())
+
+    first = await service.process_chat_request('T001', '图书馆几点开门？', TASK_INFO, session_id='s1')
+    assert '## 对话历史' not in llm.prompts[0]
+
+    await service.process_chat_request('T001', '图书馆几点开门？', TASK_INFO, session_id='s1')
+    assert len(llm.prompts) == 2
+    assert '## 对话历史\n用户: 图书馆几点开门？\n助手: ' + first.answer in llm.prompts[1]
+
+    # 不带会话的相同问题仍然命中第一轮写入的缓存
+    await service.process_chat_request('T001', '图书馆几点开门？', TASK_INFO)
+    assert len(llm.prompts) == 2
+
+
+@pytest.mark.asyncio
+async def test_rag_prompt_size_stays_flat():
+    llm = RecordingLLM()
+    service = make_service(llm, SessionStore(max_turns=3, history_tokens=120, summary_tokens=60))
+
+    for i in range(20):
+        await service.process_chat_request('T001', f'第{i}个关于图书馆的问题', TASK_INFO, session_id='s1')
+
+    sizes = [estimate_tokens(prompt) for prompt in llm.prompts]
+    assert max(sizes[5:]) - min(sizes[5:]) <= 20
+    stats = service.session_store.get_stats()
+    assert 1 <= stats['turns'] <= 3
+    assert stats['turns'] + stats['summarized_turns'] == 20
+
+
+@pytest.mark.asyncio
+async def test_failed_answers_are_not_remembered():
+    store = SessionStore()
+    service = make_service(MockLLMService(simulate_delay=False, failure_rate=1.0), store)
+    service.base_delay = 0.01
+
+    await service.process_chat_request('T001', '图书馆几点开门？', TASK_INFO, session_id='s1')
+    assert store.get_history('s1', 'T001') == ""
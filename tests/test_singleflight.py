@@ -0,0 +1,140 @@
+"""
+请求合并（single-flight）测试
+"""
+import sys
+import os
+import asyncio
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from singleflight import SingleFlight, get_singleflight_stats
+import rag
+from rag import KnowledgeRetriever, RAGService
+
+
+class SlowLLMService:
+    """固定延迟的 LLM 服务"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.call_count = 0
+
+    async def generate_response(self, system_prompt, user_prompt):
+        self.call_count += 1
+        await asyncio.sleep(self.delay)
+        return {"answer": "合并测试回答", "confidence": "high", "uncertain_aspects": []}
+
+
+class TestSingleFlight:
+    """请求合并组测试"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_execute_once(self):
+        """测试相同键的并发请求只执行一次"""
+        group = SingleFlight("test_dup")
+        executions = 0
+
+        async def work():
+            nonlocal executions
+            executions += 1
+            await asyncio.sleep(0.05)
+            return executions
+
+        results = await asyncio.gather(*[group.do("k", work) for _ in range(10)])
+
+        assert executions == 1
+        assert results == [1] * 10
+        stats = group.get_stats()
+        assert stats['calls'] == 10
+        assert stats['executions'] == 1
+        assert stats['coalesced'] == 9
+        assert stats['inflight'] == 0
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        """测试不同键分别执行"""
+        group = SingleFlight("test_keys")
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            group.do("a", lambda: work("a")),
+            group.do("b", lambda: work("b"))
+        )
+
+        assert results == ["a", "b"]
+        assert group.get_stats()['executions'] == 2
+
+    @pytest.mark.asyncio
+    async def test_sequential_calls_are_not_coalesced(self):
+        """测试前一个请求完成后，新请求会重新执行"""
+        group = SingleFlight("test_seq")
+
+        async def work():
+            return 1
+
+        await group.do("k", work)
+        await group.do("k", work)
+        assert group.get_stats()['executions'] == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        """测试异常传递给所有等待者"""
+        group = SingleFlight("test_err")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            *[group.do("k", fail) for _ in range(3)], return_exceptions=True
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert group.get_stats()['errors'] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_others(self):
+        """测试第一个调用方被取消不影响其他等待者"""
+        group = SingleFlight("test_cancel")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        leader = asyncio.ensure_future(group.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(group.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "ok"
+        assert group.get_stats()['executions'] == 1
+
+    def test_stats_registry(self):
+        """测试全局统计包含已创建的合并组"""
+        SingleFlight("test_registry")
+        assert "test_registry" in get_singleflight_stats()
+
+
+@pytest.mark.asyncio
+async def test_process_npc_chat_coalesces_identical_questions():
+    """测试相同任务的相同问题只调用一次 LLM"""
+    retriever = KnowledgeRetriever()
+    retriever.load_knowledge_base({})
+    llm = SlowLLMService()
+    rag.rag_service = RAGService(retriever, llm)
+    rag.rag_service.answer_cache = None
+
+    task_info = {'task_id': 'T001', 'location_lat': 22.3, 'location_lng': 114.2}
+    results = await asyncio.gather(
+        *[rag.process_npc_chat('T001', '怎么报名？', task_info) for _ in range(5)],
+        rag.process_npc_chat('T001', '怎么报名', task_info),
+        rag.process_npc_chat('T002', '怎么报名？', task_info)
+    )
+
+    assert llm.call_count == 2
+    assert all(r.answer == "合并测试回答" for r in results)
@@ -0,0 +1,137 @@
+"""
+解析结果快照缓存测试
+"""
+import sys
+import os
+import pickle
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import snapshot_cache
+from data_loader import DataLoader, Task, TaskKnowledge, CATEGORY_CODES
+from snapshot_cache import SnapshotCache, schema_signature
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+SCHEMA = schema_signature(Task, TaskKnowledge)
+
+
+def copy_file(tmp_path, name):
+    path = tmp_path / name
+    with open(os.path.join(DATA_DIR, name), encoding='utf-8') as f:
+        path.write_text(f.read(), encoding='utf-8')
+    return path
+
+
+def fresh_loader(cache_dir, monkeypatch=None, validated=None):
+    loader = DataLoader(SnapshotCache(str(cache_dir), SCHEMA))
+    if monkeypatch is not None:
+        validate_task = loader.validator.validate_task
+        monkeypatch.setattr(loader.validator, 'validate_task',
+                            lambda row: validated.append(row['task_id']) or validate_task(row))
+    return loader
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = SnapshotCache(str(tmp_path), SCHEMA)
+    assert cache.load('tasks', 'abc') is None
+    assert cache.save('tasks', 'abc', {'value': 1})
+    assert cache.load('tasks', 'abc') == {'value': 1}
+    # 源文件内容哈希或数据类型不同都不命中
+    assert cache.load('tasks', 'def') is None
+    assert cache.load('knowledge', 'abc') is None
+    assert cache.get_stats()['hits'] == 1
+    assert cache.get_stats()['writes'] == 1
+
+
+def test_cache_version_mismatch(tmp_path, monkeypatch):
+    cache = SnapshotCache(str(tmp_path), SCHEMA)
+    cache.save('tasks', 'abc', {'value': 1})
+
+    # 模型字段变化后旧快照失效
+    assert SnapshotCache(str(tmp_path), schema_signature(Task)).load('tasks', 'abc') is None
+    # 格式版本递增后旧快照失效
+    monkeypatch.setattr(snapshot_cache, 'SNAPSHOT_FORMAT', snapshot_cache.SNAPSHOT_FORMAT + 1)
+    assert cache.load('tasks', 'abc') is None
+
+
+def test_corrupt_snapshot_falls_back(tmp_path):
+    cache = SnapshotCache(str(tmp_path), SCHEMA)
+    with open(cache.path_for('tasks'), 'wb') as f:
+        f.write(b'not a pickle')
+    assert cache.load('tasks', 'abc') is None
+    assert cache.get_stats()['errors'] == 1
+
+    # 只有文件头完整时同样回退
+    with open(cache.path_for('tasks'), 'wb') as f:
+        pickle.dump(cache._header('tasks', 'abc'), f, protocol=5)
+    assert cache.load('tasks', 'abc') is None
+
+
+def test_disabled_cache(tmp_path):
+    cache = SnapshotCache('', SCHEMA)
+    assert not cache.enabled
+    assert not cache.save('tasks', 'abc', {'value': 1})
+    assert cache.load('tasks', 'abc') is None
+
+
+def test_startup_uses_snapshot(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    tasks_path = copy_file(tmp_path, 'tasks.csv')
+    kb_path = copy_file(tmp_path, 'task_kb.jsonl')
+    first = fresh_loader(cache_dir)
+    assert first.load_all_data(str(tasks_path), str(kb_path))
+
+    # 新进程启动：源文件未变，不再解析和校验
+    validated = []
+    loader = fresh_loader(cache_dir, monkeypatch, validated)
+    assert loader.load_all_data(str(tasks_path), str(kb_path))
+    assert validated == []
+    assert loader.snapshot_cache.get_stats()['hits'] == 2
+    assert loader.data_version == first.data_version
+    assert loader.load_stats['tasks_loaded'] == first.load_stats['tasks_loaded']
+    assert loader.load_stats['tasks_skipped'] == first.load_stats['tasks_skipped']
+    assert loader.load_stats['validation_warnings'] == first.load_stats['validation_warnings']
+    for task_id, task in first.tasks.items():
+        restored = loader.get_task(task_id)
+        assert restored == task
+        # 恢复后的取值重新与编码表共享
+        assert restored.category is CATEGORY_CODES.intern(task.category)
+    assert loader.task_knowledge == first.task_knowledge
+    assert len(loader.get_task_store()) == len(first.tasks)
+
+
+def test_changed_file_reparsed(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    tasks_path = copy_file(tmp_path, 'tasks.csv')
+    assert fresh_loader(cache_dir).load_tasks_csv(str(tasks_path))
+
+    tasks_path.write_text(tasks_path.read_text(encoding='utf-8').replace('整理图书资源', '图书上架'), encoding='utf-8')
+    validated = []
+    loader = fresh_loader(cache_dir, monkeypatch, validated)
+    assert loader.load_tasks_csv(str(tasks_path))
+    assert len(validated) == len(loader.tasks)
+    assert loader.get_task('NT001').title == '图书上架'
+
+    # 新的解析结果写回快照，下次启动直接使用
+    validated.clear()
+    loader = fresh_loader(cache_dir, monkeypatch, validated)
+    assert loader.load_tasks_csv(str(tasks_path))
+    assert validated == []
+    assert loader.get_task('NT001').title == '图书上架'
+
+
+def test_reload_reuses_current_objects(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    tasks_path = copy_file(tmp_path, 'tasks.csv')
+    loader = fresh_loader(cache_dir)
+    assert loader.load_tasks_csv(str(tasks_path))
+    previous = dict(loader.tasks)
+
+    # 命中快照时行哈希未变的任务沿用当前对象，变更集为空
+    received = []
+    loader.add_change_listener(received.append)
+    assert loader.load_tasks_csv(str(tasks_path))
+    assert loader.snapshot_cache.get_stats()['hits'] == 1
+    assert all(loader.tasks[task_id] is task for task_id, task in previous.items())
+    assert loader.load_stats['tasks_unchanged'] == len(previous)
+    assert received[-1].is_empty()
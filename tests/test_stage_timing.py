@@ -0,0 +1,101 @@
+"""
+RAG 流水线分阶段耗时统计测试
+"""
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from stage_timing import StageHistogram, RequestTrace, record_span, trace_request, get_stage_stats, reset_stage_stats
+from rag import KnowledgeRetriever, MockLLMService, RAGService
+
+
+TASK_INFO = {'task_id': 'T001', 'title': '图书馆文献检索', 'location_lat': 22.3, 'location_lng': 114.2}
+
+
+def make_service(llm):
+    retriever = KnowledgeRetriever()
+    retriever.load_knowledge_base({
+        'T001': {'title': '图书馆指南', 'content': '图书馆提供文献检索服务。开放时间为早八点。'}
+    })
+    service = RAGService(retriever, llm)
+    service.answer_cache = None
+    service.hedge_config.enabled = False
+    service.base_delay = 0.01
+    return service
+
+
+def test_histogram_buckets():
+    histogram = StageHistogram(bounds_ms=(10, 100))
+    for seconds in (0.005, 0.01, 0.05, 0.5):
+        histogram.record(seconds)
+
+    stats = histogram.to_dict()
+    assert stats['count'] == 4
+    assert stats['buckets'] == {'le_10ms': 2, 'le_100ms': 1, 'le_inf': 1}
+    assert stats['max_ms'] == 500.0
+    assert stats['p50_ms'] == 10.0
+
+
+def test_server_timing_header():
+    trace = RequestTrace()
+    trace.add('retrieval', 0.0012)
+    trace.add('llm_attempt', 0.5)
+    trace.add('llm_attempt', 0.25)
+    assert trace.server_timing() == 'retrieval;dur=1.2, llm_attempt;dur=750.0;desc="x2"'
+
+
+def test_spans_outside_trace_only_update_histograms():
+    reset_stage_stats()
+    record_span('retrieval', 0.01)
+    assert get_stage_stats()['retrieval']['count'] == 1
+
+
+def test_concurrent_spans_from_threads():
+    """测试多个线程同时记录 span 时计数不丢失"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    reset_stage_stats()
+
+    def work(i):
+        for _ in range(2000):
+            record_span(f'stage_{i % 2}', 0.001)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, range(8)))
+    stats = get_stage_stats()
+    for stage in ('stage_0', 'stage_1'):
+        assert stats[stage]['count'] == 8000
+        assert sum(stats[stage]['buckets'].values()) == 8000
+
+
+@pytest.mark.asyncio
+async def test_chat_request_records_each_stage():
+    """测试一次聊天请求记录检索、提示词构建、LLM 调用和后处理阶段"""
+    reset_stage_stats()
+    service = make_service(MockLLMService(simulate_delay=False))
+
+    with trace_request() as trace:
+        await service.process_chat_request('T001', '图书馆开放时间', TASK_INFO)
+
+    stages = [stage for stage, _ in trace.spans]
+    for stage in ('retrieval', 'prompt_build', 'llm_queue', 'llm_attempt', 'postprocess', 'total'):
+        assert stage in stages
+    assert get_stage_stats()['retrieval']['count'] == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_record_attempts_and_backoff():
+    """测试失败重试时分别记录每次 LLM 尝试和退避等待"""
+    service = make_service(MockLLMService(simulate_delay=False, failure_rate=1.0))
+    service.max_retries = 2
+    service.circuit_breaker = None
+
+    with trace_request() as trace:
+        await service.process_chat_request('T001', '图书馆', TASK_INFO)
+
+    totals = trace.totals()
+    assert totals['llm_attempt'][0] == 3
+    assert totals['llm_backoff'][0] == 2
+    assert 'postprocess' not in totals
@@ -0,0 +1,183 @@
+"""
+预计算建议索引测试
+"""
+import sys
+import os
+import random
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from answer_cache import AnswerCache
+from data_loader import Task, TaskKnowledge
+from suggestion_index import GridIndex, SuggestionIndex, haversine_distance, parse_prerequisites
+from rag import KnowledgeRetriever, MockLLMService, RAGService
+
+
+def make_task(task_id, title, category='学术研究', lat=22.3360, lng=114.1705,
+              prerequisites='无', course_code='', location_name='Library'):
+    return Task(
+        task_id=task_id, title=title, description='', category=category,
+        location_name=location_name, latitude=lat, longitude=lng, difficulty='初级',
+        estimated_duration=30, prerequisites=prerequisites, rewards='学分+1', status='active',
+        created_at='', updated_at='', npc_id='', course_code=course_code
+    )
+
+
+TASKS = [
+    make_task('NT001', '图书整理', course_code='LIB1001'),
+    make_task('NT002', '文献检索', prerequisites='NT001', lat=22.3400),
+    make_task('NT003', '课程项目', category='实验任务', course_code='LIB1001', lat=22.3500),
+    make_task('NT004', '迎新活动', category='社团活动', lat=22.3362),
+    make_task('NT005', '跑步训练', category='体育锻炼', lat=22.4000),
+]
+
+
+def titles(suggestions, kind):
+    return [s['title'] for s in suggestions if s['type'] == kind]
+
+
+def test_haversine_distance():
+    # 纬度相差 0.001 度约 111 米
+    assert haversine_distance(22.336, 114.17, 22.337, 114.17) == pytest.approx(111.2, abs=0.5)
+
+
+def test_parse_prerequisites():
+    assert parse_prerequisites('无', {'NT001'}) == []
+    assert parse_prerequisites('NT001;NT009', {'NT001'}) == ['NT001']
+
+
+def test_related_tasks_follow_graph_course_and_category():
+    index = SuggestionIndex()
+    index.build(TASKS)
+
+    # 后续任务优先，其次是同一课程
+    assert titles(index.get('NT001'), 'related_task') == ['文献检索', '课程项目']
+    suggestions = index.get('NT002')
+    assert titles(suggestions, 'related_task') == ['图书整理']
+    assert suggestions[0]['description'].startswith('前置任务')
+    assert titles(suggestions, 'follow_up')[0] == '开始前需要先完成“图书整理”吗？'
+
+
+def test_nearby_tasks_within_radius():
+    index = SuggestionIndex(nearby_radius=500)
+    index.build(TASKS)
+
+    suggestions = index.get('NT004')
+    # NT001 距离约 22 米，NT002 约 420 米，NT003、NT005 在半径之外
+    assert titles(suggestions, 'nearby_task') == ['图书整理', '文献检索']
+    assert suggestions[-1]['type'] == 'contact'
+    # 已作为相关任务推荐的不会重复出现在附近任务中
+    assert titles(index.get('NT001'), 'nearby_task') == ['迎新活动']
+
+
+def test_follow_up_uses_category_and_knowledge_tags():
+    knowledge = {'NT005': TaskKnowledge('NT005', 'fitness_plan', '内容', ['健身', '体育运动'], '初级', 10, '')}
+    index = SuggestionIndex(max_questions=2)
+    index.build(TASKS, knowledge)
+    assert titles(index.get('NT005'), 'follow_up') == ['需要自备哪些装备？', '能详细介绍一下体育运动吗？']
+
+
+def test_rebuild_reports_changed_tasks():
+    index = SuggestionIndex()
+    assert index.build(TASKS) == {t.task_id for t in TASKS}
+    assert index.build(TASKS) == set()
+
+    updated = TASKS[:4] + [make_task('NT005', '晨跑训练', category='体育锻炼', lat=22.4000)]
+    assert index.build(updated) == {'NT005'}
+    assert index.build(updated[:4]) == {'NT005'}
+    assert index.get('NT005') is None
+    assert index.get_stats()['builds'] == 4
+
+
+def random_task(rng, i, spread=0.02):
+    located = rng.random() < 0.85
+    return make_task(
+        f'NT{i:03d}', rng.choice('甲乙丙丁戊'), category=rng.choice(['学术研究', '体育锻炼', '社团活动', '']),
+        lat=22.33 + rng.random() * spread if located else 0.0,
+        lng=114.17 + rng.random() * spread if located else 0.0,
+        prerequisites=';'.join(f'NT{rng.randrange(40):03d}' for _ in range(rng.randrange(3))) or '无',
+        course_code=rng.choice(['', 'LIB1001', 'PE1002']), location_name=rng.choice(['Library', 'Gym'])
+    )
+
+
+@pytest.mark.parametrize('spread', [0.001, 0.02, 100.0])
+def test_grid_nearest_matches_brute_force(spread):
+    rng = random.Random(7)
+    tasks = [random_task(rng, i, spread) for i in range(200)]
+    grid = GridIndex.for_tasks(tasks, 500)
+    for task in tasks[:50]:
+        excluded = lambda tid: tid == task.task_id or tid.endswith('3')
+        expected = sorted(
+            (haversine_distance(task.latitude, task.longitude, other.latitude, other.longitude)
+             if task.latitude and other.latitude else float('inf'), other.task_id)
+            for other in tasks if not excluded(other.task_id)
+        )
+        assert grid.nearest(task, 5, excluded) == expected[:5]
+        assert grid.nearest(task, 200, excluded, 800) == [item for item in expected if item[0] <= 800]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_build_matches_full_build(seed):
+    """测试增量更新的结果与从头构建一致，并准确报告变更的任务"""
+    rng = random.Random(seed)
+    tasks = {f'NT{i:03d}': random_task(rng, i) for i in range(30)}
+    knowledge = {}
+    index = SuggestionIndex(max_related=rng.randrange(1, 5), max_nearby=rng.randrange(1, 4))
+    index.build(tasks.values(), knowledge)
+
+    for _ in range(6):
+        for _ in range(rng.randrange(1, 4)):
+            task_id = f'NT{rng.randrange(35):03d}'
+            action = rng.random()
+            if action < 0.3:
+                tasks.pop(task_id, None)
+            elif action < 0.8:
+                tasks[task_id] = random_task(rng, int(task_id[2:]))
+            else:
+                knowledge[task_id] = TaskKnowledge(task_id, 'k', '内容', [rng.choice(['健身', '文献'])], '初级', 10, '')
+        before = {task_id: index.get(task_id) for task_id in set(tasks) | set(index._suggestions)}
+        changed = index.build(tasks.values(), knowledge)
+
+        fresh = SuggestionIndex(max_related=index.max_related, max_nearby=index.max_nearby)
+        fresh.build(tasks.values(), knowledge)
+        assert {task_id: index.get(task_id) for task_id in tasks} == {task_id: fresh.get(task_id) for task_id in tasks}
+        assert changed == {task_id for task_id, old in before.items() if old != index.get(task_id)}
+
+
+def test_rebuild_recomputes_only_affected_tasks():
+    rng = random.Random(1)
+    tasks = [
+        make_task(f'NT{i:04d}', f'任务{i}', category=rng.choice(['学术研究', '体育锻炼', '社团活动']),
+                  lat=22.30 + rng.random() * 0.05, lng=114.10 + rng.random() * 0.05)
+        for i in range(2000)
+    ]
+    index = SuggestionIndex()
+    index.build(tasks)
+    assert index.get_stats()['last_recomputed'] == 2000
+
+    tasks[10] = make_task('NT0010', '任务10改', category=tasks[10].category, lat=tasks[10].latitude, lng=tasks[10].longitude)
+    changed = index.build(tasks)
+    assert 'NT0010' in changed
+    assert index.get_stats()['last_recomputed'] < 100
+
+
+@pytest.mark.asyncio
+async def test_rag_uses_index_for_low_confidence_answers():
+    """测试没有检索到知识时返回预计算的建议，且建议变化后缓存的回答失效"""
+    service = RAGService(KnowledgeRetriever(), MockLLMService(simulate_delay=False), answer_cache=AnswerCache())
+    service.hedge_config.enabled = False
+    service.update_suggestions(TASKS)
+    task_info = {'task_id': 'NT002', 'title': '文献检索', 'location_lat': 22.34, 'location_lng': 114.17}
+
+    result = await service.process_chat_request('NT002', '这个任务怎么做？', task_info)
+    assert result.suggestions == service.suggestion_index.get('NT002')
+    assert titles(result.suggestions, 'related_task') == ['图书整理']
+
+    renamed = [make_task('NT001', '图书上架', course_code='LIB1001')] + TASKS[1:]
+    assert 'NT002' in service.update_suggestions(renamed)
+    result = await service.process_chat_request('NT002', '这个任务怎么做？', task_info)
+    assert titles(result.suggestions, 'related_task') == ['图书上架']
+
+    unknown = await service.process_chat_request('NT404', '这个任务怎么做？', {'task_id': 'NT404'})
+    assert [s['type'] for s in unknown.suggestions] == ['contact']
@@ -0,0 +1,266 @@
+"""
+列式任务存储测试
+"""
+import sys
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from data_loader import Task
+from task_store import (
+    MISSING_TIMESTAMP, HashIndex, KeysetIndex, SortedIndex, StringColumn, TaskStore, decode_cursor,
+    encode_cursor, intersect_rows, parse_timestamp
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+
+def make_task(task_id, title, description='', category='学术研究', difficulty='初级', status='active',
+              course_code='', npc_id='', created_at='2025-09-01T09:00:00Z', rewards='学分+1'):
+    return Task(
+        task_id=task_id, title=title, description=description, category=category,
+        location_name='Library', latitude=22.336, longitude=114.17, difficulty=difficulty,
+        estimated_duration=30, prerequisites='无', rewards=rewards, status=status,
+        created_at=created_at, updated_at=created_at, npc_id=npc_id, course_code=course_code
+    )
+
+
+TASKS = [
+    make_task('NT001', '整理图书资源', '学习图书管理流程', course_code='LIB1001', npc_id='NPC1'),
+    make_task('NT002', 'Media Repair', '检查多媒体设备', category='实验任务', difficulty='中级',
+              created_at='2025-09-02T10:00:00Z', npc_id='NPC2'),
+    make_task('NT003', '迎新活动', 'Welcome new students', category='社团活动',
+              created_at='2025-09-03T10:00:00Z', npc_id='NPC1'),
+    make_task('NT004', '草稿任务', '', status='draft', created_at='', rewards='徽章'),
+]
+
+
+@pytest.fixture
+def store():
+    return TaskStore(TASKS)
+
+
+def test_parse_timestamp():
+    assert parse_timestamp('2025-09-01T09:00:00Z') == int(datetime(2025, 9, 1, 9, tzinfo=timezone.utc).timestamp())
+    assert parse_timestamp('2025-09-01T09:00:00') == parse_timestamp('2025-09-01T09:00:00Z')
+    assert parse_timestamp('') == MISSING_TIMESTAMP
+    assert parse_timestamp('昨天') == MISSING_TIMESTAMP
+
+
+def test_string_column():
+    column = StringColumn(['图书馆', '', 'abc'])
+    assert [column[i] for i in range(3)] == ['图书馆', '', 'abc']
+    assert column.contains('馆').tolist() == [True, False, False]
+    # 不会匹配跨越两行的子串
+    assert column.contains('馆a').tolist() == [False, False, False]
+    assert column.contains('').all()
+
+
+def test_columns_round_trip(store):
+    assert len(store) == 4
+    assert store.materialize(1) == TASKS[1]
+    assert [t.task_id for t in store.materialize_rows([2, 0])] == ['NT003', 'NT001']
+    assert store.get(0, 'course_code') == 'LIB1001'
+    assert store.get(3, 'points') == 0
+    assert store.row_of('NT003') == 2
+
+
+def test_categorical_filters(store):
+    assert store.filter(category=['学术研究']).tolist() == [0, 3]
+    assert store.filter(category=['学术研究', '实验任务'], difficulty=['初级']).tolist() == [0, 3]
+    assert store.filter(npc_id=['NPC1']).tolist() == [0, 2]
+    assert store.filter(course_code=['LIB1001'], status=['active']).tolist() == [0]
+    assert store.filter(category=[]).tolist() == []
+    # 查询中的未知取值不会写入编码表
+    assert store.filter(course_code=['NOPE999']).tolist() == []
+    assert store.categorical['course_code'].table.lookup('NOPE999') is None
+
+
+def test_date_and_search_filters(store):
+    start = parse_timestamp('2025-09-02T00:00:00Z')
+    assert store.filter(created_from=start).tolist() == [1, 2]
+    # 没有创建时间的任务不参与时间范围过滤
+    assert store.filter(created_to=parse_timestamp('2025-09-02T10:00:00Z')).tolist() == [0, 1]
+    assert store.filter(search='图书').tolist() == [0]
+    assert store.filter(search='WELCOME').tolist() == [2]
+    assert store.filter(search='media', difficulty=['中级']).tolist() == [1]
+
+
+def test_value_counts(store):
+    assert store.value_counts('status') == {'active': 3, 'draft': 1}
+    assert store.value_counts('npc_id', np.array([0, 1, 2])) == {'NPC1': 2, 'NPC2': 1}
+    assert store.get_stats()['rows'] == 4
+
+
+def test_sorted_index():
+    values = np.array([30, MISSING_TIMESTAMP, 10, 20, 30, 5], dtype=np.int64)
+    index = SortedIndex(values)
+    assert index.range_rows(10, 30).tolist() == [0, 2, 3, 4]
+    assert index.range_rows(None, 10).tolist() == [2, 5]
+    assert index.range_rows(31, None).tolist() == []
+    assert index.range_rows(20, 10).tolist() == []
+    assert index.check(np.array([0, 1, 3]), 20, None).tolist() == [True, False, True]
+    assert index.span() == (5, 30)
+
+
+def test_date_ranges_combine_with_indexes():
+    """测试时间范围与分类条件组合时，不论哪个集合更小结果都与逐行扫描一致"""
+    tasks = [
+        make_task(f'NT{i:04d}', f'任务{i}', category=['学术研究', '社团活动'][i % 2],
+                  npc_id=f'NPC{i % 50}', created_at=f'2025-09-{i % 30 + 1:02d}T08:00:00Z')
+        for i in range(600)
+    ]
+    store = TaskStore(tasks)
+    start, end = parse_timestamp('2025-09-03T00:00:00Z'), parse_timestamp('2025-09-05T08:00:00Z')
+
+    def expected(predicate):
+        return [i for i, t in enumerate(tasks) if predicate(t) and start <= parse_timestamp(t.created_at) <= end]
+
+    # 时间范围比分类集合小：取出范围参与求交集
+    assert store.filter(category=['学术研究'], created_from=start, created_to=end).tolist() == \
+        expected(lambda t: t.category == '学术研究')
+    # 分类集合比时间范围小：逐行检查候选行
+    assert store.filter(npc_id=['NPC4'], created_from=start, created_to=end).tolist() == \
+        expected(lambda t: t.npc_id == 'NPC4')
+    assert store.filter(created_from=start, created_to=end, updated_from=start).tolist() == \
+        expected(lambda t: True)
+
+
+def test_hash_index():
+    index = HashIndex(['a', 'b', 'a', None, 'c', 'a'])
+    assert index.lookup(['a']).tolist() == [0, 2, 5]
+    assert index.lookup(['c', 'b']).tolist() == [1, 4]
+    assert index.lookup(['x']).tolist() == []
+    assert index.sizes() == {'a': 3, 'b': 1, None: 1, 'c': 1}
+
+
+def test_intersect_rows():
+    big = np.arange(0, 1000, dtype=np.int64)
+    evens = np.arange(0, 1000, 2, dtype=np.int64)
+    small = np.array([3, 4, 998, 999], dtype=np.int64)
+    assert intersect_rows([big, evens, small]).tolist() == [4, 998]
+    assert intersect_rows([big, np.empty(0, dtype=np.int64), small]).tolist() == []
+    assert intersect_rows([evens]).tolist() == evens.tolist()
+
+
+def test_index_filters_match_linear_scan():
+    """测试索引查询与逐行扫描结果一致"""
+    categories = ['学术研究', '实验任务', '社团活动']
+    tasks = [
+        make_task(f'NT{i:04d}', f'任务{i}', category=categories[i % 3], difficulty=['初级', '中级'][i % 2],
+                  npc_id=f'NPC{i % 7}', course_code=f'C{i % 5}')
+        for i in range(300)
+    ]
+    store = TaskStore(tasks)
+    rows = store.filter(category=['学术研究', '社团活动'], difficulty=['中级'], npc_id=['NPC3'], course_code=['C1'])
+    expected = [
+        i for i, t in enumerate(tasks)
+        if t.category in ('学术研究', '社团活动') and t.difficulty == '中级' and t.npc_id == 'NPC3'
+        and t.course_code == 'C1'
+    ]
+    assert rows.tolist() == expected
+    assert store.filter(npc_id=['NPC3'], search='任务1').tolist() == [
+        i for i, t in enumerate(tasks) if t.npc_id == 'NPC3' and '任务1' in t.title
+    ]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor((1756717200, 'NT001'))
+    assert decode_cursor(cursor) == (1756717200, 'NT001')
+    assert '=' not in cursor
+    for bad in ('not-a-cursor', encode_cursor((1, 'NT001'))[:-2], 'WzEsMl0'):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_keyset_index_order_and_resume():
+    keyset = KeysetIndex([20, MISSING_TIMESTAMP, 10, 20, 10], ['B', 'Z', 'C', 'A', 'A'])
+    # 缺失的时间排在最前，同一时间按任务ID排序
+    assert keyset.order.tolist() == [1, 4, 2, 3, 0]
+    assert keyset.key_of(2) == (10, 'C')
+    assert keyset.position_after(None) == 0
+    assert keyset.position_after((10, 'A')) == 2
+    # 游标对应的任务已被删除时，从它原来的位置之后继续
+    assert keyset.position_after((10, 'B')) == 2
+    assert keyset.position_after((99, 'A')) == 5
+
+    page = keyset.page(1, 2)
+    assert page.rows.tolist() == [4, 2] and page.next_key == (10, 'C') and page.skipped == 1
+    page = keyset.page(0, 2, np.array([0, 1, 3]))
+    assert page.rows.tolist() == [1, 3] and page.total == 3 and page.next_key == (20, 'A')
+    assert keyset.page(4, 2, np.array([0, 1, 3])).next_key is None
+
+
+def walk_pages(store, size, approximate=False, **conditions):
+    """按游标从头读到尾，返回全部行号和每页结果"""
+    rows, pages, after = [], [], None
+    while True:
+        page = store.page(after, size, approximate, **conditions)
+        rows.extend(page.rows.tolist())
+        pages.append(page)
+        if page.next_key is None:
+            return rows, pages
+        after = decode_cursor(encode_cursor(page.next_key))
+
+
+def test_keyset_pages_match_filter():
+    """测试精确模式和近似模式逐页读取的结果都与一次性过滤后排序一致"""
+    tasks = [
+        make_task(f'NT{i:04d}', f'任务{i}', category=['学术研究', '社团活动', '实验任务'][i % 3],
+                  npc_id=f'NPC{i % 4}', created_at=f'2025-09-{i % 28 + 1:02d}T08:00:00Z')
+        for i in range(500)
+    ]
+    store = TaskStore(tasks)
+    conditions = dict(category=['学术研究', '社团活动'], npc_id=['NPC1'], search='任务')
+    expected = store.keyset.sort_rows(store.filter(**conditions)).tolist()
+
+    rows, pages = walk_pages(store, 7, **conditions)
+    assert rows == expected
+    assert all(page.total == len(expected) and not page.total_approximate for page in pages)
+    assert [page.skipped for page in pages] == list(range(0, len(expected), 7))
+
+    rows, pages = walk_pages(store, 7, approximate=True, **conditions)
+    assert rows == expected
+    assert pages[1].total_approximate
+    assert abs(pages[1].total - len(expected)) <= len(expected) * 0.3
+
+    # 没有过滤条件时按位置直接切片
+    rows, _ = walk_pages(store, 50)
+    assert rows == store.keyset.order.tolist()
+    assert [tasks[row].created_at for row in rows] == sorted(t.created_at for t in tasks)
+
+
+def test_updated_range_over_http():
+    """测试 /tasks 的 updated_from/updated_to 按更新时间过滤（两端包含），并可与游标分页组合"""
+    from fastapi.testclient import TestClient
+    import main
+
+    main.data_loader.load_all_data(os.path.join(DATA_DIR, 'tasks.csv'), os.path.join(DATA_DIR, 'task_kb.jsonl'))
+    client = TestClient(main.app)
+    all_tasks = client.get('/tasks', params={'size': 100}).json()['data']
+    low, high = datetime.fromisoformat('2025-09-02T00:00:00+00:00'), datetime.fromisoformat('2025-09-05T23:59:59+00:00')
+
+    def updated(task):
+        return datetime.fromisoformat(task['updated_at'].replace('Z', '+00:00'))
+
+    params = {'updated_from': '2025-09-02T00:00:00Z', 'updated_to': '2025-09-05T23:59:59Z', 'size': 100}
+    body = client.get('/tasks', params=params).json()
+    expected = [t['task_id'] for t in all_tasks if low <= updated(t) <= high]
+    assert [t['task_id'] for t in body['data']] == expected
+    assert body['meta']['total'] == len(expected) > 0
+
+    collected, cursor = [], ''
+    while cursor is not None:
+        page = client.get('/tasks', params={**params, 'size': 2, 'cursor': cursor}).json()
+        collected.extend(t['task_id'] for t in page['data'])
+        cursor = page['meta']['next_cursor']
+    assert collected == expected
+
+    only_from = client.get('/tasks', params={'updated_from': '2025-09-06T00:00:00Z', 'size': 100}).json()
+    assert [t['task_id'] for t in only_from['data']] == [
+        t['task_id'] for t in all_tasks if updated(t) >= datetime.fromisoformat('2025-09-06T00:00:00+00:00')
+    ]